@@ -0,0 +1,47 @@
+"""
+Price model benchmark
+
+    cd backend && python -m benchmarks.bench_price --products 200000
+
+Trains on a synthetic catalog, then reports holdout error, single-request
+latency and batched single-core throughput.
+"""
+import argparse
+import json
+import time
+
+from benchmarks.catalog import generate_products, percentile
+from utils.price_model import train
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=200_000)
+    parser.add_argument("--batch", type=int, default=10_000)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    products = list(generate_products(args.products))
+    model = train(products)
+
+    single_ms = []
+    for product in products[:args.requests]:
+        started = time.perf_counter()
+        model.predict([product])
+        single_ms.append((time.perf_counter() - started) * 1000)
+
+    batch = products[:args.batch]
+    started = time.perf_counter()
+    model.predict(batch)
+    batch_seconds = time.perf_counter() - started
+
+    print(json.dumps({
+        "products": args.products,
+        "metrics": model.metrics,
+        "single_ms": {q: round(percentile(single_ms, v), 3) for q, v in (("p50", 50), ("p99", 99))},
+        "batch_size": len(batch),
+        "batch_ms": round(batch_seconds * 1000, 1),
+        "predictions_per_second": round(len(batch) / batch_seconds),
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Product search benchmark
+
+    cd backend && python -m benchmarks.bench_search --products 1000000
+
+Builds the in-process index over a synthetic catalog, then reports build
+time, snapshot size/load time and query / autocomplete latency percentiles.
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.catalog import ADJECTIVES, CATEGORIES, NOUNS, generate_products, percentile
+from utils.search_index import ProductSearchIndex
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    index = ProductSearchIndex()
+    started = time.perf_counter()
+    index.bulk_load(generate_products(args.products))
+    build_seconds = time.perf_counter() - started
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "search.snapshot"
+        started = time.perf_counter()
+        index.save(path)
+        save_seconds = time.perf_counter() - started
+        snapshot_bytes = os.path.getsize(path)
+        started = time.perf_counter()
+        ProductSearchIndex.load(path)
+        load_seconds = time.perf_counter() - started
+
+    rng = random.Random(args.seed)
+    query_ms, facet_ms, complete_ms = [], [], []
+    for _ in range(args.queries):
+        query = f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)}"
+        started = time.perf_counter()
+        index.search(query, limit=20)
+        query_ms.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        index.search(rng.choice(NOUNS), category=rng.choice(CATEGORIES), max_price=100, limit=20)
+        facet_ms.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        index.autocomplete(rng.choice(NOUNS)[:2])
+        complete_ms.append((time.perf_counter() - started) * 1000)
+
+    def summary(samples):
+        return {q: round(percentile(samples, v), 3) for q, v in (("p50", 50), ("p95", 95), ("p99", 99))}
+
+    print(json.dumps({
+        "products": args.products,
+        "terms": len(index.postings),
+        "build_seconds": round(build_seconds, 2),
+        "snapshot_mb": round(snapshot_bytes / 1e6, 1),
+        "snapshot_save_seconds": round(save_seconds, 2),
+        "snapshot_load_seconds": round(load_seconds, 2),
+        "query_ms": summary(query_ms),
+        "filtered_query_ms": summary(facet_ms),
+        "autocomplete_ms": summary(complete_ms),
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
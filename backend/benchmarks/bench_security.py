@@ -0,0 +1,211 @@
+"""
+utils/security hot-path microbenchmarks
+
+    cd backend && python -m benchmarks.bench_security               # full run, 1 KB - 50 MB files
+    cd backend && python -m benchmarks.bench_security --check
+    cd backend && python -m benchmarks.bench_security --quick --check
+    cd backend && python -m benchmarks.bench_security [--quick] --save-baseline
+
+Times bcrypt hashing/verification, access-token encode/decode, Fernet file
+encryption across sizes and hash_filename, next to alternative backends:
+PyJWT (and joserfc when installed) for tokens, one-shot and streaming AES-GCM
+for files. Times are also expressed relative to a fixed sha256 calibration
+workload measured in the same run, so the stored baseline transfers between
+machines; --check exits non-zero when any benchmark's relative time exceeds
+the baseline by more than --tolerance, or has no baseline at all (except the
+optional-backend ones, which only run where that backend is installed).
+
+The baseline keeps full and quick runs apart: after the 10 MB and 50 MB
+buffers the allocator serves 1 MB ones differently, so the same benchmark
+times differently in the two modes.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from hashlib import sha256
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Tuple
+
+import jwt as pyjwt
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+from utils import security
+
+try:
+    from joserfc import jwt as joserfc_jwt
+    from joserfc.jwk import OctKey
+except ImportError:
+    joserfc_jwt = None
+
+BASELINE_PATH = Path(__file__).parent / "baselines" / "security.json"
+FILE_SIZES = {"1KB": 1 << 10, "64KB": 64 << 10, "1MB": 1 << 20, "10MB": 10 << 20, "50MB": 50 << 20}
+QUICK_FILE_SIZES = ("1KB", "64KB", "1MB")
+STREAM_CHUNK = 1 << 20
+CALIBRATION_BYTES = 1 << 20
+# Run only when joserfc is installed, so a stored baseline need not cover them
+OPTIONAL_BENCHMARKS = {"token.encode.joserfc", "token.decode.joserfc"}
+
+def measure(fn: Callable[[], object], min_seconds: float, min_rounds: int = 5) -> List[float]:
+    """Per-call seconds over at least min_rounds calls and min_seconds of wall time"""
+    samples: List[float] = []
+    deadline = time.perf_counter() + min_seconds
+    while len(samples) < min_rounds or time.perf_counter() < deadline:
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+def calibrate(min_seconds: float) -> float:
+    data = os.urandom(CALIBRATION_BYTES)
+    return statistics.median(measure(lambda: sha256(data).digest(), min_seconds, min_rounds=20))
+
+# Alternative file ciphers
+def aesgcm_encrypt(key: bytes, data: bytes) -> bytes:
+    nonce = os.urandom(12)
+    return nonce + AESGCM(key).encrypt(nonce, data, None)
+
+def aesgcm_decrypt(key: bytes, blob: bytes) -> bytes:
+    return AESGCM(key).decrypt(blob[:12], blob[12:], None)
+
+def aesgcm_stream_encrypt(key: bytes, chunks: Iterable[bytes]) -> Tuple[bytes, List[bytes], bytes]:
+    """Chunked AES-GCM: constant memory per chunk, one tag for the whole file"""
+    nonce = os.urandom(12)
+    encryptor = Cipher(algorithms.AES(key), modes.GCM(nonce)).encryptor()
+    out = [encryptor.update(chunk) for chunk in chunks]
+    out.append(encryptor.finalize())
+    return nonce, out, encryptor.tag
+
+def aesgcm_stream_decrypt(key: bytes, nonce: bytes, chunks: Iterable[bytes], tag: bytes) -> List[bytes]:
+    decryptor = Cipher(algorithms.AES(key), modes.GCM(nonce, tag)).decryptor()
+    out = [decryptor.update(chunk) for chunk in chunks]
+    out.append(decryptor.finalize())
+    return out
+
+def chunked(data: bytes, size: int = STREAM_CHUNK) -> Iterable[bytes]:
+    view = memoryview(data)
+    return (view[i:i + size] for i in range(0, len(data), size))
+
+def token_benchmarks() -> Dict[str, Callable[[], object]]:
+    claims = {"sub": "user-123", "email": "buyer@hamro.com", "type": "access",
+              "exp": datetime.utcnow() + timedelta(minutes=30)}
+    jose_token = security.create_access_token({"sub": "user-123", "email": "buyer@hamro.com"})
+    key = security.SECRET_KEY
+    pyjwt_token = pyjwt.encode(claims, key, algorithm=security.ALGORITHM)
+    benches = {
+        "token.encode.jose": lambda: security.create_access_token({"sub": "user-123", "email": "buyer@hamro.com"}),
+        "token.decode.jose": lambda: security.decode_token(jose_token),
+        "token.encode.pyjwt": lambda: pyjwt.encode(claims, key, algorithm=security.ALGORITHM),
+        "token.decode.pyjwt": lambda: pyjwt.decode(pyjwt_token, key, algorithms=[security.ALGORITHM]),
+    }
+    if joserfc_jwt is not None:
+        oct_key = OctKey.import_key(key)
+        header = {"alg": security.ALGORITHM}
+        rfc_claims = {**claims, "exp": int(claims["exp"].timestamp())}
+        rfc_token = joserfc_jwt.encode(header, rfc_claims, oct_key)
+        benches["token.encode.joserfc"] = lambda: joserfc_jwt.encode(header, rfc_claims, oct_key)
+        benches["token.decode.joserfc"] = lambda: joserfc_jwt.decode(rfc_token, oct_key)
+    return benches
+
+def file_benchmarks(sizes: Iterable[str]) -> Dict[str, Callable[[], object]]:
+    key = AESGCM.generate_key(bit_length=256)
+    benches = {}
+    for label in sizes:
+        data = os.urandom(FILE_SIZES[label])
+        fernet_blob = security.encrypt_file(data)
+        gcm_blob = aesgcm_encrypt(key, data)
+        nonce, stream_blob, tag = aesgcm_stream_encrypt(key, chunked(data))
+        benches.update({
+            f"file.encrypt.fernet.{label}": lambda d=data: security.encrypt_file(d),
+            f"file.decrypt.fernet.{label}": lambda b=fernet_blob: security.decrypt_file(b),
+            f"file.encrypt.aesgcm.{label}": lambda d=data: aesgcm_encrypt(key, d),
+            f"file.decrypt.aesgcm.{label}": lambda b=gcm_blob: aesgcm_decrypt(key, b),
+            f"file.encrypt.aesgcm_stream.{label}": lambda d=data: aesgcm_stream_encrypt(key, chunked(d)),
+            f"file.decrypt.aesgcm_stream.{label}": lambda n=nonce, s=stream_blob, t=tag: aesgcm_stream_decrypt(key, n, s, t),
+        })
+    return benches
+
+def password_benchmarks() -> Dict[str, Callable[[], object]]:
+    hashed = security.get_password_hash("correct horse battery staple")
+    return {
+        "password.hash.bcrypt": lambda: security.get_password_hash("correct horse battery staple"),
+        "password.verify.bcrypt": lambda: security.verify_password("correct horse battery staple", hashed),
+    }
+
+def run_suite(quick: bool, min_seconds: float) -> Dict:
+    calibration = calibrate(min_seconds)
+    benches = {
+        **password_benchmarks(),
+        **token_benchmarks(),
+        **file_benchmarks(QUICK_FILE_SIZES if quick else FILE_SIZES),
+        "hash_filename": lambda: security.hash_filename("passport-scan.pdf", "user-123"),
+    }
+    results = {}
+    for name, fn in benches.items():
+        fn()  # warm up
+        samples = measure(fn, min_seconds, min_rounds=3 if name.endswith(("10MB", "50MB")) else 5)
+        median = statistics.median(samples)
+        result = {
+            "rounds": len(samples),
+            "median_us": round(median * 1e6, 2),
+            "ops_per_second": round(1 / median, 1),
+            "relative": round(median / calibration, 4)
+        }
+        size = name.rsplit(".", 1)[-1]
+        if size in FILE_SIZES:
+            result["mb_per_second"] = round(FILE_SIZES[size] / median / 2**20, 1)
+        results[name] = result
+    return {"calibration_us": round(calibration * 1e6, 2), "benchmarks": results}
+
+def regressions(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """
+    Benchmarks whose calibration-relative time grew past the baseline by more than tolerance
+    A benchmark the baseline does not cover fails too, so new sizes or backends
+    cannot go unchecked, unless it is in OPTIONAL_BENCHMARKS; baseline entries
+    not run (e.g. by --quick) are skipped.
+    """
+    failures = [
+        f"{name}: no baseline" for name in results["benchmarks"]
+        if name not in baseline["benchmarks"] and name not in OPTIONAL_BENCHMARKS
+    ]
+    for name, base in baseline["benchmarks"].items():
+        current = results["benchmarks"].get(name)
+        if current is None:
+            continue
+        limit = base["relative"] * (1 + tolerance)
+        if current["relative"] > limit:
+            failures.append(f"{name}: {current['relative']:.4f} > {limit:.4f} (baseline {base['relative']:.4f})")
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="Files up to 1 MB only")
+    parser.add_argument("--min-seconds", type=float, default=0.5, help="Minimum wall time per benchmark")
+    parser.add_argument("--check", action="store_true", help="Fail on regressions against the stored baseline")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Allowed relative slowdown for --check")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    args = parser.parse_args()
+
+    mode = "quick" if args.quick else "full"
+    results = run_suite(args.quick, args.min_seconds)
+    print(json.dumps(results, indent=2))
+
+    baselines = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    if args.save_baseline:
+        baselines[mode] = results
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(baselines, indent=2) + "\n")
+    if args.check:
+        failures = regressions(results, baselines.get(mode, {"benchmarks": {}}), args.tolerance)
+        for failure in failures:
+            print(f"REGRESSION {failure}", file=sys.stderr)
+        if failures:
+            raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Product list serialization benchmark
+
+    cd backend && python -m benchmarks.bench_serialization --limit 100
+
+Serves the same page of products two ways through a real FastAPI app:
+the previous path (ProductResponse models re-validated by response_model)
+and the projected orjson path, and reports per-request latency.
+"""
+import argparse
+import json
+import time
+from typing import List
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from benchmarks.catalog import generate_products, percentile
+from models.product import ProductResponse
+from utils.serialization import PRODUCT_RESPONSE_PROJECTION, json_response, product_responses
+
+def build_app(page: List[dict]) -> FastAPI:
+    projected = [{k: v for k, v in p.items() if k in PRODUCT_RESPONSE_PROJECTION} for p in page]
+    app = FastAPI()
+
+    @app.get("/pydantic", response_model=List[ProductResponse])
+    async def pydantic_path():
+        return [ProductResponse(**p) for p in page]
+
+    @app.get("/orjson", response_model=List[ProductResponse])
+    async def orjson_path():
+        return json_response(product_responses(projected))
+
+    return app
+
+def measure(client: TestClient, path: str, requests: int) -> dict:
+    samples = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        response = client.get(path)
+        samples.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 200
+    return {q: round(percentile(samples, v), 3) for q, v in (("p50", 50), ("p99", 99))}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    page = list(generate_products(args.limit))
+    client = TestClient(build_app(page))
+    assert client.get("/pydantic").json() == client.get("/orjson").json()
+
+    # Serialization alone, without the HTTP client overhead
+    started = time.perf_counter()
+    for _ in range(args.requests):
+        json_response(product_responses(page))
+    orjson_only = (time.perf_counter() - started) * 1000 / args.requests
+
+    print(json.dumps({
+        "limit": args.limit,
+        "pydantic_ms": measure(client, "/pydantic", args.requests),
+        "orjson_ms": measure(client, "/orjson", args.requests),
+        "orjson_serialize_only_ms": round(orjson_only, 3),
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
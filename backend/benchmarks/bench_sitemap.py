@@ -0,0 +1,59 @@
+"""
+Sitemap and JSON-LD feed generation benchmark
+
+    cd backend && python -m benchmarks.bench_sitemap --products 5000000
+
+Streams a synthetic catalog through the shard writer (no database), and
+reports throughput, compressed output size and peak RSS sampled as the run
+progresses, which should stay flat however many products go through.
+"""
+import argparse
+import asyncio
+import json
+import resource
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.catalog import generate_products
+from utils.sitemap import SITEMAP_SHARD_SIZE, write_shards
+
+def peak_rss_mb() -> float:
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+async def run(count: int, directory: Path, shard_size: int) -> dict:
+    checkpoints = {}
+
+    async def products():
+        for i, product in enumerate(generate_products(count)):
+            if i and i % (count // 5 or 1) == 0:
+                checkpoints[i] = peak_rss_mb()
+            yield product
+
+    started = time.perf_counter()
+    shards = await write_shards(products(), directory, 1, shard_size)
+    elapsed = time.perf_counter() - started
+    sitemap_bytes = sum(p.stat().st_size for p in directory.glob("sitemap-*.xml.gz"))
+    feed_bytes = sum(p.stat().st_size for p in directory.glob("products-*.jsonl.gz"))
+    return {
+        "products": count,
+        "shards": len(shards),
+        "seconds": round(elapsed, 1),
+        "products_per_second": round(count / elapsed),
+        "sitemap_mb": round(sitemap_bytes / 2**20, 1),
+        "feed_mb": round(feed_bytes / 2**20, 1),
+        "peak_rss_mb_at": checkpoints,
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=5_000_000)
+    parser.add_argument("--shard-size", type=int, default=SITEMAP_SHARD_SIZE)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        print(json.dumps(asyncio.run(run(args.products, Path(directory), args.shard_size)), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Semantic search benchmark
+
+    cd backend && python -m benchmarks.bench_vector --products 1000000
+
+Embeds a synthetic catalog into a memory-mapped index, then reports build
+time, reopen time and single / batched / IVF query latency percentiles.
+"""
+import argparse
+import json
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.catalog import ADJECTIVES, CATEGORIES, NOUNS, generate_products, percentile
+from utils.vector_index import ProductVectorIndex
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--batch", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    queries = [f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)}" for _ in range(args.queries)]
+
+    def summary(samples):
+        return {q: round(percentile(samples, v), 3) for q, v in (("p50", 50), ("p95", 95), ("p99", 99))}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        index = ProductVectorIndex(Path(tmp))
+        started = time.perf_counter()
+        index.bulk_load(generate_products(args.products))
+        build_seconds = time.perf_counter() - started
+        index.save()
+
+        started = time.perf_counter()
+        index = ProductVectorIndex.load(Path(tmp))
+        load_seconds = time.perf_counter() - started
+
+        query_ms, filtered_ms = [], []
+        for query in queries:
+            started = time.perf_counter()
+            index.search(query, k=20)
+            query_ms.append((time.perf_counter() - started) * 1000)
+
+            started = time.perf_counter()
+            index.search(query, k=20, category=rng.choice(CATEGORIES), max_price=100)
+            filtered_ms.append((time.perf_counter() - started) * 1000)
+
+        batch_ms = []
+        for start in range(0, len(queries), args.batch):
+            chunk = queries[start:start + args.batch]
+            started = time.perf_counter()
+            index.search_batch(chunk, k=20)
+            batch_ms.append((time.perf_counter() - started) * 1000 / len(chunk))
+
+        started = time.perf_counter()
+        index.build_ivf()
+        ivf_seconds = time.perf_counter() - started
+        ivf_ms = []
+        for query in queries:
+            started = time.perf_counter()
+            index.search(query, k=20)
+            ivf_ms.append((time.perf_counter() - started) * 1000)
+
+    print(json.dumps({
+        "products": args.products,
+        "build_seconds": round(build_seconds, 2),
+        "reopen_seconds": round(load_seconds, 2),
+        "query_ms": summary(query_ms),
+        "filtered_query_ms": summary(filtered_ms),
+        "batched_query_ms_per_query": summary(batch_ms),
+        "ivf_train_seconds": round(ivf_seconds, 2),
+        "ivf_query_ms": summary(ivf_ms),
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
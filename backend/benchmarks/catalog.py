@@ -0,0 +1,69 @@
+"""
+Deterministic synthetic catalog shared by the benchmarks
+"""
+import random
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Iterator
+
+CATEGORIES = [
+    "Electronics", "Home & Kitchen", "Clothing", "Beauty", "Sports",
+    "Toys", "Books", "Garden", "Automotive", "Grocery"
+]
+
+ADJECTIVES = [
+    "wireless", "organic", "handmade", "portable", "premium", "vintage", "compact", "smart",
+    "waterproof", "ergonomic", "bamboo", "leather", "cotton", "stainless", "ceramic", "solar",
+    "rechargeable", "foldable", "eco", "classic", "modern", "mini", "heavy", "lightweight"
+]
+
+NOUNS = [
+    "headphones", "speaker", "kettle", "backpack", "lamp", "blender", "jacket", "sneakers",
+    "mug", "charger", "keyboard", "mouse", "tent", "yoga", "mat", "bottle", "watch", "camera",
+    "pillow", "blanket", "knife", "pan", "shampoo", "serum", "puzzle", "novel", "drill", "tyre",
+    "coffee", "tea", "chocolate", "rug", "chair", "desk", "shelf", "planter", "hose", "gloves"
+]
+
+FILLER = [
+    "durable", "perfect", "gift", "everyday", "use", "designed", "comfort", "quality", "easy",
+    "clean", "travel", "home", "office", "outdoor", "family", "kids", "professional", "warranty"
+]
+
+def generate_products(count: int, seed: int = 42, sellers: int = 1000) -> Iterator[Dict]:
+    """Yield `count` published, approved product documents"""
+    rng = random.Random(seed)
+    base = datetime(2026, 1, 1)
+    for i in range(count):
+        noun = rng.choice(NOUNS)
+        title = f"{rng.choice(ADJECTIVES)} {rng.choice(ADJECTIVES)} {noun}"
+        description = " ".join(rng.choices(FILLER + ADJECTIVES + NOUNS, k=rng.randint(12, 30)))
+        created = base + timedelta(seconds=i * 13)
+        seller = rng.randrange(sellers)
+        yield {
+            "id": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            "title": title.title(),
+            "description": description,
+            "category": rng.choice(CATEGORIES),
+            "price": round(rng.lognormvariate(3.5, 1.0), 2),
+            "quantity": rng.randint(0, 500),
+            "sku": f"SKU-{i:08d}",
+            "images": [],
+            "tags": rng.sample(ADJECTIVES + NOUNS, 3),
+            "seller_id": f"seller-{seller}",
+            "seller_name": f"Seller {seller}",
+            "is_published": True,
+            "is_approved": True,
+            "synced_to_amazon": False,
+            "amazon_asin": None,
+            "views": rng.randint(0, 5000),
+            "sales": rng.randint(0, 300),
+            "created_at": created,
+            "updated_at": created,
+        }
+
+def percentile(samples, q: float) -> float:
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    k = min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered))) - 1))
+    return ordered[k]
@@ -0,0 +1,181 @@
+"""
+Deterministic datasets and an in-process app for API tests and load runs
+
+    async with running_app("mongomock://", users=1000, products=20000) as (app, db, dataset):
+        async with api_client(app) as client:
+            ...
+
+Seeders generate users (every tenth a seller), products from the shared
+synthetic catalog, notifications and Amazon sync logs from a fixed seed, so
+ids, emails and the traffic replayed against them repeat run to run.
+`mongomock://` needs mongomock-motor; any other URL uses that MongoDB.
+"""
+import os
+import random
+import sys
+import tempfile
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List
+from unittest import mock
+
+from benchmarks.catalog import generate_products
+
+SEED_PASSWORD = "LoadTest#2026"
+EMAIL_DOMAIN = "loadtest.hamro.com"
+INSERT_BATCH = 1000
+SYNC_OPERATIONS = ["create_listing", "update_inventory", "update_price", "get_orders"]
+SYNC_STATUSES = ["success"] * 6 + ["failed", "retry", "pending"]
+NOTIFICATION_TYPES = ["info", "success", "warning", "error"]
+
+def seller_count(users: int) -> int:
+    return max(1, users // 10)
+
+def generate_users(count: int, hashed_password: str) -> Iterator[Dict]:
+    """Sellers are seller-0..n (matching the catalog's seller ids), then buyers, then one admin"""
+    now = datetime(2026, 1, 1)
+    sellers = seller_count(count)
+    for i in range(count):
+        is_seller = i < sellers
+        user_id = f"seller-{i}" if is_seller else f"user-{i - sellers}"
+        yield {
+            "id": user_id,
+            "email": f"{user_id}@{EMAIL_DOMAIN}",
+            "full_name": f"{'Seller' if is_seller else 'Buyer'} {i}",
+            "phone": None,
+            "hashed_password": hashed_password,
+            "is_active": True,
+            "is_verified": True,
+            "phone_verified": False,
+            "role": "seller" if is_seller else "user",
+            "created_at": now,
+            "updated_at": now
+        }
+    yield {
+        "id": "admin-0", "email": f"admin-0@{EMAIL_DOMAIN}", "full_name": "Load Admin", "phone": None,
+        "hashed_password": hashed_password, "is_active": True, "is_verified": True, "phone_verified": False,
+        "role": "admin", "created_at": now, "updated_at": now
+    }
+
+def generate_notifications(user_ids: List[str], per_user: int, seed: int = 42) -> Iterator[Dict]:
+    rng = random.Random(seed)
+    base = datetime(2026, 1, 1)
+    for user_id in user_ids:
+        for n in range(per_user):
+            yield {
+                "id": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+                "user_id": user_id,
+                "title": f"Update {n}",
+                "message": "Your order has been updated.",
+                "type": rng.choice(NOTIFICATION_TYPES),
+                "action_url": None,
+                "is_read": rng.random() < 0.6,
+                "created_at": base + timedelta(minutes=n * 7)
+            }
+
+def generate_sync_logs(product_ids: List[str], count: int, seed: int = 42) -> Iterator[Dict]:
+    rng = random.Random(seed)
+    base = datetime(2026, 1, 1)
+    for i in range(count):
+        status = rng.choice(SYNC_STATUSES)
+        created = base + timedelta(seconds=i * 37)
+        yield {
+            "id": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            "operation": rng.choice(SYNC_OPERATIONS),
+            "product_id": rng.choice(product_ids) if product_ids else None,
+            "amazon_listing_id": f"SKU-{i:08d}",
+            "feed_id": None,
+            "status": status,
+            "request_data": {"quantity": rng.randint(0, 100)},
+            "response_data": {"ok": True} if status == "success" else None,
+            "error_message": "Throttled" if status in ("failed", "retry") else None,
+            "retry_count": rng.randint(1, 3) if status in ("failed", "retry") else 0,
+            "max_retries": 3,
+            "created_at": created,
+            "updated_at": created,
+            "completed_at": created if status == "success" else None
+        }
+
+async def insert_batches(collection, documents: Iterable[Dict], batch_size: int = INSERT_BATCH) -> int:
+    inserted = 0
+    batch: List[Dict] = []
+    for document in documents:
+        batch.append(document)
+        if len(batch) >= batch_size:
+            await collection.insert_many(batch, ordered=False)
+            inserted += len(batch)
+            batch = []
+    if batch:
+        await collection.insert_many(batch, ordered=False)
+        inserted += len(batch)
+    return inserted
+
+async def seed_dataset(db, users: int = 1000, products: int = 10000, notifications_per_user: int = 5,
+                       sync_logs: int = 2000, seed: int = 42, insert: bool = True) -> Dict:
+    """
+    Seed (or, with insert=False, only describe) a deterministic dataset
+    The returned description is what load drivers pick ids and logins from.
+    """
+    from utils.security import get_password_hash
+
+    sellers = seller_count(users)
+    user_ids = [f"seller-{i}" for i in range(sellers)] + [f"user-{i}" for i in range(users - sellers)]
+    catalog = list(generate_products(products, seed=seed, sellers=sellers))
+    product_ids = [p["id"] for p in catalog]
+
+    if insert:
+        await insert_batches(db.users, generate_users(users, get_password_hash(SEED_PASSWORD)))
+        await insert_batches(db.products, catalog)
+        await insert_batches(db.notifications, generate_notifications(user_ids, notifications_per_user, seed))
+        await insert_batches(db.amazon_sync_logs, generate_sync_logs(product_ids, sync_logs, seed))
+
+    return {
+        "sellers": user_ids[:sellers],
+        "buyers": user_ids[sellers:],
+        "admin": "admin-0",
+        "products": product_ids,
+        "categories": sorted({p["category"] for p in catalog}),
+        "search_terms": sorted({word.lower() for p in catalog[:1000] for word in p["title"].split()}),
+        "password": SEED_PASSWORD,
+        "email_domain": EMAIL_DOMAIN
+    }
+
+def login_email(dataset: Dict, user_id: str) -> str:
+    return f"{user_id}@{dataset['email_domain']}"
+
+@asynccontextmanager
+async def running_app(mongo_url: str = "mongomock://", db_name: str = "hamro_load", seed: bool = True, **dataset_options):
+    """
+    Import server against mongo_url, seed it, run startup, and yield (app, db, dataset)
+    Index snapshots, vectors, models and sitemaps go to a temporary directory. The
+    server module binds its database at import, so use one running_app per process.
+    The environment and the server import are undone on exit, so callers that run
+    in a shared process (pytest) do not see this database afterwards.
+    """
+    imported = "server" in sys.modules
+    with mock.patch.dict(os.environ, {"MONGO_URL": mongo_url, "DB_NAME": db_name}):
+        import server
+
+        try:
+            with tempfile.TemporaryDirectory() as data_dir:
+                server.configure_storage(Path(data_dir))
+                dataset = await seed_dataset(server.db, insert=seed, **dataset_options)
+                await server.app.router.startup()
+                try:
+                    yield server.app, server.db, dataset
+                finally:
+                    await server.app.router.shutdown()
+        finally:
+            if not imported:
+                sys.modules.pop("server", None)
+
+@asynccontextmanager
+async def api_client(app=None, base_url: str = "http://hamro.test"):
+    """httpx client for the in-process app, or for a running server when app is None"""
+    import httpx
+
+    transport = httpx.ASGITransport(app=app) if app is not None else None
+    async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=30) as client:
+        yield client
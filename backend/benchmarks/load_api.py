@@ -0,0 +1,196 @@
+"""
+Replayable API load driver
+
+    cd backend && python -m benchmarks.load_api --users 50 --requests-per-user 200 --out load_report.json
+    cd backend && MONGO_URL=mongodb://localhost:27017 DB_NAME=hamro_load \\
+        python -m benchmarks.load_api --base-url http://localhost:8001 --skip-seed
+
+Virtual users log in, then each draws `requests-per-user` tasks from a
+weighted traffic mix with its own seeded RNG, so a run with the same options
+replays the same request sequence. By default the app runs in process
+against MONGO_URL (mongomock:// if unset); with --base-url a running server
+is driven and the dataset is seeded through MONGO_URL first unless --skip-seed.
+Writes per-endpoint throughput, p50/p99 and error counts as JSON.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from benchmarks.catalog import percentile
+from benchmarks.harness import api_client, login_email, running_app, seed_dataset
+
+class VirtualUser:
+    def __init__(self, client, dataset: Dict, user_id: str, rng: random.Random, samples: Dict):
+        self.client = client
+        self.dataset = dataset
+        self.user_id = user_id
+        self.rng = rng
+        self.samples = samples
+        self.headers: Dict[str, str] = {}
+        self.next_cursor: Optional[str] = None
+
+    @property
+    def is_seller(self) -> bool:
+        return self.user_id.startswith("seller-")
+
+    async def request(self, name: str, method: str, url: str, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, headers=self.headers, **kwargs)
+            ok = response.status_code < 400
+        except Exception:
+            response, ok = None, False
+        self.samples.setdefault(name, []).append(((time.perf_counter() - started) * 1000, ok))
+        return response
+
+    async def login(self):
+        response = await self.request("POST /auth/login", "POST", "/api/auth/login", json={
+            "email": login_email(self.dataset, self.user_id), "password": self.dataset["password"]
+        })
+        if response is not None and response.status_code == 200:
+            self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+# Traffic mix tasks
+async def browse(vu: VirtualUser):
+    params = {"limit": 20}
+    if vu.rng.random() < 0.3:
+        params["category"] = vu.rng.choice(vu.dataset["categories"])
+    response = await vu.request("GET /products/", "GET", "/api/products/", params=params)
+    vu.next_cursor = response.headers.get("X-Next-Cursor") if response is not None else None
+
+async def next_page(vu: VirtualUser):
+    if not vu.next_cursor:
+        return await browse(vu)
+    response = await vu.request("GET /products/?cursor", "GET", "/api/products/", params={"limit": 20, "cursor": vu.next_cursor})
+    vu.next_cursor = response.headers.get("X-Next-Cursor") if response is not None else None
+
+async def view_product(vu: VirtualUser):
+    await vu.request("GET /products/{id}", "GET", f"/api/products/{vu.rng.choice(vu.dataset['products'])}")
+
+async def search(vu: VirtualUser):
+    await vu.request("GET /products/search", "GET", "/api/products/search", params={"q": vu.rng.choice(vu.dataset["search_terms"])})
+
+async def autocomplete(vu: VirtualUser):
+    await vu.request("GET /products/search/autocomplete", "GET", "/api/products/search/autocomplete",
+                     params={"prefix": vu.rng.choice(vu.dataset["search_terms"])[:3]})
+
+async def product_reviews(vu: VirtualUser):
+    await vu.request("GET /reviews/product/{id}", "GET", f"/api/reviews/product/{vu.rng.choice(vu.dataset['products'])}")
+
+async def notifications(vu: VirtualUser):
+    await vu.request("GET /notifications/", "GET", "/api/notifications/", params={"limit": 20})
+
+async def unread_count(vu: VirtualUser):
+    await vu.request("GET /notifications/unread-count", "GET", "/api/notifications/unread-count")
+
+async def my_products(vu: VirtualUser):
+    if vu.is_seller:
+        await vu.request("GET /products/my-products", "GET", "/api/products/my-products", params={"limit": 20})
+    else:
+        await browse(vu)
+
+async def seller_stats(vu: VirtualUser):
+    if vu.is_seller:
+        await vu.request("GET /products/analytics/seller-stats", "GET", "/api/products/analytics/seller-stats")
+    else:
+        await view_product(vu)
+
+TRAFFIC_MIX: List[Tuple[int, Callable]] = [
+    (30, browse),
+    (10, next_page),
+    (25, view_product),
+    (12, search),
+    (5, autocomplete),
+    (6, product_reviews),
+    (5, notifications),
+    (4, unread_count),
+    (2, my_products),
+    (1, seller_stats),
+]
+
+async def run_user(vu: VirtualUser, requests: int):
+    weights = [w for w, _ in TRAFFIC_MIX]
+    tasks = [t for _, t in TRAFFIC_MIX]
+    await vu.login()
+    for task in vu.rng.choices(tasks, weights, k=requests):
+        await task(vu)
+
+def summarize(samples: Dict[str, List[Tuple[float, bool]]], elapsed: float) -> Dict:
+    """Per-endpoint request count, errors, throughput and latency percentiles"""
+    endpoints = {}
+    for name, rows in sorted(samples.items()):
+        latencies = [ms for ms, _ in rows]
+        endpoints[name] = {
+            "requests": len(rows),
+            "errors": sum(not ok for _, ok in rows),
+            "rps": round(len(rows) / elapsed, 1) if elapsed else 0.0,
+            "p50_ms": round(percentile(latencies, 50), 2),
+            "p99_ms": round(percentile(latencies, 99), 2),
+            "mean_ms": round(sum(latencies) / len(latencies), 2)
+        }
+    total = sum(e["requests"] for e in endpoints.values())
+    all_latencies = [ms for rows in samples.values() for ms, _ in rows]
+    return {
+        "elapsed_seconds": round(elapsed, 2),
+        "requests": total,
+        "errors": sum(e["errors"] for e in endpoints.values()),
+        "rps": round(total / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(all_latencies, 50), 2),
+        "p99_ms": round(percentile(all_latencies, 99), 2),
+        "endpoints": endpoints
+    }
+
+async def drive(client, dataset: Dict, users: int, requests_per_user: int, seed: int) -> Dict:
+    population = dataset["sellers"] + dataset["buyers"]
+    picker = random.Random(seed)
+    samples: Dict[str, List[Tuple[float, bool]]] = {}
+    vus = [
+        VirtualUser(client, dataset, picker.choice(population), random.Random(seed * 100_003 + i), samples)
+        for i in range(users)
+    ]
+    started = time.perf_counter()
+    await asyncio.gather(*(run_user(vu, requests_per_user) for vu in vus))
+    return summarize(samples, time.perf_counter() - started)
+
+async def main_async(args) -> Dict:
+    dataset_options = dict(users=args.dataset_users, products=args.products, seed=args.seed)
+    if args.base_url:
+        from utils.database import create_client
+
+        client = create_client(os.environ["MONGO_URL"])
+        dataset = await seed_dataset(client[os.environ["DB_NAME"]], insert=not args.skip_seed, **dataset_options)
+        async with api_client(base_url=args.base_url) as http:
+            report = await drive(http, dataset, args.users, args.requests_per_user, args.seed)
+        client.close()
+    else:
+        async with running_app(os.getenv("MONGO_URL", "mongomock://"), seed=not args.skip_seed, **dataset_options) as (app, _, dataset):
+            async with api_client(app) as http:
+                report = await drive(http, dataset, args.users, args.requests_per_user, args.seed)
+    report["config"] = {k: v for k, v in vars(args).items() if k != "out"}
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50, help="Concurrent virtual users")
+    parser.add_argument("--requests-per-user", type=int, default=200)
+    parser.add_argument("--dataset-users", type=int, default=1000)
+    parser.add_argument("--products", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--base-url", help="Drive a running server instead of the in-process app")
+    parser.add_argument("--skip-seed", action="store_true", help="Dataset is already in the database")
+    parser.add_argument("--out", help="Write the JSON report here as well as to stdout")
+    args = parser.parse_args()
+
+    report = asyncio.run(main_async(args))
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+    print(text)
+
+if __name__ == "__main__":
+    main()
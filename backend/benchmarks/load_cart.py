@@ -0,0 +1,97 @@
+"""
+Concurrent cart update load test (needs a MongoDB)
+
+    cd backend && MONGO_URL=mongodb://localhost:27017 python -m benchmarks.load_cart --workers 64 --ops 200
+
+Many coroutines add, re-add, re-price, update and remove lines of ONE cart
+at the same time, then the stored totals are checked against the lines.
+Any lost update shows up as a totals mismatch.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+import uuid
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from benchmarks.catalog import percentile
+from utils.cart_store import CartError, MongoCartStore, recompute_totals
+
+PRODUCTS = 20
+
+def line(i: int, price: float) -> dict:
+    return {
+        "product_id": f"load-product-{i}",
+        "title": f"Load product {i}",
+        "price": price,
+        "image_url": None,
+        "seller_id": "load-seller",
+        "seller_name": "Load Seller"
+    }
+
+async def worker(store: MongoCartStore, user_id: str, ops: int, rng: random.Random, samples: list, failures: list):
+    for _ in range(ops):
+        i = rng.randrange(PRODUCTS)
+        op = rng.random()
+        started = time.perf_counter()
+        try:
+            if op < 0.5:
+                await store.add_item(user_id, line(i, 10.0 + i), rng.randint(1, 3))
+            elif op < 0.6:
+                # Price change between adds takes the re-pricing path
+                await store.add_item(user_id, line(i, 11.0 + i), 1)
+            elif op < 0.8:
+                await store.set_quantity(user_id, line(i, 0)["product_id"], rng.randint(1, 5))
+            else:
+                await store.remove_item(user_id, line(i, 0)["product_id"])
+        except CartError as e:
+            failures.append(type(e).__name__)
+        samples.append((time.perf_counter() - started) * 1000)
+
+async def run(args):
+    client = AsyncIOMotorClient(os.environ["MONGO_URL"])
+    db = client[os.getenv("DB_NAME", "hamro_load")]
+    store = MongoCartStore(db)
+    await store.ensure_indexes()
+    user_id = f"load-{uuid.uuid4()}"
+
+    samples, failures = [], []
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        worker(store, user_id, args.ops, random.Random(seed), samples, failures)
+        for seed in range(args.workers)
+    ))
+    elapsed = time.perf_counter() - started
+
+    cart = await store.get(user_id)
+    expected = recompute_totals({"items": cart["items"]})
+    consistent = (
+        cart["total_items"] == expected["total_items"]
+        and abs(cart["subtotal"] - expected["subtotal"]) < 1e-6
+        and len({i["product_id"] for i in cart["items"]}) == len(cart["items"])
+    )
+    await db.carts.delete_one({"user_id": user_id})
+    client.close()
+
+    print(json.dumps({
+        "workers": args.workers,
+        "operations": len(samples),
+        "ops_per_second": round(len(samples) / elapsed),
+        "latency_ms": {q: round(percentile(samples, v), 3) for q, v in (("p50", 50), ("p99", 99))},
+        "expected_failures": {name: failures.count(name) for name in set(failures)},
+        "totals_consistent": consistent,
+    }, indent=2))
+    if not consistent:
+        raise SystemExit("Stored cart totals drifted from its lines")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=64)
+    parser.add_argument("--ops", type=int, default=200)
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Checkout contention load test (needs a MongoDB)
+
+    cd backend && MONGO_URL=mongodb://localhost:27017 python -m benchmarks.load_checkout --buyers 1000 --units 10
+
+Seeds one product with `units` in stock, then `buyers` coroutines reserve and
+place an order at the same time. Verifies nothing was oversold and reports
+checkout throughput and latency.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from benchmarks.catalog import percentile
+from utils.stock import OutOfStockError, ReservationError, StockReservations
+
+async def checkout(reservations: StockReservations, db, product_id: str, samples: list) -> bool:
+    user_id = f"buyer-{uuid.uuid4()}"
+
+    async def write_order(reservation, session):
+        order = {"id": str(uuid.uuid4()), "reservation_id": reservation["id"], "user_id": user_id,
+                 "items": reservation["items"], "load_test": True}
+        await db.orders.insert_one(dict(order), session=session)
+        return order
+
+    started = time.perf_counter()
+    try:
+        held = await reservations.reserve(user_id, [{"product_id": product_id, "quantity": 1}])
+        await reservations.commit(held["id"], user_id, write_order)
+        return True
+    except (OutOfStockError, ReservationError):
+        return False
+    finally:
+        samples.append((time.perf_counter() - started) * 1000)
+
+async def run(args):
+    client = AsyncIOMotorClient(os.environ["MONGO_URL"])
+    db = client[os.getenv("DB_NAME", "hamro_load")]
+    reservations = StockReservations(db)
+    await reservations.ensure_indexes()
+
+    product_id = f"load-{uuid.uuid4()}"
+    await db.products.insert_one({
+        "id": product_id, "quantity": args.units, "sales": 0, "is_published": True, "is_approved": True
+    })
+
+    samples = []
+    started = time.perf_counter()
+    results = await asyncio.gather(*(checkout(reservations, db, product_id, samples) for _ in range(args.buyers)))
+    elapsed = time.perf_counter() - started
+
+    product = await db.products.find_one({"id": product_id})
+    orders = await db.orders.count_documents({"items.product_id": product_id})
+    await db.products.delete_one({"id": product_id})
+    await db.orders.delete_many({"items.product_id": product_id, "load_test": True})
+    client.close()
+
+    sold = sum(results)
+    report = {
+        "buyers": args.buyers,
+        "units": args.units,
+        "transactions": reservations.transactions,
+        "sold": sold,
+        "orders": orders,
+        "remaining_quantity": product["quantity"],
+        "checkouts_per_second": round(args.buyers / elapsed),
+        "latency_ms": {q: round(percentile(samples, v), 3) for q, v in (("p50", 50), ("p99", 99))},
+    }
+    print(json.dumps(report, indent=2))
+    if sold != args.units or orders != args.units or product["quantity"] != 0:
+        raise SystemExit("Oversold or undersold under contention")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--buyers", type=int, default=1000)
+    parser.add_argument("--units", type=int, default=10)
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
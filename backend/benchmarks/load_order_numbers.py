@@ -0,0 +1,64 @@
+"""
+Order number stress test across processes (needs a MongoDB)
+
+    cd backend && MONGO_URL=mongodb://localhost:27017 python -m benchmarks.load_order_numbers --processes 8 --per-process 50000
+
+Every process leases blocks from the same counters document and generates
+numbers as fast as it can. Reports the aggregate rate and fails on any
+duplicate or on a process slower than --min-rate numbers per second.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import time
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from utils.order_numbers import MongoSequence, OrderNumberGenerator
+
+COUNTER = "order_number_load_test"
+
+def generate(count: int):
+    async def run():
+        client = AsyncIOMotorClient(os.environ["MONGO_URL"])
+        generator = OrderNumberGenerator(MongoSequence(client[os.getenv("DB_NAME", "hamro_load")], COUNTER))
+        started = time.perf_counter()
+        numbers = [await generator.next_number() for _ in range(count)]
+        elapsed = time.perf_counter() - started
+        client.close()
+        return numbers, elapsed, generator.leases
+
+    return asyncio.run(run())
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, default=8)
+    parser.add_argument("--per-process", type=int, default=50_000)
+    parser.add_argument("--min-rate", type=int, default=10_000, help="numbers per second each process must sustain")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    with multiprocessing.get_context("spawn").Pool(args.processes) as pool:
+        results = pool.map(generate, [args.per_process] * args.processes)
+    wall = time.perf_counter() - started
+
+    numbers = [n for batch, _, _ in results for n in batch]
+    duplicates = len(numbers) - len(set(numbers))
+    rates = [round(args.per_process / elapsed) for _, elapsed, _ in results]
+    print(json.dumps({
+        "processes": args.processes,
+        "numbers": len(numbers),
+        "duplicates": duplicates,
+        "leases": sum(leases for _, _, leases in results),
+        "per_process_rate": rates,
+        "aggregate_rate_wall": round(len(numbers) / wall),
+    }, indent=2))
+    if duplicates:
+        raise SystemExit("Duplicate order numbers")
+    if min(rates) < args.min_rate:
+        raise SystemExit(f"Slowest process generated {min(rates)}/s, below --min-rate {args.min_rate}/s")
+
+if __name__ == "__main__":
+    main()
@@ -22,7 +22,12 @@ from .product import (
     ProductResponse,
     ProductApprovalAction,
     AmazonSyncRequest,
-    AmazonSyncResponse
+    AmazonSyncResponse,
+    BulkProductFilter,
+    BulkApprovalRequest,
+    BulkSyncRequest,
+    BulkJobInDB,
+    BulkJobResponse
 )
 from .notification import (
     NotificationCreate,
@@ -37,6 +42,24 @@ from .payout import (
     PayoutResponse,
     BalanceResponse
 )
+from .review import (
+    ReviewCreate,
+    ReviewUpdate,
+    ReviewInDB,
+    ReviewResponse,
+    ReviewStats,
+    ProductSentiment
+)
+from .ledger import (
+    LedgerEntryInDB,
+    LedgerEntryResponse,
+    EarningsPeriod,
+    EarningsStatement
+)
+from .report import (
+    SalesReportRow,
+    SalesReport
+)
 
 __all__ = [
     'UserBase',
@@ -59,6 +82,11 @@ __all__ = [
     'ProductApprovalAction',
     'AmazonSyncRequest',
     'AmazonSyncResponse',
+    'BulkProductFilter',
+    'BulkApprovalRequest',
+    'BulkSyncRequest',
+    'BulkJobInDB',
+    'BulkJobResponse',
     'NotificationCreate',
     'NotificationInDB',
     'NotificationResponse',
@@ -67,5 +95,17 @@ __all__ = [
     'PayoutCreate',
     'PayoutInDB',
     'PayoutResponse',
-    'BalanceResponse'
+    'BalanceResponse',
+    'ReviewCreate',
+    'ReviewUpdate',
+    'ReviewInDB',
+    'ReviewResponse',
+    'ReviewStats',
+    'ProductSentiment',
+    'LedgerEntryInDB',
+    'LedgerEntryResponse',
+    'EarningsPeriod',
+    'EarningsStatement',
+    'SalesReportRow',
+    'SalesReport'
 ]
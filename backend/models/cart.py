@@ -23,6 +23,11 @@ class CartInDB(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     user_id: str
     items: List[CartItem] = []
+    # Maintained with $inc on every item change
+    total_items: int = 0
+    subtotal: float = 0.0
+    tax: float = 0.0
+    total: float = 0.0
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
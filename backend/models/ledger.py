@@ -0,0 +1,49 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from datetime import datetime
+import uuid
+
+class LedgerEntryInDB(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    user_id: str
+    entry_type: str  # sale_credit, fee, payout_debit, adjustment
+    amount: float  # Signed: credits positive, fees and payouts negative
+    currency: str = "USD"
+    reference_id: str  # order id, payout id, ...
+    description: Optional[str] = None
+    seq: Optional[int] = None  # Per-user sequence, set once the balance is applied
+    balance_after: Optional[float] = None
+    applied: bool = False  # Balance and rollups both updated
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class LedgerEntryResponse(BaseModel):
+    id: str
+    entry_type: str
+    amount: float
+    currency: str
+    reference_id: str
+    description: Optional[str]
+    balance_after: Optional[float]
+    created_at: datetime
+
+class EarningsPeriod(BaseModel):
+    period: str  # 2026-10 or 2026-10-19
+    sales: float = 0
+    fees: float = 0
+    payouts: float = 0
+    adjustments: float = 0
+    net: float = 0
+    entries: int = 0
+
+class EarningsStatement(BaseModel):
+    start: datetime
+    end: datetime
+    currency: str = "USD"
+    sales: float
+    fees: float
+    payouts: float
+    adjustments: float
+    net: float
+    entries: int
+    balance: float
+    periods: List[EarningsPeriod] = []
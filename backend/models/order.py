@@ -7,7 +7,7 @@ class OrderItem(BaseModel):
     product_id: str
     title: str
     price: float
-    quantity: int
+    quantity: int = Field(gt=0)
     image_url: Optional[str] = None
     seller_id: str
     seller_name: str
@@ -23,11 +23,26 @@ class ShippingAddress(BaseModel):
     phone: str
 
 class OrderCreate(BaseModel):
-    items: List[OrderItem]
+    # Either items (reserved on the spot) or a reservation from /orders/reserve
+    items: List[OrderItem] = []
+    reservation_id: Optional[str] = None
     shipping_address: ShippingAddress
     payment_method: str = "card"
     stripe_payment_intent_id: Optional[str] = None
 
+class ReservationItem(BaseModel):
+    product_id: str
+    quantity: int = Field(gt=0)
+
+class ReservationCreate(BaseModel):
+    items: List[ReservationItem]
+
+class ReservationResponse(BaseModel):
+    id: str
+    items: List[OrderItem]
+    subtotal: float
+    expires_at: datetime
+
 class OrderInDB(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     order_number: str
@@ -43,6 +58,7 @@ class OrderInDB(BaseModel):
     payment_status: str = "pending"  # pending, paid, failed, refunded
     payment_method: str
     stripe_payment_intent_id: Optional[str] = None
+    reservation_id: Optional[str] = None
     tracking_number: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
@@ -68,3 +84,16 @@ class OrderResponse(BaseModel):
 class OrderStatusUpdate(BaseModel):
     status: str
     tracking_number: Optional[str] = None
+
+class SellerOrderResponse(BaseModel):
+    order_id: str
+    order_number: str
+    items: List[OrderItem]
+    item_count: int
+    subtotal: float
+    status: str
+    payment_status: str
+    shipping_address: ShippingAddress
+    tracking_number: Optional[str]
+    created_at: datetime
+    updated_at: datetime
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 import uuid
 
@@ -18,6 +18,8 @@ class StripeAccountInDB(BaseModel):
     business_type: str
     charges_enabled: bool = False
     payouts_enabled: bool = False
+    details_submitted: bool = False
+    requirements: dict = {}  # Kept current by account.updated webhooks
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -29,10 +31,20 @@ class PayoutCreate(BaseModel):
 class PayoutInDB(PayoutCreate):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     user_id: str
-    stripe_payout_id: str
-    status: str  # pending, paid, failed, canceled
+    stripe_account_id: Optional[str] = None
+    stripe_payout_id: Optional[str] = None  # Set once the settlement worker has paid it out
+    idempotency_key: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    batch_id: Optional[str] = None
+    settlement_id: Optional[str] = None  # Stripe Idempotency-Key, kept across retries
+    settlement_sent: bool = False
+    settlement_amount: Optional[float] = None  # Total sent to Stripe for the settlement, replayed on retry
+    settlement_size: Optional[int] = None
+    status: str  # queued, processing, pending, paid, failed, canceled
+    attempts: int = 0
+    error_message: Optional[str] = None
     arrival_date: Optional[datetime] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
     paid_at: Optional[datetime] = None
 
 class PayoutResponse(BaseModel):
@@ -45,7 +57,14 @@ class PayoutResponse(BaseModel):
     created_at: datetime
     paid_at: Optional[datetime]
 
+class CurrencyBalance(BaseModel):
+    currency: str
+    available: float
+    pending: float
+
 class BalanceResponse(BaseModel):
+    # First currency on the account; `balances` lists every currency
     available: float
     pending: float
     currency: str
+    balances: List[CurrencyBalance] = []
@@ -79,3 +79,50 @@ class AmazonSyncResponse(BaseModel):
     amazon_asin: Optional[str]
     message: str
     synced_at: datetime
+
+class BulkProductFilter(BaseModel):
+    category: Optional[str] = None
+    seller_id: Optional[str] = None
+    is_approved: Optional[bool] = None
+    is_published: Optional[bool] = None
+    synced_to_amazon: Optional[bool] = None
+    created_after: Optional[datetime] = None
+    created_before: Optional[datetime] = None
+
+class BulkApprovalRequest(BaseModel):
+    product_ids: Optional[List[str]] = None
+    filter: Optional[BulkProductFilter] = None
+    action: str  # approve, reject
+    notes: Optional[str] = None
+
+class BulkSyncRequest(BaseModel):
+    product_ids: Optional[List[str]] = None
+    filter: Optional[BulkProductFilter] = None
+
+class BulkJobInDB(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    job_type: str  # approval_fanout, amazon_sync
+    status: str = "queued"  # queued, running, completed, failed
+    created_by: str
+    params: dict = {}
+    product_ids: List[str]
+    total: int
+    processed: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    errors: List[dict] = []
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    finished_at: Optional[datetime] = None
+
+class BulkJobResponse(BaseModel):
+    id: str
+    job_type: str
+    status: str
+    total: int
+    processed: int
+    succeeded: int
+    failed: int
+    errors: List[dict]
+    created_at: datetime
+    finished_at: Optional[datetime]
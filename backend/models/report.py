@@ -0,0 +1,18 @@
+from pydantic import BaseModel
+from typing import List
+from datetime import datetime
+
+class SalesReportRow(BaseModel):
+    key: str  # seller id, category, product id, or "all"
+    period: str  # day, week, month
+    start: datetime
+    orders: int = 0
+    units: int = 0
+    revenue: float = 0
+    views: int = 0
+    conversion: float = 0  # orders per view
+
+class SalesReport(BaseModel):
+    dimension: str
+    period: str
+    rows: List[SalesReportRow] = []
@@ -10,12 +10,22 @@ class ReviewCreate(BaseModel):
     comment: str
     images: List[str] = []
 
+class ReviewUpdate(BaseModel):
+    rating: Optional[int] = Field(None, ge=1, le=5)
+    title: Optional[str] = None
+    comment: Optional[str] = None
+    images: Optional[List[str]] = None
+
 class ReviewInDB(ReviewCreate):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     user_id: str
     user_name: str
     is_verified_purchase: bool = False
     helpful_count: int = 0
+    sentiment: Optional[str] = None  # positive, neutral, negative; set by the sentiment pipeline
+    sentiment_score: Optional[float] = None
+    sentiment_batch: Optional[str] = None
+    sentiment_scored_at: Optional[datetime] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -29,9 +39,18 @@ class ReviewResponse(BaseModel):
     images: List[str]
     is_verified_purchase: bool
     helpful_count: int
+    sentiment: Optional[str] = None
     created_at: datetime
 
 class ReviewStats(BaseModel):
     average_rating: float
     total_reviews: int
     rating_distribution: dict  # {5: 100, 4: 50, 3: 20, 2: 5, 1: 2}
+
+class ProductSentiment(BaseModel):
+    product_id: str
+    review_count: int = 0
+    average_score: float = 0.0
+    positive: int = 0
+    neutral: int = 0
+    negative: int = 0
@@ -44,9 +44,11 @@ class TokenData(BaseModel):
     user_id: Optional[str] = None
 
 class RefreshTokenDB(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    """One document per login session (token family), rotated in place on refresh"""
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))  # Family id
     user_id: str
-    token: str
-    expires_at: datetime
+    token_hash: str  # Digest of the current refresh token, never the raw JWT
+    previous_hash: Optional[str] = None  # Last rotated-out token, for reuse detection
+    expires_at: datetime  # TTL index removes the family once it lapses
     created_at: datetime = Field(default_factory=datetime.utcnow)
-    is_revoked: bool = False
+    rotated_at: Optional[datetime] = None
@@ -1,4 +1,4 @@
 # Modules package for Hamro backend
-from . import auth, products, ai, kyc, notifications, payouts
+from . import auth, products, ai, kyc, notifications, payouts, ledger, reviews, cart, orders, reports, seo
 
-__all__ = ['auth', 'products', 'ai', 'kyc', 'notifications', 'payouts']
+__all__ = ['auth', 'products', 'ai', 'kyc', 'notifications', 'payouts', 'ledger', 'reviews', 'cart', 'orders', 'reports', 'seo']
@@ -1,7 +1,17 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
 import logging
+import time
+
+from models.user import UserInDB
+from modules.auth import get_current_user
+from utils import price_model
+from utils.chat import ChatBusyError, chat_service, sse_event
+from utils.recommender import product_recommender
+from utils.sentiment import sentiment_analyzer, sentiment_label
+from utils.vector_index import vector_index
 
 logger = logging.getLogger(__name__)
 
@@ -9,7 +19,7 @@ router = APIRouter(prefix="/ai", tags=["AI Services"])
 
 # Placeholder models
 class RecommendationRequest(BaseModel):
-    user_id: str
+    user_id: Optional[str] = None  # Ignored: recommendations are for the signed-in user
     limit: int = 5
 
 class ProductRecommendation(BaseModel):
@@ -22,87 +32,133 @@ class SearchQuery(BaseModel):
     query: str
     filters: Optional[dict] = None
 
+class BatchSearchQuery(BaseModel):
+    queries: List[str]
+    filters: Optional[dict] = None
+
+class ChatMessage(BaseModel):
+    message: str
+
+class BatchPricePrediction(BaseModel):
+    products: List[dict]
+
 class SentimentAnalysis(BaseModel):
     text: str
 
+class BatchSentimentAnalysis(BaseModel):
+    texts: List[str]
+
 class SentimentResult(BaseModel):
     sentiment: str
     score: float
     analysis: str
 
+def _sentiment_result(score: float) -> SentimentResult:
+    label = sentiment_label(score)
+    return SentimentResult(
+        sentiment=label,
+        score=round(score, 4),
+        analysis=f"The text expresses {label} sentiment about the product"
+    )
+
 @router.post("/recommendations", response_model=List[ProductRecommendation])
-async def get_recommendations(request: RecommendationRequest):
+async def get_recommendations(
+    request: RecommendationRequest,
+    current_user: UserInDB = Depends(get_current_user)
+):
     """
-    Get AI-powered product recommendations for a user
-    TODO: Implement actual ML model for recommendations
+    Get product recommendations for the signed-in user
+    Served from precomputed co-purchase / co-view neighbour tables.
     """
-    logger.info(f"Generating recommendations for user: {request.user_id}")
-    # Placeholder response
-    return [
-        ProductRecommendation(
-            product_id="rec-1",
-            product_name="Recommended Product 1",
-            confidence_score=0.95,
-            reason="Based on your previous purchases"
-        ),
-        ProductRecommendation(
-            product_id="rec-2",
-            product_name="Recommended Product 2",
-            confidence_score=0.87,
-            reason="Similar to items you viewed"
-        )
-    ]
+    return product_recommender.recommend(current_user.id, limit=max(1, min(request.limit, 50)))
 
-@router.post("/search")
-async def ai_search(query: SearchQuery):
-    """
-    AI-powered semantic search across products
-    TODO: Implement vector search using embeddings
-    """
-    logger.info(f"AI search query: {query.query}")
-    # Placeholder response
+@router.get("/recommendations/product/{product_id}", response_model=List[ProductRecommendation])
+async def get_similar_products(product_id: str, limit: int = Query(10, ge=1, le=50)):
+    """Products frequently bought or viewed together with this one"""
+    return product_recommender.similar(product_id, limit=limit)
+
+def _search_filters(filters: Optional[dict]) -> dict:
+    filters = filters or {}
+    try:
+        k = int(filters.get("limit", 10))
+        min_price = float(filters["min_price"]) if filters.get("min_price") is not None else None
+        max_price = float(filters["max_price"]) if filters.get("max_price") is not None else None
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="limit, min_price and max_price must be numbers")
     return {
-        "query": query.query,
+        "k": max(1, min(k, 100)),
+        "category": filters.get("category"),
+        "min_price": min_price,
+        "max_price": max_price
+    }
+
+def _format_results(query: str, results: List[dict]) -> dict:
+    return {
+        "query": query,
         "results": [
             {
-                "product_id": "search-1",
-                "name": "Relevant Product 1",
-                "relevance_score": 0.92
-            },
-            {
-                "product_id": "search-2",
-                "name": "Relevant Product 2",
-                "relevance_score": 0.85
+                "product_id": r["product_id"],
+                "name": r["title"],
+                "relevance_score": r["score"]
             }
+            for r in results
         ],
-        "total_results": 2
+        "total_results": len(results)
     }
 
+@router.post("/search")
+async def ai_search(query: SearchQuery):
+    """
+    AI-powered semantic search across products
+    Cosine similarity over hashed TF-IDF embeddings of published, approved products
+    """
+    logger.info(f"AI search query: {query.query}")
+    results = vector_index.search(query.query, **_search_filters(query.filters))
+    return _format_results(query.query, results)
+
+@router.post("/search/batch")
+async def ai_search_batch(batch: BatchSearchQuery):
+    """Semantic search for many queries in one vectorized pass"""
+    if len(batch.queries) > 256:
+        raise HTTPException(status_code=400, detail="At most 256 queries per batch")
+    logger.info(f"AI batch search: {len(batch.queries)} queries")
+    filters = _search_filters(batch.filters)
+    k = filters.pop("k")
+    results = vector_index.search_batch(batch.queries, k, **filters)
+    return {"results": [_format_results(q, r) for q, r in zip(batch.queries, results)]}
+
 @router.post("/sentiment", response_model=SentimentResult)
 async def analyze_sentiment(analysis: SentimentAnalysis):
     """
     Analyze sentiment of product reviews or feedback
-    TODO: Implement actual sentiment analysis model
+    Lexicon scoring with negation handling, score in [-1, 1]
     """
     logger.info(f"Analyzing sentiment for text of length: {len(analysis.text)}")
-    # Placeholder response
-    return SentimentResult(
-        sentiment="positive",
-        score=0.85,
-        analysis="The text expresses positive sentiment about the product"
-    )
+    return _sentiment_result(float(sentiment_analyzer.score_batch([analysis.text])[0]))
+
+@router.post("/sentiment/batch", response_model=List[SentimentResult])
+async def analyze_sentiment_batch(batch: BatchSentimentAnalysis):
+    """Score many texts in one vectorized pass"""
+    if len(batch.texts) > 1000:
+        raise HTTPException(status_code=400, detail="At most 1000 texts per batch")
+    logger.info(f"Analyzing sentiment for {len(batch.texts)} texts")
+    return [_sentiment_result(score) for score in sentiment_analyzer.score_batch(batch.texts).tolist()]
 
 @router.post("/chat")
-async def ai_chat(message: dict):
+async def ai_chat(message: ChatMessage):
     """
     AI chatbot for customer support
-    TODO: Implement actual chatbot using LLM
+    Non-streaming variant of /chat/stream; same retrieval, cache and limits.
     """
-    user_message = message.get("message", "")
+    user_message = message.message
     logger.info(f"AI chat message received: {user_message}")
-    # Placeholder response
+    try:
+        result = await chat_service.complete(user_message)
+    except ChatBusyError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "2"})
     return {
-        "response": "Hello! I'm the Hamro AI assistant. How can I help you today?",
+        "response": result["response"],
+        "products": result["products"],
         "suggested_actions": [
             "Browse products",
             "Check order status",
@@ -110,20 +166,73 @@ async def ai_chat(message: dict):
         ]
     }
 
+@router.post("/chat/stream")
+async def ai_chat_stream(message: ChatMessage):
+    """
+    Stream a chat response as server-sent events
+    Events: context (retrieved products), token (repeated), done (latency).
+    """
+    events = chat_service.stream(message.message)
+    try:
+        # Waits for a slot before the response starts, so overload is a clean 429
+        first = await events.__anext__()
+    except ChatBusyError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "2"})
+
+    async def body():
+        # A client that disconnects mid-stream must still give back its limiter slot
+        try:
+            yield sse_event(first[1], first[0])
+            async for event, payload in events:
+                yield sse_event(payload, event)
+        finally:
+            await events.aclose()
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/chat/metrics")
+async def chat_metrics():
+    """Chat concurrency, cache and first-token / total latency histograms"""
+    return chat_service.metrics()
+
+def _price_model():
+    if price_model.price_model is None:
+        raise HTTPException(status_code=503, detail="Price model is not trained yet")
+    return price_model.price_model
+
 @router.post("/price-prediction")
 async def predict_price(product_data: dict):
     """
     Predict optimal pricing for products
-    TODO: Implement ML-based price prediction
+    Ridge regression over category, tags, text and seller history
     """
-    logger.info(f"Predicting price for product: {product_data.get('name', 'unknown')}")
-    # Placeholder response
+    logger.info(f"Predicting price for product: {product_data.get('title') or product_data.get('name', 'unknown')}")
+    model = _price_model()
+    try:
+        prediction = model.predict([product_data])[0]
+    except price_model.InvalidProductError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return {
-        "predicted_price": 99.99,
-        "confidence": 0.88,
-        "factors": [
-            "Market demand",
-            "Competitor pricing",
-            "Historical sales data"
-        ]
+        **prediction,
+        "model_version": model.version,
+        "factors": ["Category", "Tags and title terms", "Seller pricing history"]
     }
+
+@router.post("/price-prediction/batch")
+async def predict_price_batch(batch: BatchPricePrediction):
+    """Price a bulk upload in one vectorized pass"""
+    if len(batch.products) > 10000:
+        raise HTTPException(status_code=400, detail="At most 10000 products per batch")
+    model = _price_model()
+    started = time.perf_counter()
+    try:
+        predictions = model.predict(batch.products)
+    except price_model.InvalidProductError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    logger.info(f"Predicted {len(predictions)} prices in {elapsed_ms:.1f}ms")
+    return {"model_version": model.version, "predictions": predictions}
@@ -1,10 +1,12 @@
 from fastapi import APIRouter, HTTPException, Depends, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel, EmailStr
-from typing import Optional
+from typing import Awaitable, Callable, List, Optional
 from datetime import datetime, timedelta
 import logging
 
+from pymongo import ReturnDocument
+
 from models.user import UserCreate, UserInDB, UserResponse, Token, RefreshTokenDB
 from utils.security import (
     get_password_hash,
@@ -12,8 +14,10 @@ from utils.security import (
     create_access_token,
     create_refresh_token,
     decode_token,
+    hash_token,
     generate_verification_token,
-    generate_otp
+    generate_otp,
+    REFRESH_TOKEN_EXPIRE_DAYS
 )
 from utils.mock_services import email_service, sms_service
 
@@ -21,6 +25,7 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
 
 # Database instance will be injected
 db = None
@@ -29,6 +34,12 @@ def set_db(database):
     global db
     db = database
 
+# Called as hook(user, credentials) after a successful password login
+LOGIN_HOOKS: List[Callable[..., Awaitable]] = []
+
+def register_login_hook(hook: Callable[..., Awaitable]):
+    LOGIN_HOOKS.append(hook)
+
 # Request/Response models
 class RegisterRequest(BaseModel):
     email: EmailStr
@@ -39,6 +50,7 @@ class RegisterRequest(BaseModel):
 class LoginRequest(BaseModel):
     email: EmailStr
     password: str
+    guest_cart_id: Optional[str] = None  # merged into the user's cart
 
 class VerifyEmailRequest(BaseModel):
     token: str
@@ -54,6 +66,13 @@ class RefreshTokenRequest(BaseModel):
     refresh_token: str
 
 # Helper functions
+async def ensure_indexes():
+    """Refresh tokens: unique digest lookup, reuse detection, TTL expiry"""
+    await db.refresh_tokens.create_index("token_hash", unique=True, sparse=True)
+    await db.refresh_tokens.create_index("previous_hash", sparse=True)
+    await db.refresh_tokens.create_index("user_id")
+    await db.refresh_tokens.create_index("expires_at", expireAfterSeconds=0)
+
 async def get_user_by_email(email: str) -> Optional[UserInDB]:
     """Get user by email from database"""
     user_data = await db.users.find_one({"email": email})
@@ -97,6 +116,17 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     
     return user
 
+def get_optional_user_id(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)
+) -> Optional[str]:
+    """User id from a valid access token, or None for anonymous requests"""
+    if credentials is None:
+        return None
+    payload = decode_token(credentials.credentials)
+    if not payload or payload.get("type") != "access":
+        return None
+    return payload.get("sub")
+
 async def get_admin_user(current_user: UserInDB = Depends(get_current_user)) -> UserInDB:
     """Verify user is admin"""
     if current_user.role != "admin":
@@ -184,14 +214,20 @@ async def login(credentials: LoginRequest):
     access_token = create_access_token(data={"sub": user.id, "email": user.email})
     refresh_token = create_refresh_token(data={"sub": user.id})
     
-    # Store refresh token
+    # Store refresh token digest (starts a new token family)
     refresh_token_db = RefreshTokenDB(
         user_id=user.id,
-        token=refresh_token,
-        expires_at=datetime.utcnow() + timedelta(days=7)
+        token_hash=hash_token(refresh_token),
+        expires_at=datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
     )
     await db.refresh_tokens.insert_one(refresh_token_db.dict())
     
+    for hook in LOGIN_HOOKS:
+        try:
+            await hook(user, credentials)
+        except Exception as e:
+            logger.error(f"❌ Login hook {hook.__name__} failed: {e}")
+    
     logger.info(f"✅ User logged in: {user.email}")
     
     return Token(
@@ -321,28 +357,6 @@ async def refresh_token(request: RefreshTokenRequest):
     
     user_id = payload.get("sub")
     
-    # Check if refresh token exists and is not revoked
-    token_data = await db.refresh_tokens.find_one({
-        "token": request.refresh_token,
-        "user_id": user_id,
-        "is_revoked": False
-    })
-    
-    if not token_data:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid or revoked refresh token"
-        )
-    
-    refresh_token_db = RefreshTokenDB(**token_data)
-    
-    # Check expiration
-    if datetime.utcnow() > refresh_token_db.expires_at:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Refresh token expired"
-        )
-    
     # Get user
     user = await get_user_by_id(user_id)
     if not user:
@@ -355,19 +369,29 @@ async def refresh_token(request: RefreshTokenRequest):
     new_access_token = create_access_token(data={"sub": user.id, "email": user.email})
     new_refresh_token = create_refresh_token(data={"sub": user.id})
     
-    # Revoke old refresh token
-    await db.refresh_tokens.update_one(
-        {"id": refresh_token_db.id},
-        {"$set": {"is_revoked": True}}
+    # Rotate atomically: the old digest matches at most once
+    old_hash = hash_token(request.refresh_token)
+    now = datetime.utcnow()
+    rotated = await db.refresh_tokens.find_one_and_update(
+        {"token_hash": old_hash, "user_id": user_id, "expires_at": {"$gt": now}},
+        {"$set": {
+            "token_hash": hash_token(new_refresh_token),
+            "previous_hash": old_hash,
+            "expires_at": now + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+            "rotated_at": now
+        }},
+        return_document=ReturnDocument.AFTER
     )
     
-    # Store new refresh token
-    new_refresh_token_db = RefreshTokenDB(
-        user_id=user.id,
-        token=new_refresh_token,
-        expires_at=datetime.utcnow() + timedelta(days=7)
-    )
-    await db.refresh_tokens.insert_one(new_refresh_token_db.dict())
+    if not rotated:
+        # A rotated-out token being replayed means it leaked: revoke the whole family
+        reused = await db.refresh_tokens.find_one_and_delete({"previous_hash": old_hash, "user_id": user_id})
+        if reused:
+            logger.warning(f"⚠️ Refresh token reuse detected, family revoked for user: {user_id}")
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or revoked refresh token"
+        )
     
     logger.info(f"✅ Token refreshed for user: {user.email}")
     
@@ -379,12 +403,11 @@ async def refresh_token(request: RefreshTokenRequest):
 @router.post("/logout")
 async def logout(request: RefreshTokenRequest, current_user: UserInDB = Depends(get_current_user)):
     """
-    Logout user by revoking refresh token
+    Logout user by revoking the refresh token family
     """
-    # Revoke refresh token
-    await db.refresh_tokens.update_many(
-        {"token": request.refresh_token, "user_id": current_user.id},
-        {"$set": {"is_revoked": True}}
+    # One document per family, so revocation is a single indexed delete
+    await db.refresh_tokens.delete_one(
+        {"token_hash": hash_token(request.refresh_token), "user_id": current_user.id}
     )
     
     logger.info(f"✅ User logged out: {current_user.email}")
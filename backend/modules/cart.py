@@ -0,0 +1,178 @@
+from fastapi import APIRouter, HTTPException, Depends, Header, Response, status
+from typing import Optional
+import logging
+import uuid
+
+from models.cart import CartItemAdd, CartItemUpdate, CartResponse
+from models.user import UserInDB
+from modules import auth
+from modules.auth import get_optional_user_id
+from utils.cart_store import (
+    CART_MAX_ITEM_QUANTITY,
+    CartConflictError,
+    CartError,
+    CartItemNotFoundError,
+    MongoCartStore,
+    cart_response,
+    guest_carts
+)
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/cart", tags=["Cart"])
+
+# Anonymous carts are addressed by this header; the server mints one on first write
+GUEST_CART_HEADER = "X-Guest-Cart"
+
+# Database instance
+db = None
+cart_store: MongoCartStore = None
+
+def set_db(database):
+    global db, cart_store
+    db = database
+    cart_store = MongoCartStore(database)
+
+async def ensure_indexes():
+    await cart_store.ensure_indexes()
+
+def cart_line(product: dict) -> dict:
+    """Cart line snapshot of a product, without quantity"""
+    primary = next((img for img in product.get("images", []) if img.get("is_primary")), None)
+    if primary is None and product.get("images"):
+        primary = product["images"][0]
+    return {
+        "product_id": product["id"],
+        "title": product["title"],
+        "price": product["price"],
+        "image_url": primary["url"] if primary else None,
+        "seller_id": product["seller_id"],
+        "seller_name": product["seller_name"]
+    }
+
+def resolve_cart(user_id: Optional[str], guest_id: Optional[str], create: bool = False):
+    """(store, owner id) for the caller: the user's cart when signed in, else the guest cart"""
+    if user_id:
+        return cart_store, user_id
+    if not guest_id and create:
+        guest_id = str(uuid.uuid4())
+    return guest_carts, guest_id
+
+def respond(cart: Optional[dict], guest_id: Optional[str], response: Response, user_id: Optional[str]):
+    if not user_id and guest_id:
+        response.headers[GUEST_CART_HEADER] = guest_id
+    return CartResponse(**cart_response(cart))
+
+async def apply(operation):
+    try:
+        return await operation
+    except CartConflictError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except CartItemNotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except CartError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+async def merge_guest_cart(user: UserInDB, guest_id: Optional[str]):
+    """Move a guest cart into the user's cart"""
+    if not guest_id:
+        return None
+    guest = await guest_carts.get(guest_id)
+    if not guest or not guest["items"]:
+        return None
+    cart = await cart_store.merge(user.id, guest["items"])
+    await guest_carts.clear(guest_id)
+    logger.info(f"🛒 Merged {len(guest['items'])} guest cart lines into cart of {user.id}")
+    return cart
+
+async def merge_on_login(user: UserInDB, credentials):
+    await merge_guest_cart(user, credentials.guest_cart_id)
+
+auth.register_login_hook(merge_on_login)
+
+@router.get("/", response_model=CartResponse)
+async def get_cart(
+    response: Response,
+    user_id: Optional[str] = Depends(get_optional_user_id),
+    guest_id: Optional[str] = Header(None, alias=GUEST_CART_HEADER)
+):
+    """Current cart; totals are maintained on write"""
+    store, owner_id = resolve_cart(user_id, guest_id)
+    cart = await store.get(owner_id) if owner_id else None
+    return respond(cart, owner_id, response, user_id)
+
+@router.post("/items", response_model=CartResponse)
+async def add_cart_item(
+    item: CartItemAdd,
+    response: Response,
+    user_id: Optional[str] = Depends(get_optional_user_id),
+    guest_id: Optional[str] = Header(None, alias=GUEST_CART_HEADER)
+):
+    """Add a product to the cart (signed-in or guest)"""
+    if not 1 <= item.quantity <= CART_MAX_ITEM_QUANTITY:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Quantity must be between 1 and {CART_MAX_ITEM_QUANTITY}"
+        )
+    product = await db.products.find_one(
+        {"id": item.product_id, "is_published": True, "is_approved": True},
+        {"_id": 0, "id": 1, "title": 1, "price": 1, "images": 1, "seller_id": 1, "seller_name": 1, "quantity": 1}
+    )
+    if not product:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
+    if product["quantity"] < item.quantity:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Not enough stock")
+
+    store, owner_id = resolve_cart(user_id, guest_id, create=True)
+    cart = await apply(store.add_item(owner_id, cart_line(product), item.quantity))
+    return respond(cart, owner_id, response, user_id)
+
+@router.put("/items/{product_id}", response_model=CartResponse)
+async def update_cart_item(
+    product_id: str,
+    update: CartItemUpdate,
+    response: Response,
+    user_id: Optional[str] = Depends(get_optional_user_id),
+    guest_id: Optional[str] = Header(None, alias=GUEST_CART_HEADER)
+):
+    """Set a line's quantity; 0 removes it"""
+    store, owner_id = resolve_cart(user_id, guest_id)
+    if not owner_id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item not in cart")
+    cart = await apply(store.set_quantity(owner_id, product_id, update.quantity))
+    return respond(cart, owner_id, response, user_id)
+
+@router.delete("/items/{product_id}", response_model=CartResponse)
+async def remove_cart_item(
+    product_id: str,
+    response: Response,
+    user_id: Optional[str] = Depends(get_optional_user_id),
+    guest_id: Optional[str] = Header(None, alias=GUEST_CART_HEADER)
+):
+    """Remove a product from the cart"""
+    store, owner_id = resolve_cart(user_id, guest_id)
+    if not owner_id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item not in cart")
+    cart = await apply(store.remove_item(owner_id, product_id))
+    return respond(cart, owner_id, response, user_id)
+
+@router.delete("/", response_model=CartResponse)
+async def clear_cart(
+    response: Response,
+    user_id: Optional[str] = Depends(get_optional_user_id),
+    guest_id: Optional[str] = Header(None, alias=GUEST_CART_HEADER)
+):
+    """Empty the cart"""
+    store, owner_id = resolve_cart(user_id, guest_id)
+    if owner_id:
+        await store.clear(owner_id)
+    return respond(None, owner_id, response, user_id)
+
+@router.post("/merge", response_model=CartResponse)
+async def merge_cart(
+    current_user: UserInDB = Depends(auth.get_current_user),
+    guest_id: Optional[str] = Header(None, alias=GUEST_CART_HEADER)
+):
+    """Merge a guest cart into the signed-in user's cart (login does this automatically)"""
+    cart = await merge_guest_cart(current_user, guest_id)
+    return CartResponse(**cart_response(cart or await cart_store.get(current_user.id)))
@@ -0,0 +1,312 @@
+from fastapi import APIRouter, HTTPException, Depends, Query, status
+from typing import Dict, List, Optional, Tuple
+from datetime import date, datetime, timedelta
+import logging
+import os
+
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import DuplicateKeyError
+
+from models.ledger import (
+    LedgerEntryInDB,
+    LedgerEntryResponse,
+    EarningsPeriod,
+    EarningsStatement
+)
+from models.user import UserInDB
+from modules.auth import get_current_user
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/ledger", tags=["Ledger"])
+
+# Database instance
+db = None
+
+def set_db(database):
+    global db
+    db = database
+
+# Platform fee taken from each seller's part of an order
+PLATFORM_FEE_RATE = float(os.getenv("PLATFORM_FEE_RATE", "0"))
+# Entries remembered on balance and rollup documents, so a replayed entry is not applied twice
+LEDGER_RECENT_ENTRIES = 100
+
+# Rollup field each entry type is accumulated into
+ENTRY_FIELDS = {
+    "sale_credit": "sales",
+    "fee": "fees",
+    "payout_debit": "payouts",
+    "adjustment": "adjustments",
+}
+
+async def ensure_indexes():
+    await db.ledger_entries.create_index(
+        [("user_id", ASCENDING), ("entry_type", ASCENDING), ("reference_id", ASCENDING)],
+        unique=True
+    )
+    await db.ledger_entries.create_index([("user_id", ASCENDING), ("created_at", DESCENDING)])
+    await db.ledger_entries.create_index([("user_id", ASCENDING), ("currency", ASCENDING), ("seq", DESCENDING)])
+    await db.ledger_rollups.create_index(
+        [("user_id", ASCENDING), ("currency", ASCENDING), ("period", ASCENDING), ("bucket", ASCENDING)],
+        unique=True
+    )
+    await db.ledger_balances.create_index([("user_id", ASCENDING), ("currency", ASCENDING)], unique=True)
+
+def bucket_keys(ts: datetime) -> Tuple[str, str]:
+    """Day and month rollup keys for a timestamp"""
+    return ts.strftime("%Y-%m-%d"), ts.strftime("%Y-%m")
+
+def plan_rollup_buckets(start: date, end: date) -> Tuple[List[str], List[str]]:
+    """
+    Cover [start, end] with the fewest rollup documents
+    Whole calendar months use the monthly rollup, ragged edges use daily rollups.
+    """
+    months, days = [], []
+    current = start
+    while current <= end:
+        month_start = current.replace(day=1)
+        next_month = (month_start + timedelta(days=32)).replace(day=1)
+        month_end = next_month - timedelta(days=1)
+        if current == month_start and month_end <= end:
+            months.append(month_start.strftime("%Y-%m"))
+            current = next_month
+        else:
+            stop = min(month_end, end)
+            while current <= stop:
+                days.append(current.strftime("%Y-%m-%d"))
+                current += timedelta(days=1)
+    return months, days
+
+async def apply_balance(entry: LedgerEntryInDB):
+    """
+    Add the entry to the user's running balance in its currency exactly once
+    Compare-and-set on seq; the last LEDGER_RECENT_ENTRIES entries are kept
+    with their seq and balance so a replay picks those up instead.
+    """
+    key = {"user_id": entry.user_id, "currency": entry.currency}
+    while True:
+        balance = await db.ledger_balances.find_one(key)
+        if balance is None:
+            try:
+                await db.ledger_balances.insert_one(
+                    {**key, "balance": 0.0, "seq": 0, "recent": [], "updated_at": datetime.utcnow()}
+                )
+            except DuplicateKeyError:
+                pass
+            continue
+
+        applied = next((r for r in balance.get("recent", []) if r["id"] == entry.id), None)
+        if applied:
+            entry.seq, entry.balance_after = applied["seq"], applied["balance"]
+            return
+
+        seq = balance["seq"] + 1
+        total = round(balance["balance"] + entry.amount, 2)
+        result = await db.ledger_balances.update_one(
+            {**key, "seq": balance["seq"]},
+            {
+                "$set": {"seq": seq, "balance": total, "updated_at": datetime.utcnow()},
+                "$push": {"recent": {"$each": [{"id": entry.id, "seq": seq, "balance": total}],
+                                     "$slice": -LEDGER_RECENT_ENTRIES}}
+            }
+        )
+        if result.modified_count:
+            entry.seq, entry.balance_after = seq, total
+            return
+
+async def apply_rollups(entry: LedgerEntryInDB):
+    """$inc the day and month rollups of the entry's currency once per entry"""
+    increments = {ENTRY_FIELDS[entry.entry_type]: entry.amount, "net": entry.amount, "entries": 1}
+    day, month = bucket_keys(entry.created_at)
+    for period, bucket in (("day", day), ("month", month)):
+        try:
+            await db.ledger_rollups.update_one(
+                {"user_id": entry.user_id, "currency": entry.currency, "period": period, "bucket": bucket,
+                 "recent": {"$ne": entry.id}},
+                {"$inc": increments, "$push": {"recent": {"$each": [entry.id], "$slice": -LEDGER_RECENT_ENTRIES}}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # The bucket exists and already holds this entry
+            pass
+
+async def record_entry(
+    user_id: str,
+    entry_type: str,
+    amount: float,
+    reference_id: str,
+    description: Optional[str] = None,
+    currency: str = "USD",
+    created_at: Optional[datetime] = None
+) -> Optional[LedgerEntryInDB]:
+    """
+    Append a ledger entry and update the running balance and rollups
+    Entries are unique per (user, type, reference). Replaying an entry that a
+    crash left half applied finishes it; replaying a finished one is a no-op
+    and returns None.
+    """
+    if entry_type not in ENTRY_FIELDS:
+        raise ValueError(f"Unknown ledger entry type: {entry_type}")
+
+    entry = LedgerEntryInDB(
+        user_id=user_id,
+        entry_type=entry_type,
+        amount=round(amount, 2),
+        currency=currency.upper(),
+        reference_id=reference_id,
+        description=description,
+        created_at=created_at or datetime.utcnow()
+    )
+
+    try:
+        await db.ledger_entries.insert_one(entry.dict())
+    except DuplicateKeyError:
+        existing = await db.ledger_entries.find_one(
+            {"user_id": user_id, "entry_type": entry_type, "reference_id": reference_id}, {"_id": 0}
+        )
+        if existing["applied"]:
+            return None
+        entry = LedgerEntryInDB(**existing)
+
+    await apply_balance(entry)
+    await apply_rollups(entry)
+    entry.applied = True
+    await db.ledger_entries.update_one(
+        {"id": entry.id},
+        {"$set": {"seq": entry.seq, "balance_after": entry.balance_after, "applied": True}}
+    )
+    return entry
+
+async def record_sale(seller_id: str, order_id: str, gross: float, fee: float, currency: str = "USD"):
+    """Credit a seller for an order and debit the platform fee"""
+    await record_entry(seller_id, "sale_credit", gross, order_id, f"Sale {order_id}", currency)
+    if fee:
+        await record_entry(seller_id, "fee", -abs(fee), order_id, f"Platform fee {order_id}", currency)
+
+def seller_sales(lines: List[Dict]) -> Dict[str, float]:
+    """Gross amount per seller for a set of order lines"""
+    gross: Dict[str, float] = {}
+    for line in lines:
+        gross[line["seller_id"]] = gross.get(line["seller_id"], 0.0) + line["price"] * line["quantity"]
+    return {seller_id: round(amount, 2) for seller_id, amount in gross.items()}
+
+async def record_order(order: Dict):
+    """Credit every seller in a placed order (checkout hook)"""
+    for seller_id, gross in seller_sales(order["items"]).items():
+        await record_sale(seller_id, order["id"], gross, round(gross * PLATFORM_FEE_RATE, 2), order.get("currency", "USD"))
+
+async def record_cancellation(seller_order: Dict):
+    """Reverse a cancelled seller part's sale net of its fee"""
+    gross = seller_order["subtotal"]
+    net = gross - round(gross * PLATFORM_FEE_RATE, 2)
+    await record_entry(
+        seller_order["seller_id"], "adjustment", -net, f"cancel:{seller_order['order_id']}",
+        f"Cancelled {seller_order['order_id']}", seller_order.get("currency", "USD")
+    )
+
+async def record_payouts(payouts: List[Dict], stripe_payout: Dict):
+    """Debit settled payouts (settlement worker hook)"""
+    for payout in payouts:
+        await record_entry(
+            payout["user_id"],
+            "payout_debit",
+            -abs(payout["amount"]),
+            payout["id"],
+            f"Payout {stripe_payout['id']}",
+            payout.get("currency", "USD")
+        )
+
+def _sum_rollups(rollups: List[Dict]) -> Dict[str, float]:
+    totals = {field: 0.0 for field in ENTRY_FIELDS.values()}
+    totals.update(net=0.0, entries=0)
+    for rollup in rollups:
+        for field in totals:
+            totals[field] += rollup.get(field, 0)
+    return {k: (round(v, 2) if k != "entries" else int(v)) for k, v in totals.items()}
+
+@router.get("/entries", response_model=List[LedgerEntryResponse])
+async def get_ledger_entries(
+    currency: str = "USD",
+    limit: int = Query(50, ge=1, le=200),
+    before_seq: Optional[int] = None,
+    current_user: UserInDB = Depends(get_current_user)
+):
+    """Get ledger entries in one currency, newest first (keyset paginated on seq)"""
+    query = {"user_id": current_user.id, "currency": currency.upper(), "seq": {"$ne": None}}
+    if before_seq is not None:
+        query["seq"] = {"$lt": before_seq}
+
+    entries = await db.ledger_entries.find(query).sort("seq", -1).limit(limit).to_list(limit)
+    return [LedgerEntryResponse(**e) for e in entries]
+
+@router.get("/balance")
+async def get_ledger_balance(current_user: UserInDB = Depends(get_current_user)):
+    """Get running ledger balance per currency"""
+    balances = await db.ledger_balances.find({"user_id": current_user.id}).sort("currency", 1).to_list(None)
+    return {
+        "balances": [
+            {"currency": b["currency"], "balance": round(b["balance"], 2), "entries": b["seq"]}
+            for b in balances
+        ]
+    }
+
+@router.get("/statement", response_model=EarningsStatement)
+async def get_earnings_statement(
+    start: date,
+    end: date,
+    granularity: Optional[str] = None,
+    currency: str = "USD",
+    current_user: UserInDB = Depends(get_current_user)
+):
+    """
+    Earnings statement in one currency for [start, end] served from rollups
+    - granularity=day|month adds a per-period breakdown; edge months only
+      count the requested days, so the periods always add up to the totals
+    """
+    if end < start:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="end must not be before start"
+        )
+    if granularity not in (None, "day", "month"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="granularity must be 'day' or 'month'"
+        )
+    key = {"user_id": current_user.id, "currency": currency.upper()}
+
+    months, days = plan_rollup_buckets(start, end)
+    clauses = []
+    if months:
+        clauses.append({"period": "month", "bucket": {"$in": months}})
+    if days:
+        clauses.append({"period": "day", "bucket": {"$in": days}})
+    rollups = await db.ledger_rollups.find({**key, "$or": clauses}).to_list(None)
+    totals = _sum_rollups(rollups)
+
+    periods = []
+    if granularity == "month":
+        # Whole months come from their monthly rollup, edge months from the same day rollups as the totals
+        by_month: Dict[str, List[Dict]] = {}
+        for rollup in rollups:
+            by_month.setdefault(rollup["bucket"][:7], []).append(rollup)
+        periods = [EarningsPeriod(period=month, **_sum_rollups(by_month[month])) for month in sorted(by_month)]
+    elif granularity == "day":
+        breakdown = await db.ledger_rollups.find({
+            **key,
+            "period": "day",
+            "bucket": {"$gte": start.strftime("%Y-%m-%d"), "$lte": end.strftime("%Y-%m-%d")}
+        }).sort("bucket", 1).to_list(None)
+        periods = [EarningsPeriod(period=r["bucket"], **_sum_rollups([r])) for r in breakdown]
+
+    balance = await db.ledger_balances.find_one(key)
+
+    return EarningsStatement(
+        start=datetime.combine(start, datetime.min.time()),
+        end=datetime.combine(end, datetime.max.time()),
+        currency=currency.upper(),
+        balance=round(balance["balance"], 2) if balance else 0.0,
+        periods=periods,
+        **totals
+    )
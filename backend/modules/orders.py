@@ -0,0 +1,301 @@
+from fastapi import APIRouter, HTTPException, Depends, Query, Response, status
+from typing import Dict, List, Optional
+from datetime import datetime
+import logging
+import os
+
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+
+from models.order import (
+    OrderCreate,
+    OrderInDB,
+    OrderResponse,
+    OrderStatusUpdate,
+    ReservationCreate,
+    ReservationResponse,
+    SellerOrderResponse
+)
+from models.user import UserInDB
+from modules import cart, ledger, reports
+from modules.auth import get_current_user
+from modules.notifications import create_notification
+from utils.cart_store import CART_TAX_RATE, CartError
+from utils.order_numbers import MongoSequence, OrderNumberGenerator
+from utils.seller_orders import ORDER_STATUSES, SellerOrderViews, can_transition, derive_order_status
+from utils.stock import OutOfStockError, ReservationError, StockReservations
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/orders", tags=["Orders"])
+
+ORDER_SHIPPING_COST = float(os.getenv("ORDER_SHIPPING_COST", "0"))
+
+# Database instance
+db = None
+stock_reservations: StockReservations = None
+order_numbers: OrderNumberGenerator = None
+seller_orders: SellerOrderViews = None
+
+def set_db(database):
+    global db, stock_reservations, order_numbers, seller_orders
+    db = database
+    stock_reservations = StockReservations(database, on_recovered=recover_order)
+    order_numbers = OrderNumberGenerator(MongoSequence(database))
+    seller_orders = SellerOrderViews(database)
+
+async def ensure_indexes():
+    await db.orders.create_index("id", unique=True)
+    await db.orders.create_index("order_number", unique=True)
+    await db.orders.create_index([("user_id", ASCENDING), ("created_at", DESCENDING)])
+    await db.orders.create_index(
+        "reservation_id", unique=True, partialFilterExpression={"reservation_id": {"$type": "string"}}
+    )
+    await stock_reservations.ensure_indexes()
+    await seller_orders.ensure_indexes()
+
+async def recover_order(order: Dict):
+    """Sweeper hook for a checkout that crashed after the order insert; every write is idempotent"""
+    await seller_orders.write_for_order(order)
+    await ledger.record_order(order)
+    await reports.record_order(order)
+
+async def price_lines(items: List[Dict]) -> List[Dict]:
+    """Order lines priced from the catalog; client-supplied prices are ignored"""
+    product_ids = list({item["product_id"] for item in items})
+    products = {
+        p["id"]: p
+        async for p in db.products.find(
+            {"id": {"$in": product_ids}, "is_published": True, "is_approved": True},
+            {"_id": 0, "id": 1, "title": 1, "price": 1, "images": 1, "seller_id": 1, "seller_name": 1}
+        )
+    }
+    missing = [pid for pid in product_ids if pid not in products]
+    if missing:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Product not found: {missing[0]}")
+    return [{**cart.cart_line(products[item["product_id"]]), "quantity": item["quantity"]} for item in items]
+
+def order_totals(lines: List[Dict]) -> Dict[str, float]:
+    subtotal = round(sum(line["price"] * line["quantity"] for line in lines), 2)
+    tax = round(subtotal * CART_TAX_RATE, 2)
+    return {
+        "subtotal": subtotal,
+        "tax": tax,
+        "shipping_cost": ORDER_SHIPPING_COST,
+        "total": round(subtotal + tax + ORDER_SHIPPING_COST, 2)
+    }
+
+async def hold_stock(user_id: str, lines: List[Dict]) -> Dict:
+    try:
+        return await stock_reservations.reserve(user_id, lines)
+    except OutOfStockError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+@router.post("/reserve", response_model=ReservationResponse, status_code=status.HTTP_201_CREATED)
+async def reserve_stock(
+    request: ReservationCreate,
+    current_user: UserInDB = Depends(get_current_user)
+):
+    """Hold stock while the buyer pays; the hold expires after CHECKOUT_HOLD_MINUTES"""
+    lines = await price_lines([item.dict() for item in request.items])
+    reservation = await hold_stock(current_user.id, lines)
+    return ReservationResponse(
+        id=reservation["id"],
+        items=reservation["items"],
+        subtotal=order_totals(reservation["items"])["subtotal"],
+        expires_at=reservation["expires_at"]
+    )
+
+@router.delete("/reserve/{reservation_id}")
+async def release_reservation(reservation_id: str, current_user: UserInDB = Depends(get_current_user)):
+    """Give held stock back before the hold expires"""
+    if not await stock_reservations.release(reservation_id, current_user.id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No active reservation")
+    return {"message": "Reservation released", "reservation_id": reservation_id}
+
+@router.post("/", response_model=OrderResponse, status_code=status.HTTP_201_CREATED)
+async def create_order(
+    order: OrderCreate,
+    current_user: UserInDB = Depends(get_current_user)
+):
+    """
+    Checkout: place an order from a reservation, or reserve the given items now
+    The order insert and consuming the stock holds share one transaction when available.
+    """
+    if order.reservation_id:
+        reservation_id = order.reservation_id
+        reserved_here = False
+    elif order.items:
+        lines = await price_lines([{"product_id": i.product_id, "quantity": i.quantity} for i in order.items])
+        reservation_id = (await hold_stock(current_user.id, lines))["id"]
+        reserved_here = True
+    else:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Provide items or reservation_id")
+
+    async def write_order(reservation: Dict, session) -> Dict:
+        new_order = OrderInDB(
+            # Leased outside the session so the counter never joins (or aborts with) the transaction
+            order_number=await order_numbers.next_number(),
+            user_id=current_user.id,
+            user_email=current_user.email,
+            items=reservation["items"],
+            shipping_address=order.shipping_address,
+            payment_method=order.payment_method,
+            stripe_payment_intent_id=order.stripe_payment_intent_id,
+            reservation_id=reservation["id"],
+            **order_totals(reservation["items"])
+        ).dict()
+        await db.orders.insert_one(dict(new_order), session=session)
+        await seller_orders.write_for_order(new_order, session)
+        return new_order
+
+    try:
+        placed = await stock_reservations.commit(reservation_id, current_user.id, write_order)
+    except ReservationError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except Exception:
+        # Once the order row exists the sweeper finishes the commit; releasing would hand its stock back
+        if reserved_here and not await db.orders.find_one({"reservation_id": reservation_id}, {"_id": 0, "id": 1}):
+            await stock_reservations.release(reservation_id, current_user.id)
+        raise
+
+    await reports.record_order(placed)
+    try:
+        await ledger.record_order(placed)
+    except Exception as e:
+        # Entries are idempotent per order, so ledger.record_order(order) can be replayed
+        logger.error(f"❌ Ledger update failed for order {placed['id']}: {e}")
+    for line in placed["items"]:
+        try:
+            await cart.cart_store.remove_item(current_user.id, line["product_id"])
+        except CartError:
+            pass
+    logger.info(f"🛒 Order placed: {placed['order_number']} ({len(placed['items'])} lines)")
+
+    return OrderResponse(**placed)
+
+@router.get("/", response_model=List[OrderResponse])
+async def get_my_orders(
+    skip: int = 0,
+    limit: int = 20,
+    current_user: UserInDB = Depends(get_current_user)
+):
+    """Buyer's orders, newest first"""
+    limit = min(limit, 100)
+    orders = await db.orders.find({"user_id": current_user.id}, {"_id": 0}).sort(
+        "created_at", DESCENDING
+    ).skip(skip).limit(limit).to_list(limit)
+    return [OrderResponse(**o) for o in orders]
+
+# Seller Endpoints
+@router.get("/seller", response_model=List[SellerOrderResponse])
+async def get_seller_orders(
+    response: Response,
+    order_status: Optional[str] = Query(None, alias="status"),
+    cursor: Optional[str] = None,
+    limit: int = 20,
+    current_user: UserInDB = Depends(get_current_user)
+):
+    """
+    Seller's part of each order, newest first
+    Pass the X-Next-Cursor header back as `cursor` for the next page.
+    """
+    limit = max(1, min(limit, 100))
+    try:
+        rows, next_cursor = await seller_orders.page(current_user.id, order_status, cursor, limit)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return [SellerOrderResponse(**r) for r in rows]
+
+@router.get("/seller/analytics")
+async def get_seller_order_analytics(current_user: UserInDB = Depends(get_current_user)):
+    """Order counts by status, items sold and revenue from counters kept on write"""
+    return await seller_orders.analytics(current_user.id)
+
+async def restock(items: List[Dict]):
+    for item in items:
+        give_back = {"$inc": {"quantity": item["quantity"], "sales": -item["quantity"]}}
+        result = await db.products.update_one({"id": item["product_id"], "quantity": {"$gt": 0}}, give_back)
+        if not result.modified_count:
+            # Back in stock, which feeds and caches key on updated_at
+            await db.products.update_one(
+                {"id": item["product_id"]}, {**give_back, "$set": {"updated_at": datetime.utcnow()}}
+            )
+
+@router.put("/{order_id}/status", response_model=OrderResponse)
+async def update_order_status(
+    order_id: str,
+    update: OrderStatusUpdate,
+    current_user: UserInDB = Depends(get_current_user)
+):
+    """
+    Move the caller's part of an order on (seller), or every part (admin)
+    The order's own status is the least advanced of its parts.
+    """
+    if update.status not in ORDER_STATUSES:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid status")
+
+    parts = await seller_orders.for_order(order_id)
+    is_admin = current_user.role == "admin"
+    mine = [p for p in parts if is_admin or p["seller_id"] == current_user.id]
+    if not mine:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Order not found")
+
+    for part in mine:
+        if not can_transition(part["status"], update.status):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Cannot move order from {part['status']} to {update.status}"
+            )
+    for part in mine:
+        updated = await seller_orders.set_status(
+            order_id, part["seller_id"], part["status"], update.status, update.tracking_number
+        )
+        if updated is None:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Order was updated concurrently")
+        if update.status == "cancelled" and part["status"] != "cancelled":
+            await restock(updated["items"])
+            await reports.record_cancellation(updated)
+            try:
+                await ledger.record_cancellation(updated)
+            except Exception as e:
+                logger.error(f"❌ Ledger update failed for cancelled order {order_id}: {e}")
+
+    # Re-read: other sellers may have moved their parts while these were updated
+    parts = await seller_orders.for_order(order_id)
+    now = datetime.utcnow()
+    order_status = derive_order_status([p["status"] for p in parts])
+    changes = {"status": order_status, "updated_at": now}
+    if update.tracking_number:
+        changes["tracking_number"] = update.tracking_number
+    if order_status == "shipped":
+        changes["shipped_at"] = now
+    elif order_status == "delivered":
+        changes["delivered_at"] = now
+    order = await db.orders.find_one_and_update(
+        {"id": order_id}, {"$set": changes}, projection={"_id": 0}, return_document=ReturnDocument.AFTER
+    )
+
+    if update.status in ("shipped", "delivered", "cancelled"):
+        await create_notification(
+            user_id=order["user_id"],
+            title=f"Order {update.status.title()}",
+            message=f"Items from order {order['order_number']} have been {update.status}"
+                    f"{f' (tracking {update.tracking_number})' if update.tracking_number else ''}.",
+            notification_type="warning" if update.status == "cancelled" else "success",
+            action_url=f"/orders/{order_id}"
+        )
+    logger.info(f"📦 Order {order['order_number']} -> {order_status} by {current_user.id}")
+
+    return OrderResponse(**order)
+
+@router.get("/{order_id}", response_model=OrderResponse)
+async def get_order(order_id: str, current_user: UserInDB = Depends(get_current_user)):
+    """Order details (buyer or admin)"""
+    order = await db.orders.find_one({"id": order_id}, {"_id": 0})
+    if not order or (order["user_id"] != current_user.id and current_user.role != "admin"):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Order not found")
+    return OrderResponse(**order)
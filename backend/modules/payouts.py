@@ -1,5 +1,5 @@
-from fastapi import APIRouter, HTTPException, Depends, status
-from typing import List
+from fastapi import APIRouter, HTTPException, Depends, Header, Request, status
+from typing import List, Optional
 from datetime import datetime
 import logging
 
@@ -12,9 +12,18 @@ from models.payout import (
     BalanceResponse
 )
 from models.user import UserInDB
-from modules.auth import get_current_user
-from utils.stripe_service import stripe_service
+from modules.auth import get_current_user, get_admin_user
+from utils.stripe_service import STRIPE_MODE, stripe_service
+from utils.payout_queue import PayoutQueue, PayoutSettlementWorker, balances_by_currency
+from utils.stripe_webhooks import (
+    StripeEventQueue,
+    STRIPE_WEBHOOK_SECRET,
+    StripeEventProcessor,
+    WebhookSignatureError,
+    verify_webhook_signature
+)
 from modules.notifications import create_notification
+from modules.ledger import record_payouts
 
 logger = logging.getLogger(__name__)
 
@@ -22,10 +31,20 @@ router = APIRouter(prefix="/payouts", tags=["Payouts"])
 
 # Database instance
 db = None
+payout_queue = None
+settlement_worker = None
+event_queue = None
+event_processor = None
 
 def set_db(database):
-    global db
+    global db, payout_queue, settlement_worker, event_queue, event_processor
     db = database
+    payout_queue = PayoutQueue(database)
+    settlement_worker = PayoutSettlementWorker(
+        payout_queue, stripe_service, notify=create_notification, on_settled=record_payouts
+    )
+    event_queue = StripeEventQueue(database)
+    event_processor = StripeEventProcessor(event_queue)
 
 @router.post("/connect/account", status_code=status.HTTP_201_CREATED)
 async def create_stripe_account(
@@ -114,19 +133,28 @@ async def get_balance(current_user: UserInDB = Depends(get_current_user)):
         )
     
     balance = await stripe_service.get_account_balance(account['stripe_account_id'])
+    balances = balances_by_currency(balance)
     
-    return BalanceResponse(
-        available=balance['available'],
-        pending=balance['pending'],
-        currency=balance['currency']
-    )
+    return BalanceResponse(**balances[0], balances=balances)
 
-@router.post("/request", response_model=PayoutResponse, status_code=status.HTTP_201_CREATED)
+@router.post("/request", response_model=PayoutResponse, status_code=status.HTTP_202_ACCEPTED)
 async def request_payout(
     payout_data: PayoutCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
     current_user: UserInDB = Depends(get_current_user)
 ):
-    """Request payout to bank account"""
+    """
+    Queue payout to bank account
+    - Retries with the same Idempotency-Key return the original payout;
+      reusing a key for a different amount or currency is a 409
+    - Balance check and Stripe payout happen in the settlement worker
+    """
+    if payout_data.amount <= 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Payout amount must be positive"
+        )
+    
     account = await db.stripe_accounts.find_one({"user_id": current_user.id})
     
     if not account:
@@ -141,46 +169,37 @@ async def request_payout(
             detail="Payouts not enabled. Complete account verification."
         )
     
-    # Check balance
-    balance = await stripe_service.get_account_balance(account['stripe_account_id'])
-    if balance['available'] < payout_data.amount:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Insufficient balance. Available: ${balance['available']}"
-        )
-    
-    # Create payout
-    stripe_payout = await stripe_service.create_payout(
-        account_id=account['stripe_account_id'],
-        amount=payout_data.amount,
-        currency=payout_data.currency,
-        description=payout_data.description
-    )
-    
-    # Save to database
     payout_db = PayoutInDB(
         user_id=current_user.id,
-        stripe_payout_id=stripe_payout['id'],
+        stripe_account_id=account['stripe_account_id'],
         amount=payout_data.amount,
         currency=payout_data.currency,
         description=payout_data.description,
-        status=stripe_payout['status'],
-        arrival_date=datetime.fromisoformat(stripe_payout['arrival_date']) if stripe_payout.get('arrival_date') else None
+        status="queued"
     )
+    if idempotency_key:
+        payout_db.idempotency_key = idempotency_key
     
-    await db.payouts.insert_one(payout_db.dict())
+    payout, created = await payout_queue.enqueue(payout_db.dict())
     
-    # Create notification
-    await create_notification(
-        user_id=current_user.id,
-        title="Payout Requested",
-        message=f"Your payout of ${payout_data.amount} has been requested and will arrive in 2-3 business days.",
-        notification_type="success"
-    )
+    if not created and (payout['amount'] != payout_db.amount or payout['currency'] != payout_db.currency):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Idempotency-Key was already used for a different payout"
+        )
     
-    logger.info(f"✅ Payout requested: ${payout_data.amount} for {current_user.email}")
+    if created:
+        await create_notification(
+            user_id=current_user.id,
+            title="Payout Requested",
+            message=f"Your payout of ${payout_data.amount} has been queued and will arrive in 2-3 business days once settled.",
+            notification_type="success"
+        )
+        logger.info(f"✅ Payout queued: ${payout_data.amount} for {current_user.email}")
+    else:
+        logger.info(f"↩️ Payout request replayed for {current_user.email} (key={payout_db.idempotency_key})")
     
-    return PayoutResponse(**payout_db.dict())
+    return PayoutResponse(**payout)
 
 @router.get("/history", response_model=List[PayoutResponse])
 async def get_payout_history(
@@ -193,7 +212,7 @@ async def get_payout_history(
 
 @router.get("/account/status")
 async def get_account_status(current_user: UserInDB = Depends(get_current_user)):
-    """Get Stripe account status"""
+    """Get Stripe account status (kept current by Stripe webhooks, polled in mock mode)"""
     account = await db.stripe_accounts.find_one({"user_id": current_user.id})
     
     if not account:
@@ -202,25 +221,70 @@ async def get_account_status(current_user: UserInDB = Depends(get_current_user))
             "message": "No Stripe account connected"
         }
     
-    # Get status from Stripe
-    status_data = await stripe_service.get_account_status(account['stripe_account_id'])
-    
-    # Update local database
-    await db.stripe_accounts.update_one(
-        {"user_id": current_user.id},
-        {"$set": {
+    if STRIPE_MODE == "mock":
+        # The mock never sends webhooks, so read the status from it directly
+        status_data = await stripe_service.get_account_status(account['stripe_account_id'])
+        account.update({
             "charges_enabled": status_data['charges_enabled'],
             "payouts_enabled": status_data['payouts_enabled'],
             "status": "active" if status_data['details_submitted'] else "pending",
-            "updated_at": datetime.utcnow()
-        }}
-    )
+            "requirements": status_data.get('requirements', {})
+        })
+        await db.stripe_accounts.update_one(
+            {"user_id": current_user.id},
+            {"$set": {
+                "charges_enabled": account['charges_enabled'],
+                "payouts_enabled": account['payouts_enabled'],
+                "status": account['status'],
+                "requirements": account['requirements'],
+                "updated_at": datetime.utcnow()
+            }}
+        )
     
     return {
         "connected": True,
         "account_id": account['stripe_account_id'],
-        "charges_enabled": status_data['charges_enabled'],
-        "payouts_enabled": status_data['payouts_enabled'],
-        "status": "active" if status_data['details_submitted'] else "pending",
-        "requirements": status_data.get('requirements', {})
+        "charges_enabled": account.get('charges_enabled', False),
+        "payouts_enabled": account.get('payouts_enabled', False),
+        "status": account.get('status', 'pending'),
+        "requirements": account.get('requirements', {})
     }
+
+@router.post("/webhook")
+async def stripe_webhook(request: Request):
+    """
+    Stripe webhook ingestion
+    - Verifies Stripe-Signature, stores the event and acknowledges immediately
+    - Events are applied to stripe_accounts and payouts by the background processor
+    """
+    if not STRIPE_WEBHOOK_SECRET:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Stripe webhooks are not configured"
+        )
+    
+    payload = await request.body()
+    
+    try:
+        event = verify_webhook_signature(payload, request.headers.get("Stripe-Signature"))
+    except WebhookSignatureError as e:
+        logger.warning(f"⚠️ Rejected Stripe webhook: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid signature"
+        )
+    
+    if not event.get("id") or not event.get("type"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid event"
+        )
+    
+    created = await event_queue.ingest(event)
+    
+    return {"received": True, "duplicate": not created}
+
+@router.get("/admin/stripe-metrics")
+async def get_stripe_metrics(admin_user: UserInDB = Depends(get_admin_user)):
+    """Stripe API latency histograms per endpoint (Admin only)"""
+    return {"endpoints": stripe_service.metrics()}
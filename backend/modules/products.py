@@ -1,7 +1,14 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, status
+from fastapi.responses import Response, StreamingResponse
 from typing import List, Optional
-from datetime import datetime
+from datetime import datetime, timedelta
+import asyncio
 import logging
+import os
+import uuid
+
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from pymongo.errors import BulkWriteError
 
 from models.product import (
     ProductCreate,
@@ -10,13 +17,37 @@ from models.product import (
     ProductResponse,
     ProductApprovalAction,
     AmazonSyncRequest,
-    AmazonSyncResponse
+    AmazonSyncResponse,
+    BulkApprovalRequest,
+    BulkSyncRequest,
+    BulkJobInDB,
+    BulkJobResponse
 )
+from models.amazon_sync import AmazonSyncLog
+from models.notification import NotificationInDB
 from models.user import UserInDB
-from modules.auth import get_current_user, get_admin_user
+from modules.auth import get_current_user, get_admin_user, get_optional_user_id
 from utils.amazon_sp_api_client import amazon_client
 from modules.notifications import create_notification
 from modules.amazon_sync import create_sync_log
+from modules import reports
+from utils import product_io
+from utils.http_cache import (
+    CATALOG_CACHE_CONTROL,
+    PRIVATE_CACHE_CONTROL,
+    catalog_cache,
+    cursor_query,
+    encode_cursor,
+    etag_matches,
+    list_etag,
+    product_etag
+)
+from utils.chat import chat_service
+from utils.bulk_jobs import BULK_MAX_IDS, BulkJobQueue, BulkJobWorker, build_product_query
+from utils.recommender import ViewLog
+from utils.search_index import INDEX_PROJECTION, search_index
+from utils.serialization import PRODUCT_RESPONSE_PROJECTION, json_response, product_response, product_responses
+from utils.vector_index import vector_index
 
 logger = logging.getLogger(__name__)
 
@@ -24,10 +55,25 @@ router = APIRouter(prefix="/products", tags=["Products"])
 
 # Database instance
 db = None
+bulk_jobs: BulkJobQueue = None
+bulk_worker: BulkJobWorker = None
+view_log: ViewLog = None
+
+# Concurrent SP-API calls per bulk sync batch
+AMAZON_SYNC_CONCURRENCY = 5
+# A bulk sync claim left by a crashed worker may be retried after this
+AMAZON_SYNC_CLAIM_MINUTES = int(os.getenv("AMAZON_SYNC_CLAIM_MINUTES", "30"))
+AMAZON_SYNC_CLAIM_FIELDS = {"amazon_sync_claim": "", "amazon_sync_claimed_at": ""}
 
 def set_db(database):
-    global db
+    global db, bulk_jobs, bulk_worker, view_log
     db = database
+    view_log = ViewLog(database)
+    bulk_jobs = BulkJobQueue(database)
+    bulk_worker = BulkJobWorker(bulk_jobs, {
+        "approval_fanout": approval_fanout_batch,
+        "amazon_sync": amazon_sync_batch
+    })
 
 # Helper functions
 async def get_product_by_id(product_id: str) -> Optional[ProductInDB]:
@@ -37,6 +83,43 @@ async def get_product_by_id(product_id: str) -> Optional[ProductInDB]:
         return ProductInDB(**product_data)
     return None
 
+def invalidate_caches():
+    """Catalog pages and cached chat answers both embed product titles and prices"""
+    catalog_cache.invalidate()
+    chat_service.cache.invalidate()
+
+def index_product(product: dict):
+    """Keep the in-process search indexes and response caches current"""
+    search_index.upsert(product)
+    vector_index.upsert(product)
+    invalidate_caches()
+
+def unindex_product(product_id: str):
+    search_index.remove(product_id)
+    vector_index.remove(product_id)
+    invalidate_caches()
+
+async def ensure_indexes():
+    await db.products.create_index("id", unique=True)
+    await bulk_jobs.ensure_indexes()
+    await db.products.create_index(
+        [("seller_id", ASCENDING), ("sku", ASCENDING)],
+        unique=True,
+        partialFilterExpression={"sku": {"$type": "string"}},
+        name="seller_sku"
+    )
+    # Public listing, newest first, with and without a category
+    await db.products.create_index([
+        ("is_published", ASCENDING), ("is_approved", ASCENDING),
+        ("created_at", DESCENDING), ("id", DESCENDING)
+    ])
+    await db.products.create_index([
+        ("is_published", ASCENDING), ("is_approved", ASCENDING), ("category", ASCENDING),
+        ("created_at", DESCENDING), ("id", DESCENDING)
+    ])
+    # Watermark scans for incremental sitemap regeneration
+    await db.products.create_index("updated_at")
+
 async def check_product_ownership(product_id: str, user_id: str) -> bool:
     """Check if user owns the product"""
     product = await get_product_by_id(product_id)
@@ -64,6 +147,7 @@ async def create_product(
     )
     
     await db.products.insert_one(new_product.dict())
+    index_product(new_product.dict())
     logger.info(f"✅ Product created: {new_product.id}")
     
     return ProductResponse(**new_product.dict())
@@ -80,13 +164,149 @@ async def get_my_products(
     if is_published is not None:
         query["is_published"] = is_published
     
-    products = await db.products.find(query).skip(skip).limit(limit).to_list(limit)
-    return [ProductResponse(**p) for p in products]
+    products = await db.products.find(query, PRODUCT_RESPONSE_PROJECTION).skip(skip).limit(limit).to_list(limit)
+    return json_response(product_responses(products))
+
+async def import_chunk(rows, current_user: UserInDB, report: product_io.ImportReport):
+    """Validate and upsert one chunk of import rows with a single bulk_write"""
+    planned = product_io.plan_chunk(rows, report)
+    if not planned:
+        return
+    now = datetime.utcnow()
+    # Two operations per row: insert if missing, then update if changed
+    operations = [
+        operation
+        for _, product in planned
+        for operation in product_io.upsert_operations(product, current_user.id, current_user.full_name, now)
+    ]
+    failed = set()
+    try:
+        result = await db.products.bulk_write(operations, ordered=False)
+        details = result.bulk_api_result
+    except BulkWriteError as e:
+        details = e.details
+        for error in details.get("writeErrors", []):
+            row_number, product = planned[error["index"] // 2]
+            failed.add(row_number)
+            report.error(row_number, error.get("errmsg", "Write failed"), product.sku)
+
+    report.inserted += details.get("nUpserted", 0)
+    report.updated += details.get("nModified", 0)
+    report.unchanged += len(planned) - len(failed) - details.get("nUpserted", 0) - details.get("nModified", 0)
+
+    skus = [product.sku for _, product in planned]
+    async for product in db.products.find({"seller_id": current_user.id, "sku": {"$in": skus}}, INDEX_PROJECTION):
+        index_product(product)
+
+@router.post("/bulk/import")
+async def bulk_import_products(
+    request: Request,
+    format: Optional[str] = None,
+    current_user: UserInDB = Depends(get_current_user)
+):
+    """
+    Stream a CSV or JSONL upload of any size (Seller only)
+    Rows are validated and upserted by (seller, sku) in chunks; new products start unpublished
+    and existing ones keep their stock and any column the file leaves out.
+    """
+    if current_user.role not in ['seller', 'admin']:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only sellers can import products")
+
+    content_type = request.headers.get("content-type", "")
+    format = format or ("jsonl" if "json" in content_type else "csv")
+    if format not in ("csv", "jsonl"):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="format must be csv or jsonl")
+
+    lines = product_io.iter_lines(request.stream())
+    rows = product_io.iter_csv_rows(lines) if format == "csv" else product_io.iter_jsonl_rows(lines)
+    report = product_io.ImportReport()
+    chunk = []
+    try:
+        async for row_number, row, error in rows:
+            report.rows += 1
+            if error:
+                report.error(row_number, error)
+                continue
+            chunk.append((row_number, row))
+            if len(chunk) >= product_io.IMPORT_CHUNK_SIZE:
+                await import_chunk(chunk, current_user, report)
+                chunk = []
+        await import_chunk(chunk, current_user, report)
+    except UnicodeDecodeError:
+        report.error(report.rows, "Upload is not valid UTF-8")
+
+    logger.info(f"📥 Bulk import by {current_user.email}: {report.rows} rows, {report.error_count} errors")
+    return report.dict()
+
+@router.get("/bulk/export")
+async def bulk_export_products(
+    format: str = "csv",
+    current_user: UserInDB = Depends(get_current_user)
+):
+    """Stream the seller's catalog as CSV or JSONL straight from a cursor"""
+    if format not in ("csv", "jsonl"):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="format must be csv or jsonl")
+
+    async def body():
+        if format == "csv":
+            yield product_io.csv_header()
+        cursor = db.products.find(
+            {"seller_id": current_user.id}, product_io.EXPORT_PROJECTION
+        ).sort("id", ASCENDING).batch_size(product_io.EXPORT_BATCH_SIZE)
+        batch = []
+        async for product in cursor:
+            batch.append(product)
+            if len(batch) >= product_io.EXPORT_BATCH_SIZE:
+                yield product_io.csv_lines(batch) if format == "csv" else product_io.jsonl_lines(batch)
+                batch = []
+        if batch:
+            yield product_io.csv_lines(batch) if format == "csv" else product_io.jsonl_lines(batch)
+
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    filename = f"products-{datetime.utcnow():%Y%m%d}.{format}"
+    return StreamingResponse(
+        body(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@router.get("/search")
+async def search_products(
+    q: str,
+    category: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100)
+):
+    """Full-text product search with BM25 ranking and facets (Public)"""
+    return search_index.search(
+        q,
+        category=category,
+        min_price=min_price,
+        max_price=max_price,
+        limit=limit,
+        offset=skip
+    )
+
+@router.get("/search/autocomplete")
+async def autocomplete_products(prefix: str, limit: int = Query(10, ge=1, le=50)):
+    """Prefix autocomplete over the search vocabulary (Public)"""
+    return {"prefix": prefix, "suggestions": search_index.autocomplete(prefix, limit=limit)}
 
 @router.get("/{product_id}", response_model=ProductResponse)
-async def get_product(product_id: str):
-    """Get single product by ID"""
-    product = await get_product_by_id(product_id)
+async def get_product(
+    product_id: str,
+    request: Request,
+    viewer_id: Optional[str] = Depends(get_optional_user_id)
+):
+    """Get single product by ID; honours If-None-Match"""
+    # Fetch and count the view in one round trip
+    product = await db.products.find_one_and_update(
+        {"id": product_id},
+        {"$inc": {"views": 1}},
+        projection=PRODUCT_RESPONSE_PROJECTION
+    )
     
     if not product:
         raise HTTPException(
@@ -94,10 +314,20 @@ async def get_product(product_id: str):
             detail="Product not found"
         )
     
-    # Increment view count
-    await db.products.update_one({"id": product_id}, {"$inc": {"views": 1}})
+    reports.sales_rollups.count_view(product)
+    if viewer_id:
+        # Signed-in views feed the co-view recommender
+        view_log.record(viewer_id, product_id)
     
-    return ProductResponse(**product.dict())
+    etag = product_etag(product)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": CATALOG_CACHE_CONTROL if product["is_published"] and product["is_approved"]
+        else PRIVATE_CACHE_CONTROL
+    }
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return json_response(product_response(product), headers=headers)
 
 @router.put("/{product_id}", response_model=ProductResponse)
 async def update_product(
@@ -121,6 +351,7 @@ async def update_product(
     await db.products.update_one({"id": product_id}, {"$set": update_data})
     
     updated_product = await get_product_by_id(product_id)
+    index_product(updated_product.dict())
     logger.info(f"✅ Product updated: {product_id}")
     
     return ProductResponse(**updated_product.dict())
@@ -148,6 +379,7 @@ async def delete_product(
         await amazon_api.delete_product_listing(product.amazon_asin)
     
     await db.products.delete_one({"id": product_id})
+    unindex_product(product_id)
     logger.info(f"✅ Product deleted: {product_id}")
     
     return {"message": "Product deleted successfully"}
@@ -231,6 +463,228 @@ async def sync_to_amazon(
             detail=sync_result.get('error', 'Failed to sync to Amazon')
         )
 
+def amazon_listing_data(product: dict) -> dict:
+    """Payload sent to the SP-API client for a new listing"""
+    return {
+        'id': product['id'],
+        'title': product['title'],
+        'description': product['description'],
+        'price': product['price'],
+        'quantity': product['quantity'],
+        'category': product['category'],
+        'sku': product.get('sku') or f"SKU-{product['id'][:8]}",
+        'brand': 'Generic',
+        'images': product.get('images', [])
+    }
+
+async def notify_sellers(counts: dict, title: str, message, notification_type: str):
+    """One summary notification per seller, inserted as a batch"""
+    notifications = [
+        NotificationInDB(
+            user_id=seller_id,
+            title=title,
+            message=message(count),
+            type=notification_type,
+            action_url="/seller/products"
+        ).dict()
+        for seller_id, count in counts.items()
+    ]
+    if notifications:
+        await db.notifications.insert_many(notifications, ordered=False)
+
+async def approval_fanout_batch(job: dict, product_ids: List[str]):
+    """Reindex approved/rejected products and notify their sellers"""
+    action = job["params"]["action"]
+    notes = job["params"].get("notes") or ""
+    counts = {}
+    async for product in db.products.find({"id": {"$in": product_ids}}, {**INDEX_PROJECTION, "seller_id": 1}):
+        index_product(product)
+        counts[product["seller_id"]] = counts.get(product["seller_id"], 0) + 1
+
+    approved = action == "approve"
+    await notify_sellers(
+        counts,
+        f"Products {action.title()}d",
+        lambda n: f"{n} of your product{'s' if n > 1 else ''} {'were' if n > 1 else 'was'} {action}d by admin. "
+                  f"{'You can now sync them to Amazon!' if approved else notes}",
+        "success" if approved else "warning"
+    )
+    found = sum(counts.values())
+    errors = [] if found == len(product_ids) else [
+        {"product_id": None, "error": f"{len(product_ids) - found} products no longer exist"}
+    ]
+    return found, errors
+
+async def amazon_sync_batch(job: dict, product_ids: List[str]):
+    """
+    Create Amazon listings for one batch with bounded concurrency
+    Products are claimed before the external call, so a requeued job or a
+    concurrent one does not list them again while the claim is live.
+    """
+    now = datetime.utcnow()
+    claim = str(uuid.uuid4())
+    query = {
+        "id": {"$in": product_ids},
+        "is_published": True,
+        "is_approved": True,
+        "synced_to_amazon": False,
+        "$or": [
+            {"amazon_sync_claimed_at": None},
+            {"amazon_sync_claimed_at": {"$lt": now - timedelta(minutes=AMAZON_SYNC_CLAIM_MINUTES)}}
+        ]
+    }
+    if not job["params"].get("is_admin"):
+        query["seller_id"] = job["created_by"]
+    await db.products.update_many(query, {"$set": {"amazon_sync_claim": claim, "amazon_sync_claimed_at": now}})
+    products = await db.products.find({"amazon_sync_claim": claim}, {"_id": 0}).to_list(len(product_ids))
+    eligible = {p["id"] for p in products}
+    errors = [
+        {"product_id": pid, "error": "Not eligible: must be yours, published, approved and not yet synced or syncing"}
+        for pid in product_ids if pid not in eligible
+    ]
+    if not products:
+        return 0, errors
+
+    logs = [
+        AmazonSyncLog(operation='create_listing', product_id=p["id"], status="pending",
+                      request_data=amazon_listing_data(p)).dict()
+        for p in products
+    ]
+    await db.amazon_sync_logs.insert_many(logs, ordered=False)
+
+    semaphore = asyncio.Semaphore(AMAZON_SYNC_CONCURRENCY)
+
+    async def sync(log):
+        async with semaphore:
+            return await amazon_client.create_listing(log["request_data"], db, log["id"])
+
+    results = await asyncio.gather(*(sync(log) for log in logs), return_exceptions=True)
+    now = datetime.utcnow()
+    updates, counts, synced = [], {}, 0
+    for product, result in zip(products, results):
+        if isinstance(result, Exception):
+            result = {"success": False, "error": str(result)}
+        if result.get("success"):
+            updates.append(UpdateOne({"id": product["id"], "amazon_sync_claim": claim}, {
+                "$set": {"synced_to_amazon": True, "amazon_asin": result.get("amazon_listing_id"), "updated_at": now},
+                "$unset": AMAZON_SYNC_CLAIM_FIELDS
+            }))
+            counts[product["seller_id"]] = counts.get(product["seller_id"], 0) + 1
+            synced += 1
+        else:
+            # Failed listings can be retried straight away
+            updates.append(UpdateOne({"id": product["id"], "amazon_sync_claim": claim}, {"$unset": AMAZON_SYNC_CLAIM_FIELDS}))
+            errors.append({"product_id": product["id"], "error": result.get("error", "Failed to sync to Amazon")})
+    await db.products.bulk_write(updates, ordered=False)
+    await notify_sellers(
+        counts,
+        "Products Synced to Amazon",
+        lambda n: f"{n} product{'s' if n > 1 else ''} successfully synced to Amazon",
+        "success"
+    )
+    return synced, errors
+
+async def resolve_bulk_ids(product_ids: Optional[List[str]], product_filter, scope: dict) -> List[str]:
+    """
+    Product ids from an explicit list or a filter, restricted to scope
+    A filter matching more than BULK_MAX_IDS products is rejected rather than
+    silently cut short, and an empty match is a 404.
+    """
+    if product_ids is None and product_filter is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Provide product_ids or filter")
+    if product_ids is not None and len(product_ids) > BULK_MAX_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {BULK_MAX_IDS} products per bulk request"
+        )
+    query = dict(scope)
+    if product_filter is not None:
+        query.update(build_product_query(product_filter))
+        query.update(scope)
+    if product_ids is not None:
+        query["id"] = {"$in": list(dict.fromkeys(product_ids))}
+    cursor = db.products.find(query, {"_id": 0, "id": 1}).limit(BULK_MAX_IDS + 1)
+    ids = [p["id"] async for p in cursor]
+    if len(ids) > BULK_MAX_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Filter matches more than {BULK_MAX_IDS} products; narrow it and run several jobs"
+        )
+    if not ids:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No matching products")
+    return ids
+
+@router.post("/admin/bulk/approve", status_code=status.HTTP_202_ACCEPTED)
+async def bulk_approve_products(
+    request: BulkApprovalRequest,
+    admin_user: UserInDB = Depends(get_admin_user)
+):
+    """
+    Approve or reject up to BULK_MAX_IDS products at once (Admin only)
+    The approval is one update_many; reindexing and seller notifications run as a job.
+    """
+    if request.action not in ["approve", "reject"]:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid action")
+
+    product_ids = await resolve_bulk_ids(request.product_ids, request.filter, {})
+    is_approved = request.action == "approve"
+    now = datetime.utcnow()
+    result = await db.products.update_many(
+        {"id": {"$in": product_ids}},
+        {"$set": {
+            "is_approved": is_approved,
+            "approved_at": now if is_approved else None,
+            "approved_by": admin_user.id if is_approved else None,
+            "updated_at": now
+        }}
+    )
+    invalidate_caches()
+
+    job = await bulk_jobs.create(BulkJobInDB(
+        job_type="approval_fanout",
+        created_by=admin_user.id,
+        params={"action": request.action, "notes": request.notes},
+        product_ids=product_ids,
+        total=len(product_ids)
+    ).dict())
+    logger.info(f"✅ Bulk {request.action}: {result.modified_count} products, job {job['id']}")
+
+    return {
+        "job_id": job["id"],
+        "matched": result.matched_count,
+        "modified": result.modified_count,
+        "is_approved": is_approved
+    }
+
+@router.post("/bulk/sync/amazon", status_code=status.HTTP_202_ACCEPTED)
+async def bulk_sync_to_amazon(
+    request: BulkSyncRequest,
+    current_user: UserInDB = Depends(get_current_user)
+):
+    """Queue Amazon listings for many products; poll the returned job for progress"""
+    is_admin = current_user.role == "admin"
+    scope = {} if is_admin else {"seller_id": current_user.id}
+    product_ids = await resolve_bulk_ids(request.product_ids, request.filter, scope)
+
+    job = await bulk_jobs.create(BulkJobInDB(
+        job_type="amazon_sync",
+        created_by=current_user.id,
+        params={"is_admin": is_admin},
+        product_ids=product_ids,
+        total=len(product_ids)
+    ).dict())
+    logger.info(f"📦 Amazon bulk sync queued: {len(product_ids)} products, job {job['id']}")
+
+    return {"job_id": job["id"], "total": len(product_ids)}
+
+@router.get("/bulk/jobs/{job_id}", response_model=BulkJobResponse)
+async def get_bulk_job(job_id: str, current_user: UserInDB = Depends(get_current_user)):
+    """Bulk job progress (creator or admin)"""
+    job = await bulk_jobs.get(job_id)
+    if not job or (job["created_by"] != current_user.id and current_user.role != "admin"):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return BulkJobResponse(**job)
+
 @router.get("/admin/all", response_model=List[ProductResponse])
 async def get_all_products_admin(
     skip: int = 0,
@@ -243,8 +697,8 @@ async def get_all_products_admin(
     if is_approved is not None:
         query["is_approved"] = is_approved
     
-    products = await db.products.find(query).skip(skip).limit(limit).to_list(limit)
-    return [ProductResponse(**p) for p in products]
+    products = await db.products.find(query, PRODUCT_RESPONSE_PROJECTION).skip(skip).limit(limit).to_list(limit)
+    return json_response(product_responses(products))
 
 @router.post("/admin/{product_id}/approve")
 async def approve_product(
@@ -273,6 +727,8 @@ async def approve_product(
         }}
     )
     
+    index_product({**product.dict(), "is_approved": is_approved, "updated_at": datetime.utcnow()})
+    
     # Create notification for seller
     await create_notification(
         user_id=product.seller_id,
@@ -292,18 +748,45 @@ async def approve_product(
 
 @router.get("/", response_model=List[ProductResponse])
 async def list_products(
+    request: Request,
     skip: int = 0,
     limit: int = 20,
-    category: Optional[str] = None
+    category: Optional[str] = None,
+    cursor: Optional[str] = None
 ):
-    """List published and approved products (Public)"""
-    query = {"is_published": True, "is_approved": True}
-    
-    if category:
-        query["category"] = category
-    
-    products = await db.products.find(query).skip(skip).limit(limit).to_list(limit)
-    return [ProductResponse(**p) for p in products]
+    """
+    List published and approved products, newest first (Public)
+    Pass the X-Next-Cursor header back as `cursor` to page without skip.
+    """
+    limit = max(1, min(limit, 100))
+    key = (category, cursor, skip, limit)
+    page = catalog_cache.get(key)
+    if page is None:
+        query = {"is_published": True, "is_approved": True}
+        if category:
+            query["category"] = category
+        if cursor:
+            try:
+                query.update(cursor_query(cursor))
+            except ValueError:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+        products = await db.products.find(query, PRODUCT_RESPONSE_PROJECTION).sort(
+            [("created_at", DESCENDING), ("id", DESCENDING)]
+        ).skip(skip).limit(limit).to_list(limit)
+        page = {
+            "body": json_response(product_responses(products)).body,
+            "etag": list_etag(products, category, cursor, skip, limit),
+            "next_cursor": encode_cursor(products[-1]) if len(products) == limit else None
+        }
+        catalog_cache.put(key, page)
+
+    headers = {"ETag": page["etag"], "Cache-Control": CATALOG_CACHE_CONTROL}
+    if page["next_cursor"]:
+        headers["X-Next-Cursor"] = page["next_cursor"]
+    if etag_matches(request.headers.get("if-none-match"), page["etag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=page["body"], media_type="application/json", headers=headers)
 
 @router.get("/analytics/seller-stats")
 async def get_seller_stats(current_user: UserInDB = Depends(get_current_user)):
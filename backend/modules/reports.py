@@ -0,0 +1,102 @@
+from fastapi import APIRouter, HTTPException, Depends, status
+from typing import Optional
+from datetime import datetime, timedelta
+import logging
+
+from models.report import SalesReport
+from models.user import UserInDB
+from modules.auth import get_current_user, get_admin_user
+from utils.sales_rollups import DIMENSIONS, PERIODS, SalesRollups
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/reports", tags=["Reports"])
+
+# How far back a trend goes when no start is given
+DEFAULT_SPAN = {"day": timedelta(days=30), "week": timedelta(weeks=12), "month": timedelta(days=365)}
+
+# Database instance
+db = None
+sales_rollups: SalesRollups = None
+
+def set_db(database):
+    global db, sales_rollups
+    db = database
+    sales_rollups = SalesRollups(database)
+
+async def ensure_indexes():
+    await sales_rollups.ensure_indexes()
+
+def check_period(period: str):
+    if period not in PERIODS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="period must be day, week or month")
+
+async def record_order(order: dict):
+    """Called after checkout; reporting must never fail an order"""
+    try:
+        await sales_rollups.record_order(order)
+    except Exception as e:
+        logger.error(f"❌ Sales rollup update failed for order {order['id']}: {e}")
+
+async def record_cancellation(seller_order: dict):
+    try:
+        await sales_rollups.record_cancellation(seller_order)
+    except Exception as e:
+        logger.error(f"❌ Sales rollup update failed for cancelled order {seller_order['order_id']}: {e}")
+
+# Seller Endpoints
+@router.get("/seller/sales", response_model=SalesReport)
+async def get_seller_sales(
+    period: str = "day",
+    since: Optional[datetime] = None,
+    current_user: UserInDB = Depends(get_current_user)
+):
+    """Seller's sales, revenue, views and conversion per day, week or month"""
+    check_period(period)
+    rows = await sales_rollups.report("seller", current_user.id, period, since or datetime.utcnow() - DEFAULT_SPAN[period])
+    return SalesReport(dimension="seller", period=period, rows=rows)
+
+@router.get("/seller/top-products", response_model=SalesReport)
+async def get_seller_top_products(
+    period: str = "month",
+    start: Optional[datetime] = None,
+    limit: int = 10,
+    current_user: UserInDB = Depends(get_current_user)
+):
+    """Seller's best-selling products in the period containing `start` (default: current)"""
+    check_period(period)
+    rows = await sales_rollups.top(
+        "product", period, start or datetime.utcnow(), min(limit, 100), seller_id=current_user.id
+    )
+    return SalesReport(dimension="product", period=period, rows=rows)
+
+# Admin Endpoints
+@router.get("/admin/sales", response_model=SalesReport)
+async def get_sales_trend(
+    period: str = "day",
+    dimension: str = "all",
+    key: str = "all",
+    since: Optional[datetime] = None,
+    admin_user: UserInDB = Depends(get_admin_user)
+):
+    """Revenue trend for the platform, or one seller, category or product (Admin only)"""
+    check_period(period)
+    if dimension not in DIMENSIONS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid dimension")
+    rows = await sales_rollups.report(dimension, key, period, since or datetime.utcnow() - DEFAULT_SPAN[period])
+    return SalesReport(dimension=dimension, period=period, rows=rows)
+
+@router.get("/admin/top", response_model=SalesReport)
+async def get_top_sales(
+    dimension: str = "seller",
+    period: str = "month",
+    start: Optional[datetime] = None,
+    limit: int = 10,
+    admin_user: UserInDB = Depends(get_admin_user)
+):
+    """Top sellers, categories or products by revenue in one period (Admin only)"""
+    check_period(period)
+    if dimension not in ("seller", "category", "product"):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="dimension must be seller, category or product")
+    rows = await sales_rollups.top(dimension, period, start or datetime.utcnow(), min(limit, 100))
+    return SalesReport(dimension=dimension, period=period, rows=rows)
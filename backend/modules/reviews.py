@@ -0,0 +1,200 @@
+from fastapi import APIRouter, HTTPException, Depends, status
+from typing import List
+from datetime import datetime
+import logging
+
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from models.review import ReviewCreate, ReviewUpdate, ReviewInDB, ReviewResponse, ReviewStats, ProductSentiment
+from models.user import UserInDB
+from modules.auth import get_current_user, get_admin_user
+from utils.review_stats import (
+    ReviewStatsStore,
+    ensure_purchase_index,
+    is_verified_purchase,
+    rating_change,
+    rating_increment,
+    sentiment_removal
+)
+from utils.review_votes import HelpfulVotes
+from utils.sentiment import ReviewSentimentPipeline
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/reviews", tags=["Reviews"])
+
+# Database instance
+db = None
+sentiment_pipeline: ReviewSentimentPipeline = None
+review_stats: ReviewStatsStore = None
+helpful_votes: HelpfulVotes = None
+
+REVIEW_SORTS = {
+    "newest": [("created_at", DESCENDING)],
+    "helpful": [("helpful_count", DESCENDING), ("created_at", DESCENDING)]
+}
+
+def set_db(database):
+    global db, sentiment_pipeline, review_stats, helpful_votes
+    db = database
+    sentiment_pipeline = ReviewSentimentPipeline(database)
+    review_stats = ReviewStatsStore(database)
+    helpful_votes = HelpfulVotes(database)
+
+async def ensure_indexes():
+    await db.reviews.create_index("id", unique=True)
+    await db.reviews.create_index([("product_id", ASCENDING), ("user_id", ASCENDING)], unique=True)
+    await db.reviews.create_index([("product_id", ASCENDING), ("created_at", DESCENDING)])
+    await db.reviews.create_index([("product_id", ASCENDING), ("helpful_count", DESCENDING), ("created_at", DESCENDING)])
+    await sentiment_pipeline.ensure_indexes()
+    await review_stats.ensure_indexes()
+    await helpful_votes.ensure_indexes()
+    await ensure_purchase_index(db)
+
+async def forget_sentiment(review: dict):
+    """Take a scored review out of the sentiment aggregate"""
+    inc = sentiment_removal(review)
+    if inc:
+        await db.review_sentiment.update_one({"product_id": review["product_id"]}, {"$inc": inc})
+
+@router.post("/", response_model=ReviewResponse, status_code=status.HTTP_201_CREATED)
+async def create_review(
+    review: ReviewCreate,
+    current_user: UserInDB = Depends(get_current_user)
+):
+    """Review a product; sentiment is scored asynchronously"""
+    product = await db.products.find_one({"id": review.product_id}, {"_id": 0, "id": 1})
+    if not product:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Product not found"
+        )
+
+    new_review = ReviewInDB(
+        **review.dict(),
+        user_id=current_user.id,
+        user_name=current_user.full_name,
+        is_verified_purchase=await is_verified_purchase(db, current_user.id, review.product_id)
+    )
+    try:
+        await db.reviews.insert_one(new_review.dict())
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="You have already reviewed this product"
+        )
+    await review_stats.apply(review.product_id, rating_increment(review.rating))
+    logger.info(f"📝 Review created: {new_review.id} for product {review.product_id}")
+
+    return ReviewResponse(**new_review.dict())
+
+@router.put("/{review_id}", response_model=ReviewResponse)
+async def update_review(
+    review_id: str,
+    update: ReviewUpdate,
+    current_user: UserInDB = Depends(get_current_user)
+):
+    """Edit your review; rating counters move by the difference"""
+    changes = {k: v for k, v in update.dict().items() if v is not None}
+    if not changes:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Nothing to update")
+    changes["updated_at"] = datetime.utcnow()
+    text_changed = "title" in changes or "comment" in changes
+    if text_changed:
+        # Rescored by the sentiment pipeline
+        changes.update(sentiment=None, sentiment_score=None, sentiment_batch=None, sentiment_scored_at=None)
+
+    before = await db.reviews.find_one_and_update(
+        {"id": review_id, "user_id": current_user.id},
+        {"$set": changes},
+        projection={"_id": 0},
+        return_document=ReturnDocument.BEFORE
+    )
+    if not before:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Review not found")
+
+    if "rating" in changes:
+        await review_stats.apply(before["product_id"], rating_change(before["rating"], changes["rating"]))
+    if text_changed:
+        await forget_sentiment(before)
+
+    return ReviewResponse(**{**before, **changes})
+
+@router.delete("/{review_id}")
+async def delete_review(review_id: str, current_user: UserInDB = Depends(get_current_user)):
+    """Delete a review (author or admin)"""
+    query = {"id": review_id}
+    if current_user.role != "admin":
+        query["user_id"] = current_user.id
+    deleted = await db.reviews.find_one_and_delete(query, projection={"_id": 0})
+    if not deleted:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Review not found")
+
+    await review_stats.apply(deleted["product_id"], rating_increment(deleted["rating"], -1))
+    await forget_sentiment(deleted)
+    await helpful_votes.forget(review_id)
+    logger.info(f"🗑️ Review deleted: {review_id} by {current_user.id}")
+
+    return {"message": "Review deleted", "review_id": review_id}
+
+@router.post("/{review_id}/helpful")
+async def vote_helpful(review_id: str, current_user: UserInDB = Depends(get_current_user)):
+    """Mark a review as helpful, once per user"""
+    review = await db.reviews.find_one({"id": review_id}, {"_id": 0, "user_id": 1})
+    if not review:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Review not found")
+    if review["user_id"] == current_user.id:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cannot vote on your own review")
+
+    if not await helpful_votes.vote(review_id, current_user.id):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Already marked as helpful")
+    return {"review_id": review_id, "voted": True, "helpful_count": await helpful_votes.count(review_id)}
+
+@router.delete("/{review_id}/helpful")
+async def unvote_helpful(review_id: str, current_user: UserInDB = Depends(get_current_user)):
+    """Withdraw a helpful vote"""
+    if not await helpful_votes.unvote(review_id, current_user.id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No helpful vote to remove")
+    return {"review_id": review_id, "voted": False, "helpful_count": await helpful_votes.count(review_id)}
+
+@router.get("/product/{product_id}", response_model=List[ReviewResponse])
+async def get_product_reviews(
+    product_id: str,
+    sort: str = "newest",
+    skip: int = 0,
+    limit: int = 20
+):
+    """Get reviews for a product, newest or most helpful first (Public)"""
+    if sort not in REVIEW_SORTS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="sort must be newest or helpful")
+    limit = min(limit, 100)
+    reviews = await db.reviews.find({"product_id": product_id}).sort(
+        REVIEW_SORTS[sort]
+    ).skip(skip).limit(limit).to_list(limit)
+    return [ReviewResponse(**r) for r in reviews]
+
+@router.get("/product/{product_id}/stats", response_model=ReviewStats)
+async def get_product_review_stats(product_id: str):
+    """Average rating and star distribution from counters kept on write (Public)"""
+    return ReviewStats(**await review_stats.get(product_id))
+
+@router.post("/product/{product_id}/stats/rebuild", response_model=ReviewStats)
+async def rebuild_product_review_stats(product_id: str, admin_user: UserInDB = Depends(get_admin_user)):
+    """Recount a product's rating counters from its reviews (Admin only)"""
+    return ReviewStats(**await review_stats.rebuild(product_id))
+
+@router.get("/product/{product_id}/sentiment", response_model=ProductSentiment)
+async def get_product_sentiment(product_id: str):
+    """Pre-aggregated review sentiment for a product (Public)"""
+    summary = await db.review_sentiment.find_one({"product_id": product_id})
+    if not summary or not summary.get("review_count"):
+        return ProductSentiment(product_id=product_id)
+    return ProductSentiment(
+        product_id=product_id,
+        review_count=summary["review_count"],
+        average_score=round(summary["score_sum"] / summary["review_count"], 4),
+        positive=summary.get("positive", 0),
+        neutral=summary.get("neutral", 0),
+        negative=summary.get("negative", 0)
+    )
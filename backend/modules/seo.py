@@ -0,0 +1,62 @@
+from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi.responses import FileResponse
+import logging
+
+from models.user import UserInDB
+from modules.auth import get_admin_user
+from utils.serialization import json_response
+from utils.sitemap import PUBLIC_QUERY, SITEMAP_PROJECTION, SitemapBusyError, SitemapGenerator, product_jsonld
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/seo", tags=["SEO"])
+
+# Generated files change at most once per refresh
+SEO_CACHE_CONTROL = "public, max-age=900"
+MEDIA_TYPES = {".xml": "application/xml", ".json": "application/json", ".gz": "application/gzip"}
+
+# Database instance
+db = None
+sitemap_generator: SitemapGenerator = None
+
+def set_db(database):
+    global db, sitemap_generator
+    db = database
+    sitemap_generator = SitemapGenerator(database)
+
+def published_file(name: str) -> FileResponse:
+    path = sitemap_generator.file_path(name)
+    if path is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
+    return FileResponse(path, media_type=MEDIA_TYPES[path.suffix], headers={"Cache-Control": SEO_CACHE_CONTROL})
+
+@router.get("/sitemap.xml")
+async def get_sitemap_index():
+    """Sitemap index; each shard is a gzipped sitemap (Public)"""
+    return published_file("sitemap.xml")
+
+@router.get("/feed.json")
+async def get_product_feed_index():
+    """Index of the gzipped JSON-LD product feed shards (Public)"""
+    return published_file("feed.json")
+
+@router.get("/files/{name}")
+async def get_seo_file(name: str):
+    """A sitemap or JSON-LD feed shard (Public)"""
+    return published_file(name)
+
+@router.get("/products/{product_id}/jsonld")
+async def get_product_jsonld(product_id: str):
+    """schema.org Product structured data for a product page (Public)"""
+    product = await db.products.find_one({"id": product_id, **PUBLIC_QUERY}, SITEMAP_PROJECTION)
+    if not product:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
+    return json_response(product_jsonld(product), headers={"Cache-Control": SEO_CACHE_CONTROL})
+
+@router.post("/rebuild")
+async def rebuild_sitemap(admin_user: UserInDB = Depends(get_admin_user)):
+    """Regenerate every shard, dropping deleted products (Admin only)"""
+    try:
+        return await sitemap_generator.generate_full()
+    except SitemapBusyError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
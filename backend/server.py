@@ -1,20 +1,25 @@
 from fastapi import FastAPI, APIRouter
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
 import os
+import asyncio
 import logging
 from pathlib import Path
 
 # Import module routers
-from modules import auth, products, ai, kyc, notifications, payouts
+from modules import auth, products, ai, kyc, notifications, payouts, ledger, reviews, cart, orders, reports, seo
+from utils.stripe_service import stripe_service
+from utils.search_index import SNAPSHOT_PATH, search_index, warm_start, maintain_periodically
+from utils import vector_index, recommender, price_model
+from utils.database import create_client
+from utils.sitemap import SITEMAP_DIR
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
+# MongoDB connection (mongomock:// for an in-memory database)
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = create_client(mongo_url)
 db = client[os.environ['DB_NAME']]
 
 # Inject database into modules
@@ -23,6 +28,30 @@ kyc.set_db(db)
 products.set_db(db)
 notifications.set_db(db)
 payouts.set_db(db)
+ledger.set_db(db)
+reviews.set_db(db)
+cart.set_db(db)
+orders.set_db(db)
+reports.set_db(db)
+seo.set_db(db)
+
+# On-disk state, passed explicitly at startup; configure_storage() moves all of it
+storage = {
+    "search_snapshot": SNAPSHOT_PATH,
+    "vectors": vector_index.VECTOR_DIR,
+    "price_models": price_model.MODEL_DIR,
+    "sitemaps": SITEMAP_DIR,
+}
+
+def configure_storage(data_dir: Path):
+    """Keep index snapshots, vectors, price models and sitemaps under data_dir (tests, load runs)"""
+    storage.update({
+        "search_snapshot": data_dir / "search_index.snapshot",
+        "vectors": data_dir / "vectors",
+        "price_models": data_dir / "models",
+        "sitemaps": data_dir / "sitemaps",
+    })
+    seo.sitemap_generator.directory = storage["sitemaps"]
 
 # Create the main app
 app = FastAPI(
@@ -61,6 +90,12 @@ api_router.include_router(products.router)
 api_router.include_router(ai.router)
 api_router.include_router(notifications.router)
 api_router.include_router(payouts.router)
+api_router.include_router(ledger.router)
+api_router.include_router(reviews.router)
+api_router.include_router(cart.router)
+api_router.include_router(orders.router)
+api_router.include_router(reports.router)
+api_router.include_router(seo.router)
 
 # Include the main router in the app
 app.include_router(api_router)
@@ -72,6 +107,7 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor", "X-Guest-Cart"],
 )
 
 # Configure logging
@@ -81,13 +117,60 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Long-running workers started with the app
+background_tasks = []
+
 @app.on_event("startup")
 async def startup_event():
     logger.info("🚀 Hamro Backend API starting up...")
     logger.info(f"📦 Database: {os.environ['DB_NAME']}")
+    await auth.ensure_indexes()
+    await payouts.payout_queue.ensure_indexes()
+    await payouts.event_queue.ensure_indexes()
+    await ledger.ensure_indexes()
+    await products.ensure_indexes()
+    await reviews.ensure_indexes()
+    await cart.ensure_indexes()
+    await orders.ensure_indexes()
+    await reports.ensure_indexes()
+    await warm_start(db, storage["search_snapshot"])
+    await vector_index.warm_start(db, storage["vectors"])
+    await recommender.ensure_indexes(db)
+    await recommender.warm_start(db)
+    await price_model.load_latest(storage["price_models"])
+    background_tasks.append(asyncio.create_task(payouts.settlement_worker.run_forever()))
+    background_tasks.append(asyncio.create_task(payouts.event_processor.run_forever()))
+    background_tasks.append(asyncio.create_task(recommender.refresh_periodically(db)))
+    background_tasks.append(asyncio.create_task(reviews.sentiment_pipeline.run_forever()))
+    background_tasks.append(asyncio.create_task(reviews.helpful_votes.run_forever()))
+    background_tasks.append(asyncio.create_task(products.bulk_worker.run_forever()))
+    background_tasks.append(asyncio.create_task(products.view_log.run_forever()))
+    background_tasks.append(asyncio.create_task(orders.stock_reservations.run_forever()))
+    background_tasks.append(asyncio.create_task(reports.sales_rollups.run_forever()))
+    background_tasks.append(asyncio.create_task(seo.sitemap_generator.run_forever()))
+    background_tasks.append(asyncio.create_task(
+        maintain_periodically(db, [search_index, vector_index.vector_index])
+    ))
     logger.info("✅ All modules loaded successfully")
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
     logger.info("👋 Shutting down Hamro Backend API...")
+    payouts.settlement_worker.stop()
+    payouts.event_processor.stop()
+    reviews.sentiment_pipeline.stop()
+    reviews.helpful_votes.stop()
+    products.bulk_worker.stop()
+    products.view_log.stop()
+    orders.stock_reservations.stop()
+    reports.sales_rollups.stop()
+    seo.sitemap_generator.stop()
+    for task in background_tasks:
+        task.cancel()
+    await stripe_service.close()
+    for index in (search_index, vector_index.vector_index):
+        if index.dirty:
+            index.save()
+    await reports.sales_rollups.flush_views()
+    await products.view_log.flush()
     client.close()
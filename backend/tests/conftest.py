@@ -0,0 +1,79 @@
+"""
+Shared fixtures
+
+`mongo_db` is an in-memory MongoDB (mongomock-motor). Every collection call
+yields to the event loop first, so concurrent coroutines interleave between
+operations the way they do against a real server, and calls are counted per
+method for tests that assert on round trips.
+
+Tests marked `benchmark` time real work against stored baselines and are
+skipped unless RUN_BENCHMARKS is set, e.g. `RUN_BENCHMARKS=1 pytest -m benchmark`.
+"""
+import asyncio
+import os
+from collections import Counter
+
+import pytest
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "benchmark: wall-clock check, runs only with RUN_BENCHMARKS set")
+
+def pytest_collection_modifyitems(config, items):
+    if os.getenv("RUN_BENCHMARKS"):
+        return
+    skip = pytest.mark.skip(reason="set RUN_BENCHMARKS to run wall-clock benchmarks")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
+
+class InterleavingCollection:
+    def __init__(self, collection):
+        self._collection = collection
+        self.calls = Counter()
+
+    async def find_one_and_update(self, filter, update, projection=None, **kwargs):
+        # mongomock re-reads the updated document through `filter` unless the
+        # projection keeps _id, so a claim that changes a filtered field gets None
+        self.calls["find_one_and_update"] += 1
+        await asyncio.sleep(0)
+        hide_id = isinstance(projection, dict) and not projection.get("_id", True)
+        if hide_id:
+            projection = {k: v for k, v in projection.items() if k != "_id"} or None
+        document = await self._collection.find_one_and_update(filter, update, projection=projection, **kwargs)
+        if hide_id and document is not None:
+            document.pop("_id", None)
+        return document
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if not callable(attr):
+            return attr
+        self.calls[name] += 1
+        if not asyncio.iscoroutinefunction(attr):
+            return attr
+
+        async def call(*args, **kwargs):
+            await asyncio.sleep(0)
+            return await attr(*args, **kwargs)
+        return call
+
+class InterleavingDatabase:
+    def __init__(self, db):
+        self._db = db
+        self._collections = {}
+
+    def __getattr__(self, name):
+        if name not in self._collections:
+            self._collections[name] = InterleavingCollection(self._db[name])
+        return self._collections[name]
+
+    __getitem__ = __getattr__
+
+    async def command(self, *args, **kwargs):
+        # Like a standalone server: no replica set, so no transactions
+        return {"ok": 1.0, "isWritablePrimary": True}
+
+@pytest.fixture
+def mongo_db():
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    return InterleavingDatabase(mongomock_motor.AsyncMongoMockClient()["hamro_test"])
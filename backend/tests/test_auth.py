@@ -1,6 +1,8 @@
 """
 Unit tests for authentication module
 """
+import asyncio
+
 import pytest
 from utils.security import (
     get_password_hash,
@@ -8,6 +10,7 @@ from utils.security import (
     create_access_token,
     create_refresh_token,
     decode_token,
+    hash_token,
     generate_verification_token,
     generate_otp
 )
@@ -98,6 +101,105 @@ def test_token_decoding_invalid():
     # Should return None for invalid token
     assert payload is None
 
+def test_refresh_tokens_are_unique():
+    """Test refresh tokens issued back to back differ"""
+    token1 = create_refresh_token({"sub": "user123"})
+    token2 = create_refresh_token({"sub": "user123"})
+    
+    assert token1 != token2
+    assert decode_token(token1)["jti"] != decode_token(token2)["jti"]
+
+def test_refresh_token_hashing():
+    """Test refresh token digest used for storage"""
+    token = create_refresh_token({"sub": "user123"})
+    digest = hash_token(token)
+    
+    # Digest should be short, fixed-size and deterministic
+    assert len(digest) == 32
+    assert digest == hash_token(token)
+    assert digest != hash_token(token + "x")
+    assert token not in digest
+
+@pytest.fixture
+def auth_client(monkeypatch, mongo_db):
+    """Auth router over mongo_db with one active user, no login hooks"""
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from models.user import UserInDB
+    from modules import auth
+
+    monkeypatch.setattr(auth, "db", mongo_db)
+    monkeypatch.setattr(auth, "LOGIN_HOOKS", [])
+    user = UserInDB(email="buyer@example.com", full_name="Buyer", is_active=True,
+                    hashed_password=get_password_hash("SecurePassword123!"))
+    asyncio.run(mongo_db.users.insert_one(user.dict()))
+    app = FastAPI()
+    app.include_router(auth.router)
+    return TestClient(app)
+
+def login(client):
+    response = client.post("/auth/login", json={"email": "buyer@example.com", "password": "SecurePassword123!"})
+    assert response.status_code == 200
+    return response.json()
+
+def refresh(client, token):
+    return client.post("/auth/refresh", json={"refresh_token": token})
+
+def families(mongo_db):
+    return asyncio.run(mongo_db.refresh_tokens.find({}, {"_id": 0}).to_list(None))
+
+def test_refresh_rotates_the_stored_digest_in_one_update(auth_client, mongo_db):
+    """Test refresh replaces the family's digest with one find_one_and_update"""
+    first = login(auth_client)["refresh_token"]
+    mongo_db.refresh_tokens.calls.clear()
+    
+    response = refresh(auth_client, first)
+    assert response.status_code == 200
+    second = response.json()["refresh_token"]
+    
+    assert mongo_db.refresh_tokens.calls["find_one_and_update"] == 1
+    assert sum(mongo_db.refresh_tokens.calls.values()) == 1
+    [family] = families(mongo_db)
+    assert family["token_hash"] == hash_token(second)
+    assert family["previous_hash"] == hash_token(first)
+    assert first not in str(family) and second not in str(family)
+
+def test_replaying_a_rotated_token_revokes_the_family(auth_client, mongo_db):
+    """Test reuse of a rotated-out token is refused and deletes the family, newest token included"""
+    first = login(auth_client)["refresh_token"]
+    other_session = login(auth_client)["refresh_token"]
+    second = refresh(auth_client, first).json()["refresh_token"]
+    
+    assert refresh(auth_client, first).status_code == 401
+    assert [f["token_hash"] for f in families(mongo_db)] == [hash_token(other_session)]
+    assert refresh(auth_client, second).status_code == 401
+    
+    # Other logins keep working
+    assert refresh(auth_client, other_session).status_code == 200
+
+def test_logout_deletes_the_family(auth_client, mongo_db):
+    """Test logout revokes the family with a single delete_one"""
+    tokens = login(auth_client)
+    second = refresh(auth_client, tokens["refresh_token"]).json()["refresh_token"]
+    mongo_db.refresh_tokens.calls.clear()
+    
+    response = auth_client.post("/auth/logout", json={"refresh_token": second},
+                                headers={"Authorization": f"Bearer {tokens['access_token']}"})
+    assert response.status_code == 200
+    assert mongo_db.refresh_tokens.calls["delete_one"] == 1
+    assert families(mongo_db) == []
+    assert refresh(auth_client, second).status_code == 401
+
+def test_refresh_token_families_expire_by_ttl(monkeypatch, mongo_db):
+    """Test the TTL index on expires_at"""
+    from modules import auth
+    
+    monkeypatch.setattr(auth, "db", mongo_db)
+    asyncio.run(auth.ensure_indexes())
+    indexes = asyncio.run(mongo_db.refresh_tokens.index_information())
+    ttl = [index for index in indexes.values() if index.get("expireAfterSeconds") is not None]
+    assert [(index["key"], index["expireAfterSeconds"]) for index in ttl] == [([("expires_at", 1)], 0)]
+
 if __name__ == "__main__":
     # Run all tests
     test_password_hashing()
@@ -106,5 +208,7 @@ if __name__ == "__main__":
     test_verification_token_generation()
     test_otp_generation()
     test_token_decoding_invalid()
+    test_refresh_tokens_are_unique()
+    test_refresh_token_hashing()
     
     print("✅ All authentication security tests passed!")
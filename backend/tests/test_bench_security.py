@@ -0,0 +1,61 @@
+"""
+Tests for the security benchmark's alternative backends and regression check
+"""
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from benchmarks.bench_security import (
+    BASELINE_PATH,
+    FILE_SIZES,
+    QUICK_FILE_SIZES,
+    aesgcm_decrypt,
+    aesgcm_encrypt,
+    aesgcm_stream_decrypt,
+    aesgcm_stream_encrypt,
+    OPTIONAL_BENCHMARKS,
+    chunked,
+    regressions
+)
+
+def test_aesgcm_backends_round_trip():
+    key = os.urandom(32)
+    data = os.urandom((3 << 20) + 17)
+    assert aesgcm_decrypt(key, aesgcm_encrypt(key, data)) == data
+    nonce, blob, tag = aesgcm_stream_encrypt(key, chunked(data))
+    assert b"".join(aesgcm_stream_decrypt(key, nonce, blob, tag)) == data
+
+def test_regressions_use_relative_times_and_tolerance():
+    baseline = {"benchmarks": {"a": {"relative": 1.0}, "b": {"relative": 2.0}, "gone": {"relative": 1.0}}}
+    results = {"benchmarks": {"a": {"relative": 1.4}, "b": {"relative": 3.1}, "new": {"relative": 1.0}}}
+    failures = regressions(results, baseline, tolerance=0.5)
+    assert sorted(f.split(":")[0] for f in failures) == ["b", "new"]
+
+def test_optional_backends_need_no_baseline():
+    baseline = {"benchmarks": {"a": {"relative": 1.0}}}
+    results = {"benchmarks": {"a": {"relative": 1.0}, **{name: {"relative": 9.0} for name in OPTIONAL_BENCHMARKS}}}
+    assert regressions(results, baseline, tolerance=0.5) == []
+
+def test_stored_baseline_covers_every_size_in_both_modes():
+    baselines = json.loads(BASELINE_PATH.read_text())
+    for mode, sizes in (("full", FILE_SIZES), ("quick", QUICK_FILE_SIZES)):
+        names = set(baselines[mode]["benchmarks"])
+        assert {"password.verify.bcrypt", "token.decode.jose", "token.decode.pyjwt", "hash_filename"} <= names
+        assert {
+            f"file.{op}.{backend}.{size}"
+            for op in ("encrypt", "decrypt") for backend in ("fernet", "aesgcm", "aesgcm_stream") for size in sizes
+        } <= names
+
+@pytest.mark.benchmark
+def test_quick_check_passes_against_the_stored_baseline():
+    # Twice the baseline's time fails; shared CI runners are too noisy for the CLI's 50% default
+    completed = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_security", "--quick", "--check", "--min-seconds", "0.2",
+         "--tolerance", "1.0"],
+        cwd=Path(__file__).parent.parent, capture_output=True, text=True
+    )
+    assert completed.returncode == 0, completed.stderr
@@ -0,0 +1,159 @@
+"""
+Unit tests for bulk product jobs
+"""
+import asyncio
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+from models.product import BulkJobInDB, BulkProductFilter
+from modules import products
+from utils.bulk_jobs import BulkJobWorker, batches, build_product_query
+
+class RecordingQueue:
+    def __init__(self):
+        self.progress_calls = []
+        self.finished = []
+        self.heartbeats = 0
+
+    async def heartbeat(self, job_id):
+        self.heartbeats += 1
+
+    async def progress(self, job_id, processed, succeeded, errors):
+        self.progress_calls.append((processed, succeeded, errors))
+
+    async def finish(self, job_id, status="completed"):
+        self.finished.append((job_id, status))
+
+def make_job(count, job_type="approval_fanout", processed=0):
+    ids = [f"p{i}" for i in range(count)]
+    return BulkJobInDB(job_type=job_type, created_by="admin", product_ids=ids,
+                       total=count, processed=processed).dict()
+
+def test_build_product_query_skips_unset_fields():
+    query = build_product_query(BulkProductFilter(
+        category="Books",
+        is_approved=False,
+        created_after=datetime(2026, 1, 1)
+    ))
+    assert query == {
+        "category": "Books",
+        "is_approved": False,
+        "created_at": {"$gte": datetime(2026, 1, 1)}
+    }
+    assert build_product_query(BulkProductFilter()) == {}
+
+def test_batches_cover_all_items():
+    assert list(batches(list(range(7)), 3)) == [[0, 1, 2], [3, 4, 5], [6]]
+
+def test_run_job_reports_progress_per_batch():
+    seen = []
+
+    async def handler(job, ids):
+        seen.append(ids)
+        return len(ids), []
+
+    queue = RecordingQueue()
+    worker = BulkJobWorker(queue, {"approval_fanout": handler}, batch_size=4)
+    job = make_job(10)
+    asyncio.run(worker.run_job(job))
+
+    assert [len(ids) for ids in seen] == [4, 4, 2]
+    assert [call[:2] for call in queue.progress_calls] == [(4, 4), (4, 4), (2, 2)]
+    assert queue.finished == [(job["id"], "completed")]
+
+def test_run_job_resumes_from_processed_offset():
+    seen = []
+
+    async def handler(job, ids):
+        seen.extend(ids)
+        return len(ids), []
+
+    worker = BulkJobWorker(RecordingQueue(), {"approval_fanout": handler}, batch_size=4)
+    asyncio.run(worker.run_job(make_job(10, processed=8)))
+    assert seen == ["p8", "p9"]
+
+def test_handler_failure_marks_batch_failed_and_continues():
+    calls = []
+
+    async def handler(job, ids):
+        calls.append(ids)
+        if len(calls) == 1:
+            raise RuntimeError("SP-API unavailable")
+        return len(ids), []
+
+    queue = RecordingQueue()
+    worker = BulkJobWorker(queue, {"amazon_sync": handler}, batch_size=3)
+    asyncio.run(worker.run_job(make_job(5, job_type="amazon_sync")))
+
+    first, second = queue.progress_calls
+    assert first[:2] == (3, 0)
+    assert [e["product_id"] for e in first[2]] == ["p0", "p1", "p2"]
+    assert second == (2, 2, [])
+    assert queue.finished[0][1] == "completed"
+
+def test_unknown_job_type_fails_job():
+    queue = RecordingQueue()
+    job = make_job(3, job_type="reindex")
+    asyncio.run(BulkJobWorker(queue, {}).run_job(job))
+    assert queue.finished == [(job["id"], "failed")]
+    assert queue.progress_calls == []
+
+def test_slow_batches_keep_the_job_alive():
+    async def handler(job, ids):
+        await asyncio.sleep(0.05)
+        return len(ids), []
+
+    queue = RecordingQueue()
+    worker = BulkJobWorker(queue, {"approval_fanout": handler}, batch_size=10, heartbeat_interval=0.01)
+    asyncio.run(worker.run_job(make_job(3)))
+    assert queue.heartbeats >= 2
+    assert queue.finished[0][1] == "completed"
+
+def test_amazon_sync_skips_products_claimed_by_another_run(monkeypatch, mongo_db):
+    listed = []
+
+    async def create_listing(data, db, log_id):
+        listed.append(data["sku"])
+        return {"success": data["sku"] != "SKU-P2", "amazon_listing_id": "ASIN-" + data["sku"]}
+
+    monkeypatch.setattr(products, "db", mongo_db)
+    monkeypatch.setattr(products.amazon_client, "create_listing", create_listing)
+    product = lambda pid, **extra: {"id": pid, "sku": "SKU-" + pid.upper(), "title": pid, "description": "",
+                                    "category": "Books", "price": 5.0, "quantity": 1, "seller_id": "s1",
+                                    "is_published": True, "is_approved": True, "synced_to_amazon": False, **extra}
+    job = make_job(3, job_type="amazon_sync")
+    job["params"] = {"is_admin": True}
+
+    async def run():
+        await mongo_db.products.insert_many([
+            product("p0"), product("p1", amazon_sync_claim="other", amazon_sync_claimed_at=datetime.utcnow()), product("p2")
+        ])
+        result = await products.amazon_sync_batch(job, ["p0", "p1", "p2"])
+        docs = await mongo_db.products.find({}, {"_id": 0}).to_list(None)
+        return result, {d["id"]: d for d in docs}
+
+    (synced, errors), docs = asyncio.run(run())
+    assert synced == 1
+    assert sorted(listed) == ["SKU-P0", "SKU-P2"]
+    assert [e["product_id"] for e in errors] == ["p1", "p2"]
+    assert docs["p0"]["synced_to_amazon"] and "amazon_sync_claim" not in docs["p0"]
+    assert docs["p1"]["amazon_sync_claim"] == "other"
+    assert not docs["p2"]["synced_to_amazon"] and "amazon_sync_claim" not in docs["p2"]
+
+def test_bulk_filter_over_the_cap_or_matching_nothing_is_rejected(monkeypatch, mongo_db):
+    monkeypatch.setattr(products, "db", mongo_db)
+    monkeypatch.setattr(products, "BULK_MAX_IDS", 2)
+    asyncio.run(mongo_db.products.insert_many([{"id": f"p{i}", "category": "Books"} for i in range(3)]))
+
+    def resolve(product_filter):
+        return asyncio.run(products.resolve_bulk_ids(None, product_filter, {}))
+
+    with pytest.raises(HTTPException) as too_many:
+        resolve(BulkProductFilter(category="Books"))
+    assert too_many.value.status_code == 400
+    with pytest.raises(HTTPException) as none:
+        resolve(BulkProductFilter(category="Garden"))
+    assert none.value.status_code == 404
+    assert sorted(asyncio.run(products.resolve_bulk_ids(["p0", "p2"], None, {}))) == ["p0", "p2"]
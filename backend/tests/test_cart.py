@@ -0,0 +1,142 @@
+"""
+Unit tests for cart totals and the guest cart store
+"""
+import asyncio
+
+import pytest
+
+from modules import cart as cart_module
+from utils.cart_store import (
+    CART_MAX_ITEM_QUANTITY,
+    CART_TAX_RATE,
+    CartItemNotFoundError,
+    GuestCartStore,
+    InMemoryKV,
+    MongoCartStore,
+    cart_response,
+    recompute_totals,
+    totals_delta
+)
+
+def line(product_id, price=10.0):
+    return {
+        "product_id": product_id,
+        "title": product_id.title(),
+        "price": price,
+        "image_url": None,
+        "seller_id": "s1",
+        "seller_name": "Seller"
+    }
+
+def test_totals_delta_is_linear_in_subtotal():
+    delta = totals_delta(3, 30.0)
+    assert delta["total_items"] == 3
+    assert delta["tax"] == pytest.approx(30.0 * CART_TAX_RATE)
+    assert delta["total"] == pytest.approx(delta["subtotal"] + delta["tax"])
+
+def test_incremental_totals_match_recompute():
+    stored = {"items": [], "total_items": 0, "subtotal": 0.0, "tax": 0.0, "total": 0.0}
+    for quantity, price in [(2, 0.1), (1, 0.2), (-1, 0.1), (5, 19.99)]:
+        for key, value in totals_delta(quantity, quantity * price).items():
+            stored[key] += value
+    expected = recompute_totals({"items": [
+        {"price": 0.1, "quantity": 1}, {"price": 0.2, "quantity": 1}, {"price": 19.99, "quantity": 5}
+    ]})
+    assert cart_response(stored)["subtotal"] == round(expected["subtotal"], 2)
+    assert cart_response(stored)["total"] == round(round(expected["subtotal"], 2) + round(expected["tax"], 2), 2)
+
+def test_guest_cart_add_update_remove():
+    async def run():
+        store = GuestCartStore(InMemoryKV(), ttl=60)
+        await store.add_item("g1", line("a"), 2)
+        await store.add_item("g1", line("b", price=5.0), 1)
+        cart = await store.add_item("g1", line("a", price=12.0), 1)
+        assert [(i["product_id"], i["quantity"], i["price"]) for i in cart["items"]] == [("a", 3, 12.0), ("b", 1, 5.0)]
+        assert cart["subtotal"] == pytest.approx(41.0)
+
+        cart = await store.set_quantity("g1", "a", CART_MAX_ITEM_QUANTITY + 50)
+        assert cart["items"][0]["quantity"] == CART_MAX_ITEM_QUANTITY
+
+        cart = await store.set_quantity("g1", "a", 0)
+        assert [i["product_id"] for i in cart["items"]] == ["b"]
+        with pytest.raises(CartItemNotFoundError):
+            await store.remove_item("g1", "a")
+
+        await store.clear("g1")
+        assert await store.get("g1") is None
+
+    asyncio.run(run())
+
+def test_in_memory_kv_expires_entries():
+    async def run():
+        kv = InMemoryKV()
+        await kv.set("k", "v", ex=-1)
+        assert await kv.get("k") is None
+        await kv.set("k", "v")
+        assert await kv.get("k") == "v"
+
+    asyncio.run(run())
+
+def test_in_memory_kv_is_bounded_and_sweeps_expired_keys():
+    async def run():
+        kv = InMemoryKV(max_keys=2, sweep_interval=0)
+        await kv.set("a", "1")
+        await kv.set("b", "2")
+        await kv.set("a", "1")
+        await kv.set("c", "3")
+        assert [await kv.get(k) for k in "abc"] == ["1", None, "3"]
+        await kv.set("d", "4", ex=-1)
+        await kv.set("e", "5")
+        return sorted(kv._data)
+
+    assert asyncio.run(run()) == ["c", "e"]
+
+def test_concurrent_signed_in_cart_updates_keep_lines_and_totals_consistent(mongo_db):
+    store = MongoCartStore(mongo_db)
+
+    async def run():
+        await store.ensure_indexes()
+        await asyncio.gather(*(store.add_item("u1", line("a"), 1) for _ in range(5)),
+                             store.add_item("u1", line("b", price=5.0), 2))
+        first = await store.get("u1")
+        await asyncio.gather(store.set_quantity("u1", "a", 3), store.add_item("u1", line("a", price=12.0), 1),
+                             store.remove_item("u1", "b"), store.add_item("u1", line("c", price=2.0), 1))
+        return first, await store.get("u1")
+
+    first, cart = asyncio.run(run())
+    assert sorted((i["product_id"], i["quantity"]) for i in first["items"]) == [("a", 5), ("b", 2)]
+    assert (first["total_items"], first["subtotal"]) == (7, pytest.approx(60.0))
+    assert sorted((i["product_id"], i["quantity"], i["price"]) for i in cart["items"]) == [("a", 4, 12.0), ("c", 1, 2.0)]
+    expected = recompute_totals({"items": [dict(i) for i in cart["items"]]})
+    assert cart["total_items"] == expected["total_items"]
+    assert cart["subtotal"] == pytest.approx(expected["subtotal"])
+    assert cart["total"] == pytest.approx(expected["total"])
+
+class RecordingCartStore:
+    def __init__(self):
+        self.merged = []
+
+    async def merge(self, user_id, items):
+        self.merged.append((user_id, items))
+        return {"items": items, **{k: 0 for k in ("total_items", "subtotal", "tax", "total")}}
+
+class User:
+    id = "u1"
+
+def test_merge_moves_guest_lines_and_clears_guest_cart(monkeypatch):
+    async def run():
+        guests = GuestCartStore(InMemoryKV(), ttl=60)
+        store = RecordingCartStore()
+        monkeypatch.setattr(cart_module, "guest_carts", guests)
+        monkeypatch.setattr(cart_module, "cart_store", store)
+
+        await guests.add_item("g1", line("a"), 2)
+        await cart_module.merge_guest_cart(User(), "g1")
+        assert store.merged[0][0] == "u1"
+        assert [(i["product_id"], i["quantity"]) for i in store.merged[0][1]] == [("a", 2)]
+        assert await guests.get("g1") is None
+
+        assert await cart_module.merge_guest_cart(User(), "missing") is None
+        assert len(store.merged) == 1
+
+    asyncio.run(run())
@@ -0,0 +1,106 @@
+"""
+Unit tests for the chat service: retrieval, caching and concurrency limits
+"""
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from utils.chat import ChatBusyError, ChatLimiter, ChatService, LocalChatBackend, cache_key, sse_event
+from utils.search_index import ProductSearchIndex
+
+def build_index():
+    index = ProductSearchIndex()
+    index.bulk_load([
+        {"id": "p1", "title": "Wireless Headphones", "description": "", "category": "Electronics",
+         "price": 120.0, "tags": [], "is_published": True, "is_approved": True, "updated_at": datetime(2026, 1, 1)},
+    ])
+    return index
+
+async def collect(service, message):
+    return [event async for event in service.stream(message)]
+
+def test_stream_retrieves_products_and_records_latency():
+    service = ChatService(backend=LocalChatBackend(), limiter=ChatLimiter(2, 2), index=build_index())
+
+    events = asyncio.run(collect(service, "do you sell headphones"))
+
+    names = [name for name, _ in events]
+    assert names[0] == "context" and names[-1] == "done"
+    assert events[0][1]["products"][0]["product_id"] == "p1"
+    text = "".join(payload["token"] for name, payload in events if name == "token")
+    assert "Wireless Headphones ($120.00)" in text
+    assert service.first_token.count == service.total.count == 1
+    assert service.limiter.active == 0
+
+def test_repeated_faq_prompt_is_served_from_cache():
+    service = ChatService(backend=LocalChatBackend(), limiter=ChatLimiter(1, 1), index=build_index())
+
+    first = asyncio.run(service.complete("How do refunds work?"))
+    second = asyncio.run(service.complete("how do REFUNDS work"))
+
+    assert second["cached"] and not first["cached"]
+    assert second["response"] == first["response"]
+    assert service.cache.hits == 1
+    assert cache_key("word " * 40) is None
+
+def test_limiter_rejects_when_queue_is_full():
+    async def run():
+        limiter = ChatLimiter(max_concurrency=1, max_queue=1, timeout=0.05)
+        await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(ChatBusyError):
+            await limiter.acquire()
+        with pytest.raises(ChatBusyError):
+            await waiter
+        limiter.release()
+        await limiter.acquire()
+        return limiter.active
+
+    assert asyncio.run(run()) == 1
+
+def test_sse_event_format():
+    assert sse_event({"token": "hi"}, "token") == 'event: token\ndata: {"token": "hi"}\n\n'
+
+def test_disconnected_stream_releases_its_slot(monkeypatch):
+    from modules import ai
+
+    service = ChatService(backend=LocalChatBackend(), limiter=ChatLimiter(1, 1), index=build_index())
+    monkeypatch.setattr(ai, "chat_service", service)
+
+    async def run():
+        response = await ai.ai_chat_stream(ai.ChatMessage(message="do you sell headphones"))
+        body = response.body_iterator
+        await body.__anext__()
+        await body.__anext__()
+        await body.aclose()
+        return service.limiter.active
+
+    assert asyncio.run(run()) == 0
+
+def test_product_write_evicts_cached_answers(monkeypatch):
+    from modules import products
+
+    service = ChatService(backend=LocalChatBackend(), limiter=ChatLimiter(1, 1), index=build_index())
+    monkeypatch.setattr(products, "chat_service", service)
+    asyncio.run(service.complete("How do refunds work?"))
+    assert len(service.cache) == 1
+
+    products.index_product({"id": "p-missing", "title": "Mug", "is_published": False, "is_approved": True})
+    assert len(service.cache) == 0
+    assert not asyncio.run(service.complete("How do refunds work?"))["cached"]
+
+def test_chat_rejects_non_string_messages(monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from modules import ai
+
+    monkeypatch.setattr(ai, "chat_service", ChatService(backend=LocalChatBackend(), limiter=ChatLimiter(1, 1), index=build_index()))
+    app = FastAPI()
+    app.include_router(ai.router)
+    client = TestClient(app)
+
+    for body in ({"message": 123}, {"message": ["hi"]}, {}):
+        assert client.post(f"{ai.router.prefix}/chat", json=body).status_code == 422
+    assert client.post(f"{ai.router.prefix}/chat", json={"message": "do you sell headphones"}).status_code == 200
@@ -0,0 +1,109 @@
+"""
+Unit tests for catalog HTTP caching
+"""
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from starlette.requests import Request
+
+from modules import products
+from utils.http_cache import (
+    ResponseCache,
+    catalog_cache,
+    decode_cursor,
+    encode_cursor,
+    etag_matches,
+    list_etag,
+    product_etag
+)
+
+T0 = datetime(2026, 3, 1, 12, 0, 0, 250000)
+
+def doc(product_id, minutes=0, **extra):
+    document = {
+        "id": product_id,
+        "title": product_id.title(),
+        "description": "",
+        "category": "Books",
+        "price": 10.0,
+        "quantity": 1,
+        "seller_id": "s1",
+        "seller_name": "Seller",
+        "is_published": True,
+        "is_approved": True,
+        "created_at": T0 + timedelta(minutes=minutes),
+        "updated_at": T0,
+    }
+    document.update(extra)
+    return document
+
+def test_etag_changes_with_updated_at_and_stock_not_views():
+    first = product_etag(doc("a"))
+    assert first.startswith('W/"')
+    assert product_etag(doc("a", views=99)) == first
+    assert product_etag(doc("a", updated_at=T0 + timedelta(seconds=1))) != first
+    assert product_etag(doc("a", quantity=0)) != first
+    assert product_etag(doc("a", sales=1)) != first
+
+def test_list_etag_depends_on_page_and_params():
+    page = [doc("a"), doc("b")]
+    assert list_etag(page, "Books", None, 0, 20) == list_etag(page, "Books", None, 0, 20)
+    assert list_etag(page, "Books", None, 0, 20) != list_etag(page, None, None, 0, 20)
+    assert list_etag(page, None, None, 0, 20) != list_etag(page[:1], None, None, 0, 20)
+
+def test_if_none_match_uses_weak_comparison():
+    etag = 'W/"abc"'
+    assert etag_matches('"abc"', etag)
+    assert etag_matches('"zzz", W/"abc"', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('"zzz"', etag)
+    assert not etag_matches(None, etag)
+
+def test_cursor_round_trip_and_rejects_garbage():
+    cursor = encode_cursor(doc("p1"))
+    assert decode_cursor(cursor) == (T0, "p1")
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+def test_response_cache_expires_and_invalidates():
+    cache = ResponseCache(max_size=2, ttl=60)
+    cache.put("a", {"body": b"1"})
+    cache.put("b", {"body": b"2"})
+    cache.put("c", {"body": b"3"})
+    assert cache.get("a") is None
+    assert cache.get("c") == {"body": b"3"}
+    cache.invalidate()
+    assert cache.get("c") is None
+
+    expired = ResponseCache(ttl=-1)
+    expired.put("a", {"body": b"1"})
+    assert expired.get("a") is None
+
+def request(if_none_match=None):
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers, "query_string": b""})
+
+def test_list_products_caches_pages_and_answers_304(monkeypatch, mongo_db):
+    documents = [doc(f"p{i}", minutes=i) for i in range(5)] + [doc("hidden", minutes=9, is_approved=False)]
+    asyncio.run(mongo_db.products.insert_many(documents))
+    mongo_db.products.calls.clear()
+    monkeypatch.setattr(products, "db", mongo_db)
+    catalog_cache.invalidate()
+
+    first = asyncio.run(products.list_products(request(), limit=2))
+    assert [p["id"] for p in json.loads(first.body)] == ["p4", "p3"]
+    assert first.headers["cache-control"].startswith("public")
+
+    again = asyncio.run(products.list_products(request(first.headers["etag"]), limit=2))
+    assert again.status_code == 304
+    assert mongo_db.products.calls["find"] == 1
+
+    following = asyncio.run(products.list_products(request(), limit=2, cursor=first.headers["x-next-cursor"]))
+    assert [p["id"] for p in json.loads(following.body)] == ["p2", "p1"]
+
+    products.index_product(doc("p5", minutes=10))
+    asyncio.run(products.list_products(request(), limit=2))
+    assert mongo_db.products.calls["find"] == 3
+    products.unindex_product("p5")
@@ -0,0 +1,126 @@
+"""
+Unit tests for ledger rollup planning and idempotent entries
+"""
+import asyncio
+from datetime import date, datetime
+
+import pytest
+
+from modules import ledger
+from modules.ledger import bucket_keys, plan_rollup_buckets
+
+def test_bucket_keys():
+    assert bucket_keys(datetime(2026, 3, 7, 23, 59)) == ("2026-03-07", "2026-03")
+
+def test_plan_uses_months_for_whole_months():
+    months, days = plan_rollup_buckets(date(2026, 1, 1), date(2026, 3, 31))
+    assert months == ["2026-01", "2026-02", "2026-03"]
+    assert days == []
+
+def test_plan_uses_days_for_ragged_edges():
+    months, days = plan_rollup_buckets(date(2026, 1, 30), date(2026, 3, 2))
+    assert months == ["2026-02"]
+    assert days == ["2026-01-30", "2026-01-31", "2026-03-01", "2026-03-02"]
+
+def test_plan_single_day_and_partial_month():
+    assert plan_rollup_buckets(date(2026, 5, 5), date(2026, 5, 5)) == ([], ["2026-05-05"])
+    months, days = plan_rollup_buckets(date(2026, 2, 1), date(2026, 2, 27))
+    assert months == [] and len(days) == 27
+
+def test_plan_is_bounded_by_periods_not_range():
+    months, days = plan_rollup_buckets(date(2020, 1, 15), date(2026, 1, 14))
+    assert len(months) == 71
+    assert len(days) <= 62
+
+def test_replay_finishes_a_half_applied_entry_once(monkeypatch, mongo_db):
+    monkeypatch.setattr(ledger, "db", mongo_db)
+    apply_rollups = ledger.apply_rollups
+
+    async def crash(entry):
+        raise ConnectionError("lost the primary")
+
+    async def run():
+        await ledger.ensure_indexes()
+        monkeypatch.setattr(ledger, "apply_rollups", crash)
+        with pytest.raises(ConnectionError):
+            await ledger.record_entry("s1", "sale_credit", 25.0, "o1", created_at=datetime(2026, 3, 7))
+        monkeypatch.setattr(ledger, "apply_rollups", apply_rollups)
+        replayed = await ledger.record_entry("s1", "sale_credit", 25.0, "o1", created_at=datetime(2026, 3, 7))
+        again = await ledger.record_entry("s1", "sale_credit", 25.0, "o1", created_at=datetime(2026, 3, 7))
+        balance = await mongo_db.ledger_balances.find_one({"user_id": "s1"})
+        rollups = await mongo_db.ledger_rollups.find({"user_id": "s1"}).to_list(None)
+        return replayed, again, balance, rollups
+
+    replayed, again, balance, rollups = asyncio.run(run())
+    assert (replayed.seq, replayed.balance_after, again) == (1, 25.0, None)
+    assert (balance["seq"], balance["balance"]) == (1, 25.0)
+    assert sorted((r["period"], r["sales"], r["entries"]) for r in rollups) == [("day", 25.0, 1), ("month", 25.0, 1)]
+
+def test_orders_credit_each_seller_net_of_fees(monkeypatch, mongo_db):
+    monkeypatch.setattr(ledger, "db", mongo_db)
+    monkeypatch.setattr(ledger, "PLATFORM_FEE_RATE", 0.1)
+    line = lambda seller, price, qty: {"seller_id": seller, "price": price, "quantity": qty}
+    order = {"id": "o1", "items": [line("s1", 10.0, 2), line("s2", 5.0, 1), line("s1", 2.5, 2)]}
+
+    async def run():
+        await ledger.ensure_indexes()
+        await ledger.record_order(order)
+        await ledger.record_order(order)
+        await ledger.record_cancellation({"order_id": "o1", "seller_id": "s2", "subtotal": 5.0})
+        balances = await mongo_db.ledger_balances.find({}).to_list(None)
+        return {b["user_id"]: (b["seq"], b["balance"]) for b in balances}
+
+    assert asyncio.run(run()) == {"s1": (2, 22.5), "s2": (3, 0.0)}
+
+class User:
+    id = "s1"
+
+def test_currencies_keep_separate_balances_and_statements(monkeypatch, mongo_db):
+    monkeypatch.setattr(ledger, "db", mongo_db)
+
+    async def run():
+        await ledger.ensure_indexes()
+        await ledger.record_entry("s1", "sale_credit", 25.0, "o1", created_at=datetime(2026, 3, 7))
+        await ledger.record_entry("s1", "sale_credit", 40.0, "o2", currency="eur", created_at=datetime(2026, 3, 8))
+        balance = await ledger.get_ledger_balance(User())
+        usd = await ledger.get_earnings_statement(date(2026, 3, 1), date(2026, 3, 31), current_user=User())
+        eur = await ledger.get_earnings_statement(date(2026, 3, 1), date(2026, 3, 31), currency="EUR", current_user=User())
+        return balance, usd, eur
+
+    balance, usd, eur = asyncio.run(run())
+    assert balance == {"balances": [
+        {"currency": "EUR", "balance": 40.0, "entries": 1},
+        {"currency": "USD", "balance": 25.0, "entries": 1},
+    ]}
+    assert (usd.currency, usd.sales, usd.balance) == ("USD", 25.0, 25.0)
+    assert (eur.currency, eur.sales, eur.balance) == ("EUR", 40.0, 40.0)
+
+def test_month_breakdown_adds_up_for_partial_months(monkeypatch, mongo_db):
+    monkeypatch.setattr(ledger, "db", mongo_db)
+    sales = [(datetime(2026, 1, 10), 10.0), (datetime(2026, 1, 25), 20.0), (datetime(2026, 2, 14), 5.0),
+             (datetime(2026, 3, 2), 7.0), (datetime(2026, 3, 20), 30.0)]
+
+    async def run():
+        await ledger.ensure_indexes()
+        for i, (created_at, amount) in enumerate(sales):
+            await ledger.record_entry("s1", "sale_credit", amount, f"o{i}", created_at=created_at)
+        return await ledger.get_earnings_statement(date(2026, 1, 20), date(2026, 3, 5), "month", current_user=User())
+
+    statement = asyncio.run(run())
+    assert [(p.period, p.sales) for p in statement.periods] == [("2026-01", 20.0), ("2026-02", 5.0), ("2026-03", 7.0)]
+    assert statement.sales == sum(p.sales for p in statement.periods) == 32.0
+
+def test_entries_limit_is_bounded_at_the_api():
+    from types import SimpleNamespace
+
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from modules.auth import get_current_user
+
+    app = FastAPI()
+    app.include_router(ledger.router)
+    app.dependency_overrides[get_current_user] = lambda: SimpleNamespace(id="u1")
+    client = TestClient(app)
+
+    assert client.get(f"{ledger.router.prefix}/entries", params={"limit": 0}).status_code == 422
+    assert client.get(f"{ledger.router.prefix}/entries", params={"limit": 201}).status_code == 422
@@ -0,0 +1,89 @@
+"""
+Tests for the deterministic dataset seeders and the API load driver
+"""
+import asyncio
+import os
+import random
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+from benchmarks.harness import api_client, generate_users, login_email, running_app, seed_dataset
+from benchmarks.load_api import VirtualUser, run_user, summarize
+
+class RecordingClient:
+    def __init__(self):
+        self.calls = []
+
+    async def request(self, method, url, headers=None, **kwargs):
+        self.calls.append((method, url, kwargs.get("params")))
+        return SimpleNamespace(status_code=200, headers={"X-Next-Cursor": "c1"}, json=lambda: {"access_token": "t"})
+
+def dataset():
+    return asyncio.run(seed_dataset(None, users=20, products=50, insert=False))
+
+def test_dataset_is_reproducible_and_sellers_own_products():
+    first, second = dataset(), dataset()
+    assert first == second
+    assert first["sellers"] == ["seller-0", "seller-1"]
+    assert len(first["buyers"]) == 18
+    assert len(first["products"]) == 50
+    users = list(generate_users(20, "hash"))
+    assert users[-1]["role"] == "admin"
+    assert {u["id"] for u in users if u["role"] == "seller"} == set(first["sellers"])
+    assert login_email(first, "user-3") == "user-3@loadtest.hamro.com"
+
+def test_same_seed_replays_the_same_requests():
+    data = dataset()
+
+    def replay(seed):
+        client = RecordingClient()
+        vu = VirtualUser(client, data, "seller-1", random.Random(seed), {})
+        asyncio.run(run_user(vu, 50))
+        return client.calls
+
+    assert replay(7) == replay(7)
+    assert replay(7) != replay(8)
+    assert replay(7)[0][1] == "/api/auth/login"
+
+def test_summary_reports_per_endpoint_percentiles():
+    samples = {
+        "GET /products/": [(float(ms), True) for ms in range(1, 101)],
+        "GET /products/{id}": [(5.0, True), (7.0, False)],
+    }
+    report = summarize(samples, elapsed=2.0)
+    listing = report["endpoints"]["GET /products/"]
+    assert listing["requests"] == 100
+    assert listing["rps"] == 50.0
+    assert listing["p50_ms"] == 50.0
+    assert listing["p99_ms"] == 99.0
+    assert report["endpoints"]["GET /products/{id}"]["errors"] == 1
+    assert report["requests"] == 102
+    assert report["errors"] == 1
+
+def test_app_serves_seeded_data_in_memory():
+    pytest.importorskip("mongomock_motor")
+    environ = dict(os.environ)
+
+    async def run():
+        async with running_app("mongomock://", users=20, products=200, sync_logs=50) as (app, db, data):
+            async with api_client(app) as client:
+                login = await client.post("/api/auth/login", json={
+                    "email": login_email(data, "seller-0"), "password": data["password"]
+                })
+                assert login.status_code == 200
+                headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+                listing = await client.get("/api/products/", params={"limit": 10})
+                mine = await client.get("/api/products/my-products", headers=headers)
+                unread = await client.get("/api/notifications/unread-count", headers=headers)
+                return listing, mine, unread, await db.amazon_sync_logs.count_documents({})
+
+    listing, mine, unread, sync_logs = asyncio.run(run())
+    assert listing.status_code == 200 and len(listing.json()) == 10
+    assert mine.status_code == 200 and all(p["seller_id"] == "seller-0" for p in mine.json())
+    assert unread.status_code == 200
+    assert sync_logs == 50
+    # Later tests in the session see neither the mongomock URL nor the imported server
+    assert dict(os.environ) == environ
+    assert "server" not in sys.modules
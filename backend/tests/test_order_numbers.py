@@ -0,0 +1,86 @@
+"""
+Unit and multi-process uniqueness tests for the order number generator
+"""
+import asyncio
+import multiprocessing
+from datetime import datetime
+
+from utils.order_numbers import OrderNumberGenerator, format_order_number
+
+class LocalSequence:
+    """In-process stand-in for MongoSequence"""
+
+    def __init__(self):
+        self.value = 0
+        self.leases = []
+
+    async def lease(self, count):
+        await asyncio.sleep(0)
+        start = self.value + 1
+        self.value += count
+        self.leases.append(count)
+        return start
+
+class SharedSequence:
+    """Cross-process counter with the same atomic lease contract as the counters document"""
+
+    def __init__(self, counter):
+        self.counter = counter
+
+    async def lease(self, count):
+        with self.counter.get_lock():
+            start = self.counter.value + 1
+            self.counter.value += count
+        return start
+
+_shared_counter = None
+
+def _init_worker(counter):
+    global _shared_counter
+    _shared_counter = counter
+
+def _generate(count):
+    generator = OrderNumberGenerator(SharedSequence(_shared_counter), block_size=100)
+
+    async def run():
+        return [await generator.next_number() for _ in range(count)]
+
+    return asyncio.run(run())
+
+def test_format_is_date_prefixed_and_padded():
+    assert format_order_number(4821, datetime(2026, 3, 19)) == "HM260319-0004821"
+    assert format_order_number(12345678, datetime(2026, 3, 19), prefix="X") == "X260319-12345678"
+
+def test_concurrent_tasks_share_blocks_without_duplicates():
+    sequence = LocalSequence()
+    generator = OrderNumberGenerator(sequence, block_size=10, max_block=1000)
+
+    async def run():
+        return await asyncio.gather(*(generator.next_sequence() for _ in range(2500)))
+
+    numbers = asyncio.run(run())
+    assert len(set(numbers)) == 2500
+    assert min(numbers) == 1
+    # Back-to-back refills grow the block, so far fewer leases than numbers / 10
+    assert generator.leases < 20
+    assert max(sequence.leases) > 10
+
+def test_numbers_are_increasing_within_a_process():
+    generator = OrderNumberGenerator(LocalSequence(), block_size=5, clock=lambda: datetime(2026, 1, 1))
+
+    async def run():
+        return [await generator.next_number() for _ in range(50)]
+
+    numbers = asyncio.run(run())
+    assert numbers == sorted(numbers)
+
+def test_no_duplicates_across_processes():
+    processes, per_process = 4, 25_000
+    context = multiprocessing.get_context("fork")
+    counter = context.Value("q", 0)
+    with context.Pool(processes, initializer=_init_worker, initargs=(counter,)) as pool:
+        results = pool.map(_generate, [per_process] * processes)
+
+    numbers = [number for batch in results for number in batch]
+    assert len(numbers) == processes * per_process
+    assert len(set(numbers)) == len(numbers)
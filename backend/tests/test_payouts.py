@@ -0,0 +1,313 @@
+"""
+Unit tests for payout queue, settlement worker and Stripe webhooks
+"""
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from utils.payout_queue import (
+    PayoutQueue,
+    PayoutSettlementWorker,
+    available_balance,
+    group_by_settlement,
+    split_by_balance
+)
+from utils.stripe_mock import LocalStripe
+from utils.stripe_webhooks import (
+    StripeEventProcessor,
+    StripeEventQueue,
+    WebhookSignatureError,
+    build_bulk_operations,
+    sign_webhook_payload,
+    verify_webhook_signature
+)
+
+def make_payout(payout_id, account_id, amount, minutes_ago=0, currency="USD", settlement_id=None):
+    return {
+        "id": payout_id,
+        "user_id": f"user-{account_id}",
+        "stripe_account_id": account_id,
+        "idempotency_key": f"key-{payout_id}",
+        "amount": amount,
+        "currency": currency,
+        "settlement_id": settlement_id or f"settle-{account_id}-{currency}",
+        "attempts": 1,
+        "created_at": datetime.utcnow() - timedelta(minutes=minutes_ago)
+    }
+
+class RecordingQueue:
+    """Minimal queue double that records status transitions"""
+
+    def __init__(self):
+        self.settled = {}
+        self.failed = {}
+        self.released = []
+        self.sent = {}
+
+    async def mark_sent(self, ids, amount):
+        for payout_id in ids:
+            self.sent[payout_id] = {"settlement_sent": True, "settlement_amount": amount, "settlement_size": len(ids)}
+
+    async def mark_settled(self, ids, stripe_payout):
+        for payout_id in ids:
+            self.settled[payout_id] = stripe_payout["id"]
+
+    async def mark_failed(self, ids, error_message):
+        for payout_id in ids:
+            self.failed[payout_id] = error_message
+
+    async def release(self, payouts, error_message, max_attempts=5):
+        self.released.extend(p["id"] for p in payouts)
+        return []
+
+def test_group_by_settlement_oldest_first_and_per_currency():
+    payouts = [
+        make_payout("p1", "acct_a", 10, minutes_ago=1),
+        make_payout("p2", "acct_b", 20, minutes_ago=5),
+        make_payout("p3", "acct_a", 30, minutes_ago=3),
+        make_payout("p4", "acct_a", 40, minutes_ago=4, currency="EUR"),
+    ]
+    groups = group_by_settlement(payouts)
+
+    assert list(groups.keys()) == ["settle-acct_b-USD", "settle-acct_a-EUR", "settle-acct_a-USD"]
+    assert [p["id"] for p in groups["settle-acct_a-USD"]] == ["p3", "p1"]
+
+def test_available_balance_is_per_currency():
+    assert available_balance({"available": 50.0, "currency": "usd"}, "USD") == 50.0
+    assert available_balance({"available": 50.0, "currency": "usd"}, "EUR") == 0.0
+    listed = {"available": [{"amount": 10.0, "currency": "usd"}, {"amount": 7.0, "currency": "eur"}]}
+    assert available_balance(listed, "EUR") == 7.0
+
+def test_split_by_balance():
+    payouts = [make_payout("p1", "a", 50), make_payout("p2", "a", 80), make_payout("p3", "a", 20)]
+    settle, short = split_by_balance(payouts, 100)
+
+    assert [p["id"] for p in settle] == ["p1", "p3"]
+    assert [p["id"] for p in short] == ["p2"]
+
+def test_local_stripe_replays_idempotent_payout():
+    stripe = LocalStripe(default_balance=100)
+
+    async def run():
+        first = await stripe.create_payout("acct", 40, idempotency_key="k1")
+        second = await stripe.create_payout("acct", 40, idempotency_key="k1")
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first["id"] == second["id"]
+    assert len(stripe.payouts) == 1
+    assert stripe.balances["acct"] == 60
+
+def test_worker_settles_one_stripe_payout_per_account():
+    stripe = LocalStripe()
+    stripe.set_balance("acct_a", 100)
+    queue = RecordingQueue()
+    worker = PayoutSettlementWorker(queue, stripe, rate_limit=1000)
+    payouts = [make_payout("p1", "acct_a", 30), make_payout("p2", "acct_a", 50), make_payout("p3", "acct_a", 40)]
+
+    settled = asyncio.run(worker.settle(payouts))
+
+    assert settled == 2
+    assert len(stripe.payouts) == 1
+    assert stripe.payouts[0]["amount"] == 80
+    assert set(queue.settled) == {"p1", "p2"}
+    assert queue.failed == {"p3": "Insufficient balance"}
+    assert set(queue.sent) == {"p1", "p2"}
+    assert queue.sent["p1"]["settlement_amount"] == 80
+    assert stripe.calls[-1][3] == "settle-acct_a-USD"
+
+def test_worker_releases_batch_on_stripe_error():
+    stripe = LocalStripe(default_balance=100)
+    stripe.fail_next()
+    queue = RecordingQueue()
+    worker = PayoutSettlementWorker(queue, stripe, rate_limit=1000)
+
+    settled = asyncio.run(worker.settle([make_payout("p1", "acct", 10)]))
+
+    assert settled == 0
+    assert queue.released == ["p1"]
+    assert queue.settled == {}
+
+def test_retry_after_timeout_replays_the_same_stripe_payout():
+    stripe = LocalStripe()
+    stripe.set_balance("acct", 50)
+    queue = RecordingQueue()
+    worker = PayoutSettlementWorker(queue, stripe, rate_limit=1000)
+    payouts = [make_payout("p1", "acct", 30), make_payout("p2", "acct", 20)]
+    create_payout = stripe.create_payout
+
+    async def paid_then_timed_out(**kwargs):
+        await create_payout(**kwargs)
+        raise TimeoutError("read timed out")
+
+    stripe.create_payout = paid_then_timed_out
+    assert asyncio.run(worker.settle(payouts)) == 0
+    assert queue.released == ["p1", "p2"]
+
+    # The retry sees a drained balance but must not fail or re-split the settlement
+    stripe.create_payout = create_payout
+    retried = [{**p, **queue.sent[p["id"]]} for p in payouts]
+    assert asyncio.run(worker.settle(retried)) == 2
+    assert len(stripe.payouts) == 1
+    assert stripe.balances["acct"] == 0
+    assert queue.failed == {}
+    assert queue.settled["p1"] == queue.settled["p2"] == stripe.payouts[0]["id"]
+
+def test_partial_retry_replays_the_stored_settlement_request():
+    stripe = LocalStripe()
+    stripe.set_balance("acct", 50)
+    queue = RecordingQueue()
+    worker = PayoutSettlementWorker(queue, stripe, rate_limit=1000)
+    payouts = [make_payout("p1", "acct", 30), make_payout("p2", "acct", 20)]
+    create_payout = stripe.create_payout
+    requests = []
+
+    async def recording_create_payout(**kwargs):
+        requests.append(kwargs)
+        return await create_payout(**kwargs)
+
+    async def paid_then_timed_out(**kwargs):
+        await recording_create_payout(**kwargs)
+        raise TimeoutError("read timed out")
+
+    stripe.create_payout = paid_then_timed_out
+    assert asyncio.run(worker.settle(payouts)) == 0
+
+    # Another worker holds p2: p1 alone must resend the whole settlement's parameters
+    stripe.create_payout = recording_create_payout
+    assert asyncio.run(worker.settle([{**payouts[0], **queue.sent["p1"]}])) == 1
+    assert requests[0] == requests[1]
+    assert requests[1]["amount"] == 50
+    assert len(stripe.payouts) == 1
+
+def test_claim_pulls_in_the_rest_of_a_sent_settlement(mongo_db):
+    queue = PayoutQueue(mongo_db)
+    payouts = [
+        {**make_payout(f"p{i}", "acct", 10, minutes_ago=10 - i, settlement_id="settle-1"),
+         "status": "queued", "settlement_sent": True, "settlement_amount": 30, "settlement_size": 3}
+        for i in range(3)
+    ]
+    asyncio.run(mongo_db.payouts.insert_many(payouts))
+
+    claimed = asyncio.run(queue.claim_batch(limit=1))
+
+    assert sorted(p["id"] for p in claimed) == ["p0", "p1", "p2"]
+    assert len(group_by_settlement(claimed)) == 1
+    assert {p["attempts"] for p in claimed} == {2}
+
+def test_webhook_signature_roundtrip():
+    payload = json.dumps({"id": "evt_1", "type": "payout.paid"}).encode()
+    header = sign_webhook_payload(payload, secret="whsec_x")
+
+    event = verify_webhook_signature(payload, header, secret="whsec_x")
+    assert event["id"] == "evt_1"
+
+    with pytest.raises(WebhookSignatureError):
+        verify_webhook_signature(payload + b" ", header, secret="whsec_x")
+    with pytest.raises(WebhookSignatureError):
+        verify_webhook_signature(payload, header, secret="whsec_other")
+    with pytest.raises(WebhookSignatureError):
+        verify_webhook_signature(payload, header, secret="")
+    with pytest.raises(WebhookSignatureError):
+        stale = sign_webhook_payload(payload, secret="whsec_x", timestamp=int(time.time()) - 3600)
+        verify_webhook_signature(payload, stale, secret="whsec_x")
+
+def test_bulk_operations_keep_latest_event_per_object():
+    def event(event_type, created, obj):
+        return {"type": event_type, "created": created, "payload": {"data": {"object": obj}}}
+
+    events = [
+        event("payout.paid", 20, {"id": "po_1", "status": "paid"}),
+        event("payout.created", 10, {"id": "po_1", "status": "pending"}),
+        event("account.updated", 5, {"id": "acct_1", "payouts_enabled": False}),
+        event("account.updated", 6, {"id": "acct_1", "payouts_enabled": True, "details_submitted": True}),
+        event("charge.succeeded", 7, {"id": "ch_1"}),
+    ]
+    account_ops, payout_ops = build_bulk_operations(events)
+
+    assert len(account_ops) == 1
+    assert account_ops[0]._filter == {"stripe_account_id": "acct_1", "stripe_event_created": {"$not": {"$gte": 6}}}
+    assert account_ops[0]._doc["$set"]["payouts_enabled"] is True
+    assert account_ops[0]._doc["$set"]["stripe_event_created"] == 6
+    assert account_ops[0]._doc["$set"]["status"] == "active"
+    assert len(payout_ops) == 1
+    assert payout_ops[0]._filter == {"stripe_payout_id": "po_1", "stripe_event_created": {"$not": {"$gte": 20}}}
+    assert payout_ops[0]._doc["$set"]["status"] == "paid"
+
+def test_payout_event_before_its_payout_is_stored_waits_for_it(mongo_db):
+    queue = StripeEventQueue(mongo_db)
+    processor = StripeEventProcessor(queue)
+
+    def payout_event(event_id, payout_id, created):
+        return {"id": event_id, "type": "payout.paid", "created": created,
+                "data": {"object": {"id": payout_id, "status": "paid"}}}
+
+    async def run():
+        await mongo_db.payouts.insert_one({"id": "p1", "status": "processing", "stripe_payout_id": None})
+        await queue.ingest(payout_event("evt_early", "po_1", 10))
+        await queue.ingest(payout_event("evt_lost", "po_gone", 5))
+        await mongo_db.stripe_events.update_one(
+            {"event_id": "evt_lost"}, {"$set": {"received_at": datetime.utcnow() - timedelta(days=1)}}
+        )
+        assert await processor.run_once() == 2
+        # Deferred until retry_at, so the next poll does not pick it up again
+        assert await processor.run_once() == 0
+
+        await mongo_db.payouts.update_one({"id": "p1"}, {"$set": {"stripe_payout_id": "po_1", "status": "pending"}})
+        await mongo_db.stripe_events.update_one({"event_id": "evt_early"}, {"$set": {"retry_at": datetime.utcnow()}})
+        assert await processor.run_once() == 1
+
+    asyncio.run(run())
+    events = {e["event_id"]: e for e in asyncio.run(mongo_db.stripe_events.find({}).to_list(None))}
+    assert events["evt_early"]["status"] == "processed"
+    assert events["evt_early"]["attempts"] == 1
+    assert events["evt_lost"]["status"] == "unmatched"
+    assert asyncio.run(mongo_db.payouts.find_one({"id": "p1"}))["status"] == "paid"
+
+def test_worker_calls_on_settled_hook():
+    stripe = LocalStripe(default_balance=100)
+    queue = RecordingQueue()
+    settled_batches = []
+
+    async def on_settled(payouts, stripe_payout):
+        settled_batches.append(([p["id"] for p in payouts], stripe_payout["id"]))
+
+    worker = PayoutSettlementWorker(queue, stripe, on_settled=on_settled, rate_limit=1000)
+    asyncio.run(worker.settle([make_payout("p1", "acct", 10)]))
+
+    assert settled_batches == [(["p1"], stripe.payouts[0]["id"])]
+
+def test_reused_idempotency_key_must_match_the_original_request(mongo_db, monkeypatch):
+    from types import SimpleNamespace
+
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from modules import notifications, payouts
+    from modules.auth import get_current_user
+
+    queue = PayoutQueue(mongo_db)
+    asyncio.run(queue.ensure_indexes())
+    asyncio.run(mongo_db.stripe_accounts.insert_one(
+        {"user_id": "u1", "stripe_account_id": "acct_1", "payouts_enabled": True}
+    ))
+    monkeypatch.setattr(payouts, "db", mongo_db)
+    monkeypatch.setattr(payouts, "payout_queue", queue)
+    monkeypatch.setattr(notifications, "db", mongo_db)
+    app = FastAPI()
+    app.include_router(payouts.router)
+    app.dependency_overrides[get_current_user] = lambda: SimpleNamespace(id="u1", email="seller@hamro.com")
+    client = TestClient(app)
+
+    def request(amount, currency="USD"):
+        return client.post(f"{payouts.router.prefix}/request", json={"amount": amount, "currency": currency},
+                           headers={"Idempotency-Key": "k1"})
+
+    first = request(40)
+    assert first.status_code == 202
+    assert request(40).json()["id"] == first.json()["id"]
+    assert request(50).status_code == 409
+    assert request(40, currency="EUR").status_code == 409
+    assert asyncio.run(mongo_db.payouts.count_documents({})) == 1
@@ -0,0 +1,91 @@
+"""
+Unit tests for the catalog price model
+"""
+import random
+
+import numpy as np
+import pytest
+
+from utils.price_model import InvalidProductError, PriceModel, latest_artifact, train
+
+def catalog(count=2000, seed=3):
+    rng = random.Random(seed)
+    base = {"Electronics": 120.0, "Books": 15.0, "Garden": 40.0}
+    products = []
+    for i in range(count):
+        category = rng.choice(list(base))
+        premium = rng.random() < 0.3
+        seller = f"seller-{rng.randrange(20)}"
+        price = base[category] * (2.5 if premium else 1.0) * rng.lognormvariate(0, 0.1)
+        products.append({
+            "title": f"{'Premium ' if premium else ''}{category} item {i % 7}",
+            "description": "solid everyday item",
+            "category": category,
+            "tags": ["premium"] if premium else [],
+            "seller_id": seller,
+            "price": round(price, 2),
+        })
+    return products
+
+@pytest.fixture(scope="module")
+def model():
+    return train(catalog(), dim=512)
+
+def test_learns_category_and_premium_signal(model):
+    books, electronics, premium = model.predict([
+        {"title": "Books item", "category": "Books"},
+        {"title": "Electronics item", "category": "Electronics"},
+        {"title": "Premium Electronics item", "category": "Electronics", "tags": ["premium"]},
+    ])
+
+    assert books["predicted_price"] < electronics["predicted_price"] < premium["predicted_price"]
+    assert 90 < electronics["predicted_price"] < 160
+    low, high = electronics["price_range"]
+    assert low < electronics["predicted_price"] < high
+    assert model.metrics["mape"] < 0.2
+
+def test_batch_matches_single_predictions(model):
+    products = catalog(50, seed=9)
+    assert model.predict(products) == [model.predict([p])[0] for p in products]
+    assert model.predict([]) == []
+
+def test_artifact_roundtrip(model, tmp_path):
+    path = model.save(tmp_path)
+
+    assert latest_artifact(tmp_path) == path
+    loaded = PriceModel.load(path)
+    products = catalog(20, seed=5)
+    assert loaded.version == model.version
+    assert loaded.predict(products) == model.predict(products)
+    with np.load(path, allow_pickle=False) as data:
+        assert data["seller_ids"].dtype.kind == "U"
+
+def test_train_rejects_empty_catalog():
+    with pytest.raises(ValueError):
+        train([{"title": "Free", "price": 0}, {"title": "Unpriced", "price": None}])
+
+def test_train_streams_from_a_cursor_factory(model):
+    passes = []
+
+    def cursor():
+        passes.append(1)
+        return iter(catalog())
+
+    streamed = train(cursor, dim=512)
+
+    assert len(passes) == 3
+    assert streamed.metrics["train_rows"] == model.metrics["train_rows"]
+    products = catalog(20, seed=5)
+    assert np.allclose(
+        [p["predicted_price"] for p in streamed.predict(products)],
+        [p["predicted_price"] for p in model.predict(products)]
+    )
+    with pytest.raises(TypeError):
+        train(iter(catalog()), dim=512)
+
+def test_malformed_products_are_rejected(model):
+    with pytest.raises(InvalidProductError, match="Product 1: tags"):
+        model.predict([{"title": "Mug"}, {"title": "Mug", "tags": "kitchen"}])
+    with pytest.raises(InvalidProductError, match="title"):
+        model.predict([{"title": 42}])
+    assert model.predict([{"title": "Mug", "tags": None, "seller_id": None}])
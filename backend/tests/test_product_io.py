@@ -0,0 +1,93 @@
+"""
+Unit tests for streaming product import parsing and export serialization
+"""
+import asyncio
+import json
+from datetime import datetime
+
+from utils.product_io import (
+    ImportReport,
+    csv_header,
+    csv_lines,
+    iter_csv_rows,
+    iter_jsonl_rows,
+    iter_lines,
+    jsonl_lines,
+    plan_chunk,
+    upsert_operations
+)
+
+async def chunks(data: bytes, size: int = 7):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+async def parse(data: bytes, parser):
+    return [row async for row in parser(iter_lines(chunks(data)))]
+
+def test_csv_rows_survive_chunk_boundaries_and_quoted_newlines():
+    data = (
+        "﻿sku,title,description,category,price,quantity,tags\r\n"
+        'A1,Mug,"Big, blue\nceramic mug",Home,9.5,3,kitchen|gift\r\n'
+        "\r\n"
+        "A2,Lamp,Desk lamp,Home,20,1,\n"
+    ).encode()
+
+    rows = asyncio.run(parse(data, iter_csv_rows))
+
+    assert [r[0] for r in rows] == [1, 2]
+    assert rows[0][1]["description"] == "Big, blue\nceramic mug"
+    assert rows[0][1]["tags"] == ["kitchen", "gift"]
+    assert "tags" not in rows[1][1]
+
+def test_jsonl_reports_bad_lines():
+    data = b'{"sku": "A1"}\nnot json\n[1]\n\n{"sku": "A2"}'
+    rows = asyncio.run(parse(data, iter_jsonl_rows))
+
+    assert [(n, error is None) for n, _, error in rows] == [(1, True), (2, False), (3, False), (4, True)]
+
+def test_plan_chunk_validates_and_dedupes():
+    report = ImportReport()
+    planned = plan_chunk([
+        (1, {"sku": "A1", "title": "Mug", "description": "", "category": "Home", "price": "9.5", "quantity": "3"}),
+        (2, {"sku": "A2", "title": "Lamp", "description": "", "category": "Home", "price": "-1", "quantity": "1"}),
+        (3, {"title": "No sku", "description": "", "category": "Home", "price": "5", "quantity": "1"}),
+        (4, {"sku": "A1", "title": "Mug v2", "description": "", "category": "Home", "price": "10", "quantity": "3"}),
+    ], report)
+
+    assert [(n, p.title) for n, p in planned] == [(4, "Mug v2")]
+    assert [e["row"] for e in report.errors] == [2, 3]
+    assert report.errors[0]["error"].startswith("price:")
+
+def test_upsert_keeps_lifecycle_fields_stock_and_unsupplied_columns(mongo_db):
+    report = ImportReport()
+    row = {"sku": "A1", "title": "Mug", "description": "d", "category": "Home", "price": 9.5, "quantity": 3}
+
+    def import_row(row, now):
+        [(_, product)] = plan_chunk([(1, row)], report)
+        operations = upsert_operations(product, "seller-1", "Seller", now)
+        result = asyncio.run(mongo_db.products.bulk_write(operations, ordered=False))
+        stored = asyncio.run(mongo_db.products.find_one({"sku": "A1"}, {"_id": 0}))
+        return result.bulk_api_result, stored
+
+    inserted, first = import_row({**row, "tags": ["kitchen"]}, datetime(2026, 1, 1))
+    assert (inserted["nUpserted"], first["quantity"], first["is_approved"]) == (1, 3, False)
+
+    asyncio.run(mongo_db.products.update_one({"sku": "A1"}, {"$set": {"quantity": 1, "is_approved": True}}))
+    unchanged, same = import_row(row, datetime(2026, 1, 2))
+    assert unchanged["nModified"] == 0 and same["updated_at"] == datetime(2026, 1, 1)
+
+    updated, second = import_row({**row, "price": 12.0}, datetime(2026, 1, 3))
+    assert updated["nModified"] == 1
+    assert (second["price"], second["updated_at"]) == (12.0, datetime(2026, 1, 3))
+    assert (second["quantity"], second["is_approved"], second["tags"], second["id"]) == (1, True, ["kitchen"], first["id"])
+
+def test_export_roundtrips_through_import_parser():
+    products = [{"id": "p1", "sku": "A1", "title": "Mug, large", "description": "two\nlines",
+                 "category": "Home", "price": 9.5, "quantity": 3, "tags": ["a", "b"],
+                 "images": [{"url": "http://x/img.png"}], "created_at": datetime(2026, 1, 1)}]
+
+    text = csv_header() + csv_lines(products)
+    [(_, row, _)] = asyncio.run(parse(text.encode(), iter_csv_rows))
+    assert row["title"] == "Mug, large" and row["description"] == "two\nlines"
+    assert row["images"][0]["filename"] == "img.png"
+    assert json.loads(jsonl_lines(products))["created_at"] == "2026-01-01T00:00:00"
@@ -0,0 +1,140 @@
+"""
+Unit tests for the co-occurrence recommender
+"""
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from utils.recommender import ProductRecommender, ViewLog, ingest_new_interactions
+
+T0 = datetime(2026, 1, 1)
+
+def product(product_id, title, category="Electronics", **extra):
+    doc = {
+        "id": product_id,
+        "title": title,
+        "category": category,
+        "is_published": True,
+        "is_approved": True,
+        "updated_at": T0,
+    }
+    doc.update(extra)
+    return doc
+
+def order(user_id, *product_ids, minutes=0, status="pending"):
+    return {
+        "user_id": user_id,
+        "status": status,
+        "created_at": T0 + timedelta(minutes=minutes),
+        "items": [{"product_id": pid} for pid in product_ids],
+    }
+
+def build_recommender():
+    recommender = ProductRecommender(k=5)
+    for p in [
+        product("phone", "Phone"),
+        product("case", "Phone Case"),
+        product("charger", "Charger"),
+        product("mug", "Mug", category="Home & Kitchen"),
+        product("kettle", "Kettle", category="Home & Kitchen"),
+    ]:
+        recommender.upsert(p)
+    recommender.ingest_orders([
+        order("u1", "phone", "case", minutes=1),
+        order("u2", "phone", "case", "charger", minutes=2),
+        order("u3", "mug", "kettle", minutes=3),
+        order("u4", "phone", "mug", minutes=4, status="cancelled"),
+    ])
+    recommender.rebuild_neighbors()
+    return recommender
+
+def test_similar_ranks_co_purchases():
+    recommender = build_recommender()
+    similar = [r["product_id"] for r in recommender.similar("phone", limit=3)]
+
+    assert similar[:2] == ["case", "charger"]
+    # Cancelled orders add no pairs
+    assert "mug" not in similar[:2]
+    assert recommender.orders_watermark == T0 + timedelta(minutes=4)
+
+def test_user_recommendations_exclude_owned_items():
+    recommender = build_recommender()
+    recs = recommender.recommend("u1", limit=3)
+
+    ids = [r["product_id"] for r in recs]
+    assert ids[0] == "charger"
+    assert "phone" not in ids and "case" not in ids
+    assert all(0 < r["confidence_score"] <= 1 for r in recs)
+
+def test_co_views_and_incremental_rebuild():
+    recommender = build_recommender()
+    recommender.ingest_views([
+        {"user_id": "u9", "product_id": "mug", "viewed_at": T0},
+        {"user_id": "u9", "product_id": "charger", "viewed_at": T0 + timedelta(seconds=1)},
+    ])
+    assert "charger" not in [r["product_id"] for r in recommender.similar("mug", limit=1)]
+
+    recommender.rebuild_neighbors()
+
+    assert "charger" in [r["product_id"] for r in recommender.similar("mug", limit=2)]
+    assert recommender.recommend("u9", limit=1)[0]["product_id"] in {"kettle", "phone", "case"}
+
+def test_hidden_products_and_cold_start_fallback():
+    recommender = build_recommender()
+    recommender.upsert(product("case", "Phone Case", is_approved=False))
+    recommender.rebuild_neighbors()
+
+    assert "case" not in [r["product_id"] for r in recommender.similar("phone", limit=5)]
+    cold = recommender.recommend("new-user", limit=2)
+    assert [r["reason"] for r in cold] == ["Popular right now"] * 2
+    assert cold[0]["product_id"] == "phone"
+
+def test_view_log_buffers_reads_and_writes_them_in_order():
+    inserted = []
+
+    async def insert_many(documents, ordered=True):
+        inserted.extend(documents)
+
+    log = ViewLog(SimpleNamespace(product_views=SimpleNamespace(insert_many=insert_many)), max_buffer=3)
+    for product_id in ("a", "b", "c", "d"):
+        log.record("u1", product_id)
+    assert inserted == []
+
+    assert asyncio.run(log.flush()) == 3
+    assert [v["product_id"] for v in inserted] == ["a", "b", "c"]
+    assert inserted[0]["viewed_at"] < inserted[1]["viewed_at"] < inserted[2]["viewed_at"]
+    assert log.dropped == 1
+    assert asyncio.run(log.flush()) == 0
+
+def test_late_committing_orders_are_ingested_once(mongo_db):
+    recommender = build_recommender()
+    charger_before = recommender.popularity[recommender.codes["charger"]]
+
+    async def scenario():
+        await mongo_db.orders.insert_many([
+            {**order("u5", "phone", "charger", minutes=10), "id": "o5"},
+            {**order("u6", "mug", "kettle", minutes=12), "id": "o6"},
+        ])
+        assert await ingest_new_interactions(mongo_db, recommender) == 2
+        # Stamped before o6 but committed after the last pass read past it
+        await mongo_db.orders.insert_one({**order("u7", "phone", "charger", minutes=11), "id": "o7"})
+        assert await ingest_new_interactions(mongo_db, recommender) == 1
+        assert await ingest_new_interactions(mongo_db, recommender) == 0
+
+    asyncio.run(scenario())
+    assert recommender.popularity[recommender.codes["charger"]] == charger_before + 2
+    assert set(recommender.recent_orders) == {"o5", "o6", "o7"}
+
+def test_similar_limit_is_bounded_at_the_api():
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from modules import ai
+    from modules.auth import get_current_user
+
+    app = FastAPI()
+    app.include_router(ai.router)
+    app.dependency_overrides[get_current_user] = lambda: SimpleNamespace(id="u1")
+    client = TestClient(app)
+
+    for limit in (0, -5, 51):
+        assert client.get(f"{ai.router.prefix}/recommendations/product/p1", params={"limit": limit}).status_code == 422
@@ -0,0 +1,83 @@
+"""
+Unit tests for per-product review rating counters
+"""
+import asyncio
+
+from utils.review_stats import (
+    ReviewStatsStore,
+    is_verified_purchase,
+    rating_change,
+    rating_increment,
+    sentiment_removal,
+    stats_response
+)
+
+class CounterCollection:
+    """Applies upsert $inc updates to in-memory documents"""
+
+    def __init__(self):
+        self.docs = {}
+
+    async def update_one(self, query, update, upsert=False):
+        doc = self.docs.setdefault(query["product_id"], {"product_id": query["product_id"]})
+        for path, amount in update["$inc"].items():
+            target = doc
+            *parents, leaf = path.split(".")
+            for key in parents:
+                target = target.setdefault(key, {})
+            target[leaf] = target.get(leaf, 0) + amount
+
+    async def find_one(self, query, projection=None):
+        return self.docs.get(query["product_id"])
+
+class DB:
+    reviews = None
+
+    def __init__(self):
+        self.review_stats = CounterCollection()
+
+def test_counters_follow_create_edit_and_delete():
+    store = ReviewStatsStore(DB())
+
+    async def run():
+        for rating in (5, 4, 4, 1):
+            await store.apply("p1", rating_increment(rating))
+        await store.apply("p1", rating_change(1, 3))
+        await store.apply("p1", rating_increment(5, -1))
+        await store.apply("p1", rating_change(4, 4))
+        return await store.get("p1")
+
+    stats = asyncio.run(run())
+    assert stats["total_reviews"] == 3
+    assert stats["average_rating"] == round(11 / 3, 2)
+    assert stats["rating_distribution"] == {5: 0, 4: 2, 3: 1, 2: 0, 1: 0}
+
+def test_unknown_product_has_empty_stats():
+    assert stats_response(None) == {
+        "average_rating": 0.0,
+        "total_reviews": 0,
+        "rating_distribution": {5: 0, 4: 0, 3: 0, 2: 0, 1: 0}
+    }
+
+def test_rating_change_is_noop_when_unchanged():
+    assert rating_change(3, 3) == {}
+    assert rating_change(2, 5) == {"rating_sum": 3, "stars.2": -1, "stars.5": 1}
+
+def test_sentiment_removal_only_for_scored_reviews():
+    assert sentiment_removal({"sentiment_scored_at": None, "sentiment_score": None}) == {}
+    removal = sentiment_removal({"sentiment_scored_at": "2026-01-01", "sentiment_score": 0.8})
+    assert removal == {"review_count": -1, "score_sum": -0.8, "positive": -1}
+
+def test_only_paid_or_delivered_orders_verify_a_purchase(mongo_db):
+    def order(user_id, **fields):
+        return {"user_id": user_id, "items": [{"product_id": "p1"}], "status": "pending", "payment_status": "pending", **fields}
+
+    asyncio.run(mongo_db.orders.insert_many([
+        order("placed"),
+        order("paid", payment_status="paid"),
+        order("delivered", status="delivered"),
+        order("refunded", payment_status="paid", status="cancelled"),
+    ]))
+    verified = {user: asyncio.run(is_verified_purchase(mongo_db, user, "p1"))
+                for user in ("placed", "paid", "delivered", "refunded")}
+    assert verified == {"placed": False, "paid": True, "delivered": True, "refunded": False}
@@ -0,0 +1,49 @@
+"""
+Unit tests for deduplicated, sharded helpful votes
+"""
+import asyncio
+
+from utils.review_votes import HelpfulVotes, shard_totals
+
+def helpful_counts(db):
+    reviews = asyncio.run(db.reviews.find({}, {"_id": 0}).to_list(None))
+    return {r["id"]: r.get("helpful_count") for r in reviews}
+
+def test_shard_totals_sum_per_review():
+    shards = [{"review_id": "a", "count": 3}, {"review_id": "b", "count": 1}, {"review_id": "a", "count": -1}]
+    assert shard_totals(shards) == {"a": 2, "b": 1}
+
+def test_each_user_counts_once_and_writes_spread_over_shards(mongo_db):
+    db = mongo_db
+    votes = HelpfulVotes(db, shards=8)
+
+    async def run():
+        await votes.ensure_indexes()
+        first = await asyncio.gather(*(votes.vote("r1", f"u{i % 300}") for i in range(600)))
+        await votes.unvote("r1", "u0")
+        return first, await votes.count("r1")
+
+    accepted, count = asyncio.run(run())
+    assert sum(accepted) == 300
+    assert count == 299
+    assert asyncio.run(db.review_vote_counters.count_documents({})) == 8
+
+def test_flush_writes_counts_behind_and_picks_up_later_votes(mongo_db):
+    db = mongo_db
+    asyncio.run(db.reviews.insert_many([{"id": "r1"}, {"id": "r2"}]))
+    votes = HelpfulVotes(db, shards=4)
+
+    async def run():
+        await votes.ensure_indexes()
+        for i in range(5):
+            await votes.vote("r1", f"u{i}")
+        await votes.vote("r2", "u1")
+        flushed = await votes.flush_once()
+        idle = await votes.flush_once()
+        await votes.vote("r1", "late")
+        await votes.flush_once()
+        return flushed, idle
+
+    flushed, idle = asyncio.run(run())
+    assert (flushed, idle) == (2, 0)
+    assert helpful_counts(db) == {"r1": 6, "r2": 1}
@@ -0,0 +1,107 @@
+"""
+Unit tests for time-bucketed sales rollups
+"""
+import asyncio
+from datetime import datetime
+
+from utils.sales_rollups import SalesRollups, order_increments, period_start, report_row
+
+def line(product_id, seller_id, price, quantity):
+    return {"product_id": product_id, "seller_id": seller_id, "price": price, "quantity": quantity}
+
+def seed(db, orders=(), cancelled=()):
+    async def run():
+        await db.products.insert_many([{"id": "p1", "category": "shoes"}, {"id": "p2", "category": "shoes"}])
+        for collection, documents in ((db.orders, orders), (db.seller_orders, cancelled)):
+            if documents:
+                await collection.insert_many([dict(d) for d in documents])
+    asyncio.run(run())
+    return db
+
+def bucket(db, dimension, key, period, start):
+    fields = {"_id": 0, "dimension": 0, "key": 0, "period": 0, "start": 0, "updated_at": 0}
+    return asyncio.run(db.sales_rollups.find_one(
+        {"dimension": dimension, "key": key, "period": period, "start": start}, fields
+    ))
+
+def test_period_start_rounds_to_day_week_and_month():
+    ts = datetime(2026, 10, 17, 15, 30)  # Saturday
+    assert period_start(ts, "day") == datetime(2026, 10, 17)
+    assert period_start(ts, "week") == datetime(2026, 10, 12)
+    assert period_start(ts, "month") == datetime(2026, 10, 1)
+
+def test_order_counts_once_per_key_and_lines_add_up():
+    items = [line("p1", "s1", 10.0, 2), line("p2", "s1", 2.5, 1)]
+    increments, meta = order_increments(items, datetime(2026, 10, 17, 9), {"p1": "shoes", "p2": "shoes"})
+    day = datetime(2026, 10, 17)
+    assert increments[("seller", "s1", "day", day)] == {"orders": 1, "units": 3, "revenue": 22.5}
+    assert increments[("category", "shoes", "day", day)]["orders"] == 1
+    assert increments[("product", "p1", "month", datetime(2026, 10, 1))] == {"orders": 1, "units": 2, "revenue": 20.0}
+    assert meta[("product", "p2", "week", datetime(2026, 10, 12))] == {"seller_id": "s1"}
+    # all, seller, category and two products, in three periods
+    assert len(increments) == 5 * 3
+
+def test_views_are_buffered_until_flushed(mongo_db):
+    db = seed(mongo_db)
+    rollups = SalesRollups(db)
+    product = {"id": "p1", "seller_id": "s1", "category": "shoes"}
+    for _ in range(3):
+        rollups.count_view(product, datetime(2026, 10, 17, 12))
+    assert asyncio.run(db.sales_rollups.count_documents({})) == 0
+
+    asyncio.run(rollups.flush_views())
+    assert bucket(db, "product", "p1", "day", datetime(2026, 10, 17)) == {"views": 3, "seller_id": "s1"}
+    assert rollups._views == {}
+
+def test_conversion_is_orders_per_view():
+    row = report_row({"key": "s1", "period": "day", "start": datetime(2026, 10, 17), "orders": 3, "views": 40, "revenue": 9.999})
+    assert row["conversion"] == 0.075
+    assert row["revenue"] == 10.0
+    assert report_row({"key": "s1", "period": "day", "start": datetime(2026, 10, 17)})["conversion"] == 0.0
+
+def test_backfill_rebuilds_order_metrics_and_keeps_views(mongo_db):
+    orders = [
+        {"id": "o1", "items": [line("p1", "s1", 10.0, 1), line("p2", "s2", 5.0, 2)], "created_at": datetime(2026, 10, 3)},
+        {"id": "o2", "items": [line("p1", "s1", 10.0, 3)], "created_at": datetime(2026, 10, 17)},
+    ]
+    db = seed(mongo_db, orders, cancelled=[{"order_id": "o1", "seller_id": "s2", "status": "cancelled"}])
+    rollups = SalesRollups(db)
+    month = datetime(2026, 10, 1)
+    asyncio.run(db.sales_rollups.insert_one({"dimension": "seller", "key": "s1", "period": "month", "start": month,
+                                             "orders": 99, "units": 99, "revenue": 999.0, "views": 50}))
+
+    stats = asyncio.run(rollups.backfill(datetime(2026, 10, 10)))
+    assert stats["orders"] == 2
+    assert bucket(db, "seller", "s1", "month", month) == {"orders": 2, "units": 4, "revenue": 40.0, "views": 50}
+    assert bucket(db, "seller", "s2", "month", month) is None
+    assert bucket(db, "all", "all", "month", month)["orders"] == 2
+
+def test_cancelling_one_seller_keeps_shared_category_order(mongo_db):
+    created = datetime(2026, 10, 17, 9)
+    order = {"id": "o1", "items": [line("p1", "s1", 10.0, 1), line("p2", "s2", 5.0, 1)], "created_at": created}
+    parts = [
+        {"order_id": "o1", "seller_id": "s1", "status": "cancelled", "items": [order["items"][0]], "created_at": created},
+        {"order_id": "o1", "seller_id": "s2", "status": "pending", "items": [order["items"][1]], "created_at": created},
+    ]
+    db = seed(mongo_db, [order], cancelled=parts)
+    rollups = SalesRollups(db)
+    asyncio.run(rollups.record_order(order))
+    asyncio.run(rollups.record_cancellation(parts[0]))
+
+    day = datetime(2026, 10, 17)
+    assert bucket(db, "category", "shoes", "day", day) == {"orders": 1, "units": 1, "revenue": 5.0}
+    assert bucket(db, "all", "all", "day", day)["orders"] == 1
+    assert bucket(db, "seller", "s1", "day", day) == {"orders": 0, "units": 0, "revenue": 0.0}
+
+def test_replayed_order_is_counted_once(mongo_db):
+    order = {"id": "o1", "items": [line("p1", "s1", 10.0, 2)], "created_at": datetime(2026, 10, 17, 9)}
+    db = seed(mongo_db, [order])
+    rollups = SalesRollups(db)
+    assert asyncio.run(rollups.record_order(order)) is True
+    assert asyncio.run(rollups.record_order(order)) is False
+    assert bucket(db, "seller", "s1", "day", datetime(2026, 10, 17)) == {"orders": 1, "units": 2, "revenue": 20.0}
+
+    # A backfill re-adds it and keeps it flagged, so a later sweeper replay still does nothing
+    asyncio.run(rollups.backfill(datetime(2026, 10, 1)))
+    assert asyncio.run(rollups.record_order(order)) is False
+    assert bucket(db, "seller", "s1", "day", datetime(2026, 10, 17)) == {"orders": 1, "units": 2, "revenue": 20.0}
@@ -0,0 +1,146 @@
+"""
+Unit tests for the in-process product search index
+"""
+import asyncio
+import fcntl
+from datetime import datetime
+
+from utils.search_index import ProductSearchIndex, catch_up, tokenize
+
+def product(product_id, title, description="", category="Electronics", price=10.0, tags=None, **extra):
+    doc = {
+        "id": product_id,
+        "title": title,
+        "description": description,
+        "category": category,
+        "price": price,
+        "tags": tags or [],
+        "is_published": True,
+        "is_approved": True,
+        "updated_at": datetime(2026, 1, 1),
+    }
+    doc.update(extra)
+    return doc
+
+def build_index():
+    index = ProductSearchIndex()
+    index.bulk_load([
+        product("p1", "Wireless Headphones", "Noise cancelling over-ear headphones", price=120),
+        product("p2", "Wired Headphones", "Budget headphones", price=15),
+        product("p3", "Bluetooth Speaker", "Portable wireless speaker", tags=["wireless"], price=60),
+        product("p4", "Ceramic Mug", "Coffee mug", category="Home & Kitchen", price=8),
+    ])
+    return index
+
+def test_tokenize_drops_stopwords():
+    assert tokenize("The Best Mug for Coffee!") == ["best", "mug", "coffee"]
+
+def test_bm25_ranks_title_matches_first():
+    result = build_index().search("wireless headphones")
+
+    assert [r["product_id"] for r in result["results"]][:2] == ["p1", "p2"]
+    assert result["total"] == 3
+
+def test_facets_and_filters():
+    index = build_index()
+    result = index.search("headphones speaker mug", max_price=100)
+
+    assert {r["product_id"] for r in result["results"]} == {"p2", "p3", "p4"}
+    assert result["facets"]["category"] == {"Electronics": 2, "Home & Kitchen": 1}
+
+    filtered = index.search("headphones speaker mug", category="Home & Kitchen")
+    assert [r["product_id"] for r in filtered["results"]] == ["p4"]
+    # Price facet ignores the price filter but honours the category filter
+    assert filtered["facets"]["price"] == {"0-25": 1}
+
+def test_incremental_update_and_removal():
+    index = build_index()
+
+    index.upsert(product("p4", "Travel Mug", "Insulated headphones case", category="Home & Kitchen"))
+    assert "p4" in [r["product_id"] for r in index.search("headphones")["results"]]
+
+    index.upsert(product("p1", "Wireless Headphones", is_approved=False))
+    assert "p1" not in [r["product_id"] for r in index.search("headphones")["results"]]
+
+    index.remove("p2")
+    assert [r["product_id"] for r in index.search("headphones")["results"]] == ["p4"]
+    assert len(index) == 2
+
+def test_compaction_preserves_results():
+    index = build_index()
+    for i in range(5):
+        index.upsert(product("p2", f"Wired Headphones v{i}", "Budget headphones", price=15))
+    before = index.search("headphones")
+    index.compact()
+
+    assert index.size == len(index) == 4
+    assert index.search("headphones")["results"] == before["results"]
+
+def test_autocomplete_prefers_frequent_terms():
+    index = build_index()
+    assert index.autocomplete("head") == ["headphones"]
+    assert index.autocomplete("blue w")[:1] == ["blue wireless"]
+    assert index.autocomplete("") == []
+
+def test_snapshot_roundtrip(tmp_path):
+    index = build_index()
+    index.remove("p3")
+    path = tmp_path / "search.snapshot"
+    index.save(path)
+
+    loaded = ProductSearchIndex.load(path)
+
+    assert len(loaded) == 3
+    assert loaded.watermark == datetime(2026, 1, 1)
+    assert loaded.search("headphones")["results"] == index.search("headphones")["results"]
+    loaded.upsert(product("p5", "Gaming Headphones"))
+    assert loaded.search("gaming")["results"][0]["product_id"] == "p5"
+
+def test_only_the_lock_holder_writes_snapshots(tmp_path):
+    path = tmp_path / "search.snapshot"
+    with open(tmp_path / "search.snapshot.lock", "a+") as other_worker:
+        fcntl.flock(other_worker, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        assert build_index().save(path) is False
+    assert not path.exists()
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["search.snapshot.lock"]
+
+def test_catch_up_skips_indexed_ties_and_starts_from_epoch_without_watermark(mongo_db):
+    asyncio.run(mongo_db.products.insert_many([
+        product("p1", "Wireless Headphones"),
+        product("p5", "Gaming Headphones"),
+        product("p6", "Desk Lamp", updated_at=datetime(2026, 2, 1)),
+    ]))
+    index = ProductSearchIndex()
+    index.upsert(product("p1", "Wireless Headphones"))
+    assert asyncio.run(catch_up(mongo_db, index)) == 2
+    assert len(index) == 3
+    assert asyncio.run(catch_up(mongo_db, index)) == 0
+
+    empty = ProductSearchIndex()
+    assert asyncio.run(catch_up(mongo_db, empty)) == 3
+
+def test_hidden_products_advance_the_watermark(mongo_db):
+    asyncio.run(mongo_db.products.insert_many([
+        product("p1", "Wireless Headphones"),
+        product("p2", "Draft Speaker", is_published=False, updated_at=datetime(2026, 2, 1)),
+    ]))
+    index = ProductSearchIndex()
+    assert asyncio.run(catch_up(mongo_db, index)) == 2
+    assert index.watermark == datetime(2026, 2, 1)
+    assert len(index) == 1
+    assert asyncio.run(catch_up(mongo_db, index)) == 0
+
+def test_search_paging_is_bounded_at_the_api():
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from modules import products
+
+    app = FastAPI()
+    app.include_router(products.router)
+    client = TestClient(app)
+    search = f"{products.router.prefix}/search"
+
+    for params in ({"skip": -1}, {"limit": 0}, {"limit": -5}, {"limit": 101}):
+        assert client.get(search, params={"q": "mug", **params}).status_code == 422
+    assert client.get(f"{search}/autocomplete", params={"prefix": "mu", "limit": -1}).status_code == 422
+    assert client.get(search, params={"q": "mug", "skip": 0, "limit": 100}).status_code == 200
@@ -0,0 +1,77 @@
+"""
+Unit tests for per-seller order projections
+"""
+import asyncio
+from datetime import datetime
+
+from utils.seller_orders import SellerOrderViews, can_transition, derive_order_status, seller_projections
+
+def order():
+    item = lambda pid, seller, price, qty: {
+        "product_id": pid, "title": pid, "price": price, "quantity": qty,
+        "image_url": None, "seller_id": seller, "seller_name": seller
+    }
+    return {
+        "id": "o1",
+        "order_number": "HM260101-0000001",
+        "user_id": "buyer",
+        "items": [item("a", "s1", 10.0, 2), item("b", "s2", 5.5, 1), item("c", "s1", 1.25, 4)],
+        "status": "pending",
+        "payment_status": "pending",
+        "shipping_address": {"city": "Kathmandu"},
+        "created_at": datetime(2026, 1, 1),
+    }
+
+def test_projection_per_seller_holds_only_their_lines():
+    projections = {p["seller_id"]: p for p in seller_projections(order())}
+    assert set(projections) == {"s1", "s2"}
+    assert [i["product_id"] for i in projections["s1"]["items"]] == ["a", "c"]
+    assert projections["s1"]["item_count"] == 6
+    assert projections["s1"]["subtotal"] == 25.0
+    assert projections["s2"]["id"] == "o1:s2"
+
+def test_status_transitions_only_move_forward():
+    assert can_transition("pending", "shipped")
+    assert can_transition("processing", "cancelled")
+    assert not can_transition("shipped", "processing")
+    assert not can_transition("shipped", "cancelled")
+    assert not can_transition("cancelled", "pending")
+    assert not can_transition("pending", "lost")
+
+def test_order_status_is_least_advanced_active_part():
+    assert derive_order_status(["shipped", "processing"]) == "processing"
+    assert derive_order_status(["delivered", "cancelled"]) == "delivered"
+    assert derive_order_status(["cancelled", "cancelled"]) == "cancelled"
+
+def test_counters_follow_new_orders_and_cancellations(mongo_db):
+    views = SellerOrderViews(mongo_db)
+    projections = seller_projections(order())
+
+    async def run():
+        await views.count_new(projections)
+        cancelled = {**projections[0], "status": "cancelled"}
+        await views.count_transition(cancelled, "pending")
+
+    asyncio.run(run())
+    stats = asyncio.run(mongo_db.seller_order_stats.find({}, {"_id": 0}).sort("seller_id").to_list(None))
+    s1, s2 = stats
+    assert s1["seller_id"] == "s1"
+    assert s1["orders"] == {"pending": 0, "cancelled": 1}
+    assert (s1["items_sold"], s1["revenue"]) == (0, 0.0)
+    assert s2["orders"] == {"pending": 1}
+    assert (s2["items_sold"], s2["revenue"]) == (1, 5.5)
+
+def test_rewriting_an_order_only_adds_missing_parts(mongo_db):
+    views = SellerOrderViews(mongo_db)
+    placed = order()
+
+    async def run():
+        await views.ensure_indexes()
+        await mongo_db.seller_orders.insert_one(seller_projections(placed)[0])
+        await views.write_for_order(placed)
+        await views.write_for_order(placed)
+        parts = await mongo_db.seller_orders.count_documents({"order_id": "o1"})
+        stats = await mongo_db.seller_order_stats.find({}, {"_id": 0}).to_list(None)
+        return parts, {s["seller_id"]: s["orders"]["pending"] for s in stats}
+
+    assert asyncio.run(run()) == (2, {"s2": 1})
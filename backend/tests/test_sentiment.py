@@ -0,0 +1,71 @@
+"""
+Unit tests for lexicon sentiment scoring and review aggregates
+"""
+import asyncio
+from datetime import datetime
+
+import numpy as np
+
+from utils.sentiment import ReviewSentimentPipeline, aggregate_increments, sentiment_analyzer, sentiment_label
+
+def test_polarity_and_negation():
+    scores = sentiment_analyzer.score_batch([
+        "Love it, works great",
+        "Arrived broken. Terrible quality",
+        "Not good at all",
+        "not bad",
+        "It is okay",
+        "",
+    ])
+
+    labels = [sentiment_label(s) for s in scores]
+    assert labels == ["positive", "negative", "negative", "positive", "neutral", "neutral"]
+    # "not bad" is weaker than plain praise
+    assert scores[3] < scores[0]
+    assert np.all(np.abs(scores) <= 1)
+
+def test_negation_stops_at_clause_boundary():
+    assert sentiment_analyzer.analyze("Did not work, total waste of money")["sentiment"] == "negative"
+    assert sentiment_analyzer.analyze("I don't like it")["sentiment"] == "negative"
+
+def test_batch_matches_single_scores():
+    texts = ["Very good product", "Cheaply made and flimsy", "Fast shipping, happy"]
+    batch = sentiment_analyzer.score_batch(texts)
+
+    assert [round(float(s), 6) for s in batch] == [
+        round(float(sentiment_analyzer.score_batch([t])[0]), 6) for t in texts
+    ]
+
+def test_aggregate_increments_per_product():
+    reviews = [{"product_id": "p1"}, {"product_id": "p1"}, {"product_id": "p2"}]
+    increments = aggregate_increments(reviews, np.array([0.9, -0.8, 0.0]))
+
+    assert increments["p1"]["review_count"] == 2
+    assert increments["p1"]["positive"] == increments["p1"]["negative"] == 1
+    assert abs(increments["p1"]["score_sum"] - 0.1) < 1e-9
+    assert increments["p2"] == {"review_count": 1, "score_sum": 0.0, "neutral": 1}
+
+def test_reviews_edited_after_the_claim_are_not_counted(mongo_db):
+    pipeline = ReviewSentimentPipeline(mongo_db)
+    asyncio.run(mongo_db.reviews.insert_many([
+        {"id": f"r{i}", "product_id": "p1", "title": "Great", "comment": "love it", "sentiment_batch": None,
+         "created_at": datetime(2026, 1, 1, 0, i)}
+        for i in range(3)
+    ]))
+    claim_batch = pipeline.claim_batch
+
+    async def claim_then_edit():
+        reviews = await claim_batch()
+        # The author edits r1 while the batch is being scored
+        await mongo_db.reviews.update_one({"id": "r1"}, {"$set": {"comment": "broke", "sentiment_batch": None}})
+        return reviews
+
+    pipeline.claim_batch = claim_then_edit
+    assert asyncio.run(pipeline.run_once()) == 3
+    aggregate = asyncio.run(mongo_db.review_sentiment.find_one({"product_id": "p1"}))
+    edited = asyncio.run(mongo_db.reviews.find_one({"id": "r1"}))
+    assert aggregate["review_count"] == 2
+    assert edited.get("sentiment_scored_at") is None
+    # One bulk write for the batch; the only update_one is the edit above
+    assert mongo_db.reviews.calls["bulk_write"] == 1
+    assert mongo_db.reviews.calls["update_one"] == 1
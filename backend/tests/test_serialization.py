@@ -0,0 +1,47 @@
+"""
+The orjson fast path must emit the same JSON as response_model validation
+"""
+import json
+from datetime import datetime
+
+from fastapi.encoders import jsonable_encoder
+
+from models.product import ProductInDB, ProductResponse
+from utils.serialization import PRODUCT_RESPONSE_PROJECTION, json_response, product_response, product_responses
+
+def stored_product(**extra):
+    doc = ProductInDB(
+        title="Steel Kettle",
+        description="1.7L kettle",
+        category="Home & Kitchen",
+        price=29.99,
+        quantity=5,
+        images=[{"url": "https://cdn/k.jpg", "filename": "k.jpg", "is_primary": True}],
+        tags=["kettle"],
+        seller_id="s1",
+        seller_name="Seller",
+        created_at=datetime(2026, 1, 2, 3, 4, 5, 678000),
+        updated_at=datetime(2026, 1, 2, 3, 4, 5),
+    ).dict()
+    doc.update(extra)
+    return doc
+
+def project(doc):
+    return {k: v for k, v in doc.items() if k in PRODUCT_RESPONSE_PROJECTION}
+
+def test_projection_matches_response_fields():
+    assert set(PRODUCT_RESPONSE_PROJECTION) - {"_id"} == set(ProductResponse.model_fields)
+
+def test_fast_path_matches_pydantic_output():
+    doc = stored_product()
+    expected = jsonable_encoder(ProductResponse(**doc))
+    body = json.loads(json_response(product_response(project(doc))).body)
+    assert body == expected
+
+def test_missing_optional_fields_get_defaults():
+    doc = project(stored_product())
+    for field in ("sku", "amazon_asin", "views", "sales", "tags"):
+        doc.pop(field)
+    body = json.loads(json_response(product_responses([doc])).body)[0]
+    assert set(body) == set(ProductResponse.model_fields)
+    assert body["views"] == 0 and body["tags"] == [] and body["sku"] is None
@@ -0,0 +1,134 @@
+"""
+Unit tests for sharded sitemap and JSON-LD feed generation
+"""
+import asyncio
+import gzip
+import json
+from datetime import datetime, timedelta
+from xml.etree import ElementTree
+
+import pytest
+
+from utils.database import MongoLease
+from utils.sitemap import (
+    SitemapBusyError,
+    SitemapGenerator,
+    key_range_query,
+    product_jsonld,
+    shard_for,
+    write_shards
+)
+
+def product(i, **fields):
+    created = datetime(2026, 1, 1) + timedelta(minutes=i)
+    return {"id": f"p{i:04d}", "title": f"Lamp & Shade {i}", "description": "Warm light", "category": "Home",
+            "price": 12.5, "quantity": i % 3, "sku": f"SKU-{i}", "images": [{"url": f"https://cdn/{i}.jpg"}],
+            "seller_name": "Shop", "is_published": True, "is_approved": True,
+            "created_at": created, "updated_at": created, **fields}
+
+async def stream(documents):
+    for document in documents:
+        yield document
+
+def sitemap_locs(path):
+    with gzip.open(path, "rt") as f:
+        root = ElementTree.fromstring(f.read())
+    return [el.text for el in root.iter("{http://www.sitemaps.org/schemas/sitemap/0.9}loc")]
+
+def test_jsonld_describes_product_and_offer():
+    data = product_jsonld(product(1))
+    assert data["@type"] == "Product"
+    assert data["name"] == "Lamp & Shade 1"
+    assert data["image"] == ["https://cdn/1.jpg"]
+    assert data["offers"]["price"] == "12.50"
+    assert data["offers"]["availability"] == "https://schema.org/InStock"
+    assert product_jsonld(product(3))["offers"]["availability"] == "https://schema.org/OutOfStock"
+
+def seed(db, documents):
+    asyncio.run(db.products.insert_many([dict(d) for d in documents]))
+
+def test_key_range_and_shard_lookup(mongo_db):
+    seed(mongo_db, [
+        product(0, id="a", created_at=datetime(2026, 1, 1)),
+        product(1, id="b", created_at=datetime(2026, 1, 1)),
+        product(2, id="c", created_at=datetime(2026, 1, 2)),
+    ])
+    query = key_range_query((datetime(2026, 1, 1), "b"), (datetime(2026, 1, 2), "c"))
+    found = asyncio.run(mongo_db.products.find(query).to_list(None))
+    assert [p["id"] for p in found] == ["b"]
+    starts = [(datetime(2026, 1, 1), "a"), (datetime(2026, 1, 5), "a")]
+    assert shard_for(starts, (datetime(2025, 1, 1), "z")) == 0
+    assert shard_for(starts, (datetime(2026, 1, 5), "a")) == 1
+
+def test_write_shards_splits_and_escapes(tmp_path):
+    shards = asyncio.run(write_shards(stream([product(i) for i in range(25)]), tmp_path, 1, shard_size=10))
+    assert [s["count"] for s in shards] == [10, 10, 5]
+    assert [s["id"] for s in shards] == [1, 2, 3]
+    assert len(sitemap_locs(tmp_path / "sitemap-00002.xml.gz")) == 10
+    with gzip.open(tmp_path / "products-00003.jsonl.gz", "rt") as f:
+        lines = [json.loads(line) for line in f]
+    assert [line["sku"] for line in lines] == [f"SKU-{i}" for i in range(20, 25)]
+    assert not list(tmp_path.glob("*.tmp"))
+
+def test_refresh_rewrites_only_touched_shards(tmp_path, mongo_db):
+    seed(mongo_db, [product(i) for i in range(30)])
+    generator = SitemapGenerator(mongo_db, tmp_path, shard_size=10)
+    stats = asyncio.run(generator.generate_full())
+    assert stats == {"mode": "full", "shards": 3, "products": 30}
+
+    manifest = generator.load_manifest()
+    later = datetime.fromisoformat(manifest["watermark"]) + timedelta(hours=1)
+    asyncio.run(mongo_db.products.update_one({"id": "p0015"}, {"$set": {"is_published": False, "updated_at": later}}))
+    seed(mongo_db, [product(i, updated_at=later) for i in range(30, 35)])
+    untouched = (tmp_path / "sitemap-00001.xml.gz").stat().st_mtime_ns
+
+    stats = asyncio.run(generator.refresh())
+    assert stats["shards"] == 2
+    manifest = generator.load_manifest()
+    assert [s["count"] for s in manifest["shards"]] == [10, 9, 10, 5]
+    assert (tmp_path / "sitemap-00001.xml.gz").stat().st_mtime_ns == untouched
+    assert not (tmp_path / "sitemap-00002.xml.gz").exists()
+
+    locs = [loc for s in manifest["shards"] for loc in sitemap_locs(tmp_path / f"sitemap-{s['id']:05d}.xml.gz")]
+    assert len(locs) == len(set(locs)) == 34
+    assert not any(loc.endswith("/p0015") for loc in locs)
+    index = ElementTree.parse(tmp_path / "sitemap.xml").getroot()
+    assert len(list(index)) == 4
+    feed = json.loads((tmp_path / "feed.json").read_text())
+    assert feed["products"] == 34
+
+def test_only_published_files_are_served(tmp_path, mongo_db):
+    generator = SitemapGenerator(mongo_db, tmp_path)
+    asyncio.run(generator.generate_full())
+    assert generator.file_path("sitemap.xml") is not None
+    assert generator.file_path("sitemap-00001.xml.gz") is not None
+    assert generator.file_path("manifest.json") is None
+    assert generator.file_path("../server.py") is None
+
+def test_one_generator_at_a_time_across_processes(tmp_path, mongo_db):
+    seed(mongo_db, [product(i) for i in range(3)])
+    other = MongoLease(mongo_db, "sitemap")
+    generator = SitemapGenerator(mongo_db, tmp_path)
+
+    async def run():
+        assert await other.acquire()
+        skipped = await generator.refresh()
+        with pytest.raises(SitemapBusyError):
+            await generator.generate_full()
+        await other.release()
+        return skipped, await generator.generate_full()
+
+    skipped, stats = asyncio.run(run())
+    assert skipped == {"mode": "skipped", "shards": 0, "products": 0}
+    assert stats["products"] == 3
+    assert asyncio.run(mongo_db.job_leases.count_documents({})) == 0
+
+def test_lease_lapses_after_ttl(mongo_db):
+    crashed = MongoLease(mongo_db, "sitemap", ttl=-1)
+    successor = MongoLease(mongo_db, "sitemap")
+
+    async def run():
+        assert await crashed.acquire()
+        return await successor.acquire(), await crashed.acquire()
+
+    assert asyncio.run(run()) == (True, False)
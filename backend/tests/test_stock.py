@@ -0,0 +1,281 @@
+"""
+Stock reservation tests against the in-memory mongo_db fixture
+Every operation yields to the event loop first, so concurrent buyers interleave
+the same way they would against MongoDB's per-document atomic updates.
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from pymongo.errors import OperationFailure
+
+from utils.stock import OutOfStockError, ReservationError, StockReservations, merge_quantities
+
+def product(product_id, quantity):
+    return {"id": product_id, "quantity": quantity, "sales": 0, "is_published": True, "is_approved": True}
+
+def seed(db, *products):
+    asyncio.run(db.products.insert_many([dict(p) for p in products]))
+    return db
+
+def stock(db, product_id):
+    return asyncio.run(db.products.find_one({"id": product_id}, {"_id": 0}))
+
+def reservation_statuses(db):
+    return [r["status"] for r in asyncio.run(db.stock_reservations.find({}).to_list(None))]
+
+async def buy(reservations, user_id, items):
+    try:
+        return await reservations.reserve(user_id, items)
+    except OutOfStockError:
+        return None
+
+def test_merge_quantities_combines_and_orders_lines():
+    merged = merge_quantities([
+        {"product_id": "b", "quantity": 1},
+        {"product_id": "a", "quantity": 2},
+        {"product_id": "b", "quantity": 3},
+    ])
+    assert [(m["product_id"], m["quantity"]) for m in merged] == [("a", 2), ("b", 4)]
+
+def test_thousand_buyers_for_last_ten_units_never_oversell(mongo_db):
+    db = seed(mongo_db, product("hot", 10))
+    reservations = StockReservations(db)
+
+    async def run():
+        return await asyncio.gather(*(
+            buy(reservations, f"u{i}", [{"product_id": "hot", "quantity": 1}]) for i in range(1000)
+        ))
+
+    results = asyncio.run(run())
+    assert sum(r is not None for r in results) == 10
+    assert stock(db, "hot")["quantity"] == 0
+    assert len(stock(db, "hot")["stock_holds"]) == 10
+
+def test_multi_item_reservation_is_all_or_nothing(mongo_db):
+    db = seed(mongo_db, product("a", 10), product("b", 5))
+    reservations = StockReservations(db)
+    items = [{"product_id": "a", "quantity": 1}, {"product_id": "b", "quantity": 1}]
+
+    async def run():
+        return await asyncio.gather(*(buy(reservations, f"u{i}", items) for i in range(100)))
+
+    results = asyncio.run(run())
+    assert sum(r is not None for r in results) == 5
+    assert stock(db, "a")["quantity"] == 5
+    assert stock(db, "b")["quantity"] == 0
+    assert len(stock(db, "a")["stock_holds"]) == 5
+
+def test_commit_consumes_holds_and_rejects_reuse(mongo_db):
+    db = seed(mongo_db, product("a", 3))
+    reservations = StockReservations(db)
+
+    async def write_order(reservation, session):
+        order = {"id": "o1", "reservation_id": reservation["id"]}
+        await db.orders.insert_one(order)
+        return order
+
+    async def run():
+        held = await reservations.reserve("u1", [{"product_id": "a", "quantity": 2}])
+        order = await reservations.commit(held["id"], "u1", write_order)
+        assert order["id"] == "o1"
+        with pytest.raises(ReservationError):
+            await reservations.commit(held["id"], "u1", write_order)
+
+    asyncio.run(run())
+    assert stock(db, "a")["quantity"] == 1
+    assert stock(db, "a")["sales"] == 2
+    assert stock(db, "a")["stock_holds"] == []
+    assert reservation_statuses(db) == ["committed"]
+
+def test_sweeper_releases_expired_holds(mongo_db):
+    db = seed(mongo_db, product("a", 3))
+    reservations = StockReservations(db, hold_minutes=-1)
+
+    async def run():
+        held = await reservations.reserve("u1", [{"product_id": "a", "quantity": 3}])
+        assert (await db.products.find_one({"id": "a"}))["quantity"] == 0
+        assert await reservations.sweep_once() == 1
+        with pytest.raises(ReservationError):
+            await reservations.commit(held["id"], "u1", None)
+
+    asyncio.run(run())
+    assert stock(db, "a")["quantity"] == 3
+    assert stock(db, "a")["stock_holds"] == []
+
+def test_sweeper_finishes_commit_interrupted_after_order_insert(mongo_db):
+    db = seed(mongo_db, product("a", 3))
+    reservations = StockReservations(db)
+
+    async def run():
+        held = await reservations.reserve("u1", [{"product_id": "a", "quantity": 1}])
+        # Simulate a crash between the order insert and consuming the holds
+        await db.orders.insert_one({"id": "o1", "reservation_id": held["id"]})
+        await db.stock_reservations.update_one(
+            {"id": held["id"]},
+            {"$set": {"status": "committing", "updated_at": datetime.utcnow() - timedelta(hours=1)}}
+        )
+        assert await reservations.sweep_once() == 1
+
+    asyncio.run(run())
+    assert stock(db, "a")["quantity"] == 2
+    assert stock(db, "a")["sales"] == 1
+    assert reservation_statuses(db) == ["committed"]
+
+def test_non_positive_quantities_are_rejected_before_any_hold(mongo_db):
+    db = seed(mongo_db, product("a", 3))
+    reservations = StockReservations(db)
+
+    async def run():
+        with pytest.raises(ValueError):
+            await reservations.reserve("u1", [{"product_id": "a", "quantity": -5}])
+
+    asyncio.run(run())
+    assert stock(db, "a")["quantity"] == 3
+    assert reservation_statuses(db) == []
+
+def test_failed_commit_after_order_insert_is_left_for_the_sweeper(mongo_db):
+    db = seed(mongo_db, product("a", 3))
+    recovered = []
+
+    async def on_recovered(order):
+        recovered.append(order["id"])
+
+    reservations = StockReservations(db, on_recovered=on_recovered)
+
+    async def write_order(reservation, session):
+        await db.orders.insert_one({"id": "o1", "reservation_id": reservation["id"]})
+        raise ConnectionError("lost the primary")
+
+    async def run():
+        held = await reservations.reserve("u1", [{"product_id": "a", "quantity": 1}])
+        with pytest.raises(ConnectionError):
+            await reservations.commit(held["id"], "u1", write_order)
+        assert not await reservations.release(held["id"], "u1")
+        await db.stock_reservations.update_one(
+            {"id": held["id"]}, {"$set": {"updated_at": datetime.utcnow() - timedelta(hours=1)}}
+        )
+        assert await reservations.sweep_once() == 1
+
+    asyncio.run(run())
+    assert stock(db, "a")["quantity"] == 2
+    assert stock(db, "a")["sales"] == 1
+    assert reservation_statuses(db) == ["committed"]
+    assert recovered == ["o1"]
+
+def test_selling_out_and_restocking_bump_updated_at(mongo_db):
+    before = datetime(2026, 1, 1)
+    db = seed(mongo_db, {**product("a", 3), "updated_at": before})
+    reservations = StockReservations(db)
+
+    first = asyncio.run(reservations.reserve("u1", [{"product_id": "a", "quantity": 1}]))
+    assert stock(db, "a")["updated_at"] == before
+    second = asyncio.run(reservations.reserve("u2", [{"product_id": "a", "quantity": 2}]))
+    sold_out = stock(db, "a")
+    assert sold_out["quantity"] == 0 and sold_out["updated_at"] > before
+
+    asyncio.run(db.products.update_one({"id": "a"}, {"$set": {"updated_at": before}}))
+    asyncio.run(reservations.release(second["id"], "u2"))
+    restocked = stock(db, "a")
+    assert restocked["quantity"] == 2 and restocked["updated_at"] > before
+    asyncio.run(db.products.update_one({"id": "a"}, {"$set": {"updated_at": before}}))
+    asyncio.run(reservations.release(first["id"], "u1"))
+    assert stock(db, "a")["updated_at"] == before
+
+class SnapshotSession:
+    """Transaction stub: abort restores the collections as they were when the session started"""
+
+    def __init__(self, db, names):
+        self.db = db
+        self.names = names
+        self.in_transaction = False
+        self.started = self.commits = self.aborts = 0
+
+    async def snapshot(self):
+        self.saved = {name: await self.db[name].find({}, {"_id": 0}).to_list(None) for name in self.names}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def start_transaction(self):
+        self.started += 1
+        self.in_transaction = True
+
+    async def commit_transaction(self):
+        self.commits += 1
+        self.in_transaction = False
+
+    async def abort_transaction(self):
+        self.aborts += 1
+        self.in_transaction = False
+        for name, documents in self.saved.items():
+            await self.db[name].delete_many({})
+            if documents:
+                await self.db[name].insert_many([dict(d) for d in documents])
+
+def test_transaction_commit_is_rerun_after_a_write_conflict(mongo_db):
+    db = seed(mongo_db, product("hot", 3))
+    session = SnapshotSession(db, ["products", "orders", "stock_reservations"])
+
+    async def start_session():
+        await session.snapshot()
+        return session
+
+    db.client = type("Client", (), {"start_session": staticmethod(start_session)})()
+    products = db.products
+    update_one = products.update_one
+    conflicts = []
+
+    async def conflicting_update_one(filter, update, **kwargs):
+        # Another checkout for the same product committed first
+        if kwargs.get("session") and not conflicts:
+            conflicts.append(filter["id"])
+            raise OperationFailure("WriteConflict", 112, {"errorLabels": ["TransientTransactionError"]})
+        return await update_one(filter, update, **kwargs)
+
+    products.update_one = conflicting_update_one
+    reservations = StockReservations(db)
+    reservations.transactions = True
+
+    async def write_order(reservation, session):
+        order = {"id": f"o{session.started}", "reservation_id": reservation["id"]}
+        await db.orders.insert_one(dict(order), session=session)
+        return order
+
+    async def run():
+        held = await reservations.reserve("u1", [{"product_id": "hot", "quantity": 1}])
+        return await reservations.commit(held["id"], "u1", write_order)
+
+    # mongomock refuses session= unless told to ignore it
+    mongomock = pytest.importorskip("mongomock")
+    mongomock.ignore_feature("session")
+    try:
+        order = asyncio.run(run())
+    finally:
+        mongomock.warn_on_feature("session")
+    assert conflicts == ["hot"]
+    assert (session.started, session.aborts, session.commits) == (2, 1, 1)
+    assert order["id"] == "o2"
+    assert [o["id"] for o in asyncio.run(db.orders.find({}).to_list(None))] == ["o2"]
+    assert stock(db, "hot")["quantity"] == 2
+    assert stock(db, "hot")["sales"] == 1
+    assert stock(db, "hot")["stock_holds"] == []
+    assert reservation_statuses(db) == ["committed"]
+
+def test_cancelled_order_restock_bumps_updated_at_when_back_in_stock(monkeypatch, mongo_db):
+    from modules import orders
+
+    before = datetime(2026, 1, 1)
+    db = seed(mongo_db, {**product("out", 0), "sales": 2, "updated_at": before},
+              {**product("left", 1), "sales": 2, "updated_at": before})
+    monkeypatch.setattr(orders, "db", db)
+
+    asyncio.run(orders.restock([{"product_id": "out", "quantity": 2}, {"product_id": "left", "quantity": 2}]))
+
+    back = stock(db, "out")
+    assert back["quantity"] == 2 and back["sales"] == 0 and back["updated_at"] > before
+    still_listed = stock(db, "left")
+    assert still_listed["quantity"] == 3 and still_listed["updated_at"] == before
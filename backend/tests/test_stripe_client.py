@@ -0,0 +1,110 @@
+"""
+Unit tests for the async Stripe client against a local HTTP stand-in
+"""
+import asyncio
+from urllib.parse import parse_qs
+
+import httpx
+import pytest
+
+import utils.stripe_client as stripe_client
+from utils.metrics import LatencyHistogram
+from utils.stripe_client import AsyncStripeClient, StripeAPIError, encode_form
+from utils.payout_queue import available_balance, balances_by_currency
+
+class StripeStandIn:
+    """Local Stripe HTTP stand-in that fails the first `failures` payout calls"""
+
+    def __init__(self, failures=0, failure_status=429):
+        self.failures = failures
+        self.failure_status = failure_status
+        self.requests = []
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        if request.url.path == "/v1/payouts" and request.method == "POST":
+            if self.failures > 0:
+                self.failures -= 1
+                return httpx.Response(self.failure_status, json={"error": {"message": "slow down"}})
+            form = parse_qs(request.content.decode())
+            return httpx.Response(200, json={
+                "id": "po_123",
+                "amount": int(form["amount"][0]),
+                "currency": form["currency"][0],
+                "status": "pending",
+                "arrival_date": 1700000000,
+                "created": 1699990000
+            })
+        if request.url.path == "/v1/balance":
+            return httpx.Response(200, json={
+                "available": [{"amount": 12345, "currency": "usd"}, {"amount": 2000, "currency": "eur"}],
+                "pending": [{"amount": 500, "currency": "usd"}]
+            })
+        return httpx.Response(400, json={"error": {"message": "bad request"}})
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(stripe_client, "backoff_delay", lambda attempt: 0)
+
+def make_client(stand_in, **kwargs):
+    return AsyncStripeClient(api_key="sk_test_local", transport=httpx.MockTransport(stand_in.handler), **kwargs)
+
+def test_encode_form_nested():
+    encoded = encode_form({"capabilities": {"transfers": {"requested": True}}, "skip": None, "n": 3})
+    assert encoded == [("capabilities[transfers][requested]", "true"), ("n", "3")]
+
+def test_payout_retries_with_same_idempotency_key():
+    stand_in = StripeStandIn(failures=2)
+    client = make_client(stand_in)
+
+    payout = asyncio.run(client.create_payout("acct_1", 12.5, idempotency_key="settle-1"))
+
+    assert payout["id"] == "po_123"
+    assert payout["amount"] == 12.5
+    assert len(stand_in.requests) == 3
+    assert {r.headers["Idempotency-Key"] for r in stand_in.requests} == {"settle-1"}
+    assert all(r.headers["Stripe-Account"] == "acct_1" for r in stand_in.requests)
+    assert client.metrics()["POST /v1/payouts"]["count"] == 3
+    assert client.metrics()["POST /v1/payouts"]["errors"] == 2
+
+def test_client_error_is_not_retried():
+    stand_in = StripeStandIn()
+    client = make_client(stand_in)
+
+    with pytest.raises(StripeAPIError) as exc:
+        asyncio.run(client.get_account_status("acct_1"))
+
+    assert exc.value.status_code == 400
+    assert len(stand_in.requests) == 1
+
+def test_retries_exhausted_raise():
+    stand_in = StripeStandIn(failures=10, failure_status=503)
+    client = make_client(stand_in, max_retries=2)
+
+    with pytest.raises(StripeAPIError):
+        asyncio.run(client.create_payout("acct_1", 1.0))
+
+    assert len(stand_in.requests) == 3
+
+def test_balance_is_per_currency_in_major_units():
+    client = make_client(StripeStandIn())
+    balance = asyncio.run(client.get_account_balance("acct_1"))
+    assert balance == {
+        "available": [{"amount": 123.45, "currency": "usd"}, {"amount": 20.0, "currency": "eur"}],
+        "pending": [{"amount": 5.0, "currency": "usd"}]
+    }
+    # A EUR payout sees the EUR funds even though USD comes first
+    assert available_balance(balance, "EUR") == 20.0
+    assert balances_by_currency(balance) == [
+        {"currency": "usd", "available": 123.45, "pending": 5.0},
+        {"currency": "eur", "available": 20.0, "pending": 0.0}
+    ]
+
+def test_latency_histogram_percentiles():
+    histogram = LatencyHistogram()
+    for ms in [1] * 98 + [300, 9000]:
+        histogram.observe(ms)
+
+    assert histogram.percentile(50) == 5
+    assert histogram.percentile(99) == 500
+    assert histogram.percentile(100) == 10000
@@ -0,0 +1,177 @@
+"""
+Unit tests for the memory-mapped product vector index
+"""
+from datetime import datetime
+
+import numpy as np
+
+from utils.vector_index import ProductVectorIndex, acquire_writer_lock
+
+def product(product_id, title, description="", category="Electronics", price=10.0, tags=None, **extra):
+    doc = {
+        "id": product_id,
+        "title": title,
+        "description": description,
+        "category": category,
+        "price": price,
+        "tags": tags or [],
+        "is_published": True,
+        "is_approved": True,
+        "updated_at": datetime(2026, 1, 1),
+    }
+    doc.update(extra)
+    return doc
+
+CATALOG = [
+    product("p1", "Wireless Headphones", "Noise cancelling over-ear headphones", price=120),
+    product("p2", "Bluetooth Speaker", "Portable wireless speaker with bass", price=60),
+    product("p3", "Ceramic Coffee Mug", "Dishwasher safe mug for coffee and tea", category="Home & Kitchen", price=8),
+    product("p4", "Running Shoes", "Lightweight trainers for road running", category="Sports", price=85),
+]
+
+def build_index(**kwargs):
+    index = ProductVectorIndex(in_memory=True, **kwargs)
+    index.bulk_load(CATALOG)
+    return index
+
+def test_semantic_ranking_tolerates_partial_words():
+    index = build_index()
+
+    assert index.search("headphone noise")[0]["product_id"] == "p1"
+    assert index.search("coffee cups")[0]["product_id"] == "p3"
+    assert index.search("runner trainers")[0]["product_id"] == "p4"
+
+def test_filters_and_hidden_products():
+    index = build_index()
+
+    assert [r["product_id"] for r in index.search("wireless", category="Electronics", max_price=100)] == ["p2"]
+    assert index.search("wireless", category="Garden") == []
+
+    index.upsert(product("p2", "Bluetooth Speaker", is_published=False))
+    index.remove("p1")
+    assert "p1" not in [r["product_id"] for r in index.search("headphones")]
+    assert "p2" not in [r["product_id"] for r in index.search("speaker")]
+    assert len(index) == 2
+    index.upsert(product("p5", "Garden Hose", is_approved=False, updated_at=datetime(2026, 3, 1)))
+    assert index.watermark == datetime(2026, 3, 1)
+
+def test_batch_matches_single_queries():
+    index = build_index()
+    queries = ["wireless audio", "mug", "shoes for running"]
+
+    batch = index.search_batch(queries, k=2)
+
+    assert batch == [index.search(q, k=2) for q in queries]
+    assert all(len(results) == 2 for results in batch)
+
+def test_ivf_finds_the_same_neighbours():
+    index = build_index()
+    for i in range(300):
+        index.upsert(product(f"g{i}", f"Garden hose {i}", "Flexible hose", category="Garden", price=20))
+    exact = index.search("noise cancelling headphones", k=3)
+
+    index.build_ivf(nlist=4)
+
+    assert index.search("noise cancelling headphones", k=3, nprobe=4) == exact
+    index.upsert(product("p5", "Studio Headphones", "Closed-back noise cancelling headphones"))
+    assert "p5" in [r["product_id"] for r in index.search("noise cancelling headphones", k=3, nprobe=4)]
+
+def test_memmap_roundtrip(tmp_path):
+    index = ProductVectorIndex(tmp_path)
+    index.bulk_load(CATALOG)
+    index.remove("p4")
+    index.save()
+
+    loaded = ProductVectorIndex.load(tmp_path)
+
+    assert isinstance(loaded.vectors, np.memmap)
+    assert len(loaded) == 3
+    assert loaded.watermark == datetime(2026, 1, 1)
+    assert loaded.search("wireless speaker") == index.search("wireless speaker")
+    loaded.upsert(product("p6", "Gaming Mouse", "RGB mouse"))
+    assert loaded.search("gaming mouse")[0]["product_id"] == "p6"
+
+def test_metadata_is_stored_without_pickle(tmp_path):
+    index = ProductVectorIndex(tmp_path)
+    index.bulk_load(CATALOG)
+    index.build_ivf(nlist=2)
+    index.save()
+
+    with np.load(index.metadata_path, allow_pickle=False) as data:
+        assert set(data.files) == {"meta", "alive", "prices", "categories", "df", "centroids"}
+    loaded = ProductVectorIndex.load(tmp_path)
+    assert np.array_equal(loaded.ivf.centroids, index.ivf.centroids)
+    assert loaded.search("wireless speaker", nprobe=2) == index.search("wireless speaker", nprobe=2)
+
+def test_ivf_keeps_one_entry_per_row():
+    index = build_index()
+    index.build_ivf(nlist=2)
+    for i in range(20):
+        index.upsert(product("p1", f"Variant {i} {'headphones' if i % 2 else 'garden hose'}"))
+    index.remove("p2")
+
+    entries = [n for entries in index.ivf.lists for n in entries]
+    assert sorted(entries) == sorted(index.docno.values())
+
+def test_read_only_index_never_writes_the_shared_files(tmp_path):
+    writer = ProductVectorIndex(tmp_path)
+    writer.bulk_load(CATALOG)
+    writer.save()
+    matrix, metadata = writer.matrix_path.read_bytes(), writer.metadata_path.read_bytes()
+
+    reader = ProductVectorIndex.load(tmp_path, writable=False)
+    reader.upsert(product("p1", "Gaming Mouse", "RGB mouse"))
+    for i in range(2100):
+        reader.upsert(product(f"n{i}", f"Garden hose {i}"))
+    reader.save()
+
+    # Growing past the mapped file keeps only the overflow rows in private memory
+    assert isinstance(reader.vectors.mapped, np.memmap)
+    assert len(reader.vectors.extra) == reader.capacity - writer.capacity
+    assert reader.search("gaming mouse")[0]["product_id"] == "p1"
+    assert reader.search("garden hose 1500", k=1)[0]["product_id"] == "n1500"
+    assert reader.search("garden hose 2099", k=1)[0]["product_id"] == "n2099"
+    assert writer.matrix_path.read_bytes() == matrix
+    assert writer.metadata_path.read_bytes() == metadata
+    assert writer.search("wireless headphones")[0]["product_id"] == "p1"
+
+def test_one_writer_per_directory(tmp_path):
+    first = acquire_writer_lock(tmp_path)
+    assert first is not None
+    assert acquire_writer_lock(tmp_path) is None
+    first.close()
+    second = acquire_writer_lock(tmp_path)
+    assert second is not None
+    second.close()
+
+def test_republished_products_reuse_their_row():
+    index = build_index()
+    for _ in range(5):
+        index.upsert(product("p1", "Wireless Headphones", is_published=False))
+        index.upsert(product("p1", "Wireless Headphones", "Noise cancelling over-ear headphones"))
+
+    assert index.size == len(CATALOG)
+    assert index.search("headphone noise")[0]["product_id"] == "p1"
+    assert index.embedder.docs == len(CATALOG)
+
+def test_save_compacts_removed_rows_into_a_new_matrix(tmp_path):
+    index = ProductVectorIndex(tmp_path)
+    index.bulk_load(CATALOG)
+    for i in range(1400):
+        index.upsert(product(f"g{i}", f"Garden hose {i}", "Flexible hose", category="Garden", price=20))
+    index.build_ivf(nlist=4)
+    index.save()
+    first_matrix = index.matrix_path
+    for i in range(1000):
+        index.remove(f"g{i}")
+    expected = index.search("noise cancelling headphones", k=3, nprobe=4)
+
+    index.save()
+
+    assert index.size == len(index) == len(CATALOG) + 400
+    assert not first_matrix.exists() and index.matrix_path.exists()
+    assert sorted(n for entries in index.ivf.lists for n in entries) == list(range(index.size))
+    assert index.search("noise cancelling headphones", k=3, nprobe=4) == expected
+    loaded = ProductVectorIndex.load(tmp_path)
+    assert loaded.size == index.size
+    assert loaded.search("garden hose 1200", k=1, nprobe=4) == index.search("garden hose 1200", k=1, nprobe=4)
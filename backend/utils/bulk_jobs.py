@@ -0,0 +1,163 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from pymongo import ASCENDING, ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+BULK_MAX_IDS = int(os.getenv("BULK_MAX_IDS", "10000"))
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "500"))
+BULK_POLL_SECONDS = float(os.getenv("BULK_POLL_SECONDS", "2"))
+BULK_STALE_MINUTES = int(os.getenv("BULK_STALE_MINUTES", "10"))
+# A running job touches updated_at this often, so a slow batch is not taken for a crashed worker
+BULK_HEARTBEAT_SECONDS = float(os.getenv("BULK_HEARTBEAT_SECONDS", "60"))
+# Errors stored on the job document; the rest are only counted
+MAX_JOB_ERRORS = 500
+
+# A handler processes one batch of product ids and returns (succeeded, errors)
+BatchHandler = Callable[[Dict, List[str]], Awaitable[Tuple[int, List[Dict]]]]
+
+def build_product_query(product_filter) -> Dict:
+    """Mongo query for a BulkProductFilter"""
+    query: Dict = {}
+    for field in ("category", "seller_id", "is_approved", "is_published", "synced_to_amazon"):
+        value = getattr(product_filter, field)
+        if value is not None:
+            query[field] = value
+    created = {}
+    if product_filter.created_after:
+        created["$gte"] = product_filter.created_after
+    if product_filter.created_before:
+        created["$lt"] = product_filter.created_before
+    if created:
+        query["created_at"] = created
+    return query
+
+def batches(items: List, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+class BulkJobQueue:
+    """
+    Durable bulk jobs in the bulk_jobs collection
+    Progress is an offset into product_ids, so a requeued job resumes where it stopped.
+    """
+
+    def __init__(self, db):
+        self.collection = db.bulk_jobs
+
+    async def ensure_indexes(self):
+        await self.collection.create_index("id", unique=True)
+        await self.collection.create_index([("status", ASCENDING), ("created_at", ASCENDING)])
+
+    async def create(self, job: Dict) -> Dict:
+        await self.collection.insert_one(dict(job))
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict]:
+        return await self.collection.find_one({"id": job_id}, {"_id": 0, "product_ids": 0})
+
+    async def claim(self) -> Optional[Dict]:
+        return await self.collection.find_one_and_update(
+            {"status": "queued"},
+            {"$set": {"status": "running", "updated_at": datetime.utcnow()}},
+            sort=[("created_at", ASCENDING)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def progress(self, job_id: str, processed: int, succeeded: int, errors: List[Dict]):
+        update = {
+            "$inc": {"processed": processed, "succeeded": succeeded, "failed": len(errors)},
+            "$set": {"updated_at": datetime.utcnow()}
+        }
+        if errors:
+            update["$push"] = {"errors": {"$each": errors, "$slice": MAX_JOB_ERRORS}}
+        await self.collection.update_one({"id": job_id}, update)
+
+    async def heartbeat(self, job_id: str):
+        await self.collection.update_one({"id": job_id, "status": "running"}, {"$set": {"updated_at": datetime.utcnow()}})
+
+    async def finish(self, job_id: str, status: str = "completed"):
+        now = datetime.utcnow()
+        await self.collection.update_one(
+            {"id": job_id},
+            {"$set": {"status": status, "updated_at": now, "finished_at": now}}
+        )
+
+    async def requeue_stale(self, older_than_minutes: int = BULK_STALE_MINUTES) -> int:
+        """Return jobs left running by a crashed worker to the queue"""
+        cutoff = datetime.utcnow() - timedelta(minutes=older_than_minutes)
+        result = await self.collection.update_many(
+            {"status": "running", "updated_at": {"$lt": cutoff}},
+            {"$set": {"status": "queued", "updated_at": datetime.utcnow()}}
+        )
+        return result.modified_count
+
+class BulkJobWorker:
+    """Background worker running queued bulk jobs batch by batch"""
+
+    def __init__(self, queue: BulkJobQueue, handlers: Dict[str, BatchHandler],
+                 batch_size: int = BULK_BATCH_SIZE, poll_interval: float = BULK_POLL_SECONDS,
+                 heartbeat_interval: float = BULK_HEARTBEAT_SECONDS):
+        self.queue = queue
+        self.handlers = handlers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self._running = False
+
+    async def _heartbeat(self, job_id: str):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                await self.queue.heartbeat(job_id)
+            except Exception as e:
+                logger.error(f"❌ Bulk job {job_id} heartbeat failed: {e}")
+
+    async def run_job(self, job: Dict):
+        handler = self.handlers.get(job["job_type"])
+        if handler is None:
+            logger.error(f"❌ No handler for bulk job type {job['job_type']}")
+            await self.queue.finish(job["id"], "failed")
+            return
+        remaining = job["product_ids"][job.get("processed", 0):]
+        heartbeat = asyncio.create_task(self._heartbeat(job["id"]))
+        try:
+            for batch in batches(remaining, self.batch_size):
+                try:
+                    succeeded, errors = await handler(job, batch)
+                except Exception as e:
+                    logger.error(f"❌ Bulk job {job['id']} batch failed: {e}")
+                    succeeded, errors = 0, [{"product_id": pid, "error": str(e)} for pid in batch]
+                await self.queue.progress(job["id"], len(batch), succeeded, errors)
+        finally:
+            heartbeat.cancel()
+        await self.queue.finish(job["id"])
+        logger.info(f"✅ Bulk job {job['id']} ({job['job_type']}) finished: {job['total']} products")
+
+    async def run_once(self) -> bool:
+        job = await self.queue.claim()
+        if job is None:
+            return False
+        await self.run_job(job)
+        return True
+
+    async def run_forever(self):
+        self._running = True
+        logger.info("📦 Bulk job worker started")
+        while self._running:
+            try:
+                await self.queue.requeue_stale()
+                if not await self.run_once():
+                    await asyncio.sleep(self.poll_interval)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"❌ Bulk job worker error: {e}")
+                await asyncio.sleep(self.poll_interval)
+
+    def stop(self):
+        self._running = False
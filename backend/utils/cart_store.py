@@ -0,0 +1,344 @@
+import json
+import logging
+import os
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+CART_TAX_RATE = float(os.getenv("CART_TAX_RATE", "0.13"))
+CART_MAX_ITEM_QUANTITY = int(os.getenv("CART_MAX_ITEM_QUANTITY", "99"))
+CART_MAX_LINES = int(os.getenv("CART_MAX_LINES", "100"))
+GUEST_CART_TTL_SECONDS = int(os.getenv("GUEST_CART_TTL_SECONDS", str(7 * 24 * 3600)))
+GUEST_CART_REDIS_URL = os.getenv("GUEST_CART_REDIS_URL")
+# In-process fallback only: oldest guest carts are dropped past this many, expired ones swept every minute
+GUEST_CART_MEMORY_MAX_KEYS = int(os.getenv("GUEST_CART_MEMORY_MAX_KEYS", "10000"))
+GUEST_CART_SWEEP_SECONDS = 60
+# Compare-and-set attempts before giving up on a contended line
+CART_CAS_RETRIES = 8
+
+CART_PROJECTION = {"_id": 0}
+
+class CartError(Exception):
+    """Raised for cart operations that cannot be applied (missing line, full cart)"""
+
+class CartItemNotFoundError(CartError):
+    """Raised when the product has no line in the cart"""
+
+class CartConflictError(CartError):
+    """Raised when a line keeps changing under concurrent writers"""
+
+def totals_delta(quantity: int, amount: float) -> Dict[str, float]:
+    """$inc document for the stored totals; tax and total are linear in the subtotal"""
+    return {
+        "total_items": quantity,
+        "subtotal": amount,
+        "tax": amount * CART_TAX_RATE,
+        "total": amount * (1 + CART_TAX_RATE)
+    }
+
+def empty_cart(owner_id: str) -> Dict:
+    now = datetime.utcnow()
+    return {
+        "id": str(uuid.uuid4()),
+        "user_id": owner_id,
+        "items": [],
+        "total_items": 0,
+        "subtotal": 0.0,
+        "tax": 0.0,
+        "total": 0.0,
+        "created_at": now,
+        "updated_at": now
+    }
+
+def recompute_totals(cart: Dict) -> Dict:
+    """Totals from scratch; used for small guest carts and to check stored totals"""
+    subtotal = sum(item["price"] * item["quantity"] for item in cart["items"])
+    cart.update(
+        total_items=sum(item["quantity"] for item in cart["items"]),
+        subtotal=subtotal,
+        tax=subtotal * CART_TAX_RATE,
+        total=subtotal * (1 + CART_TAX_RATE)
+    )
+    return cart
+
+def cart_response(cart: Optional[Dict]) -> Dict:
+    """CartResponse fields from a stored cart, rounded to cents"""
+    if not cart:
+        return {"items": [], "total_items": 0, "subtotal": 0.0, "tax": 0.0, "total": 0.0}
+    subtotal = round(cart["subtotal"], 2)
+    tax = round(cart["tax"], 2)
+    return {
+        "items": cart["items"],
+        "total_items": cart["total_items"],
+        "subtotal": subtotal,
+        "tax": tax,
+        "total": round(subtotal + tax, 2)
+    }
+
+class MongoCartStore:
+    """
+    Signed-in carts, one document per user
+    Every change is a single update on the cart document: $push a new line,
+    positional $inc/$set on an existing one, $pull to remove it, with the
+    totals moved by $inc in the same update. Changes that depend on the
+    current line (quantity set, repricing) are compare-and-set on that line.
+    """
+
+    def __init__(self, db):
+        self.collection = db.carts
+
+    async def ensure_indexes(self):
+        await self.collection.create_index("user_id", unique=True)
+
+    async def get(self, user_id: str) -> Optional[Dict]:
+        return await self.collection.find_one({"user_id": user_id}, CART_PROJECTION)
+
+    async def _line(self, user_id: str, product_id: str) -> Optional[Dict]:
+        """The cart's line for product_id, as a one-element items list"""
+        return await self.collection.find_one(
+            {"user_id": user_id},
+            {"_id": 0, "items": {"$elemMatch": {"product_id": product_id}}}
+        )
+
+    async def _is_full(self, user_id: str) -> bool:
+        return await self.collection.count_documents(
+            {"user_id": user_id, f"items.{CART_MAX_LINES - 1}": {"$exists": True}}, limit=1
+        ) > 0
+
+    async def _update(self, query: Dict, update: Dict) -> Optional[Dict]:
+        update.setdefault("$set", {})["updated_at"] = datetime.utcnow()
+        return await self.collection.find_one_and_update(
+            query, update, projection=CART_PROJECTION, return_document=ReturnDocument.AFTER
+        )
+
+    async def add_item(self, user_id: str, line: Dict, quantity: int) -> Dict:
+        """Add `quantity` of a product; `line` carries the current title/price snapshot"""
+        product_id, price = line["product_id"], line["price"]
+        for _ in range(CART_CAS_RETRIES):
+            # Same product at the same price: bump the line
+            cart = await self._update(
+                {"user_id": user_id, "items": {"$elemMatch": {
+                    "product_id": product_id,
+                    "price": price,
+                    "quantity": {"$lte": CART_MAX_ITEM_QUANTITY - quantity}
+                }}},
+                {"$inc": {"items.$.quantity": quantity, **totals_delta(quantity, price * quantity)}}
+            )
+            if cart:
+                return cart
+
+            # New line
+            cart = await self._update(
+                {
+                    "user_id": user_id,
+                    "items.product_id": {"$ne": product_id},
+                    f"items.{CART_MAX_LINES - 1}": {"$exists": False}
+                },
+                {"$push": {"items": {**line, "quantity": quantity}}, "$inc": totals_delta(quantity, price * quantity)}
+            )
+            if cart:
+                return cart
+
+            current = await self._line(user_id, product_id)
+            if current is None:
+                cart = empty_cart(user_id)
+                cart["items"].append({**line, "quantity": quantity})
+                recompute_totals(cart)
+                try:
+                    await self.collection.insert_one(dict(cart))
+                except DuplicateKeyError:
+                    continue
+                cart.pop("_id", None)
+                return cart
+            if not current.get("items"):
+                if await self._is_full(user_id):
+                    raise CartError(f"A cart holds at most {CART_MAX_LINES} products")
+                continue
+
+            # Price changed or quantity cap reached: reprice the whole line
+            old = current["items"][0]
+            new_quantity = min(old["quantity"] + quantity, CART_MAX_ITEM_QUANTITY)
+            cart = await self._update(
+                {"user_id": user_id, "items": {"$elemMatch": {
+                    "product_id": product_id, "price": old["price"], "quantity": old["quantity"]
+                }}},
+                {
+                    "$set": {"items.$": {**line, "quantity": new_quantity}},
+                    "$inc": totals_delta(new_quantity - old["quantity"],
+                                         new_quantity * price - old["quantity"] * old["price"])
+                }
+            )
+            if cart:
+                return cart
+        raise CartConflictError("Cart is being updated concurrently, please retry")
+
+    async def set_quantity(self, user_id: str, product_id: str, quantity: int) -> Dict:
+        if quantity <= 0:
+            return await self.remove_item(user_id, product_id)
+        quantity = min(quantity, CART_MAX_ITEM_QUANTITY)
+        for _ in range(CART_CAS_RETRIES):
+            current = await self._line(user_id, product_id)
+            if not current or not current.get("items"):
+                raise CartItemNotFoundError("Item not in cart")
+            old = current["items"][0]
+            cart = await self._update(
+                {"user_id": user_id, "items": {"$elemMatch": {
+                    "product_id": product_id, "price": old["price"], "quantity": old["quantity"]
+                }}},
+                {
+                    "$set": {"items.$.quantity": quantity},
+                    "$inc": totals_delta(quantity - old["quantity"], (quantity - old["quantity"]) * old["price"])
+                }
+            )
+            if cart:
+                return cart
+        raise CartConflictError("Cart is being updated concurrently, please retry")
+
+    async def remove_item(self, user_id: str, product_id: str) -> Dict:
+        for _ in range(CART_CAS_RETRIES):
+            current = await self._line(user_id, product_id)
+            if not current or not current.get("items"):
+                raise CartItemNotFoundError("Item not in cart")
+            old = current["items"][0]
+            cart = await self._update(
+                {"user_id": user_id, "items": {"$elemMatch": {
+                    "product_id": product_id, "price": old["price"], "quantity": old["quantity"]
+                }}},
+                {
+                    "$pull": {"items": {"product_id": product_id}},
+                    "$inc": totals_delta(-old["quantity"], -old["quantity"] * old["price"])
+                }
+            )
+            if cart:
+                return cart
+        raise CartConflictError("Cart is being updated concurrently, please retry")
+
+    async def clear(self, user_id: str) -> Optional[Dict]:
+        """Empty the cart; also resets any float drift in the stored totals"""
+        return await self._update(
+            {"user_id": user_id},
+            {"$set": {"items": [], "total_items": 0, "subtotal": 0.0, "tax": 0.0, "total": 0.0}}
+        )
+
+    async def merge(self, user_id: str, items: List[Dict]) -> Optional[Dict]:
+        """Fold guest cart lines into the user's cart, one atomic add per line"""
+        cart = None
+        for item in items:
+            line = {k: v for k, v in item.items() if k != "quantity"}
+            try:
+                cart = await self.add_item(user_id, line, item["quantity"])
+            except CartError as e:
+                logger.warning(f"⚠️ Guest cart line {item['product_id']} not merged: {e}")
+        return cart if cart is not None else await self.get(user_id)
+
+class InMemoryKV:
+    """
+    Process-local stand-in for the Redis commands the guest store uses
+    (get, set with ex, delete), so a redis.asyncio client can replace it.
+    Expired keys are swept periodically on writes, and past max_keys the
+    least recently written ones are evicted, like Redis with maxmemory.
+    """
+
+    def __init__(self, max_keys: int = GUEST_CART_MEMORY_MAX_KEYS, sweep_interval: float = GUEST_CART_SWEEP_SECONDS):
+        self._data: Dict[str, tuple] = {}
+        self.max_keys = max_keys
+        self.sweep_interval = sweep_interval
+        self._swept_at = time.monotonic()
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self._data[key]
+            return None
+        return entry[1]
+
+    async def set(self, key: str, value: str, ex: Optional[int] = None):
+        now = time.monotonic()
+        if now - self._swept_at >= self.sweep_interval:
+            self._sweep(now)
+        self._data.pop(key, None)
+        self._data[key] = (now + ex if ex else float("inf"), value)
+        while len(self._data) > self.max_keys:
+            del self._data[next(iter(self._data))]
+
+    def _sweep(self, now: float):
+        self._data = {key: entry for key, entry in self._data.items() if entry[0] >= now}
+        self._swept_at = now
+
+    async def delete(self, key: str):
+        self._data.pop(key, None)
+
+def guest_kv():
+    """Redis when GUEST_CART_REDIS_URL is set and redis is installed, else in-process"""
+    if GUEST_CART_REDIS_URL:
+        try:
+            import redis.asyncio as redis
+            return redis.from_url(GUEST_CART_REDIS_URL, decode_responses=True)
+        except ImportError:
+            logger.warning("redis library not available, guest carts are kept in-process")
+    return InMemoryKV()
+
+class GuestCartStore:
+    """
+    Anonymous carts kept as one JSON value per guest id with a sliding TTL
+    A guest cart belongs to one browser, so read-modify-write is acceptable here.
+    """
+
+    def __init__(self, kv=None, ttl: int = GUEST_CART_TTL_SECONDS):
+        self.kv = kv if kv is not None else guest_kv()
+        self.ttl = ttl
+
+    @staticmethod
+    def _key(guest_id: str) -> str:
+        return f"guest_cart:{guest_id}"
+
+    async def get(self, guest_id: str) -> Optional[Dict]:
+        raw = await self.kv.get(self._key(guest_id))
+        return json.loads(raw) if raw else None
+
+    async def _save(self, guest_id: str, cart: Dict) -> Dict:
+        recompute_totals(cart)
+        await self.kv.set(self._key(guest_id), json.dumps(cart, default=str), ex=self.ttl)
+        return cart
+
+    async def add_item(self, guest_id: str, line: Dict, quantity: int) -> Dict:
+        cart = await self.get(guest_id) or {"items": []}
+        for item in cart["items"]:
+            if item["product_id"] == line["product_id"]:
+                item.update(line, quantity=min(item["quantity"] + quantity, CART_MAX_ITEM_QUANTITY))
+                break
+        else:
+            if len(cart["items"]) >= CART_MAX_LINES:
+                raise CartError(f"A cart holds at most {CART_MAX_LINES} products")
+            cart["items"].append({**line, "quantity": quantity})
+        return await self._save(guest_id, cart)
+
+    async def set_quantity(self, guest_id: str, product_id: str, quantity: int) -> Dict:
+        if quantity <= 0:
+            return await self.remove_item(guest_id, product_id)
+        cart = await self.get(guest_id)
+        item = next((i for i in (cart or {}).get("items", []) if i["product_id"] == product_id), None)
+        if item is None:
+            raise CartItemNotFoundError("Item not in cart")
+        item["quantity"] = min(quantity, CART_MAX_ITEM_QUANTITY)
+        return await self._save(guest_id, cart)
+
+    async def remove_item(self, guest_id: str, product_id: str) -> Dict:
+        cart = await self.get(guest_id)
+        if not cart or not any(i["product_id"] == product_id for i in cart["items"]):
+            raise CartItemNotFoundError("Item not in cart")
+        cart["items"] = [i for i in cart["items"] if i["product_id"] != product_id]
+        return await self._save(guest_id, cart)
+
+    async def clear(self, guest_id: str) -> None:
+        await self.kv.delete(self._key(guest_id))
+
+guest_carts = GuestCartStore()
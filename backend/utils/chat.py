@@ -0,0 +1,210 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from utils.http_cache import ResponseCache
+from utils.metrics import LatencyHistogram
+from utils.search_index import search_index, tokenize
+
+logger = logging.getLogger(__name__)
+
+CHAT_BACKEND = os.getenv("CHAT_BACKEND", "local")
+CHAT_MAX_CONCURRENCY = int(os.getenv("CHAT_MAX_CONCURRENCY", "8"))
+CHAT_MAX_QUEUE = int(os.getenv("CHAT_MAX_QUEUE", "32"))
+CHAT_QUEUE_TIMEOUT_SECONDS = float(os.getenv("CHAT_QUEUE_TIMEOUT_SECONDS", "10"))
+CHAT_CACHE_SIZE = int(os.getenv("CHAT_CACHE_SIZE", "1024"))
+CHAT_CACHE_TTL_SECONDS = int(os.getenv("CHAT_CACHE_TTL_SECONDS", "3600"))
+# Only short prompts are treated as FAQ-style and cached
+CHAT_CACHE_MAX_TOKENS = 12
+CHAT_RETRIEVAL_LIMIT = 3
+
+class ChatBusyError(Exception):
+    """Raised when the chat queue is full or the wait times out"""
+
+class ChatLimiter:
+    """
+    Per-process concurrency limit with a bounded wait queue
+    Requests beyond max_concurrency wait; beyond max_queue they are rejected.
+    """
+
+    def __init__(self, max_concurrency: int = CHAT_MAX_CONCURRENCY, max_queue: int = CHAT_MAX_QUEUE,
+                 timeout: float = CHAT_QUEUE_TIMEOUT_SECONDS):
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.active = 0
+        self.waiting = 0
+
+    async def acquire(self):
+        if self.waiting >= self.max_queue:
+            raise ChatBusyError("Chat is at capacity, please retry shortly")
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            raise ChatBusyError("Timed out waiting for a chat slot")
+        finally:
+            self.waiting -= 1
+        self.active += 1
+
+    def release(self):
+        self.active -= 1
+        self._semaphore.release()
+
+def cache_key(message: str) -> Optional[str]:
+    """Normalised response cache key, or None when the prompt is not FAQ-style"""
+    tokens = tokenize(message)
+    if not tokens or len(tokens) > CHAT_CACHE_MAX_TOKENS:
+        return None
+    return " ".join(tokens)
+
+class LocalChatBackend:
+    """
+    Deterministic stand-in for an LLM
+    Answers from a small intent table and the retrieved products, streaming
+    word by word so clients exercise the same path as a real model.
+    """
+
+    name = "local"
+
+    INTENTS = [
+        ({"order", "status", "track", "tracking", "shipped", "where"},
+         "You can follow every order from My Orders, where the tracking number appears as soon as it ships."),
+        ({"return", "refund", "exchange"},
+         "Returns are accepted within 30 days of delivery. Start one from My Orders and the refund goes back to your original payment method."),
+        ({"shipping", "delivery", "deliver", "arrive"},
+         "Standard shipping takes 3-7 business days. Sellers show their dispatch time on each product page."),
+        ({"payout", "payouts", "paid", "stripe", "earnings"},
+         "Sellers can request payouts from the Payouts page once their Stripe account is verified."),
+        ({"kyc", "verify", "verification", "identity"},
+         "Identity verification is done from the KYC page and usually takes one business day."),
+    ]
+    SUGGESTED_ACTIONS = ["Browse products", "Check order status", "Contact support"]
+
+    def __init__(self, token_delay: float = 0.0):
+        self.token_delay = token_delay
+
+    def compose(self, message: str, products: List[Dict]) -> str:
+        words = set(tokenize(message))
+        parts = [answer for keywords, answer in self.INTENTS if words & keywords]
+        if products:
+            names = ", ".join(f"{p['title']} (${p['price']:.2f})" for p in products)
+            parts.append(f"You might like: {names}.")
+        if not parts:
+            parts.append("Hello! I'm the Hamro AI assistant. How can I help you today?")
+        return " ".join(parts)
+
+    async def stream(self, message: str, products: List[Dict]) -> AsyncIterator[str]:
+        words = self.compose(message, products).split(" ")
+        for i, word in enumerate(words):
+            if self.token_delay:
+                await asyncio.sleep(self.token_delay)
+            yield word if i == 0 else f" {word}"
+
+# Backends register a factory under the name selected by CHAT_BACKEND
+CHAT_BACKENDS: Dict[str, Callable[[], object]] = {"local": LocalChatBackend}
+
+def register_backend(name: str, factory: Callable[[], object]):
+    CHAT_BACKENDS[name] = factory
+
+def sse_event(data: Dict, event: Optional[str] = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+class ChatService:
+    """
+    Retrieval, caching, concurrency limiting and latency metrics around a chat backend
+    """
+
+    def __init__(self, backend=None, limiter: Optional[ChatLimiter] = None,
+                 cache: Optional[ResponseCache] = None, index=None):
+        self.backend = backend or CHAT_BACKENDS[CHAT_BACKEND]()
+        self.limiter = limiter or ChatLimiter()
+        self.cache = cache or ResponseCache(CHAT_CACHE_SIZE, CHAT_CACHE_TTL_SECONDS)
+        self.index = index or search_index
+        self.first_token = LatencyHistogram()
+        self.total = LatencyHistogram()
+
+    def retrieve(self, message: str) -> List[Dict]:
+        if not tokenize(message):
+            return []
+        results = self.index.search(message, limit=CHAT_RETRIEVAL_LIMIT)["results"]
+        return [
+            {"product_id": r["product_id"], "title": r["title"], "price": r["price"]}
+            for r in results
+        ]
+
+    async def stream(self, message: str) -> AsyncIterator[Tuple[str, Dict]]:
+        """
+        Yield (event, payload) pairs: context, token..., done
+        Raises ChatBusyError before yielding anything when no slot is free.
+        """
+        started = time.perf_counter()
+        key = cache_key(message)
+        cached = self.cache.get(key) if key else None
+        if cached is not None:
+            yield "context", {"products": cached["products"]}
+            yield "token", {"token": cached["response"]}
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.first_token.observe(elapsed_ms)
+            self.total.observe(elapsed_ms)
+            yield "done", {"cached": True, "first_token_ms": round(elapsed_ms, 2), "total_ms": round(elapsed_ms, 2)}
+            return
+
+        await self.limiter.acquire()
+        first_token_ms = None
+        tokens: List[str] = []
+        error = False
+        try:
+            products = self.retrieve(message)
+            yield "context", {"products": products}
+            async for token in self.backend.stream(message, products):
+                if first_token_ms is None:
+                    first_token_ms = (time.perf_counter() - started) * 1000
+                    self.first_token.observe(first_token_ms)
+                tokens.append(token)
+                yield "token", {"token": token}
+        except Exception:
+            error = True
+            raise
+        finally:
+            self.limiter.release()
+            total_ms = (time.perf_counter() - started) * 1000
+            self.total.observe(total_ms, error=error)
+
+        if key:
+            self.cache.put(key, {"response": "".join(tokens), "products": products})
+        yield "done", {
+            "cached": False,
+            "first_token_ms": round(first_token_ms or total_ms, 2),
+            "total_ms": round(total_ms, 2)
+        }
+
+    async def complete(self, message: str) -> Dict:
+        """Collect a full response for non-streaming callers"""
+        response, products, stats = [], [], {}
+        async for event, payload in self.stream(message):
+            if event == "context":
+                products = payload["products"]
+            elif event == "token":
+                response.append(payload["token"])
+            else:
+                stats = payload
+        return {"response": "".join(response), "products": products, **stats}
+
+    def metrics(self) -> Dict:
+        return {
+            "backend": getattr(self.backend, "name", type(self.backend).__name__),
+            "active": self.limiter.active,
+            "waiting": self.limiter.waiting,
+            "max_concurrency": self.limiter.max_concurrency,
+            "cache": {"hits": self.cache.hits, "misses": self.cache.misses, "size": len(self.cache)},
+            "first_token": self.first_token.snapshot(),
+            "total": self.total.snapshot(),
+        }
+
+chat_service = ChatService()
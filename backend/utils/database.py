@@ -0,0 +1,76 @@
+import asyncio
+import logging
+import os
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import AsyncIterator
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+# MONGO_URL=mongomock:// runs the app against an in-memory stand-in (tests, load runs)
+MOCK_SCHEME = "mongomock://"
+LEASE_TTL_SECONDS = float(os.getenv("LEASE_TTL_SECONDS", "120"))
+
+def create_client(mongo_url: str):
+    """Motor client for mongo_url, or a mongomock-motor client for mongomock:// URLs"""
+    if mongo_url.startswith(MOCK_SCHEME):
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            raise RuntimeError("MONGO_URL=mongomock:// needs the mongomock-motor package")
+        return AsyncMongoMockClient()
+    return AsyncIOMotorClient(mongo_url)
+
+class MongoLease:
+    """
+    Cross-process lease on a job_leases document
+    Only one holder at a time across every worker and host sharing the
+    database. The holder renews it in the background; a crashed holder's
+    lease lapses after ttl seconds.
+    """
+
+    def __init__(self, db, name: str, ttl: float = LEASE_TTL_SECONDS):
+        self.collection = db.job_leases
+        self.name = name
+        self.ttl = ttl
+        self.owner = str(uuid.uuid4())
+
+    async def acquire(self) -> bool:
+        now = datetime.utcnow()
+        try:
+            await self.collection.find_one_and_update(
+                {"_id": self.name, "$or": [{"owner": self.owner}, {"expires_at": {"$lt": now}}]},
+                {"$set": {"owner": self.owner, "expires_at": now + timedelta(seconds=self.ttl)}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # Held by another owner: the upsert collided with the live document
+            return False
+        return True
+
+    async def release(self):
+        await self.collection.delete_one({"_id": self.name, "owner": self.owner})
+
+    async def _renew(self):
+        while True:
+            await asyncio.sleep(self.ttl / 3)
+            if not await self.acquire():
+                logger.error(f"❌ Lost lease {self.name}")
+                return
+
+    @asynccontextmanager
+    async def hold(self) -> AsyncIterator[bool]:
+        """Yields whether the lease was acquired; it is renewed and then released around the block"""
+        if not await self.acquire():
+            yield False
+            return
+        renewal = asyncio.create_task(self._renew())
+        try:
+            yield True
+        finally:
+            renewal.cancel()
+            await self.release()
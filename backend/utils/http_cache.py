@@ -0,0 +1,110 @@
+import base64
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Hashable, Iterable, Optional, Tuple
+
+# Browsers/CDNs may reuse public catalog responses for this long
+CATALOG_MAX_AGE_SECONDS = int(os.getenv("CATALOG_MAX_AGE_SECONDS", "30"))
+CATALOG_CACHE_CONTROL = os.getenv(
+    "CATALOG_CACHE_CONTROL",
+    f"public, max-age={CATALOG_MAX_AGE_SECONDS}, must-revalidate"
+)
+# Responses that must not be shared (unpublished products, drafts)
+PRIVATE_CACHE_CONTROL = "private, no-cache"
+# In-process list cache; bounds staleness across workers that did not see a write
+CATALOG_CACHE_TTL_SECONDS = int(os.getenv("CATALOG_CACHE_TTL_SECONDS", "30"))
+CATALOG_CACHE_SIZE = int(os.getenv("CATALOG_CACHE_SIZE", "2048"))
+
+def _version(document: Dict) -> str:
+    # Stock holds and checkouts move quantity and sales without touching updated_at
+    updated_at = document.get("updated_at")
+    if isinstance(updated_at, datetime):
+        updated_at = f"{updated_at.timestamp():.6f}"
+    return f"{document['id']}:{updated_at}:{document.get('quantity')}:{document.get('sales')}"
+
+def product_etag(document: Dict) -> str:
+    """
+    Weak ETag from id, updated_at and stock
+    Weak because view counters change without touching any of them.
+    """
+    return f'W/"{hashlib.sha1(_version(document).encode()).hexdigest()[:20]}"'
+
+def list_etag(documents: Iterable[Dict], *parts) -> str:
+    digest = hashlib.sha1(repr(parts).encode())
+    for document in documents:
+        digest.update(_version(document).encode())
+        digest.update(b"|")
+    return f'W/"{digest.hexdigest()[:20]}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match uses weak comparison, so W/ prefixes are ignored"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    wanted = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == wanted for tag in if_none_match.split(","))
+
+def encode_cursor(document: Dict) -> str:
+    """Opaque keyset cursor after `document` in (created_at desc, id desc) order"""
+    raw = json.dumps([document["created_at"].isoformat(), document["id"]])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """Raises ValueError for a malformed cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, product_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), str(product_id)
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+
+def cursor_query(cursor: str) -> Dict:
+    created_at, product_id = decode_cursor(cursor)
+    return {"$or": [
+        {"created_at": {"$lt": created_at}},
+        {"created_at": created_at, "id": {"$lt": product_id}}
+    ]}
+
+class ResponseCache:
+    """
+    LRU cache with TTL for serialized responses
+    Used for catalog pages and chat answers. Catalog writes in this process
+    call invalidate(); the TTL bounds how long other processes can serve a
+    page that predates a write.
+    """
+
+    def __init__(self, max_size: int = CATALOG_CACHE_SIZE, ttl: int = CATALOG_CACHE_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, Dict]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Dict]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            self._entries.pop(key, None)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: Hashable, value: Dict):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self):
+        self._entries.clear()
+
+catalog_cache = ResponseCache()
@@ -0,0 +1,86 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Callable
+
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+ORDER_NUMBER_PREFIX = os.getenv("ORDER_NUMBER_PREFIX", "HM")
+ORDER_NUMBER_BLOCK = int(os.getenv("ORDER_NUMBER_BLOCK", "100"))
+ORDER_NUMBER_MAX_BLOCK = int(os.getenv("ORDER_NUMBER_MAX_BLOCK", "10000"))
+# Blocks are sized so a process leases roughly once per this many seconds
+ORDER_NUMBER_LEASE_SECONDS = 1.0
+ORDER_SEQUENCE_WIDTH = 7
+
+def format_order_number(sequence: int, when: datetime, prefix: str = ORDER_NUMBER_PREFIX) -> str:
+    """e.g. HM260319-0004821: the date keeps numbers roughly time-ordered, the sequence makes them unique"""
+    return f"{prefix}{when:%y%m%d}-{sequence:0{ORDER_SEQUENCE_WIDTH}d}"
+
+class MongoSequence:
+    """Global counter in the counters collection; one find_one_and_update per leased block"""
+
+    def __init__(self, db, name: str = "order_number"):
+        self.collection = db.counters
+        self.name = name
+
+    async def lease(self, count: int) -> int:
+        """Reserve `count` numbers and return the first"""
+        counter = await self.collection.find_one_and_update(
+            {"_id": self.name},
+            {"$inc": {"value": count}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return counter["value"] - count + 1
+
+class OrderNumberGenerator:
+    """
+    Hands out order numbers from blocks leased per process
+    Only a block refill touches the database, so the counter document is not a
+    hot spot. Numbers left in a block when the process stops are skipped, so
+    the sequence has gaps but never repeats.
+    """
+
+    def __init__(self, sequence, block_size: int = ORDER_NUMBER_BLOCK, max_block: int = ORDER_NUMBER_MAX_BLOCK,
+                 prefix: str = ORDER_NUMBER_PREFIX, clock: Callable[[], datetime] = datetime.utcnow):
+        self.sequence = sequence
+        self.min_block = block_size
+        self.block_size = block_size
+        self.max_block = max_block
+        self.prefix = prefix
+        self.clock = clock
+        self._next = 0
+        self._end = 0
+        self._leased_at = None
+        self._lock = asyncio.Lock()
+        self.leases = 0
+
+    async def _refill(self):
+        now = time.monotonic()
+        if self._leased_at is not None:
+            # Grow the block under sustained load, shrink it back when idle
+            elapsed = now - self._leased_at
+            if elapsed < ORDER_NUMBER_LEASE_SECONDS:
+                self.block_size = min(self.block_size * 2, self.max_block)
+            elif elapsed > ORDER_NUMBER_LEASE_SECONDS * 60:
+                self.block_size = max(self.block_size // 2, self.min_block)
+        start = await self.sequence.lease(self.block_size)
+        self._next, self._end = start, start + self.block_size
+        self._leased_at = now
+        self.leases += 1
+
+    async def next_sequence(self) -> int:
+        while self._next >= self._end:
+            async with self._lock:
+                if self._next >= self._end:
+                    await self._refill()
+        sequence = self._next
+        self._next += 1
+        return sequence
+
+    async def next_number(self) -> str:
+        return format_order_number(await self.next_sequence(), self.clock(), self.prefix)
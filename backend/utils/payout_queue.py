@@ -0,0 +1,317 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import ASCENDING
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+# Stripe allows 25 req/s in test mode and 100 req/s live; stay under both by default
+STRIPE_MAX_RPS = float(os.getenv("STRIPE_MAX_RPS", "20"))
+PAYOUT_BATCH_SIZE = int(os.getenv("PAYOUT_BATCH_SIZE", "200"))
+PAYOUT_MAX_ATTEMPTS = int(os.getenv("PAYOUT_MAX_ATTEMPTS", "5"))
+PAYOUT_POLL_SECONDS = float(os.getenv("PAYOUT_POLL_SECONDS", "5"))
+PAYOUT_STALE_MINUTES = int(os.getenv("PAYOUT_STALE_MINUTES", "10"))
+
+class RateLimiter:
+    """
+    Token bucket limiter for outbound Stripe calls
+    """
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+def settlement_key(payout: Dict) -> Tuple[str, str]:
+    return payout["stripe_account_id"], payout["currency"].upper()
+
+def group_by_settlement(payouts: List[Dict]) -> "OrderedDict[str, List[Dict]]":
+    """Group claimed payouts by settlement id, oldest first"""
+    groups: "OrderedDict[str, List[Dict]]" = OrderedDict()
+    for payout in sorted(payouts, key=lambda p: p["created_at"]):
+        groups.setdefault(payout["settlement_id"], []).append(payout)
+    return groups
+
+def available_balance(balance: Dict, currency: str) -> float:
+    """Available funds in one currency; balances in another currency count as zero"""
+    if isinstance(balance["available"], list):
+        return sum(b["amount"] for b in balance["available"] if b["currency"].upper() == currency.upper())
+    return balance["available"] if balance.get("currency", currency).upper() == currency.upper() else 0.0
+
+def balances_by_currency(balance: Dict) -> List[Dict]:
+    """Available and pending funds per currency, from either balance shape"""
+    if not isinstance(balance["available"], list):
+        return [{"currency": balance.get("currency", "usd"), "available": balance["available"],
+                 "pending": balance.get("pending", 0.0)}]
+    totals: "OrderedDict[str, Dict]" = OrderedDict()
+    for field in ("available", "pending"):
+        for entry in balance.get(field, []):
+            currency = entry["currency"].lower()
+            total = totals.setdefault(currency, {"currency": currency, "available": 0.0, "pending": 0.0})
+            total[field] = round(total[field] + entry["amount"], 2)
+    return list(totals.values()) or [{"currency": "usd", "available": 0.0, "pending": 0.0}]
+
+def split_by_balance(payouts: List[Dict], available: float) -> Tuple[List[Dict], List[Dict]]:
+    """Settle payouts oldest-first until the available balance runs out"""
+    settle, short = [], []
+    remaining = available
+    for payout in payouts:
+        if payout["amount"] <= remaining:
+            settle.append(payout)
+            remaining = round(remaining - payout["amount"], 2)
+        else:
+            short.append(payout)
+    return settle, short
+
+class PayoutQueue:
+    """
+    Durable payout queue backed by the payouts collection
+    Requests are deduplicated on (user_id, idempotency_key). Claimed payouts
+    get a settlement id per (account, currency) that is kept across retries and
+    sent as the Stripe Idempotency-Key, so a retry replays the same payout.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.collection = db.payouts
+
+    async def ensure_indexes(self):
+        await self.collection.create_index(
+            [("user_id", ASCENDING), ("idempotency_key", ASCENDING)],
+            unique=True,
+            name="user_idempotency_key"
+        )
+        await self.collection.create_index([("status", ASCENDING), ("created_at", ASCENDING)])
+        await self.collection.create_index("batch_id")
+        await self.collection.create_index("settlement_id")
+
+    async def enqueue(self, payout: Dict) -> Tuple[Dict, bool]:
+        """
+        Insert a queued payout
+        Returns (payout, created); a replayed idempotency key returns the original payout.
+        """
+        try:
+            await self.collection.insert_one(dict(payout))
+            return payout, True
+        except DuplicateKeyError:
+            existing = await self.collection.find_one({
+                "user_id": payout["user_id"],
+                "idempotency_key": payout["idempotency_key"]
+            })
+            return existing, False
+
+    async def claim_batch(self, limit: int = PAYOUT_BATCH_SIZE) -> List[Dict]:
+        """Atomically move up to `limit` queued payouts to processing"""
+        queued = await self.collection.find(
+            {"status": "queued"}, {"id": 1}
+        ).sort("created_at", ASCENDING).limit(limit).to_list(limit)
+        if not queued:
+            return []
+
+        batch_id = str(uuid.uuid4())
+        await self.collection.update_many(
+            {"id": {"$in": [p["id"] for p in queued]}, "status": "queued"},
+            {"$set": {"status": "processing", "batch_id": batch_id, "updated_at": datetime.utcnow()},
+             "$inc": {"attempts": 1}}
+        )
+        # A settlement that may have reached Stripe is only replayed whole: pull in its queued members
+        sent = await self.collection.distinct(
+            "settlement_id", {"batch_id": batch_id, "status": "processing", "settlement_sent": True}
+        )
+        if sent:
+            await self.collection.update_many(
+                {"settlement_id": {"$in": sent}, "status": "queued"},
+                {"$set": {"status": "processing", "batch_id": batch_id, "updated_at": datetime.utcnow()},
+                 "$inc": {"attempts": 1}}
+            )
+        # Another worker may have claimed some of them in between
+        claimed = await self.collection.find({"batch_id": batch_id, "status": "processing"}).to_list(None)
+
+        # Payouts retried after an error keep the settlement id of their first attempt
+        fresh: Dict[Tuple[str, str], List[Dict]] = {}
+        for payout in claimed:
+            if not payout.get("settlement_id"):
+                fresh.setdefault(settlement_key(payout), []).append(payout)
+        for payouts in fresh.values():
+            settlement_id = f"settle-{uuid.uuid4().hex}"
+            await self.collection.update_many(
+                {"id": {"$in": [p["id"] for p in payouts]}}, {"$set": {"settlement_id": settlement_id}}
+            )
+            for payout in payouts:
+                payout["settlement_id"] = settlement_id
+        return claimed
+
+    async def requeue_stale(self, older_than_minutes: int = PAYOUT_STALE_MINUTES) -> int:
+        """Return payouts left in processing by a crashed worker to the queue"""
+        cutoff = datetime.utcnow() - timedelta(minutes=older_than_minutes)
+        result = await self.collection.update_many(
+            {"status": "processing", "updated_at": {"$lt": cutoff}},
+            {"$set": {"status": "queued", "updated_at": datetime.utcnow()}}
+        )
+        return result.modified_count
+
+    async def mark_sent(self, ids: List[str], amount: float):
+        """Record the members and total of a settlement before its Stripe payout is requested"""
+        await self.collection.update_many(
+            {"id": {"$in": ids}},
+            {"$set": {"settlement_sent": True, "settlement_amount": amount, "settlement_size": len(ids)}}
+        )
+
+    async def mark_settled(self, ids: List[str], stripe_payout: Dict):
+        arrival = stripe_payout.get("arrival_date")
+        await self.collection.update_many(
+            {"id": {"$in": ids}},
+            {"$set": {
+                "status": stripe_payout.get("status", "pending"),
+                "stripe_payout_id": stripe_payout["id"],
+                "arrival_date": datetime.fromisoformat(arrival) if arrival else None,
+                "error_message": None,
+                "updated_at": datetime.utcnow()
+            }}
+        )
+
+    async def mark_failed(self, ids: List[str], error_message: str):
+        await self.collection.update_many(
+            {"id": {"$in": ids}},
+            {"$set": {"status": "failed", "error_message": error_message, "updated_at": datetime.utcnow()}}
+        )
+
+    async def release(self, payouts: List[Dict], error_message: str, max_attempts: int = PAYOUT_MAX_ATTEMPTS) -> List[Dict]:
+        """
+        Put payouts back on the queue after a transient error
+        Returns the payouts that exhausted their attempts and were failed instead.
+        """
+        retry = [p["id"] for p in payouts if p.get("attempts", 0) < max_attempts]
+        exhausted = [p for p in payouts if p.get("attempts", 0) >= max_attempts]
+        if retry:
+            await self.collection.update_many(
+                {"id": {"$in": retry}},
+                {"$set": {"status": "queued", "error_message": error_message, "updated_at": datetime.utcnow()}}
+            )
+        if exhausted:
+            await self.mark_failed([p["id"] for p in exhausted], error_message)
+        return exhausted
+
+class PayoutSettlementWorker:
+    """
+    Background worker that settles queued payouts
+    One Stripe payout is created per account and currency per batch, within the
+    Stripe rate limit.
+    """
+
+    def __init__(self, queue: PayoutQueue, stripe_client=None, notify=None, on_settled=None,
+                 batch_size: int = PAYOUT_BATCH_SIZE, rate_limit: float = STRIPE_MAX_RPS,
+                 poll_interval: float = PAYOUT_POLL_SECONDS):
+        if stripe_client is None:
+            from utils.stripe_service import stripe_service
+            stripe_client = stripe_service
+        self.queue = queue
+        self.stripe = stripe_client
+        self.notify = notify
+        self.on_settled = on_settled
+        self.batch_size = batch_size
+        self.limiter = RateLimiter(rate_limit)
+        self.poll_interval = poll_interval
+        self._running = False
+
+    async def _notify(self, user_id: str, title: str, message: str, notification_type: str):
+        if self.notify:
+            await self.notify(user_id=user_id, title=title, message=message, notification_type=notification_type)
+
+    async def settle(self, payouts: List[Dict]) -> int:
+        """Settle one settlement group (one account, one currency), returns number of payouts settled"""
+        account_id, currency = settlement_key(payouts[0])
+        settlement_id = payouts[0]["settlement_id"]
+        try:
+            settle = [p for p in payouts if p.get("settlement_sent")]
+            if not settle:
+                await self.limiter.acquire()
+                balance = await self.stripe.get_account_balance(account_id)
+                settle, short = split_by_balance(payouts, available_balance(balance, currency))
+
+                if short:
+                    await self.queue.mark_failed([p["id"] for p in short], "Insufficient balance")
+                    for payout in short:
+                        await self._notify(
+                            payout["user_id"], "Payout Failed",
+                            f"Your payout of ${payout['amount']} could not be sent: insufficient balance.",
+                            "error"
+                        )
+                if not settle:
+                    return 0
+                total, size = round(sum(p["amount"] for p in settle), 2), len(settle)
+                await self.queue.mark_sent([p["id"] for p in settle], total)
+            else:
+                # An earlier attempt may have reached Stripe: replay exactly that request, whatever
+                # the balance is now and however many members were claimed, so Stripe returns the
+                # original payout instead of rejecting the key for different parameters
+                total, size = settle[0]["settlement_amount"], settle[0]["settlement_size"]
+
+            await self.limiter.acquire()
+            stripe_payout = await self.stripe.create_payout(
+                account_id=account_id,
+                amount=total,
+                currency=currency.lower(),
+                description=f"Hamro settlement ({size} payout{'s' if size > 1 else ''})",
+                idempotency_key=settlement_id
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ Payout settlement failed for {account_id}: {e}")
+            for payout in await self.queue.release(payouts, str(e)):
+                await self._notify(
+                    payout["user_id"], "Payout Failed",
+                    f"Your payout of ${payout['amount']} failed after several attempts.",
+                    "error"
+                )
+            return 0
+
+        await self.queue.mark_settled([p["id"] for p in settle], stripe_payout)
+        if self.on_settled:
+            await self.on_settled(settle, stripe_payout)
+        logger.info(f"✅ Settled {len(settle)} payouts ({total} {currency}) for {account_id}: {stripe_payout['id']}")
+        return len(settle)
+
+    async def run_once(self) -> int:
+        """Claim and settle one batch, returns number of payouts settled"""
+        payouts = await self.queue.claim_batch(self.batch_size)
+        settled = 0
+        for group in group_by_settlement(payouts).values():
+            settled += await self.settle(group)
+        return settled
+
+    async def run_forever(self):
+        self._running = True
+        logger.info("💸 Payout settlement worker started")
+        while self._running:
+            try:
+                await self.queue.requeue_stale()
+                if not await self.run_once():
+                    await asyncio.sleep(self.poll_interval)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"❌ Payout settlement worker error: {e}")
+                await asyncio.sleep(self.poll_interval)
+
+    def stop(self):
+        self._running = False
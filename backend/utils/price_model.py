@@ -0,0 +1,356 @@
+"""
+Catalog price model
+
+Ridge regression on log price over hashed category, tag and text features
+plus seller history. Trained offline into a versioned .npz artifact:
+
+    cd backend && python -m utils.price_model
+
+The API loads the newest artifact once at startup and predicts in batches;
+it never trains, so a server without an artifact answers 503 until one is built.
+"""
+import asyncio
+import json
+import logging
+import math
+import os
+import time
+from datetime import datetime
+from hashlib import blake2b
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+from utils.search_index import tokenize
+
+logger = logging.getLogger(__name__)
+
+MODEL_DIR = Path(os.getenv("PRICE_MODEL_DIR", Path(__file__).parent.parent / "data" / "models"))
+HASH_DIM = int(os.getenv("PRICE_MODEL_HASH_DIM", "2048"))
+RIDGE_ALPHA = float(os.getenv("PRICE_MODEL_ALPHA", "1.0"))
+TRAIN_CHUNK = 5000
+# Dense seller features appended after the hashed block
+SELLER_FEATURES = 2
+FEATURE_NAMES = {"category": 4.0, "tag": 1.0, "title": 1.0, "description": 0.5}
+TEXT_FIELDS = ("title", "name", "description", "category", "seller_id")
+
+class InvalidProductError(ValueError):
+    """Raised when a product to price has fields of the wrong type"""
+
+def check_products(products: List[Dict]):
+    """Reject inputs the feature hasher cannot read, naming the first bad product"""
+    for i, product in enumerate(products):
+        if not isinstance(product, dict):
+            raise InvalidProductError(f"Product {i} must be an object")
+        for field in TEXT_FIELDS:
+            if product.get(field) is not None and not isinstance(product[field], str):
+                raise InvalidProductError(f"Product {i}: {field} must be a string")
+        tags = product.get("tags")
+        if tags is not None and not (isinstance(tags, list) and all(isinstance(t, str) for t in tags)):
+            raise InvalidProductError(f"Product {i}: tags must be a list of strings")
+
+class FeatureHasher:
+    """Maps products to sparse (index, value) rows in a fixed hashed space"""
+
+    def __init__(self, dim: int = HASH_DIM):
+        self.dim = dim
+        self._cache: Dict[str, int] = {}
+
+    def _index(self, feature: str) -> int:
+        index = self._cache.get(feature)
+        if index is None:
+            index = int.from_bytes(blake2b(feature.encode(), digest_size=8).digest(), "little") % self.dim
+            if len(self._cache) < 500000:
+                self._cache[feature] = index
+        return index
+
+    def row(self, product: Dict) -> Tuple[List[int], List[float]]:
+        index = self._index
+        indices = [index(f"category={product.get('category', '')}")]
+        values = [FEATURE_NAMES["category"]]
+        tags = product.get("tags") or []
+        indices.extend(index(f"tag={tag.lower()}") for tag in tags)
+        values.extend([FEATURE_NAMES["tag"]] * len(tags))
+        for prefix, text, weight in (
+            ("title", product.get("title") or product.get("name") or "", FEATURE_NAMES["title"]),
+            ("desc", product.get("description") or "", FEATURE_NAMES["description"]),
+        ):
+            words = set(tokenize(text))
+            if words:
+                indices.extend(index(f"{prefix}={w}") for w in words)
+                values.extend([weight / math.sqrt(len(words))] * len(words))
+        return indices, values
+
+    def transform(self, products: List[Dict]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """CSR arrays (indptr, indices, values) for a batch"""
+        indptr = np.zeros(len(products) + 1, dtype=np.int64)
+        indices: List[int] = []
+        values: List[float] = []
+        for i, product in enumerate(products):
+            idx, val = self.row(product)
+            indices.extend(idx)
+            values.extend(val)
+            indptr[i + 1] = len(indices)
+        return indptr, np.array(indices, dtype=np.int64), np.array(values, dtype=np.float64)
+
+def densify(indptr: np.ndarray, indices: np.ndarray, values: np.ndarray, dim: int) -> np.ndarray:
+    rows = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+    dense = np.zeros((len(indptr) - 1, dim), dtype=np.float64)
+    np.add.at(dense, (rows, indices), values)
+    return dense
+
+class PriceModel:
+    """
+    Log-price ridge regression with an 80% residual interval per category
+    Inference is a gather-and-sum over the weight vector, so a batch costs
+    one bincount regardless of size.
+    """
+
+    def __init__(self, weights: np.ndarray, bias: float, seller_stats: Dict[str, Tuple[float, int]],
+                 global_mean: float, category_std: Dict[str, float], residual_std: float,
+                 version: str, metrics: Optional[Dict] = None, dim: int = HASH_DIM):
+        self.hasher = FeatureHasher(dim)
+        self.weights = weights
+        self.bias = bias
+        self.seller_stats = seller_stats
+        self.global_mean = global_mean
+        self.category_std = category_std
+        self.residual_std = residual_std
+        self.version = version
+        self.metrics = metrics or {}
+
+    def seller_features(self, products: List[Dict]) -> np.ndarray:
+        """Seller mean log price (relative to the catalog) and log listing count"""
+        default = (self.global_mean, 0)
+        stats = np.array([self.seller_stats.get(p.get("seller_id"), default) for p in products], dtype=np.float64)
+        return np.column_stack([stats[:, 0] - self.global_mean, np.log1p(stats[:, 1])])
+
+    def predict_log(self, products: List[Dict]) -> np.ndarray:
+        if not products:
+            return np.zeros(0)
+        indptr, indices, values = self.hasher.transform(products)
+        rows = np.repeat(np.arange(len(products)), np.diff(indptr))
+        hashed = np.bincount(rows, weights=self.weights[indices] * values, minlength=len(products))
+        dense = self.seller_features(products) @ self.weights[self.hasher.dim:]
+        return self.bias + hashed + dense
+
+    def predict(self, products: List[Dict]) -> List[Dict]:
+        check_products(products)
+        log_prices = self.predict_log(products)
+        spread = np.array([
+            self.category_std.get(p.get("category"), self.residual_std) for p in products
+        ])
+        low, high = np.expm1(log_prices - 1.2816 * spread), np.expm1(log_prices + 1.2816 * spread)
+        predicted = np.expm1(log_prices)
+        return [
+            {
+                "predicted_price": round(max(float(p), 0.01), 2),
+                "price_range": [round(max(float(lo), 0.01), 2), round(float(hi), 2)],
+                "confidence": round(float(np.exp(-s)), 2),
+            }
+            for p, lo, hi, s in zip(predicted, low, high, spread)
+        ]
+
+    def save(self, directory: Path = MODEL_DIR) -> Path:
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"price_model-{self.version}.npz"
+        seller_ids = list(self.seller_stats)
+        # Plain string arrays, so loading never needs pickle; "" stands for no seller
+        np.savez_compressed(
+            path,
+            weights=self.weights,
+            seller_ids=np.array([s or "" for s in seller_ids], dtype=str),
+            seller_means=np.array([self.seller_stats[s][0] for s in seller_ids]),
+            seller_counts=np.array([self.seller_stats[s][1] for s in seller_ids], dtype=np.int64),
+            meta=np.array(json.dumps({
+                "version": self.version,
+                "dim": self.hasher.dim,
+                "bias": self.bias,
+                "global_mean": self.global_mean,
+                "category_std": self.category_std,
+                "residual_std": self.residual_std,
+                "metrics": self.metrics,
+            }))
+        )
+        logger.info(f"🏷️ Price model {self.version} saved to {path}")
+        return path
+
+    @classmethod
+    def load(cls, path: Path) -> "PriceModel":
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            seller_stats = {
+                str(seller_id) or None: (float(mean), int(count))
+                for seller_id, mean, count in zip(data["seller_ids"], data["seller_means"], data["seller_counts"])
+            }
+            return cls(
+                weights=data["weights"],
+                bias=meta["bias"],
+                seller_stats=seller_stats,
+                global_mean=meta["global_mean"],
+                category_std=meta["category_std"],
+                residual_std=meta["residual_std"],
+                version=meta["version"],
+                metrics=meta["metrics"],
+                dim=meta["dim"]
+            )
+
+def latest_artifact(directory: Path = MODEL_DIR) -> Optional[Path]:
+    # Versions are UTC timestamps, so lexical order is chronological
+    artifacts = sorted(Path(directory).glob("price_model-*.npz"))
+    return artifacts[-1] if artifacts else None
+
+def _batches(products, holdout: float, seed: int) -> Iterator[Tuple[List[Dict], List[Dict]]]:
+    """
+    Priced products in TRAIN_CHUNK batches, split into (train, holdout)
+    The split is drawn from a fresh generator each pass, so every pass over the
+    same rows in the same order makes the same split.
+    """
+    rng = np.random.default_rng(seed)
+    batch: List[Dict] = []
+
+    def split():
+        is_holdout = rng.random(len(batch)) < holdout
+        return [p for p, h in zip(batch, is_holdout) if not h], [p for p, h in zip(batch, is_holdout) if h]
+
+    for product in (products() if callable(products) else products):
+        if (product.get("price") or 0) > 0:
+            batch.append(product)
+            if len(batch) == TRAIN_CHUNK:
+                yield split()
+                batch = []
+    if batch:
+        yield split()
+
+def train(products: Union[Iterable[Dict], Callable[[], Iterable[Dict]]], dim: int = HASH_DIM,
+          alpha: float = RIDGE_ALPHA, holdout: float = 0.1, seed: int = 0) -> PriceModel:
+    """
+    Fit ridge regression on log1p(price) via the normal equations
+    products is read three times (seller stats, X^T X, residuals) in chunks, so
+    pass a list or a callable returning a fresh cursor in a stable order; memory
+    stays bounded by dim^2 plus one chunk.
+    """
+    if not callable(products) and iter(products) is products:
+        raise TypeError("products must be re-iterable or a callable returning a fresh iterable")
+    started = time.perf_counter()
+
+    def target_sums(holdout: float):
+        total, count, sellers = 0.0, 0, {}
+        for train_rows, _ in _batches(products, holdout, seed):
+            targets = np.log1p(np.array([p["price"] for p in train_rows], dtype=np.float64))
+            total += float(targets.sum())
+            count += len(train_rows)
+            for product, target in zip(train_rows, targets.tolist()):
+                entry = sellers.setdefault(product.get("seller_id"), [0.0, 0])
+                entry[0] += target
+                entry[1] += 1
+        return total, count, sellers
+
+    total, count, sums = target_sums(holdout)
+    if not count:
+        # Too few rows for a holdout: train on everything
+        holdout = 0.0
+        total, count, sums = target_sums(holdout)
+    if not count:
+        raise ValueError("No priced products to train on")
+    bias = total / count
+    global_mean = bias
+    # Shrink seller means toward the catalog mean for sellers with few listings
+    seller_stats = {
+        seller_id: ((seller_total + 5 * global_mean) / (seller_count + 5), seller_count)
+        for seller_id, (seller_total, seller_count) in sums.items()
+    }
+
+    model = PriceModel(np.zeros(dim + SELLER_FEATURES), bias, seller_stats, global_mean, {}, 1.0,
+                       version=datetime.utcnow().strftime("%Y%m%dT%H%M%S"), dim=dim)
+    width = dim + SELLER_FEATURES
+    gram = np.zeros((width, width))
+    moment = np.zeros(width)
+    for train_rows, _ in _batches(products, holdout, seed):
+        x = np.hstack([densify(*model.hasher.transform(train_rows), dim), model.seller_features(train_rows)])
+        y = np.log1p(np.array([p["price"] for p in train_rows], dtype=np.float64)) - bias
+        gram += x.T @ x
+        moment += x.T @ y
+    gram[np.diag_indices(width)] += alpha
+    model.weights = np.linalg.solve(gram, moment)
+
+    # Residual moments: [count, sum, sum of squares, sum of absolute percentage errors]
+    fit, held_out = np.zeros(4), np.zeros(4)
+    by_category: Dict[str, np.ndarray] = {}
+
+    def accumulate(moments: np.ndarray, rows: List[Dict]) -> np.ndarray:
+        actual = np.array([p["price"] for p in rows], dtype=np.float64)
+        residual = np.log1p(actual) - model.predict_log(rows)
+        predicted = np.expm1(np.log1p(actual) - residual)
+        moments += [len(rows), residual.sum(), (residual ** 2).sum(), (np.abs(predicted - actual) / actual).sum()]
+        return residual
+
+    for train_rows, test_rows in _batches(products, holdout, seed):
+        residual = accumulate(fit, train_rows)
+        for product, r in zip(train_rows, residual.tolist()):
+            moments = by_category.setdefault(product.get("category"), np.zeros(3))
+            moments += [1, r, r * r]
+        if test_rows:
+            accumulate(held_out, test_rows)
+
+    def std(moments: np.ndarray) -> float:
+        n, total, squares = moments[:3]
+        return float(np.sqrt(max(squares / n - (total / n) ** 2, 0.0)))
+
+    model.residual_std = std(fit)
+    model.category_std = {c: std(m) for c, m in by_category.items() if m[0] >= 20}
+
+    evaluate = held_out if held_out[0] else fit
+    model.metrics = {
+        "train_rows": int(fit[0]),
+        "holdout_rows": int(held_out[0]),
+        "rmse_log": round(float(np.sqrt(evaluate[2] / evaluate[0])), 4),
+        "mape": round(float(evaluate[3] / evaluate[0]), 4),
+        "train_seconds": round(time.perf_counter() - started, 2),
+    }
+    logger.info(f"🏷️ Price model trained: {model.metrics}")
+    return model
+
+TRAIN_PROJECTION = {"_id": 0, "title": 1, "description": 1, "category": 1, "tags": 1, "seller_id": 1, "price": 1}
+
+price_model: Optional[PriceModel] = None
+
+async def load_latest(directory: Path = MODEL_DIR) -> Optional[PriceModel]:
+    """Load the newest artifact once at startup; training is offline (see main)"""
+    global price_model
+    path = latest_artifact(directory)
+    if path is None:
+        logger.warning("⚠️ No price model artifact; run `python -m utils.price_model` to train one")
+        return None
+    price_model = await asyncio.to_thread(PriceModel.load, path)
+    logger.info(f"🏷️ Price model {price_model.version} loaded")
+    return price_model
+
+def main():
+    """Offline training entry point"""
+    import argparse
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--alpha", type=float, default=RIDGE_ALPHA)
+    parser.add_argument("--dim", type=int, default=HASH_DIM)
+    parser.add_argument("--out", type=Path, default=MODEL_DIR)
+    args = parser.parse_args()
+
+    load_dotenv(Path(__file__).parent.parent / ".env")
+    logging.basicConfig(level=logging.INFO)
+    client = MongoClient(os.environ["MONGO_URL"])
+    collection = client[os.environ["DB_NAME"]].products
+    # A fresh cursor per training pass, in _id order so every pass sees the same split
+    model = train(
+        lambda: collection.find({"is_published": True}, TRAIN_PROJECTION).sort("_id", 1).batch_size(TRAIN_CHUNK),
+        dim=args.dim, alpha=args.alpha
+    )
+    model.save(args.out)
+    print(json.dumps({"version": model.version, **model.metrics}, indent=2))
+
+if __name__ == "__main__":
+    main()
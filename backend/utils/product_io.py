@@ -0,0 +1,185 @@
+import csv
+import io
+import json
+import os
+from datetime import datetime
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+from pydantic import ValidationError
+from pymongo import UpdateOne
+
+from models.product import ProductCreate, ProductInDB
+
+IMPORT_CHUNK_SIZE = int(os.getenv("PRODUCT_IMPORT_CHUNK_SIZE", "1000"))
+EXPORT_BATCH_SIZE = int(os.getenv("PRODUCT_EXPORT_BATCH_SIZE", "1000"))
+# Per-row errors beyond this are counted but not listed
+MAX_REPORTED_ERRORS = 1000
+
+CSV_COLUMNS = ["id", "sku", "title", "description", "category", "price", "quantity", "tags", "images",
+               "is_published", "is_approved", "created_at", "updated_at"]
+# Multi-valued CSV cells
+LIST_SEPARATOR = "|"
+CREATE_FIELDS = set(ProductCreate.model_fields)
+EXPORT_PROJECTION = {"_id": 0, **{field: 1 for field in CSV_COLUMNS}}
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Split an upload stream into decoded lines without buffering the whole body"""
+    pending = b""
+    first = True
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            if first:
+                line = line.removeprefix(b"\xef\xbb\xbf")
+                first = False
+            yield line.decode("utf-8").rstrip("\r")
+    if pending:
+        if first:
+            pending = pending.removeprefix(b"\xef\xbb\xbf")
+        yield pending.decode("utf-8").rstrip("\r")
+
+def csv_row_to_dict(header: List[str], values: List[str]) -> Dict:
+    row = {key.strip(): value for key, value in zip(header, values) if key.strip() and value != ""}
+    for key in ("tags",):
+        if key in row:
+            row[key] = [v.strip() for v in row[key].split(LIST_SEPARATOR) if v.strip()]
+    if "images" in row:
+        urls = [v.strip() for v in row["images"].split(LIST_SEPARATOR) if v.strip()]
+        row["images"] = [
+            {"url": url, "filename": url.rsplit("/", 1)[-1], "is_primary": i == 0}
+            for i, url in enumerate(urls)
+        ]
+    return row
+
+async def iter_csv_rows(lines: AsyncIterator[str]) -> AsyncIterator[Tuple[int, Optional[Dict], Optional[str]]]:
+    """
+    Yield (row_number, row, error) from CSV lines
+    Quoted fields may span lines; a record is complete once its quotes balance.
+    """
+    header: Optional[List[str]] = None
+    record = ""
+    row_number = 0
+    async for line in lines:
+        record = f"{record}\n{line}" if record else line
+        if record.count('"') % 2:
+            continue
+        text, record = record, ""
+        if not text.strip():
+            continue
+        values = next(csv.reader([text]))
+        if header is None:
+            header = [h.strip().lower() for h in values]
+            continue
+        row_number += 1
+        yield row_number, csv_row_to_dict(header, values), None
+    if record:
+        yield row_number + 1, None, "Unterminated quoted field"
+
+async def iter_jsonl_rows(lines: AsyncIterator[str]) -> AsyncIterator[Tuple[int, Optional[Dict], Optional[str]]]:
+    row_number = 0
+    async for line in lines:
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield row_number, None, f"Invalid JSON: {e.msg}"
+            continue
+        if not isinstance(row, dict):
+            yield row_number, None, "Each line must be a JSON object"
+            continue
+        yield row_number, row, None
+
+def validate_row(row: Dict) -> Tuple[Optional[ProductCreate], Optional[str]]:
+    try:
+        product = ProductCreate(**{k: v for k, v in row.items() if k in CREATE_FIELDS})
+    except ValidationError as e:
+        return None, "; ".join(f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors())
+    if not product.sku:
+        return None, "sku: required for bulk import"
+    return product, None
+
+def upsert_operations(product: ProductCreate, seller_id: str, seller_name: str, now: datetime) -> List[UpdateOne]:
+    """
+    Insert-or-update keyed on (seller_id, sku), as two operations
+    The first inserts a missing product, unpublished and unapproved. The second
+    sets only the columns the row supplied, and only when one differs, so
+    updated_at (and every cache keyed on it) moves on real changes. Stock is
+    left alone on existing products: holds and checkouts own `quantity` there.
+    """
+    document = ProductInDB(**product.dict(), seller_id=seller_id, seller_name=seller_name,
+                           created_at=now, updated_at=now).dict()
+    key = {"seller_id": seller_id, "sku": product.sku}
+    # Columns the row supplied; title, description, category and price always are
+    content = {field: document[field] for field in product.dict(exclude_unset=True) if field not in ("sku", "quantity")}
+    return [
+        UpdateOne(key, {"$setOnInsert": document}, upsert=True),
+        UpdateOne(
+            {**key, "$or": [{field: {"$ne": value}} for field, value in content.items()]},
+            {"$set": {**content, "updated_at": now}}
+        )
+    ]
+
+class ImportReport:
+    """Counts and per-row errors for one import"""
+
+    def __init__(self):
+        self.rows = 0
+        self.inserted = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.error_count = 0
+        self.errors: List[Dict] = []
+
+    def error(self, row: int, message: str, sku: Optional[str] = None):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row, "sku": sku, "error": message})
+
+    def dict(self) -> Dict:
+        return {
+            "rows": self.rows,
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "unchanged": self.unchanged,
+            "failed": self.error_count,
+            "errors": self.errors,
+            "errors_truncated": self.error_count > len(self.errors)
+        }
+
+def plan_chunk(rows: Iterable[Tuple[int, Dict]], report: ImportReport) -> List[Tuple[int, ProductCreate]]:
+    """Validate a chunk; a repeated sku keeps its last row"""
+    valid: Dict[str, Tuple[int, ProductCreate]] = {}
+    for row_number, row in rows:
+        product, error = validate_row(row)
+        if error:
+            report.error(row_number, error, row.get("sku"))
+            continue
+        valid[product.sku] = (row_number, product)
+    return list(valid.values())
+
+def _cell(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        return LIST_SEPARATOR.join(v["url"] if isinstance(v, dict) else str(v) for v in value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+def csv_header() -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(CSV_COLUMNS)
+    return buffer.getvalue()
+
+def csv_lines(products: List[Dict]) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for product in products:
+        writer.writerow([_cell(product.get(column)) for column in CSV_COLUMNS])
+    return buffer.getvalue()
+
+def jsonl_lines(products: List[Dict]) -> str:
+    return "".join(json.dumps(product, default=_cell) + "\n" for product in products)
@@ -0,0 +1,461 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from utils.search_index import INDEX_PROJECTION, VISIBLE_QUERY, catch_up, is_searchable, reconcile_deletions
+
+logger = logging.getLogger(__name__)
+
+RECS_TOP_K = int(os.getenv("RECS_TOP_K", "20"))
+RECS_REFRESH_SECONDS = int(os.getenv("RECS_REFRESH_SECONDS", "60"))
+RECS_HISTORY_PER_USER = int(os.getenv("RECS_HISTORY_PER_USER", "20"))
+RECS_MAX_USERS = int(os.getenv("RECS_MAX_USERS", "200000"))
+RECS_VIEW_FLUSH_SECONDS = float(os.getenv("RECS_VIEW_FLUSH_SECONDS", "5"))
+RECS_VIEW_BUFFER_MAX = int(os.getenv("RECS_VIEW_BUFFER_MAX", "50000"))
+# Orders are stamped before their transaction commits, so each pass re-reads
+# this far behind the watermark and skips the order ids it already counted
+RECS_ORDER_SKEW_SECONDS = float(os.getenv("RECS_ORDER_SKEW_SECONDS", "300"))
+RECS_INGEST_BATCH = int(os.getenv("RECS_INGEST_BATCH", "1000"))
+ORDER_WEIGHT = 1.0
+VIEW_WEIGHT = 0.25
+# Baskets are capped so one bulk order cannot add n^2 pairs
+MAX_BASKET_ITEMS = 50
+# Views only pair with the last few items the same user looked at
+VIEW_WINDOW = 5
+
+def pack_pairs(rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+    return (rows.astype(np.int64) << 32) | cols.astype(np.int64)
+
+class CooccurrenceMatrix:
+    """
+    Sparse item-item co-occurrence weights in sorted COO form
+    Keys pack (row, col) into one int64 so merges are a single np.unique.
+    """
+
+    def __init__(self):
+        self.keys = np.zeros(0, dtype=np.int64)
+        self.weights = np.zeros(0, dtype=np.float32)
+
+    @property
+    def nnz(self) -> int:
+        return len(self.keys)
+
+    def add(self, rows: np.ndarray, cols: np.ndarray, weights: np.ndarray):
+        if not len(rows):
+            return
+        keys = np.concatenate([self.keys, pack_pairs(rows, cols)])
+        weights = np.concatenate([self.weights, weights.astype(np.float32)])
+        self.keys, inverse = np.unique(keys, return_inverse=True)
+        self.weights = np.bincount(inverse, weights=weights).astype(np.float32)
+
+    def rows(self) -> np.ndarray:
+        return (self.keys >> 32).astype(np.int32)
+
+    def cols(self) -> np.ndarray:
+        return (self.keys & 0xFFFFFFFF).astype(np.int32)
+
+def top_k_per_row(rows: np.ndarray, cols: np.ndarray, scores: np.ndarray, k: int,
+                  n_rows: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """CSR (indptr, cols, scores) keeping the k best entries of each row"""
+    order = np.lexsort((-scores, rows))
+    rows, cols, scores = rows[order], cols[order], scores[order]
+    starts = np.searchsorted(rows, np.arange(n_rows))
+    rank = np.arange(len(rows)) - starts[rows]
+    keep = rank < k
+    rows, cols, scores = rows[keep], cols[keep], scores[keep]
+    indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n_rows), out=indptr[1:])
+    return indptr, cols, scores
+
+class ProductRecommender:
+    """
+    Item-to-item recommender served from in-memory neighbour tables
+    Co-purchases and co-views are accumulated incrementally into a sparse
+    co-occurrence matrix; cosine-normalised top-k neighbours are recomputed
+    by the background job, so requests only slice precomputed arrays.
+    """
+
+    def __init__(self, k: int = RECS_TOP_K):
+        self._lock = threading.RLock()
+        self.k = k
+        self.codes: Dict[str, int] = {}
+        self.product_ids: List[str] = []
+        self.titles: List[str] = []
+        self.category_names: List[str] = []
+        self.category_codes: Dict[str, int] = {}
+        self.categories = np.zeros(0, dtype=np.int32)
+        self.visible = np.zeros(0, dtype=bool)
+        self.popularity = np.zeros(0, dtype=np.float64)
+        self.matrix = CooccurrenceMatrix()
+        self.history: "OrderedDict[str, deque]" = OrderedDict()
+        self.watermark: Optional[datetime] = None
+        self.orders_watermark: Optional[datetime] = None
+        self.views_watermark: Optional[datetime] = None
+        # Order ids ingested inside the skew window, with their created_at
+        self.recent_orders: Dict[str, datetime] = {}
+        self.dirty = False
+        # Serving tables, swapped in whole by rebuild_neighbors
+        self.neighbor_indptr = np.zeros(1, dtype=np.int64)
+        self.neighbor_codes = np.zeros(0, dtype=np.int32)
+        self.neighbor_scores = np.zeros(0, dtype=np.float32)
+        self.popular_by_category: Dict[int, List[int]] = {}
+        self.popular: List[int] = []
+
+    @property
+    def docno(self) -> Dict[str, int]:
+        """Visible products, for reconcile_deletions"""
+        return {pid: n for pid, n in self.codes.items() if self.visible[n]}
+
+    def _code(self, product_id: str) -> int:
+        n = self.codes.get(product_id)
+        if n is None:
+            n = len(self.product_ids)
+            self.codes[product_id] = n
+            self.product_ids.append(product_id)
+            self.titles.append("")
+            if n >= len(self.visible):
+                capacity = max(1024, 2 * len(self.visible))
+                for name in ("categories", "visible", "popularity"):
+                    old = getattr(self, name)
+                    grown = np.zeros(capacity, dtype=old.dtype)
+                    grown[:len(old)] = old
+                    setattr(self, name, grown)
+            self.categories[n] = -1
+        return n
+
+    def _category_code(self, category: str) -> int:
+        code = self.category_codes.get(category)
+        if code is None:
+            code = len(self.category_names)
+            self.category_names.append(category)
+            self.category_codes[category] = code
+        return code
+
+    def upsert(self, product: Dict):
+        """Record catalog metadata; hidden products are never recommended"""
+        with self._lock:
+            n = self._code(product["id"])
+            self.titles[n] = product.get("title", "")
+            self.categories[n] = self._category_code(product.get("category", ""))
+            self.visible[n] = is_searchable(product)
+            updated_at = product.get("updated_at")
+            if isinstance(updated_at, datetime) and (self.watermark is None or updated_at > self.watermark):
+                self.watermark = updated_at
+            self.dirty = True
+
+    def remove(self, product_id: str):
+        with self._lock:
+            n = self.codes.get(product_id)
+            if n is not None:
+                self.visible[n] = False
+                self.dirty = True
+
+    def _remember(self, user_id: str, codes: Iterable[int]) -> List[int]:
+        """Append to a user's recent items, returns the items seen before"""
+        recent = self.history.get(user_id)
+        if recent is None:
+            recent = self.history[user_id] = deque(maxlen=RECS_HISTORY_PER_USER)
+            if len(self.history) > RECS_MAX_USERS:
+                self.history.popitem(last=False)
+        else:
+            self.history.move_to_end(user_id)
+        before = list(recent)
+        recent.extend(codes)
+        return before
+
+    def ingest_orders(self, orders: Iterable[Dict]) -> int:
+        """Add co-purchase pairs for every pair of items in each order"""
+        rows, cols, purchased = [], [], []
+        count = 0
+        with self._lock:
+            for order in orders:
+                order_id = order.get("id")
+                if order_id is not None:
+                    if order_id in self.recent_orders:
+                        continue
+                    self.recent_orders[order_id] = order.get("created_at") or datetime.utcnow()
+                count += 1
+                created_at = order.get("created_at")
+                if isinstance(created_at, datetime) and (self.orders_watermark is None or created_at > self.orders_watermark):
+                    self.orders_watermark = created_at
+                if order.get("status") == "cancelled":
+                    continue
+                basket = list(dict.fromkeys(
+                    self._code(item["product_id"]) for item in order.get("items", [])
+                ))[:MAX_BASKET_ITEMS]
+                purchased.extend(basket)
+                if order.get("user_id"):
+                    self._remember(order["user_id"], basket)
+                if len(basket) > 1:
+                    for i in basket:
+                        for j in basket:
+                            if i != j:
+                                rows.append(i)
+                                cols.append(j)
+            if self.orders_watermark is not None:
+                horizon = self.orders_watermark - timedelta(seconds=RECS_ORDER_SKEW_SECONDS)
+                self.recent_orders = {oid: at for oid, at in self.recent_orders.items() if at >= horizon}
+            np.add.at(self.popularity, np.array(purchased, dtype=np.int64), ORDER_WEIGHT)
+            self.matrix.add(np.array(rows, dtype=np.int64), np.array(cols, dtype=np.int64),
+                            np.full(len(rows), ORDER_WEIGHT))
+            self.dirty = self.dirty or count > 0
+        return count
+
+    def ingest_views(self, views: Iterable[Dict]) -> int:
+        """Add co-view pairs between a viewed product and the user's recent items"""
+        rows, cols, viewed = [], [], []
+        count = 0
+        with self._lock:
+            for view in views:
+                count += 1
+                viewed_at = view.get("viewed_at")
+                if isinstance(viewed_at, datetime) and (self.views_watermark is None or viewed_at > self.views_watermark):
+                    self.views_watermark = viewed_at
+                n = self._code(view["product_id"])
+                viewed.append(n)
+                for previous in self._remember(view["user_id"], [n])[-VIEW_WINDOW:]:
+                    if previous != n:
+                        rows.extend((previous, n))
+                        cols.extend((n, previous))
+            np.add.at(self.popularity, np.array(viewed, dtype=np.int64), VIEW_WEIGHT)
+            self.matrix.add(np.array(rows, dtype=np.int64), np.array(cols, dtype=np.int64),
+                            np.full(len(rows), VIEW_WEIGHT))
+            self.dirty = self.dirty or count > 0
+        return count
+
+    def rebuild_neighbors(self):
+        """Recompute cosine-normalised top-k neighbour lists and popularity fallbacks"""
+        started = time.perf_counter()
+        with self._lock:
+            size = len(self.product_ids)
+            rows, cols = self.matrix.rows(), self.matrix.cols()
+            popularity = self.popularity[:size]
+            visible = self.visible[:size]
+            categories = self.categories[:size].copy()
+            weights = self.matrix.weights
+            self.dirty = False
+
+        keep = visible[cols]
+        rows, cols, weights = rows[keep], cols[keep], weights[keep]
+        norm = np.sqrt(popularity[rows] * popularity[cols])
+        scores = np.minimum(weights / np.where(norm > 0, norm, 1), 1.0).astype(np.float32)
+        indptr, codes, scores = top_k_per_row(rows, cols, scores, self.k, size)
+
+        ranked = np.flatnonzero(visible)
+        ranked = ranked[np.argsort(-popularity[ranked], kind="stable")]
+        popular_by_category: Dict[int, List[int]] = {}
+        for n in ranked.tolist():
+            bucket = popular_by_category.setdefault(int(categories[n]), [])
+            if len(bucket) < self.k:
+                bucket.append(n)
+
+        with self._lock:
+            self.neighbor_indptr, self.neighbor_codes, self.neighbor_scores = indptr, codes, scores
+            self.popular_by_category = popular_by_category
+            self.popular = ranked[:self.k].tolist()
+        logger.info(
+            f"🧩 Recommendations rebuilt: {size} products, {len(codes)} neighbours "
+            f"in {(time.perf_counter() - started) * 1000:.0f}ms"
+        )
+
+    def _item(self, n: int, score: float, reason: str) -> Dict:
+        return {
+            "product_id": self.product_ids[n],
+            "product_name": self.titles[n],
+            "confidence_score": round(float(score), 4),
+            "reason": reason
+        }
+
+    def _neighbors(self, n: int) -> Tuple[np.ndarray, np.ndarray]:
+        if n + 1 >= len(self.neighbor_indptr):
+            return self.neighbor_codes[:0], self.neighbor_scores[:0]
+        start, end = self.neighbor_indptr[n], self.neighbor_indptr[n + 1]
+        return self.neighbor_codes[start:end], self.neighbor_scores[start:end]
+
+    def _fill(self, picked: List[Dict], exclude: set, limit: int, category: Optional[int] = None):
+        """Top up with popular products, same category first"""
+        sources = []
+        if category is not None and category >= 0:
+            sources.append((self.popular_by_category.get(category, []), f"Popular in {self.category_names[category]}"))
+        sources.append((self.popular, "Popular right now"))
+        for candidates, reason in sources:
+            for rank, n in enumerate(candidates):
+                if len(picked) >= limit:
+                    return
+                if n not in exclude and self.visible[n]:
+                    exclude.add(n)
+                    picked.append(self._item(n, 1.0 / (rank + 2), reason))
+
+    def similar(self, product_id: str, limit: int = 10) -> List[Dict]:
+        """Products bought or viewed together with one product"""
+        n = self.codes.get(product_id)
+        picked: List[Dict] = []
+        exclude = {n}
+        if n is not None:
+            codes, scores = self._neighbors(n)
+            for code, score in zip(codes.tolist(), scores.tolist()):
+                if len(picked) >= limit:
+                    break
+                if self.visible[code]:
+                    exclude.add(code)
+                    picked.append(self._item(code, score, "Frequently bought or viewed together"))
+        self._fill(picked, exclude, limit, int(self.categories[n]) if n is not None else None)
+        return picked
+
+    def recommend(self, user_id: str, limit: int = 5) -> List[Dict]:
+        """Blend the neighbour lists of a user's recent items, newest weighted highest"""
+        recent = list(self.history.get(user_id, ()))
+        picked: List[Dict] = []
+        exclude = set(recent)
+        if recent:
+            slices = [self._neighbors(n) for n in reversed(recent)]
+            codes = np.concatenate([c for c, _ in slices])
+            decay = np.concatenate([
+                np.full(len(c), 1.0 / (1 + 0.2 * age)) for age, (c, _) in enumerate(slices)
+            ])
+            weights = np.concatenate([w for _, w in slices]) * decay
+            sources = np.repeat(np.array(recent[::-1]), [len(c) for c, _ in slices])
+            candidates, first, inverse = np.unique(codes, return_index=True, return_inverse=True)
+            totals = np.bincount(inverse, weights=weights)
+            for i in np.argsort(-totals, kind="stable").tolist():
+                if len(picked) >= limit:
+                    break
+                code = int(candidates[i])
+                if code in exclude or not self.visible[code]:
+                    continue
+                exclude.add(code)
+                source = self.titles[sources[first[i]]] or "a similar item"
+                picked.append(self._item(code, min(totals[i], 1.0), f"Because you showed interest in {source}"))
+        self._fill(picked, exclude, limit, int(self.categories[recent[-1]]) if recent else None)
+        return picked
+
+    def replace(self, other: "ProductRecommender"):
+        with self._lock:
+            self.__dict__.update({k: v for k, v in other.__dict__.items() if k != "_lock"})
+
+product_recommender = ProductRecommender()
+
+ORDER_PROJECTION = {"_id": 0, "id": 1, "user_id": 1, "status": 1, "created_at": 1, "items.product_id": 1}
+VIEW_PROJECTION = {"_id": 0, "user_id": 1, "product_id": 1, "viewed_at": 1}
+
+async def ensure_indexes(db):
+    await db.product_views.create_index("viewed_at", expireAfterSeconds=90 * 24 * 3600)
+    await db.orders.create_index("created_at")
+
+class ViewLog:
+    """
+    Buffered writer for signed-in product views
+    Product reads only append to memory; views are written with one insert_many
+    per flush. Views are best effort: past max_buffer, or when a flush fails,
+    they are dropped rather than held.
+    """
+
+    def __init__(self, db, flush_interval: float = RECS_VIEW_FLUSH_SECONDS, max_buffer: int = RECS_VIEW_BUFFER_MAX):
+        self.db = db
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.dropped = 0
+        self._buffer: List[Tuple[str, str]] = []
+        self._running = False
+
+    def record(self, user_id: str, product_id: str):
+        if len(self._buffer) >= self.max_buffer:
+            self.dropped += 1
+            return
+        self._buffer.append((user_id, product_id))
+
+    async def flush(self) -> int:
+        views, self._buffer = self._buffer, []
+        if not views:
+            return 0
+        # Stamped at write time, in order, so ingest_new_interactions' viewed_at
+        # watermark never skips views that waited in the buffer
+        now = datetime.utcnow()
+        try:
+            await self.db.product_views.insert_many([
+                {"user_id": user_id, "product_id": product_id, "viewed_at": now + timedelta(microseconds=i)}
+                for i, (user_id, product_id) in enumerate(views)
+            ], ordered=False)
+        except Exception as e:
+            self.dropped += len(views)
+            logger.warning(f"⚠️ Dropped {len(views)} product views: {e}")
+            return 0
+        return len(views)
+
+    async def run_forever(self):
+        self._running = True
+        logger.info("🧩 Product view log started")
+        while self._running:
+            try:
+                await asyncio.sleep(self.flush_interval)
+                await self.flush()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"❌ Product view flush error: {e}")
+
+    def stop(self):
+        self._running = False
+
+async def _ingest_batches(cursor, ingest) -> int:
+    """Feed a cursor to ingest in RECS_INGEST_BATCH sized lists"""
+    count, batch = 0, []
+    async for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= RECS_INGEST_BATCH:
+            count += ingest(batch)
+            batch = []
+    if batch:
+        count += ingest(batch)
+    return count
+
+async def ingest_new_interactions(db, recommender: ProductRecommender) -> int:
+    """Pull orders and views newer than the recommender's watermarks"""
+    order_query = {}
+    if recommender.orders_watermark:
+        since = recommender.orders_watermark - timedelta(seconds=RECS_ORDER_SKEW_SECONDS)
+        order_query = {"created_at": {"$gte": since}}
+    count = await _ingest_batches(
+        db.orders.find(order_query, ORDER_PROJECTION).sort("created_at", 1), recommender.ingest_orders
+    )
+    view_query = {"viewed_at": {"$gt": recommender.views_watermark}} if recommender.views_watermark else {}
+    count += await _ingest_batches(
+        db.product_views.find(view_query, VIEW_PROJECTION).sort("viewed_at", 1), recommender.ingest_views
+    )
+    return count
+
+async def warm_start(db) -> ProductRecommender:
+    """Build the recommender from the catalog, orders and views"""
+    started = time.perf_counter()
+    recommender = ProductRecommender()
+    async for product in db.products.find(VISIBLE_QUERY, INDEX_PROJECTION):
+        recommender.upsert(product)
+    await ingest_new_interactions(db, recommender)
+    await asyncio.to_thread(recommender.rebuild_neighbors)
+    product_recommender.replace(recommender)
+    logger.info(
+        f"🧩 Recommender ready: {len(product_recommender.product_ids)} products "
+        f"in {(time.perf_counter() - started) * 1000:.0f}ms"
+    )
+    return product_recommender
+
+async def refresh_periodically(db, recommender: ProductRecommender = product_recommender,
+                               interval: int = RECS_REFRESH_SECONDS):
+    """Background job: fold in new interactions and catalog changes, then recompute neighbours"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await catch_up(db, recommender)
+            await reconcile_deletions(db, recommender)
+            await ingest_new_interactions(db, recommender)
+            if recommender.dirty:
+                await asyncio.to_thread(recommender.rebuild_neighbors)
+        except Exception as e:
+            logger.error(f"❌ Recommendation refresh failed: {e}")
@@ -0,0 +1,90 @@
+from datetime import datetime
+from typing import Dict, Optional
+
+from pymongo import ASCENDING
+
+from utils.sentiment import sentiment_label
+
+STARS = (5, 4, 3, 2, 1)
+
+def rating_increment(rating: int, sign: int = 1) -> Dict[str, int]:
+    """$inc for adding (sign=1) or removing (sign=-1) one rating"""
+    return {"review_count": sign, "rating_sum": sign * rating, f"stars.{rating}": sign}
+
+def rating_change(old: int, new: int) -> Dict[str, int]:
+    if old == new:
+        return {}
+    return {"rating_sum": new - old, f"stars.{old}": -1, f"stars.{new}": 1}
+
+def sentiment_removal(review: Dict) -> Dict[str, float]:
+    """$inc undoing a scored review's contribution to review_sentiment"""
+    if review.get("sentiment_scored_at") is None or review.get("sentiment_score") is None:
+        return {}
+    score = review["sentiment_score"]
+    return {"review_count": -1, "score_sum": -score, sentiment_label(score): -1}
+
+def stats_response(counters: Optional[Dict]) -> Dict:
+    """ReviewStats fields from a review_stats document"""
+    counters = counters or {}
+    count = counters.get("review_count", 0)
+    stars = counters.get("stars", {})
+    return {
+        "average_rating": round(counters.get("rating_sum", 0) / count, 2) if count else 0.0,
+        "total_reviews": count,
+        "rating_distribution": {star: stars.get(str(star), 0) for star in STARS}
+    }
+
+class ReviewStatsStore:
+    """
+    Per-product rating counters in review_stats, moved by $inc on every review write
+    so product pages read ReviewStats with one indexed lookup.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.collection = db.review_stats
+
+    async def ensure_indexes(self):
+        await self.collection.create_index("product_id", unique=True)
+
+    async def apply(self, product_id: str, inc: Dict):
+        if not inc:
+            return
+        await self.collection.update_one(
+            {"product_id": product_id},
+            {"$inc": inc, "$set": {"updated_at": datetime.utcnow()}},
+            upsert=True
+        )
+
+    async def get(self, product_id: str) -> Dict:
+        return stats_response(await self.collection.find_one({"product_id": product_id}, {"_id": 0}))
+
+    async def rebuild(self, product_id: str) -> Dict:
+        """Recount one product from its reviews; repairs drift after an interrupted write"""
+        groups = await self.db.reviews.aggregate([
+            {"$match": {"product_id": product_id}},
+            {"$group": {"_id": "$rating", "count": {"$sum": 1}}}
+        ]).to_list(None)
+        stars = {str(g["_id"]): g["count"] for g in groups}
+        counters = {
+            "product_id": product_id,
+            "review_count": sum(stars.values()),
+            "rating_sum": sum(int(star) * count for star, count in stars.items()),
+            "stars": stars,
+            "updated_at": datetime.utcnow()
+        }
+        await self.collection.replace_one({"product_id": product_id}, counters, upsert=True)
+        return stats_response(counters)
+
+async def ensure_purchase_index(db):
+    """Supports the verified-purchase lookup: orders by buyer and product"""
+    await db.orders.create_index([("user_id", ASCENDING), ("items.product_id", ASCENDING)])
+
+async def is_verified_purchase(db, user_id: str, product_id: str) -> bool:
+    """The buyer has a paid or delivered order for the product; a placed, unpaid order does not count"""
+    order = await db.orders.find_one(
+        {"user_id": user_id, "items.product_id": product_id, "status": {"$ne": "cancelled"},
+         "$or": [{"payment_status": "paid"}, {"status": "delivered"}]},
+        {"_id": 1}
+    )
+    return order is not None
@@ -0,0 +1,118 @@
+import asyncio
+import logging
+import os
+import random
+from datetime import datetime
+from typing import Dict, List
+
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+HELPFUL_VOTE_SHARDS = int(os.getenv("HELPFUL_VOTE_SHARDS", "16"))
+HELPFUL_FLUSH_SECONDS = float(os.getenv("HELPFUL_FLUSH_SECONDS", "2"))
+HELPFUL_FLUSH_BATCH = int(os.getenv("HELPFUL_FLUSH_BATCH", "500"))
+
+def shard_totals(shards: List[Dict]) -> Dict[str, int]:
+    """review_id -> summed count over its counter shards"""
+    totals: Dict[str, int] = {}
+    for shard in shards:
+        totals[shard["review_id"]] = totals.get(shard["review_id"], 0) + shard.get("count", 0)
+    return totals
+
+class HelpfulVotes:
+    """
+    Helpful votes on reviews
+    One review_votes document per (review, voter) under a unique index dedupes
+    votes. Counts go to one of HELPFUL_VOTE_SHARDS counter documents picked at
+    random, so a popular review spreads its writes instead of contending on one
+    document. A write-behind flusher sums the shards of reviews touched since the
+    last pass and $sets reviews.helpful_count, which backs the helpfulness index.
+    """
+
+    def __init__(self, db, shards: int = HELPFUL_VOTE_SHARDS, flush_interval: float = HELPFUL_FLUSH_SECONDS,
+                 batch_size: int = HELPFUL_FLUSH_BATCH):
+        self.db = db
+        self.votes = db.review_votes
+        self.counters = db.review_vote_counters
+        self.shards = shards
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._running = False
+
+    async def ensure_indexes(self):
+        await self.votes.create_index([("review_id", ASCENDING), ("user_id", ASCENDING)], unique=True)
+        await self.counters.create_index([("review_id", ASCENDING), ("shard", ASCENDING)], unique=True)
+        await self.counters.create_index("dirty", sparse=True)
+
+    async def _count(self, review_id: str, amount: int):
+        await self.counters.update_one(
+            {"review_id": review_id, "shard": random.randrange(self.shards)},
+            {"$inc": {"count": amount}, "$set": {"dirty": True}},
+            upsert=True
+        )
+
+    async def vote(self, review_id: str, user_id: str) -> bool:
+        """False if this user already voted"""
+        try:
+            await self.votes.insert_one({"review_id": review_id, "user_id": user_id, "created_at": datetime.utcnow()})
+        except DuplicateKeyError:
+            return False
+        await self._count(review_id, 1)
+        return True
+
+    async def unvote(self, review_id: str, user_id: str) -> bool:
+        result = await self.votes.delete_one({"review_id": review_id, "user_id": user_id})
+        if not result.deleted_count:
+            return False
+        await self._count(review_id, -1)
+        return True
+
+    async def has_voted(self, review_id: str, user_id: str) -> bool:
+        return await self.votes.find_one({"review_id": review_id, "user_id": user_id}, {"_id": 1}) is not None
+
+    async def count(self, review_id: str) -> int:
+        """Exact count from the shards, ahead of the flushed reviews.helpful_count"""
+        shards = await self.counters.find({"review_id": review_id}, {"_id": 0, "review_id": 1, "count": 1}).to_list(None)
+        return shard_totals(shards).get(review_id, 0)
+
+    async def forget(self, review_id: str):
+        """Drop votes and counters of a deleted review"""
+        await self.votes.delete_many({"review_id": review_id})
+        await self.counters.delete_many({"review_id": review_id})
+
+    async def flush_once(self) -> int:
+        dirty = await self.counters.find({"dirty": True}, {"_id": 0, "review_id": 1}).limit(self.batch_size).to_list(None)
+        review_ids = list({d["review_id"] for d in dirty})
+        if not review_ids:
+            return 0
+
+        # Clear the flags before summing: a vote landing after this re-marks its
+        # shard and is picked up by the next pass, so no increment is lost
+        await self.counters.update_many({"review_id": {"$in": review_ids}, "dirty": True}, {"$unset": {"dirty": ""}})
+        shards = await self.counters.find(
+            {"review_id": {"$in": review_ids}}, {"_id": 0, "review_id": 1, "count": 1}
+        ).to_list(None)
+        totals = shard_totals(shards)
+        await self.db.reviews.bulk_write([
+            UpdateOne({"id": review_id}, {"$set": {"helpful_count": totals.get(review_id, 0)}})
+            for review_id in review_ids
+        ], ordered=False)
+        return len(review_ids)
+
+    async def run_forever(self):
+        self._running = True
+        logger.info("👍 Helpful vote flusher started")
+        while self._running:
+            try:
+                if await self.flush_once() < self.batch_size:
+                    await asyncio.sleep(self.flush_interval)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"❌ Helpful vote flusher error: {e}")
+                await asyncio.sleep(self.flush_interval)
+
+    def stop(self):
+        self._running = False
@@ -0,0 +1,332 @@
+"""
+Sales rollups
+
+Time-bucketed sales, revenue, views and conversion per seller, category,
+product and for the whole platform, at day, week and month granularity.
+Orders and cancellations move the buckets as they happen; product views are
+buffered in process and flushed in bulk. Report endpoints read a handful of
+bucket documents instead of aggregating raw orders.
+
+Rebuild the order metrics from raw orders (views are left untouched; orders
+placed while the buckets are reset may be counted twice, so stop checkout first):
+
+    cd backend && python -m utils.sales_rollups --since 2026-01-01
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_FLUSH_SECONDS = float(os.getenv("ROLLUP_FLUSH_SECONDS", "10"))
+ROLLUP_BACKFILL_BATCH = int(os.getenv("ROLLUP_BACKFILL_BATCH", "1000"))
+PERIODS = ("day", "week", "month")
+DIMENSIONS = ("all", "seller", "category", "product")
+ORDER_METRICS = ("orders", "units", "revenue")
+
+# (dimension, key, period, start)
+BucketKey = Tuple[str, str, str, datetime]
+
+def period_start(ts: datetime, period: str) -> datetime:
+    """Start of the day, ISO week (Monday) or month containing ts"""
+    day = ts.replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == "day":
+        return day
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    if period == "month":
+        return day.replace(day=1)
+    raise ValueError(f"Unknown period: {period}")
+
+def _dimension_keys(seller_id: str, category: Optional[str], product_id: str) -> List[Tuple[str, str]]:
+    keys = [("all", "all"), ("seller", seller_id), ("product", product_id)]
+    if category:
+        keys.append(("category", category))
+    return keys
+
+def order_increments(items: Iterable[Dict], created_at: datetime, categories: Dict[str, str],
+                     sign: int = 1) -> Tuple[Dict[BucketKey, Dict[str, float]], Dict[BucketKey, Dict]]:
+    """
+    $inc per bucket for the given order lines, and the identifying fields of each bucket
+    An order counts once towards every seller, category and product it touches.
+    """
+    per_key: Dict[Tuple[str, str], Dict[str, float]] = {}
+    meta: Dict[Tuple[str, str], Dict] = {}
+    for item in items:
+        amount = item["price"] * item["quantity"]
+        for dimension, key in _dimension_keys(item["seller_id"], categories.get(item["product_id"]), item["product_id"]):
+            inc = per_key.setdefault((dimension, key), {"orders": sign, "units": 0, "revenue": 0.0})
+            inc["units"] += sign * item["quantity"]
+            inc["revenue"] += sign * amount
+            if dimension == "product":
+                meta[(dimension, key)] = {"seller_id": item["seller_id"]}
+
+    increments: Dict[BucketKey, Dict[str, float]] = {}
+    bucket_meta: Dict[BucketKey, Dict] = {}
+    for period in PERIODS:
+        start = period_start(created_at, period)
+        for (dimension, key), inc in per_key.items():
+            bucket = (dimension, key, period, start)
+            increments[bucket] = {**inc, "revenue": round(inc["revenue"], 2)}
+            bucket_meta[bucket] = meta.get((dimension, key), {})
+    return increments, bucket_meta
+
+def view_increments(product: Dict, viewed_at: datetime) -> Dict[BucketKey, Dict[str, int]]:
+    return {
+        (dimension, key, period, period_start(viewed_at, period)): {"views": 1}
+        for period in PERIODS
+        for dimension, key in _dimension_keys(product["seller_id"], product.get("category"), product["id"])
+    }
+
+def merge_increments(target: Dict[BucketKey, Dict], increments: Dict[BucketKey, Dict]):
+    for bucket, inc in increments.items():
+        current = target.setdefault(bucket, {})
+        for field, amount in inc.items():
+            current[field] = current.get(field, 0) + amount
+
+def report_row(bucket: Dict) -> Dict:
+    views = bucket.get("views", 0)
+    orders = bucket.get("orders", 0)
+    return {
+        "key": bucket["key"],
+        "period": bucket["period"],
+        "start": bucket["start"],
+        "orders": orders,
+        "units": bucket.get("units", 0),
+        "revenue": round(bucket.get("revenue", 0.0), 2),
+        "views": views,
+        "conversion": round(orders / views, 4) if views else 0.0
+    }
+
+class SalesRollups:
+    """
+    Bucket documents in sales_rollups, one per (dimension, key, period, start)
+    Order metrics are $inc'ed as orders are placed or cancelled (against the
+    order's own date), so they are exact. Views are counted in memory and
+    flushed every ROLLUP_FLUSH_SECONDS; a crash loses at most one interval of views.
+    """
+
+    def __init__(self, db, flush_interval: float = ROLLUP_FLUSH_SECONDS):
+        self.db = db
+        self.collection = db.sales_rollups
+        self.flush_interval = flush_interval
+        self._views: Dict[BucketKey, Dict[str, int]] = {}
+        self._view_meta: Dict[BucketKey, Dict] = {}
+        self._running = False
+
+    async def ensure_indexes(self):
+        await self.collection.create_index(
+            [("dimension", ASCENDING), ("key", ASCENDING), ("period", ASCENDING), ("start", ASCENDING)], unique=True
+        )
+        # Leaderboards: top sellers / categories / products in one bucket
+        await self.collection.create_index(
+            [("dimension", ASCENDING), ("period", ASCENDING), ("start", ASCENDING), ("revenue", DESCENDING)]
+        )
+        await self.collection.create_index(
+            [("seller_id", ASCENDING), ("period", ASCENDING), ("start", ASCENDING), ("revenue", DESCENDING)],
+            partialFilterExpression={"dimension": "product"}
+        )
+
+    def _updates(self, increments: Dict[BucketKey, Dict], meta: Optional[Dict[BucketKey, Dict]] = None) -> List[UpdateOne]:
+        now = datetime.utcnow()
+        return [
+            UpdateOne(
+                {"dimension": dimension, "key": key, "period": period, "start": start},
+                {"$inc": inc, "$set": {"updated_at": now, **(meta or {}).get((dimension, key, period, start), {})}},
+                upsert=True
+            )
+            for (dimension, key, period, start), inc in increments.items()
+        ]
+
+    async def _write(self, increments: Dict[BucketKey, Dict], meta: Optional[Dict[BucketKey, Dict]] = None):
+        if increments:
+            await self.collection.bulk_write(self._updates(increments, meta), ordered=False)
+
+    async def categories(self, product_ids: Iterable[str]) -> Dict[str, str]:
+        return {
+            p["id"]: p.get("category")
+            async for p in self.db.products.find({"id": {"$in": list(set(product_ids))}}, {"_id": 0, "id": 1, "category": 1})
+        }
+
+    async def record_order(self, order: Dict) -> bool:
+        """
+        Count a placed order once; a replay (checkout retry, sweeper) is a no-op
+        The order is flagged rolled_up before the increments and unflagged if they fail.
+        """
+        claimed = await self.db.orders.update_one(
+            {"id": order["id"], "rolled_up": {"$ne": True}}, {"$set": {"rolled_up": True}}
+        )
+        if not claimed.modified_count:
+            return False
+        try:
+            categories = await self.categories(i["product_id"] for i in order["items"])
+            await self._write(*order_increments(order["items"], order["created_at"], categories))
+        except Exception:
+            await self.db.orders.update_one({"id": order["id"]}, {"$set": {"rolled_up": False}})
+            raise
+        return True
+
+    async def record_cancellation(self, seller_order: Dict):
+        """Take a cancelled seller part out of the buckets of its order date"""
+        # The order still counts for the platform, and for any category, while other sellers' parts stand
+        others = await self.db.seller_orders.find(
+            {"order_id": seller_order["order_id"], "seller_id": {"$ne": seller_order["seller_id"]},
+             "status": {"$ne": "cancelled"}},
+            {"_id": 0, "items.product_id": 1}
+        ).to_list(None)
+        other_ids = [i["product_id"] for part in others for i in part["items"]]
+        categories = await self.categories([i["product_id"] for i in seller_order["items"]] + other_ids)
+        increments, _ = order_increments(seller_order["items"], seller_order["created_at"], categories, sign=-1)
+        still_counted = {("all", "all")} if others else set()
+        still_counted.update(("category", categories[pid]) for pid in other_ids if categories.get(pid))
+        for bucket, inc in increments.items():
+            if bucket[:2] in still_counted:
+                inc["orders"] = 0
+        await self._write(increments)
+
+    def count_view(self, product: Dict, viewed_at: Optional[datetime] = None):
+        increments = view_increments(product, viewed_at or datetime.utcnow())
+        merge_increments(self._views, increments)
+        for bucket in increments:
+            if bucket[0] == "product":
+                self._view_meta[bucket] = {"seller_id": product["seller_id"]}
+
+    async def flush_views(self) -> int:
+        views, self._views = self._views, {}
+        meta, self._view_meta = self._view_meta, {}
+        try:
+            await self._write(views, meta)
+        except Exception:
+            merge_increments(self._views, views)
+            self._view_meta.update(meta)
+            raise
+        return len(views)
+
+    async def report(self, dimension: str, key: str, period: str, since: datetime,
+                     until: Optional[datetime] = None) -> List[Dict]:
+        """Trend for one key, oldest bucket first"""
+        query = {"dimension": dimension, "key": key, "period": period,
+                 "start": {"$gte": period_start(since, period), "$lte": until or datetime.utcnow()}}
+        rows = await self.collection.find(query, {"_id": 0}).sort("start", ASCENDING).to_list(None)
+        return [report_row(r) for r in rows]
+
+    async def top(self, dimension: str, period: str, start: datetime, limit: int = 10,
+                  seller_id: Optional[str] = None) -> List[Dict]:
+        """Highest revenue keys in one bucket"""
+        query = {"dimension": dimension, "period": period, "start": period_start(start, period)}
+        if seller_id:
+            query["seller_id"] = seller_id
+        rows = await self.collection.find(query, {"_id": 0}).sort("revenue", DESCENDING).limit(limit).to_list(limit)
+        return [report_row(r) for r in rows]
+
+    async def backfill(self, since: datetime, batch_size: int = ROLLUP_BACKFILL_BATCH) -> Dict[str, int]:
+        """
+        Recompute order metrics for every bucket starting at or after `since`
+        `since` is rounded down to its month, and each period is reset from its own
+        bucket boundary so no bucket is half rebuilt. Order metrics in those buckets
+        are zeroed, then orders created before the reset finished are streamed in
+        batches and re-added; orders placed after it are counted live. Cancelled
+        seller parts are skipped.
+
+        Live updates are not fenced off: an order whose own increment lands while
+        the buckets are being zeroed is counted twice. Run this with checkout
+        stopped (or quiet) when the numbers must be exact.
+        """
+        since = period_start(since, "month")
+        boundaries = {period: period_start(since, period) for period in PERIODS}
+        for period, start in boundaries.items():
+            await self.collection.update_many(
+                {"period": period, "start": {"$gte": start}}, {"$set": {metric: 0 for metric in ORDER_METRICS}}
+            )
+        # Taken after the reset, so an order counted live before it is zeroed and re-added here
+        until = datetime.utcnow()
+
+        stats = {"orders": 0, "buckets": 0}
+        cursor = self.db.orders.find(
+            {"created_at": {"$gte": min(boundaries.values()), "$lt": until}, "status": {"$ne": "cancelled"}},
+            {"_id": 0, "id": 1, "items": 1, "created_at": 1},
+            batch_size=batch_size
+        )
+        batch: List[Dict] = []
+        async for order in cursor:
+            batch.append(order)
+            if len(batch) >= batch_size:
+                stats["buckets"] += await self._backfill_batch(batch, boundaries)
+                stats["orders"] += len(batch)
+                batch = []
+        if batch:
+            stats["buckets"] += await self._backfill_batch(batch, boundaries)
+            stats["orders"] += len(batch)
+        logger.info(f"📊 Rebuilt sales rollups from {stats['orders']} orders since {since:%Y-%m-%d}")
+        return stats
+
+    async def _backfill_batch(self, orders: List[Dict], boundaries: Dict[str, datetime]) -> int:
+        cancelled = {
+            (p["order_id"], p["seller_id"])
+            async for p in self.db.seller_orders.find(
+                {"order_id": {"$in": [o["id"] for o in orders]}, "status": "cancelled"},
+                {"_id": 0, "order_id": 1, "seller_id": 1}
+            )
+        }
+        categories = await self.categories(i["product_id"] for o in orders for i in o["items"])
+        increments: Dict[BucketKey, Dict] = {}
+        meta: Dict[BucketKey, Dict] = {}
+        for order in orders:
+            items = [i for i in order["items"] if (order["id"], i["seller_id"]) not in cancelled]
+            order_inc, order_meta = order_increments(items, order["created_at"], categories)
+            merge_increments(increments, {b: inc for b, inc in order_inc.items() if b[3] >= boundaries[b[2]]})
+            meta.update(order_meta)
+        for inc in increments.values():
+            inc["revenue"] = round(inc["revenue"], 2)
+        await self._write(increments, meta)
+        # Counted now, so a later replay of record_order does not add them again
+        await self.db.orders.update_many({"id": {"$in": [o["id"] for o in orders]}}, {"$set": {"rolled_up": True}})
+        return len(increments)
+
+    async def run_forever(self):
+        self._running = True
+        logger.info("📊 Sales rollup view flusher started")
+        while self._running:
+            try:
+                await asyncio.sleep(self.flush_interval)
+                await self.flush_views()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"❌ Sales rollup flush error: {e}")
+
+    def stop(self):
+        self._running = False
+
+def main():
+    """Backfill entry point"""
+    import argparse
+    import json
+    from pathlib import Path
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--since", type=datetime.fromisoformat, required=True, help="YYYY-MM-DD; rounded down to the month")
+    parser.add_argument("--batch-size", type=int, default=ROLLUP_BACKFILL_BATCH)
+    args = parser.parse_args()
+
+    load_dotenv(Path(__file__).parent.parent / ".env")
+    logging.basicConfig(level=logging.INFO)
+
+    async def run():
+        client = AsyncIOMotorClient(os.environ["MONGO_URL"])
+        rollups = SalesRollups(client[os.environ["DB_NAME"]])
+        await rollups.ensure_indexes()
+        stats = await rollups.backfill(args.since, args.batch_size)
+        client.close()
+        return stats
+
+    print(json.dumps(asyncio.run(run()), indent=2))
+
+if __name__ == "__main__":
+    main()
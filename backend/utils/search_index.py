@@ -0,0 +1,527 @@
+import asyncio
+import bisect
+import fcntl
+import heapq
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+from array import array
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_PATH = Path(os.getenv(
+    "SEARCH_SNAPSHOT_PATH",
+    Path(__file__).parent.parent / "data" / "search_index.snapshot"
+))
+SNAPSHOT_VERSION = 2
+SNAPSHOT_INTERVAL_SECONDS = int(os.getenv("SEARCH_SNAPSHOT_INTERVAL_SECONDS", "300"))
+SYNC_INTERVAL_SECONDS = int(os.getenv("SEARCH_SYNC_INTERVAL_SECONDS", "15"))
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has in is it its of on or that the this to with".split()
+)
+
+# Field weights folded into term frequency
+FIELD_WEIGHTS = (("title", 3), ("tags", 2), ("description", 1))
+
+PRICE_BUCKETS = [0, 25, 50, 100, 250, 500, 1000]
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase alphanumeric tokens without stopwords"""
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+def price_bucket(price: float) -> str:
+    i = bisect.bisect_right(PRICE_BUCKETS, price) - 1
+    if i + 1 < len(PRICE_BUCKETS):
+        return f"{PRICE_BUCKETS[i]}-{PRICE_BUCKETS[i + 1]}"
+    return f"{PRICE_BUCKETS[-1]}+"
+
+def is_searchable(product: Dict) -> bool:
+    """Same visibility rule as the public product listing"""
+    return bool(product.get("is_published")) and bool(product.get("is_approved"))
+
+class ProductSearchIndex:
+    """
+    In-process inverted index over published, approved products
+    BM25 ranking over title/tags/description, category and price facets,
+    prefix autocomplete, incremental upserts and an npz snapshot.
+
+    Postings are append-only int32/uint16 arrays scored with NumPy. An update
+    tombstones the old document number and appends a new one; tombstones are
+    dropped by compact() once they pass COMPACT_RATIO of the index.
+    """
+
+    k1 = 1.2
+    b = 0.75
+    COMPACT_RATIO = 0.25
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.postings: Dict[str, Tuple[array, array]] = {}
+        self.doc_ids: List[Optional[str]] = []
+        self.titles: List[str] = []
+        self.docno: Dict[str, int] = {}
+        self.category_names: List[str] = []
+        self.category_codes: Dict[str, int] = {}
+        self.doc_len = np.zeros(1024, dtype=np.float32)
+        self.prices = np.zeros(1024, dtype=np.float64)
+        self.categories = np.zeros(1024, dtype=np.int32)
+        self.alive = np.zeros(1024, dtype=bool)
+        self.total_len = 0.0
+        self.watermark: Optional[datetime] = None
+        self._vocab: Optional[List[str]] = None
+        self.dirty = False
+        self.path = SNAPSHOT_PATH
+
+    def __len__(self):
+        return len(self.docno)
+
+    @property
+    def size(self) -> int:
+        """Allocated document numbers, live or tombstoned"""
+        return len(self.doc_ids)
+
+    # Writes
+
+    def _grow(self, needed: int):
+        capacity = len(self.alive)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name in ("doc_len", "prices", "categories", "alive"):
+            old = getattr(self, name)
+            grown = np.zeros(capacity, dtype=old.dtype)
+            grown[:len(old)] = old
+            setattr(self, name, grown)
+
+    def _category_code(self, category: str) -> int:
+        code = self.category_codes.get(category)
+        if code is None:
+            code = len(self.category_names)
+            self.category_names.append(category)
+            self.category_codes[category] = code
+        return code
+
+    def upsert(self, product: Dict):
+        """Index or re-index a product document; hidden products are removed"""
+        # Hidden products advance the watermark too, or catch_up re-reads them every pass
+        updated_at = product.get("updated_at")
+        with self._lock:
+            if isinstance(updated_at, datetime) and (self.watermark is None or updated_at > self.watermark):
+                self.watermark = updated_at
+        if not is_searchable(product):
+            self.remove(product["id"])
+            return
+
+        tf: Counter = Counter()
+        for field, weight in FIELD_WEIGHTS:
+            value = product.get(field) or ""
+            text = " ".join(value) if isinstance(value, list) else value
+            for token in tokenize(text):
+                tf[token] += weight
+
+        with self._lock:
+            self._remove_locked(product["id"])
+            n = self.size
+            self._grow(n + 1)
+            length = sum(tf.values())
+            self.doc_ids.append(product["id"])
+            self.titles.append(product.get("title", ""))
+            self.doc_len[n] = length
+            self.prices[n] = float(product.get("price", 0))
+            self.categories[n] = self._category_code(product.get("category", ""))
+            self.alive[n] = True
+            self.docno[product["id"]] = n
+            self.total_len += length
+
+            for term, count in tf.items():
+                postings = self.postings.get(term)
+                if postings is None:
+                    postings = self.postings[term] = (array("i"), array("H"))
+                    self._vocab = None
+                postings[0].append(n)
+                postings[1].append(min(count, 65535))
+            self.dirty = True
+
+            if self.size - len(self.docno) > self.COMPACT_RATIO * max(self.size, 1024):
+                self._compact_locked()
+
+    def remove(self, product_id: str):
+        with self._lock:
+            self._remove_locked(product_id)
+
+    def _remove_locked(self, product_id: str):
+        n = self.docno.pop(product_id, None)
+        if n is None:
+            return
+        self.alive[n] = False
+        self.total_len -= float(self.doc_len[n])
+        self.doc_ids[n] = None
+        self.dirty = True
+
+    def bulk_load(self, products: Iterable[Dict]) -> int:
+        count = 0
+        for product in products:
+            self.upsert(product)
+            count += 1
+        return count
+
+    def compact(self):
+        """Drop tombstoned documents and renumber densely"""
+        with self._lock:
+            self._compact_locked()
+
+    def _compact_locked(self):
+        size = self.size
+        alive = self.alive[:size]
+        remap = np.cumsum(alive, dtype=np.int64) - 1
+        keep = np.flatnonzero(alive)
+
+        postings = {}
+        for term, (docs, tfs) in self.postings.items():
+            d = np.frombuffer(docs, dtype=np.int32)
+            mask = alive[d]
+            if not mask.any():
+                continue
+            postings[term] = (
+                array("i", remap[d[mask]].astype(np.int32).tobytes()),
+                array("H", np.frombuffer(tfs, dtype=np.uint16)[mask].tobytes())
+            )
+            del d, mask
+
+        self.postings = postings
+        self.doc_ids = [self.doc_ids[n] for n in keep]
+        self.titles = [self.titles[n] for n in keep]
+        self.docno = {product_id: i for i, product_id in enumerate(self.doc_ids)}
+        count = len(keep)
+        for name in ("doc_len", "prices", "categories", "alive"):
+            old = getattr(self, name)
+            fresh = np.zeros(max(1024, len(old)), dtype=old.dtype)
+            fresh[:count] = old[keep]
+            setattr(self, name, fresh)
+        self._vocab = None
+
+    # Reads
+
+    def _score(self, terms: List[str]) -> np.ndarray:
+        """BM25 score for every document number (0 where unmatched)"""
+        size = self.size
+        scores = np.zeros(size, dtype=np.float32)
+        live = len(self.docno)
+        if not live:
+            return scores
+        avgdl = self.total_len / live
+        k1, b = self.k1, self.b
+        for term in set(terms):
+            postings = self.postings.get(term)
+            if postings is None:
+                continue
+            docs = np.frombuffer(postings[0], dtype=np.int32)
+            tfs = np.frombuffer(postings[1], dtype=np.uint16).astype(np.float32)
+            df = int(np.count_nonzero(self.alive[docs]))
+            if not df:
+                del docs
+                continue
+            idf = math.log(1 + (live - df + 0.5) / (df + 0.5))
+            norm = k1 * (1 - b + b * self.doc_len[docs] / avgdl)
+            scores[docs] += idf * tfs * (k1 + 1) / (tfs + norm)
+            del docs
+        scores *= self.alive[:size]
+        return scores
+
+    def search(
+        self,
+        query: str,
+        category: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        limit: int = 20,
+        offset: int = 0
+    ) -> Dict:
+        """BM25 search with category and price facets"""
+        terms = tokenize(query)
+        with self._lock:
+            scores = self._score(terms)
+            matched = np.flatnonzero(scores)
+            prices = self.prices[matched]
+            categories = self.categories[matched]
+
+            in_price = np.ones(len(matched), dtype=bool)
+            if min_price is not None:
+                in_price &= prices >= min_price
+            if max_price is not None:
+                in_price &= prices <= max_price
+            if category is not None:
+                code = self.category_codes.get(category, -1)
+                in_category = categories == code
+            else:
+                in_category = np.ones(len(matched), dtype=bool)
+
+            # Each facet ignores its own filter so the UI can offer alternatives
+            category_counts = np.bincount(categories[in_price], minlength=len(self.category_names))
+            bucket_idx = np.searchsorted(PRICE_BUCKETS, prices[in_category], side="right") - 1
+            price_counts = np.bincount(bucket_idx, minlength=len(PRICE_BUCKETS))
+
+            hits = matched[in_price & in_category]
+            hit_scores = scores[hits]
+            wanted = min(offset + limit, len(hits))
+            if wanted <= 0:
+                top = hits[:0]
+            else:
+                part = np.argpartition(-hit_scores, wanted - 1)[:wanted] if wanted < len(hits) else np.arange(len(hits))
+                top = hits[part[np.argsort(-hit_scores[part], kind="stable")]][offset:]
+
+            results = [
+                {
+                    "product_id": self.doc_ids[n],
+                    "title": self.titles[n],
+                    "category": self.category_names[self.categories[n]],
+                    "price": float(self.prices[n]),
+                    "score": round(float(scores[n]), 4)
+                }
+                for n in top.tolist()
+            ]
+            category_facets = {
+                self.category_names[code]: int(count)
+                for code, count in sorted(enumerate(category_counts.tolist()), key=lambda c: -c[1])
+                if count
+            }
+
+        return {
+            "query": query,
+            "total": int(len(hits)),
+            "results": results,
+            "facets": {
+                "category": category_facets,
+                "price": {
+                    price_bucket(PRICE_BUCKETS[i]): int(count)
+                    for i, count in enumerate(price_counts.tolist())
+                    if count
+                }
+            }
+        }
+
+    def autocomplete(self, prefix: str, limit: int = 10) -> List[str]:
+        """Vocabulary terms starting with prefix, most frequent first"""
+        tokens = tokenize(prefix)
+        if not tokens:
+            return []
+        stem = tokens[-1]
+        with self._lock:
+            if self._vocab is None:
+                self._vocab = sorted(self.postings)
+            vocab = self._vocab
+            start = bisect.bisect_left(vocab, stem)
+            end = bisect.bisect_left(vocab, stem + "\uffff")
+            candidates = [(len(self.postings[t][0]), t) for t in vocab[start:end]]
+        head = " ".join(tokens[:-1])
+        return [f"{head} {t}".strip() for _, t in heapq.nlargest(limit, candidates)]
+
+    def replace(self, other: "ProductSearchIndex"):
+        """Swap in the contents of another index (used after warm start)"""
+        with self._lock:
+            for field in ("postings", "doc_ids", "titles", "docno", "category_names", "category_codes",
+                          "doc_len", "prices", "categories", "alive", "total_len", "watermark", "path"):
+                setattr(self, field, getattr(other, field))
+            self._vocab = None
+            self.dirty = other.dirty
+
+    # Snapshots
+
+    def save(self, path: Optional[Path] = None) -> bool:
+        """
+        Write a compressed npz snapshot atomically (to self.path by default)
+        Only the process holding the snapshot's writer lock writes; the others
+        skip, so workers never race on the same file.
+        """
+        path = Path(path or self.path)
+        if not holds_writer_lock(path):
+            return False
+        with self._lock:
+            self._compact_locked()
+            count = self.size
+            terms = list(self.postings)
+            meta = {
+                "version": SNAPSHOT_VERSION,
+                "watermark": self.watermark.isoformat() if self.watermark else None,
+                "doc_ids": self.doc_ids,
+                "titles": self.titles,
+                "category_names": self.category_names,
+                "terms": terms,
+            }
+            arrays = {
+                "doc_len": self.doc_len[:count].copy(),
+                "prices": self.prices[:count].copy(),
+                "categories": self.categories[:count].copy(),
+                "offsets": np.cumsum([0] + [len(self.postings[t][0]) for t in terms], dtype=np.int64),
+                "docs": np.frombuffer(b"".join(self.postings[t][0].tobytes() for t in terms), dtype=np.int32),
+                "tfs": np.frombuffer(b"".join(self.postings[t][1].tobytes() for t in terms), dtype=np.uint16),
+            }
+            self.dirty = False
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            np.savez_compressed(f, meta=np.array(json.dumps(meta)), **arrays)
+        os.replace(tmp, path)
+        logger.info(f"🔎 Search index snapshot saved: {count} products -> {path}")
+        return True
+
+    @classmethod
+    def load(cls, path: Path = SNAPSHOT_PATH) -> Optional["ProductSearchIndex"]:
+        path = Path(path)
+        if not path.exists():
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                meta = json.loads(str(data["meta"]))
+                arrays = {name: data[name] for name in ("doc_len", "prices", "categories", "offsets", "docs", "tfs")}
+        except Exception as e:
+            logger.warning(f"⚠️ Could not read search snapshot {path}: {e}")
+            return None
+        if meta.get("version") != SNAPSHOT_VERSION:
+            return None
+
+        index = cls()
+        index.path = path
+        count = len(meta["doc_ids"])
+        index._grow(count)
+        index.doc_ids = meta["doc_ids"]
+        index.titles = meta["titles"]
+        index.docno = {product_id: n for n, product_id in enumerate(index.doc_ids)}
+        index.category_names = meta["category_names"]
+        index.category_codes = {name: code for code, name in enumerate(index.category_names)}
+        index.doc_len[:count] = arrays["doc_len"]
+        index.prices[:count] = arrays["prices"]
+        index.categories[:count] = arrays["categories"]
+        index.alive[:count] = True
+        index.total_len = float(index.doc_len[:count].sum())
+
+        offsets = arrays["offsets"].tolist()
+        docs, tfs = arrays["docs"], arrays["tfs"]
+        for i, term in enumerate(meta["terms"]):
+            lo, hi = offsets[i], offsets[i + 1]
+            index.postings[term] = (array("i", docs[lo:hi].tobytes()), array("H", tfs[lo:hi].tobytes()))
+        index.watermark = datetime.fromisoformat(meta["watermark"]) if meta["watermark"] else None
+        return index
+
+_writer_locks: Dict[Path, object] = {}
+
+def holds_writer_lock(path: Path) -> bool:
+    """
+    Whether this process owns the snapshot at path
+    The first process to flock `<path>.lock` keeps it for its lifetime.
+    """
+    path = Path(path)
+    if path not in _writer_locks:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        handle = open(path.with_name(f"{path.name}.lock"), "a+")
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            handle = None
+        _writer_locks[path] = handle
+    return _writer_locks[path] is not None
+
+# Projection needed to index a product
+INDEX_PROJECTION = {
+    "_id": 0, "id": 1, "title": 1, "description": 1, "tags": 1, "category": 1,
+    "price": 1, "is_published": 1, "is_approved": 1, "updated_at": 1
+}
+
+search_index = ProductSearchIndex()
+
+VISIBLE_QUERY = {"is_published": True, "is_approved": True}
+
+async def catch_up(db, index: ProductSearchIndex) -> int:
+    """
+    Apply product changes made since the index watermark
+    A snapshot without a watermark catches up from the epoch. Products stamped
+    exactly at the watermark are re-read, since more than one write can share
+    it, but those the index already agrees with are skipped so every pass is not
+    a no-op rewrite.
+    """
+    watermark = index.watermark or datetime(1970, 1, 1)
+    count = 0
+    async for product in db.products.find({"updated_at": {"$gte": watermark}}, INDEX_PROJECTION):
+        if product.get("updated_at") == index.watermark and (product["id"] in index.docno) == is_searchable(product):
+            continue
+        index.upsert(product)
+        count += 1
+    return count
+
+async def reconcile_deletions(db, index: ProductSearchIndex) -> int:
+    """Drop products deleted or hidden outside this process"""
+    live = {p["id"] async for p in db.products.find(VISIBLE_QUERY, {"_id": 0, "id": 1})}
+    stale = [product_id for product_id in list(index.docno) if product_id not in live]
+    for product_id in stale:
+        index.remove(product_id)
+    return len(stale)
+
+async def warm_start(db, path: Path = SNAPSHOT_PATH) -> ProductSearchIndex:
+    """
+    Load the snapshot and catch up from the products collection
+    Falls back to a full rebuild when there is no usable snapshot.
+    """
+    started = time.perf_counter()
+    index = ProductSearchIndex.load(path)
+
+    if index is None:
+        index = ProductSearchIndex()
+        index.path = Path(path)
+        async for product in db.products.find(VISIBLE_QUERY, INDEX_PROJECTION):
+            index.upsert(product)
+        source = "rebuild"
+    else:
+        await catch_up(db, index)
+        await reconcile_deletions(db, index)
+        source = "snapshot"
+
+    search_index.replace(index)
+    logger.info(
+        f"🔎 Search index ready from {source}: {len(search_index)} products "
+        f"in {(time.perf_counter() - started) * 1000:.0f}ms"
+    )
+    return search_index
+
+async def maintain_periodically(
+    db,
+    indexes: Optional[List] = None,
+    sync_interval: int = SYNC_INTERVAL_SECONDS,
+    snapshot_interval: int = SNAPSHOT_INTERVAL_SECONDS
+):
+    """
+    Background task keeping this process's indexes current
+    Picks up writes made by other workers and persists indexes when dirty.
+    """
+    indexes = indexes or [search_index]
+    last_snapshot = last_reconcile = time.monotonic()
+    while True:
+        await asyncio.sleep(sync_interval)
+        try:
+            now = time.monotonic()
+            reconcile = now - last_reconcile >= snapshot_interval
+            snapshot = now - last_snapshot >= snapshot_interval
+            for index in indexes:
+                await catch_up(db, index)
+                if reconcile:
+                    await reconcile_deletions(db, index)
+                if snapshot and index.dirty:
+                    await asyncio.to_thread(index.save)
+            if reconcile:
+                last_reconcile = now
+            if snapshot:
+                last_snapshot = now
+        except Exception as e:
+            logger.error(f"❌ Search index maintenance failed: {e}")
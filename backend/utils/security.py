@@ -6,7 +6,7 @@ import os
 import secrets
 from cryptography.fernet import Fernet
 import base64
-from hashlib import sha256
+from hashlib import sha256, blake2b
 
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -45,7 +45,8 @@ def create_refresh_token(data: dict) -> str:
     """Create JWT refresh token"""
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
-    to_encode.update({"exp": expire, "type": "refresh"})
+    # jti keeps tokens issued in the same second distinct
+    to_encode.update({"exp": expire, "type": "refresh", "jti": secrets.token_hex(8)})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
@@ -57,6 +58,10 @@ def decode_token(token: str) -> Optional[dict]:
     except JWTError:
         return None
 
+def hash_token(token: str) -> str:
+    """Fixed-size (32 hex chars) digest used to store and look up refresh tokens"""
+    return blake2b(token.encode(), digest_size=16).hexdigest()
+
 def generate_verification_token() -> str:
     """Generate random verification token"""
     return secrets.token_urlsafe(32)
@@ -0,0 +1,149 @@
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+
+from utils.http_cache import cursor_query, encode_cursor
+
+# Fulfilment moves forward through these; cancelled can happen before shipping
+ORDER_STATUS_FLOW = ["pending", "processing", "shipped", "delivered"]
+ORDER_STATUSES = set(ORDER_STATUS_FLOW) | {"cancelled"}
+
+def seller_projections(order: Dict) -> List[Dict]:
+    """One seller_orders document per seller in the order, holding only that seller's lines"""
+    by_seller: Dict[str, List[Dict]] = {}
+    for item in order["items"]:
+        by_seller.setdefault(item["seller_id"], []).append(item)
+    return [
+        {
+            "id": f"{order['id']}:{seller_id}",
+            "order_id": order["id"],
+            "order_number": order["order_number"],
+            "seller_id": seller_id,
+            "buyer_id": order["user_id"],
+            "items": items,
+            "item_count": sum(i["quantity"] for i in items),
+            "subtotal": round(sum(i["price"] * i["quantity"] for i in items), 2),
+            "status": order["status"],
+            "payment_status": order["payment_status"],
+            "shipping_address": order["shipping_address"],
+            "tracking_number": None,
+            "created_at": order["created_at"],
+            "updated_at": order["created_at"]
+        }
+        for seller_id, items in by_seller.items()
+    ]
+
+def can_transition(current: str, new: str) -> bool:
+    if current == new:
+        return True
+    if new == "cancelled":
+        return current in ("pending", "processing")
+    if current == "cancelled" or new not in ORDER_STATUS_FLOW:
+        return False
+    return ORDER_STATUS_FLOW.index(new) > ORDER_STATUS_FLOW.index(current)
+
+def derive_order_status(statuses: List[str]) -> str:
+    """Order status from its sellers' parts: the least advanced part that is not cancelled"""
+    active = [s for s in statuses if s != "cancelled"]
+    if not active:
+        return "cancelled"
+    return min(active, key=ORDER_STATUS_FLOW.index)
+
+class SellerOrderViews:
+    """
+    Per-seller order projection in seller_orders
+    Written with the order at checkout and on every status change, so seller
+    listings read one index range instead of unwinding orders, and per-seller
+    counters in seller_order_stats make the analytics summary a single read.
+    """
+
+    def __init__(self, db):
+        self.collection = db.seller_orders
+        self.stats = db.seller_order_stats
+
+    async def ensure_indexes(self):
+        await self.collection.create_index("id", unique=True)
+        await self.collection.create_index("order_id")
+        await self.collection.create_index([
+            ("seller_id", ASCENDING), ("status", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)
+        ])
+        await self.collection.create_index([
+            ("seller_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)
+        ])
+        await self.stats.create_index("seller_id", unique=True)
+
+    async def write_for_order(self, order: Dict, session=None):
+        """Upserted by id, so finishing an interrupted checkout writes and counts only missing parts"""
+        written = []
+        for projection in seller_projections(order):
+            result = await self.collection.update_one(
+                {"id": projection["id"]}, {"$setOnInsert": projection}, upsert=True, session=session
+            )
+            if result.upserted_id is not None:
+                written.append(projection)
+        await self.count_new(written, session)
+
+    async def get(self, order_id: str, seller_id: str) -> Optional[Dict]:
+        return await self.collection.find_one({"id": f"{order_id}:{seller_id}"}, {"_id": 0})
+
+    async def for_order(self, order_id: str) -> List[Dict]:
+        return await self.collection.find({"order_id": order_id}, {"_id": 0, "seller_id": 1, "status": 1}).to_list(None)
+
+    async def set_status(self, order_id: str, seller_id: str, current_status: str, status: str,
+                         tracking_number: Optional[str] = None) -> Optional[Dict]:
+        """Move one seller's part on from current_status; None if it changed meanwhile"""
+        update = {"status": status, "updated_at": datetime.utcnow()}
+        if tracking_number:
+            update["tracking_number"] = tracking_number
+        projection = await self.collection.find_one_and_update(
+            {"id": f"{order_id}:{seller_id}", "status": current_status},
+            {"$set": update},
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER
+        )
+        if projection is not None and status != current_status:
+            await self.count_transition(projection, current_status)
+        return projection
+
+    async def page(self, seller_id: str, status: Optional[str] = None, cursor: Optional[str] = None,
+                   limit: int = 20) -> Tuple[List[Dict], Optional[str]]:
+        """Newest first; raises ValueError for a bad cursor"""
+        query: Dict = {"seller_id": seller_id}
+        if status:
+            query["status"] = status
+        if cursor:
+            query.update(cursor_query(cursor))
+        rows = await self.collection.find(query, {"_id": 0}).sort(
+            [("created_at", DESCENDING), ("id", DESCENDING)]
+        ).limit(limit).to_list(limit)
+        return rows, encode_cursor(rows[-1]) if len(rows) == limit else None
+
+    async def _count(self, projection: Dict, update: Dict, session=None):
+        update.setdefault("$set", {})["updated_at"] = datetime.utcnow()
+        await self.stats.update_one({"seller_id": projection["seller_id"]}, update, upsert=True, session=session)
+
+    async def count_new(self, projections: List[Dict], session=None):
+        for projection in projections:
+            await self._count(projection, {"$inc": {
+                f"orders.{projection['status']}": 1,
+                "items_sold": projection["item_count"],
+                "revenue": projection["subtotal"]
+            }}, session)
+
+    async def count_transition(self, projection: Dict, old_status: str):
+        inc = {f"orders.{old_status}": -1, f"orders.{projection['status']}": 1}
+        if projection["status"] == "cancelled":
+            inc.update(items_sold=-projection["item_count"], revenue=-projection["subtotal"])
+        await self._count(projection, {"$inc": inc})
+
+    async def analytics(self, seller_id: str) -> Dict:
+        """Counters maintained on write; cancelled parts are excluded from sales"""
+        stats = await self.stats.find_one({"seller_id": seller_id}, {"_id": 0}) or {}
+        by_status = {status: count for status, count in stats.get("orders", {}).items() if count}
+        return {
+            "total_orders": sum(count for status, count in by_status.items() if status != "cancelled"),
+            "items_sold": stats.get("items_sold", 0),
+            "revenue": round(stats.get("revenue", 0.0), 2),
+            "by_status": by_status
+        }
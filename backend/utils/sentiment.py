@@ -0,0 +1,212 @@
+import asyncio
+import logging
+import os
+import re
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+import numpy as np
+from pymongo import ASCENDING, UpdateOne
+
+from utils.search_index import TOKEN_RE
+
+logger = logging.getLogger(__name__)
+
+SENTIMENT_BATCH_SIZE = int(os.getenv("SENTIMENT_BATCH_SIZE", "256"))
+SENTIMENT_POLL_SECONDS = float(os.getenv("SENTIMENT_POLL_SECONDS", "5"))
+SENTIMENT_STALE_MINUTES = int(os.getenv("SENTIMENT_STALE_MINUTES", "10"))
+# Scores inside (-NEUTRAL_BAND, NEUTRAL_BAND) are reported as neutral
+NEUTRAL_BAND = 0.25
+
+# Compact review lexicon; weights roughly follow AFINN on a -3..3 scale
+LEXICON = {
+    "love": 3, "loved": 3, "loves": 3, "amazing": 3, "excellent": 3, "perfect": 3, "fantastic": 3,
+    "awesome": 3, "outstanding": 3, "superb": 3, "best": 3, "wonderful": 3, "brilliant": 3,
+    "great": 2.5, "good": 2, "nice": 2, "happy": 2, "recommend": 2, "recommended": 2, "sturdy": 2,
+    "beautiful": 2, "comfortable": 2, "fast": 1.5, "quick": 1.5, "easy": 1.5, "works": 1.5,
+    "worth": 1.5, "quality": 1, "solid": 1.5, "pleased": 2, "satisfied": 2, "like": 1, "liked": 1.5,
+    "fine": 1, "ok": 0.25, "okay": 0.25, "decent": 1, "reliable": 2, "durable": 2, "cheap": -0.5,
+    "bad": -2.5, "poor": -2.5, "terrible": -3, "awful": -3, "horrible": -3, "worst": -3, "hate": -3,
+    "hated": -3, "broken": -2.5, "broke": -2.5, "useless": -3, "waste": -2.5, "disappointed": -2.5,
+    "disappointing": -2.5, "refund": -1.5, "return": -1, "returned": -1.5, "slow": -1.5, "late": -1.5,
+    "defective": -3, "damaged": -2.5, "flimsy": -2, "fake": -3, "scam": -3, "cheaply": -1.5,
+    "expensive": -1, "overpriced": -2, "uncomfortable": -2, "problem": -1.5, "problems": -1.5,
+    "issue": -1, "issues": -1, "missing": -2, "wrong": -2, "never": -1, "stopped": -1.5,
+}
+NEGATIONS = frozenset({"not", "no", "never", "dont", "didnt", "isnt", "wasnt", "doesnt", "cant", "wont", "hardly"})
+CONTRACTION_RE = re.compile(r"n['’]t\b")
+# Negation does not carry across clause boundaries
+CLAUSE_RE = re.compile(r"[.,;:!?]+|\bbut\b")
+INTENSIFIERS = {"very": 1.5, "really": 1.4, "extremely": 1.8, "super": 1.5, "so": 1.3, "absolutely": 1.6}
+# A negation flips the next few words
+NEGATION_SCOPE = 3
+
+def sentiment_label(score: float) -> str:
+    if score >= NEUTRAL_BAND:
+        return "positive"
+    if score <= -NEUTRAL_BAND:
+        return "negative"
+    return "neutral"
+
+class LexiconSentimentAnalyzer:
+    """
+    Lexicon scorer with negation and intensifier handling
+    Tokenisation is per text; scoring a batch is one bincount over all tokens.
+    """
+
+    def __init__(self, lexicon: Dict[str, float] = LEXICON):
+        self.vocab = {word: i for i, word in enumerate(lexicon)}
+        self.weights = np.array(list(lexicon.values()), dtype=np.float64)
+
+    def _encode(self, texts: List[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Flatten lexicon hits to (doc, word, modifier) arrays plus token counts"""
+        docs, words, modifiers = [], [], []
+        lengths = np.zeros(len(texts), dtype=np.float64)
+        for d, text in enumerate(texts):
+            for clause in CLAUSE_RE.split(CONTRACTION_RE.sub(" not", text.lower())):
+                tokens = TOKEN_RE.findall(clause)
+                lengths[d] += len(tokens)
+                negate_until = -1
+                boost = 1.0
+                for position, token in enumerate(tokens):
+                    if token in NEGATIONS:
+                        negate_until = position + NEGATION_SCOPE
+                        continue
+                    if token in INTENSIFIERS:
+                        boost = INTENSIFIERS[token]
+                        continue
+                    w = self.vocab.get(token)
+                    if w is not None:
+                        docs.append(d)
+                        words.append(w)
+                        if position <= negate_until:
+                            # "not good" is clearly negative, "not bad" only mildly positive
+                            boost *= -0.75 if self.weights[w] > 0 else -0.3
+                        modifiers.append(boost)
+                    boost = 1.0
+        return (np.array(docs, dtype=np.int64), np.array(words, dtype=np.int64),
+                np.array(modifiers, dtype=np.float64), lengths)
+
+    def score_batch(self, texts: List[str]) -> np.ndarray:
+        """Scores in [-1, 1] for every text"""
+        if not texts:
+            return np.zeros(0)
+        docs, words, modifiers, lengths = self._encode(texts)
+        raw = np.bincount(docs, weights=self.weights[words] * modifiers, minlength=len(texts))
+        # Dampen long texts so a rant does not saturate on length alone
+        return np.tanh(raw / np.sqrt(np.maximum(lengths, 1)) * 1.5)
+
+    def analyze(self, text: str) -> Dict:
+        score = float(self.score_batch([text])[0])
+        return {"sentiment": sentiment_label(score), "score": round(score, 4)}
+
+sentiment_analyzer = LexiconSentimentAnalyzer()
+
+def review_text(review: Dict) -> str:
+    return f"{review.get('title', '')}. {review.get('comment', '')}"
+
+def aggregate_increments(reviews: List[Dict], scores: np.ndarray) -> Dict[str, Dict[str, float]]:
+    """Per-product $inc documents for a scored batch"""
+    increments: Dict[str, Dict[str, float]] = {}
+    for review, score in zip(reviews, scores.tolist()):
+        inc = increments.setdefault(review["product_id"], {"review_count": 0, "score_sum": 0.0})
+        inc["review_count"] += 1
+        inc["score_sum"] += score
+        label = sentiment_label(score)
+        inc[label] = inc.get(label, 0) + 1
+    return increments
+
+class ReviewSentimentPipeline:
+    """
+    Background scorer for new reviews
+    Claims unscored reviews in micro-batches, scores them in one pass and
+    folds the results into review_sentiment, one document per product.
+    """
+
+    def __init__(self, db, analyzer: LexiconSentimentAnalyzer = sentiment_analyzer,
+                 batch_size: int = SENTIMENT_BATCH_SIZE, poll_interval: float = SENTIMENT_POLL_SECONDS):
+        self.db = db
+        self.analyzer = analyzer
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._running = False
+
+    async def ensure_indexes(self):
+        await self.db.reviews.create_index([("sentiment_batch", ASCENDING), ("created_at", ASCENDING)])
+        await self.db.review_sentiment.create_index("product_id", unique=True)
+
+    async def claim_batch(self) -> List[Dict]:
+        pending = await self.db.reviews.find(
+            {"sentiment_batch": None}, {"id": 1}
+        ).sort("created_at", ASCENDING).limit(self.batch_size).to_list(self.batch_size)
+        if not pending:
+            return []
+        batch_id = str(uuid.uuid4())
+        await self.db.reviews.update_many(
+            {"id": {"$in": [r["id"] for r in pending]}, "sentiment_batch": None},
+            {"$set": {"sentiment_batch": batch_id, "sentiment_claimed_at": datetime.utcnow()}}
+        )
+        # Another worker may have claimed some of them in between
+        return await self.db.reviews.find(
+            {"sentiment_batch": batch_id},
+            {"_id": 0, "id": 1, "product_id": 1, "title": 1, "comment": 1, "sentiment_batch": 1}
+        ).to_list(self.batch_size)
+
+    async def requeue_stale(self, older_than_minutes: int = SENTIMENT_STALE_MINUTES) -> int:
+        """Release batches claimed by a worker that died before scoring them"""
+        cutoff = datetime.utcnow() - timedelta(minutes=older_than_minutes)
+        result = await self.db.reviews.update_many(
+            {"sentiment_scored_at": None, "sentiment_claimed_at": {"$lt": cutoff}},
+            {"$set": {"sentiment_batch": None}}
+        )
+        return result.modified_count
+
+    async def run_once(self) -> int:
+        reviews = await self.claim_batch()
+        if not reviews:
+            return 0
+
+        scores = self.analyzer.score_batch([review_text(r) for r in reviews])
+        # BSON dates keep milliseconds; truncate so the read-back below matches what was stored
+        now = datetime.utcnow()
+        now = now.replace(microsecond=now.microsecond // 1000 * 1000)
+        # A review edited (or requeued) since the claim has left this batch: neither write nor count it
+        await self.db.reviews.bulk_write([
+            UpdateOne({"id": r["id"], "sentiment_batch": r["sentiment_batch"]}, {"$set": {
+                "sentiment_score": round(score, 4),
+                "sentiment": sentiment_label(score),
+                "sentiment_scored_at": now
+            }})
+            for r, score in zip(reviews, scores.tolist())
+        ], ordered=False)
+        landed = await self.db.reviews.find(
+            {"id": {"$in": [r["id"] for r in reviews]}, "sentiment_scored_at": now}, {"_id": 0, "id": 1}
+        ).to_list(None)
+        landed = {r["id"] for r in landed}
+        scored = [i for i, r in enumerate(reviews) if r["id"] in landed]
+        increments = aggregate_increments([reviews[i] for i in scored], scores[scored])
+        if increments:
+            await self.db.review_sentiment.bulk_write([
+                UpdateOne({"product_id": product_id}, {"$inc": inc, "$set": {"updated_at": now}}, upsert=True)
+                for product_id, inc in increments.items()
+            ], ordered=False)
+        logger.info(f"💬 Scored sentiment for {len(reviews)} reviews")
+        return len(reviews)
+
+    async def run_forever(self):
+        self._running = True
+        logger.info("💬 Review sentiment pipeline started")
+        while self._running:
+            try:
+                await self.requeue_stale()
+                if await self.run_once() < self.batch_size:
+                    await asyncio.sleep(self.poll_interval)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"❌ Review sentiment pipeline error: {e}")
+                await asyncio.sleep(self.poll_interval)
+
+    def stop(self):
+        self._running = False
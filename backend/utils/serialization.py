@@ -0,0 +1,37 @@
+from typing import Dict, Iterable, List
+
+from fastapi.responses import ORJSONResponse
+
+from models.product import ProductResponse
+
+# Fetch exactly the fields ProductResponse exposes
+PRODUCT_RESPONSE_FIELDS = list(ProductResponse.model_fields)
+PRODUCT_RESPONSE_PROJECTION = {"_id": 0, **{field: 1 for field in PRODUCT_RESPONSE_FIELDS}}
+
+# Fields older documents may lack; everything else is always written by ProductInDB
+PRODUCT_RESPONSE_DEFAULTS = {
+    "sku": None,
+    "amazon_asin": None,
+    "images": [],
+    "tags": [],
+    "views": 0,
+    "sales": 0,
+    "synced_to_amazon": False,
+}
+
+def product_response(document: Dict) -> Dict:
+    """
+    ProductResponse-shaped dict from a projected product document
+    Documents are written through ProductInDB, so they are trusted and not revalidated.
+    """
+    return {**PRODUCT_RESPONSE_DEFAULTS, **document}
+
+def product_responses(documents: Iterable[Dict]) -> List[Dict]:
+    return [{**PRODUCT_RESPONSE_DEFAULTS, **document} for document in documents]
+
+def json_response(content, status_code: int = 200, headers: Dict = None) -> ORJSONResponse:
+    """
+    Serialize with orjson and bypass response_model validation
+    Endpoints keep response_model for the OpenAPI schema only.
+    """
+    return ORJSONResponse(content, status_code=status_code, headers=headers)
@@ -0,0 +1,369 @@
+"""
+Sitemap and structured-data feed
+
+Streams approved, published products in (created_at, id) order into sharded,
+gzip-compressed files under SITEMAP_DIR:
+
+    sitemap.xml                  sitemap index pointing at every shard
+    sitemap-00001.xml.gz         up to SITEMAP_SHARD_SIZE <url> entries
+    products-00001.jsonl.gz      the same products as schema.org Product JSON-LD, one per line
+    feed.json                    index of the JSON-LD shards
+    manifest.json                shard boundaries and the updated_at watermark
+
+Each shard covers a fixed key range, so a refresh only rewrites the shards
+holding products whose updated_at moved past the watermark; new products land
+in the last shard. Generation runs under a MongoLease, so one worker or CLI
+run at a time writes the directory. Deleted products are dropped on the next
+full rebuild:
+
+    cd backend && python -m utils.sitemap --full
+"""
+import asyncio
+import gzip
+import json
+import logging
+import os
+import re
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from xml.sax.saxutils import escape
+
+import orjson
+
+from utils.database import MongoLease
+
+logger = logging.getLogger(__name__)
+
+SITEMAP_DIR = Path(os.getenv("SITEMAP_DIR", Path(__file__).parent.parent / "data" / "sitemaps"))
+SITE_URL = os.getenv("SITE_URL", "http://localhost:3000").rstrip("/")
+# Protocol limit is 50,000 URLs per file; shards start below it so refreshes can grow them
+SITEMAP_MAX_URLS = 50_000
+SITEMAP_SHARD_SIZE = int(os.getenv("SITEMAP_SHARD_SIZE", "45000"))
+SITEMAP_REFRESH_SECONDS = float(os.getenv("SITEMAP_REFRESH_SECONDS", "900"))
+# Re-read this much before the watermark to cover clock skew between app servers
+SITEMAP_WATERMARK_SKEW = timedelta(seconds=int(os.getenv("SITEMAP_WATERMARK_SKEW_SECONDS", "120")))
+SITEMAP_BATCH = 1000
+FEED_CURRENCY = "USD"
+
+PUBLIC_QUERY = {"is_published": True, "is_approved": True}
+SITEMAP_PROJECTION = {
+    "_id": 0, "id": 1, "title": 1, "description": 1, "category": 1, "price": 1, "quantity": 1,
+    "sku": 1, "images": 1, "seller_name": 1, "created_at": 1, "updated_at": 1
+}
+SITEMAP_SORT = [("created_at", 1), ("id", 1)]
+
+PUBLISHED_FILE_RE = re.compile(r"^(sitemap\.xml|feed\.json|sitemap-\d{5}\.xml\.gz|products-\d{5}\.jsonl\.gz)$")
+
+XML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n'
+URLSET_OPEN = '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+
+Key = Tuple[datetime, str]
+
+class SitemapBusyError(Exception):
+    """Another worker or CLI run holds the sitemap lease"""
+
+def product_url(product_id: str) -> str:
+    return f"{SITE_URL}/products/{product_id}"
+
+def w3c_datetime(ts: datetime) -> str:
+    return ts.strftime("%Y-%m-%dT%H:%M:%S+00:00")
+
+def sort_key(product: Dict) -> Key:
+    return product["created_at"], product["id"]
+
+def sitemap_entry(product: Dict) -> str:
+    lastmod = product.get("updated_at") or product["created_at"]
+    return f"<url><loc>{escape(product_url(product['id']))}</loc><lastmod>{w3c_datetime(lastmod)}</lastmod></url>\n"
+
+def product_jsonld(product: Dict) -> Dict:
+    url = product_url(product["id"])
+    data = {
+        "@context": "https://schema.org",
+        "@type": "Product",
+        "@id": url,
+        "url": url,
+        "name": product["title"],
+        "description": product.get("description", ""),
+        "category": product.get("category"),
+        "image": [image["url"] for image in product.get("images") or []],
+        "offers": {
+            "@type": "Offer",
+            "url": url,
+            "price": f"{product['price']:.2f}",
+            "priceCurrency": FEED_CURRENCY,
+            "availability": "https://schema.org/InStock" if product.get("quantity", 0) > 0
+            else "https://schema.org/OutOfStock",
+            "seller": {"@type": "Organization", "name": product.get("seller_name")}
+        }
+    }
+    if product.get("sku"):
+        data["sku"] = product["sku"]
+    return data
+
+def key_range_query(start: Optional[Key], end: Optional[Key]) -> Dict:
+    """Public products with start <= (created_at, id) < end"""
+    clauses = []
+    if start:
+        clauses.append({"$or": [{"created_at": {"$gt": start[0]}}, {"created_at": start[0], "id": {"$gte": start[1]}}]})
+    if end:
+        clauses.append({"$or": [{"created_at": {"$lt": end[0]}}, {"created_at": end[0], "id": {"$lt": end[1]}}]})
+    return {**PUBLIC_QUERY, "$and": clauses} if clauses else dict(PUBLIC_QUERY)
+
+def shard_files(shard_id: int) -> Tuple[str, str]:
+    return f"sitemap-{shard_id:05d}.xml.gz", f"products-{shard_id:05d}.jsonl.gz"
+
+def remove_shard(directory: Path, shard_id: int):
+    for name in shard_files(shard_id):
+        (directory / name).unlink(missing_ok=True)
+
+def shard_for(starts: List[Key], key: Key) -> int:
+    """Index of the shard whose range holds key; keys before the first shard belong to it"""
+    return max(0, bisect_right(starts, key) - 1)
+
+class ShardWriter:
+    """One sitemap shard and its JSON-LD twin, written to temp files and renamed on close"""
+
+    def __init__(self, directory: Path, shard_id: int):
+        self.directory = directory
+        self.shard_id = shard_id
+        self.sitemap_name, self.feed_name = shard_files(shard_id)
+        self._sitemap = gzip.open(directory / f"{self.sitemap_name}.tmp", "wt", encoding="utf-8", compresslevel=6)
+        self._feed = gzip.open(directory / f"{self.feed_name}.tmp", "wb", compresslevel=6)
+        self._sitemap.write(XML_HEADER + URLSET_OPEN)
+        self.count = 0
+        self.start: Optional[Key] = None
+        self.lastmod: Optional[datetime] = None
+
+    def write_many(self, products: List[Dict]):
+        if not products:
+            return
+        if self.start is None:
+            self.start = sort_key(products[0])
+        self._sitemap.write("".join(sitemap_entry(p) for p in products))
+        self._feed.write(b"".join(orjson.dumps(product_jsonld(p)) + b"\n" for p in products))
+        self.count += len(products)
+        newest = max(p.get("updated_at") or p["created_at"] for p in products)
+        self.lastmod = max(self.lastmod, newest) if self.lastmod else newest
+
+    def close(self) -> Dict:
+        self._sitemap.write("</urlset>\n")
+        self._sitemap.close()
+        self._feed.close()
+        for name in (self.sitemap_name, self.feed_name):
+            os.replace(self.directory / f"{name}.tmp", self.directory / name)
+        return {
+            "id": self.shard_id,
+            "start": [self.start[0].isoformat(), self.start[1]] if self.start else None,
+            "count": self.count,
+            "lastmod": (self.lastmod or datetime.utcnow()).isoformat()
+        }
+
+async def write_shards(products: AsyncIterator[Dict], directory: Path, first_id: int,
+                       shard_size: int = SITEMAP_SHARD_SIZE, start: Optional[Key] = None) -> List[Dict]:
+    """
+    Stream products (in key order) into consecutive shards of at most shard_size
+    Only one batch is held in memory; gzip work runs off the event loop. The
+    first shard keeps `start` as its boundary even if its first product is later.
+    """
+    shards: List[Dict] = []
+    writer = ShardWriter(directory, first_id)
+    writer.start = start
+    batch: List[Dict] = []
+
+    async def flush():
+        nonlocal writer, batch
+        while batch:
+            room = shard_size - writer.count
+            if room == 0:
+                shards.append(await asyncio.to_thread(writer.close))
+                writer = ShardWriter(directory, writer.shard_id + 1)
+                continue
+            chunk, batch = batch[:room], batch[room:]
+            await asyncio.to_thread(writer.write_many, chunk)
+
+    async for product in products:
+        batch.append(product)
+        if len(batch) >= SITEMAP_BATCH:
+            await flush()
+    await flush()
+    shards.append(await asyncio.to_thread(writer.close))
+    return shards
+
+def parse_key(raw: List) -> Key:
+    return datetime.fromisoformat(raw[0]), raw[1]
+
+class SitemapGenerator:
+    """Full and watermark-driven incremental generation of the sitemap and feed shards"""
+
+    def __init__(self, db, directory: Path = SITEMAP_DIR, shard_size: int = SITEMAP_SHARD_SIZE,
+                 refresh_interval: float = SITEMAP_REFRESH_SECONDS):
+        self.db = db
+        self.directory = Path(directory)
+        self.shard_size = shard_size
+        self.refresh_interval = refresh_interval
+        self.lease = MongoLease(db, "sitemap")
+        self._lock = asyncio.Lock()
+        self._running = False
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.directory / "manifest.json"
+
+    def load_manifest(self) -> Optional[Dict]:
+        if not self.manifest_path.exists():
+            return None
+        return json.loads(self.manifest_path.read_text())
+
+    def _save(self, shards: List[Dict], watermark: datetime):
+        sitemap_index = [XML_HEADER, '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n']
+        for shard in shards:
+            loc = escape(f"{SITE_URL}/api/seo/files/{shard_files(shard['id'])[0]}")
+            lastmod = w3c_datetime(datetime.fromisoformat(shard["lastmod"]))
+            sitemap_index.append(f"<sitemap><loc>{loc}</loc><lastmod>{lastmod}</lastmod></sitemap>\n")
+        sitemap_index.append("</sitemapindex>\n")
+        feed = {
+            "generated_at": datetime.utcnow().isoformat(),
+            "products": sum(s["count"] for s in shards),
+            "shards": [{"file": shard_files(s["id"])[1], "count": s["count"], "lastmod": s["lastmod"]} for s in shards]
+        }
+        manifest = {
+            "watermark": watermark.isoformat(),
+            "next_id": max((s["id"] for s in shards), default=0) + 1,
+            "shards": shards
+        }
+        for name, content in (("sitemap.xml", "".join(sitemap_index)), ("feed.json", json.dumps(feed, indent=1)),
+                              ("manifest.json", json.dumps(manifest, indent=1))):
+            tmp = self.directory / f"{name}.tmp"
+            tmp.write_text(content)
+            os.replace(tmp, self.directory / name)
+
+    def _stream(self, query: Dict) -> AsyncIterator[Dict]:
+        return self.db.products.find(query, SITEMAP_PROJECTION, batch_size=SITEMAP_BATCH).sort(SITEMAP_SORT)
+
+    async def generate_full(self) -> Dict:
+        """Rebuild every shard; raises SitemapBusyError while another process generates"""
+        async with self._lock, self.lease.hold() as held:
+            if not held:
+                raise SitemapBusyError("Sitemap generation is already running")
+            return await self._generate_full()
+
+    async def _generate_full(self) -> Dict:
+        started = datetime.utcnow()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        old = self.load_manifest()
+        first_id = old["next_id"] if old else 1
+        shards = await write_shards(self._stream(dict(PUBLIC_QUERY)), self.directory, first_id, self.shard_size)
+        self._save(shards, started)
+        # New shards take fresh ids, so the old files stay servable until the index moves on
+        for shard in old["shards"] if old else []:
+            remove_shard(self.directory, shard["id"])
+        stats = {"mode": "full", "shards": len(shards), "products": sum(s["count"] for s in shards)}
+        logger.info(f"🗺️ Sitemap rebuilt: {stats['products']} products in {stats['shards']} shards")
+        return stats
+
+    async def refresh(self) -> Dict:
+        """Rewrite only the shards touched since the watermark; skipped while another process generates"""
+        async with self._lock, self.lease.hold() as held:
+            if not held:
+                return {"mode": "skipped", "shards": 0, "products": 0}
+            manifest = self.load_manifest()
+            if manifest is None:
+                return await self._generate_full()
+
+            started = datetime.utcnow()
+            shards = manifest["shards"]
+            starts = [parse_key(s["start"]) if s["start"] else (datetime.min, "") for s in shards]
+            since = datetime.fromisoformat(manifest["watermark"]) - SITEMAP_WATERMARK_SKEW
+            dirty = set()
+            async for product in self.db.products.find(
+                {"updated_at": {"$gte": since}}, {"_id": 0, "id": 1, "created_at": 1}, batch_size=SITEMAP_BATCH
+            ):
+                dirty.add(shard_for(starts, sort_key(product)))
+            if not dirty:
+                self._save(shards, started)
+                return {"mode": "incremental", "shards": 0, "products": 0}
+
+            next_id = manifest["next_id"]
+            rebuilt: Dict[int, List[Dict]] = {}
+            for i in sorted(dirty):
+                end = starts[i + 1] if i + 1 < len(shards) else None
+                # The last shard takes new products and splits at shard_size; earlier ones may grow to the protocol limit
+                limit = self.shard_size if end is None else SITEMAP_MAX_URLS
+                rebuilt[i] = await write_shards(
+                    self._stream(key_range_query(starts[i], end)), self.directory, next_id, limit,
+                    start=starts[i] if shards[i]["start"] else None
+                )
+                next_id = max(s["id"] for s in rebuilt[i]) + 1
+
+            new_shards = []
+            for i, shard in enumerate(shards):
+                if i not in rebuilt:
+                    new_shards.append(shard)
+                    continue
+                # An emptied shard's range is absorbed by its predecessor
+                new_shards.extend(s for s in rebuilt[i] if s["count"] or i == 0)
+            self._save(new_shards, started)
+            kept = {s["id"] for s in new_shards}
+            for i, shard in enumerate(shards):
+                if i in rebuilt:
+                    remove_shard(self.directory, shard["id"])
+                    for s in rebuilt[i]:
+                        if s["id"] not in kept:
+                            remove_shard(self.directory, s["id"])
+            stats = {"mode": "incremental", "shards": len(rebuilt), "products": sum(s["count"] for r in rebuilt.values() for s in r)}
+            logger.info(f"🗺️ Sitemap refreshed: {stats['shards']} shards rewritten")
+            return stats
+
+    def file_path(self, name: str) -> Optional[Path]:
+        """Path of a published sitemap/feed file, or None for anything else"""
+        if not PUBLISHED_FILE_RE.match(name):
+            return None
+        path = self.directory / name
+        return path if path.is_file() else None
+
+    async def run_forever(self):
+        self._running = True
+        logger.info("🗺️ Sitemap generator started")
+        while self._running:
+            try:
+                await self.refresh()
+                await asyncio.sleep(self.refresh_interval)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"❌ Sitemap generation error: {e}")
+                await asyncio.sleep(self.refresh_interval)
+
+    def stop(self):
+        self._running = False
+
+def main():
+    """Offline generation entry point"""
+    import argparse
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--full", action="store_true", help="Rebuild every shard instead of refreshing")
+    parser.add_argument("--out", type=Path, default=SITEMAP_DIR)
+    args = parser.parse_args()
+
+    load_dotenv(Path(__file__).parent.parent / ".env")
+    logging.basicConfig(level=logging.INFO)
+
+    async def run():
+        client = AsyncIOMotorClient(os.environ["MONGO_URL"])
+        generator = SitemapGenerator(client[os.environ["DB_NAME"]], args.out)
+        try:
+            return await (generator.generate_full() if args.full else generator.refresh())
+        except SitemapBusyError as e:
+            raise SystemExit(str(e))
+        finally:
+            client.close()
+
+    print(json.dumps(asyncio.run(run()), indent=2))
+
+if __name__ == "__main__":
+    main()
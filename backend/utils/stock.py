@@ -0,0 +1,278 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+CHECKOUT_HOLD_MINUTES = int(os.getenv("CHECKOUT_HOLD_MINUTES", "15"))
+STOCK_SWEEP_SECONDS = float(os.getenv("STOCK_SWEEP_SECONDS", "30"))
+# A commit or release left half-done by a crashed process is finished after this
+STOCK_STALE_MINUTES = int(os.getenv("STOCK_STALE_MINUTES", "5"))
+# Checkouts for one hot product write-conflict on it; retry them for this long, like with_transaction
+CHECKOUT_TRANSACTION_SECONDS = float(os.getenv("CHECKOUT_TRANSACTION_SECONDS", "60"))
+
+class OutOfStockError(Exception):
+    """Raised when a product cannot cover the requested quantity"""
+
+    def __init__(self, product_id: str):
+        super().__init__(f"Not enough stock for product {product_id}")
+        self.product_id = product_id
+
+class ReservationError(Exception):
+    """Raised when a reservation is missing, expired or already used"""
+
+def merge_quantities(items: List[Dict]) -> List[Dict]:
+    """One line per product, in product id order so concurrent buyers take holds in the same order"""
+    merged: Dict[str, Dict] = {}
+    for item in items:
+        line = merged.setdefault(item["product_id"], {**item, "quantity": 0})
+        line["quantity"] += item["quantity"]
+    return [merged[product_id] for product_id in sorted(merged)]
+
+async def supports_transactions(db) -> bool:
+    """Multi-document transactions need a replica set or a sharded cluster"""
+    try:
+        hello = await db.command("hello")
+    except Exception:
+        return False
+    return bool(hello.get("setName")) or hello.get("msg") == "isdbgrid"
+
+def _retryable(error: Exception, label: str, deadline: float) -> bool:
+    return isinstance(error, PyMongoError) and error.has_error_label(label) and time.monotonic() < deadline
+
+async def run_in_transaction(session, body: Callable[[object], Awaitable], timeout: float = CHECKOUT_TRANSACTION_SECONDS):
+    """
+    Run body(session) in a transaction until it commits
+    A TransientTransactionError (e.g. a WriteConflict) reruns the whole body;
+    an UnknownTransactionCommitResult retries only the commit.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        session.start_transaction()
+        try:
+            result = await body(session)
+        except Exception as e:
+            if session.in_transaction:
+                await session.abort_transaction()
+            if _retryable(e, "TransientTransactionError", deadline):
+                continue
+            raise
+        while True:
+            try:
+                await session.commit_transaction()
+                return result
+            except Exception as e:
+                if _retryable(e, "UnknownTransactionCommitResult", deadline):
+                    continue
+                if _retryable(e, "TransientTransactionError", deadline):
+                    break
+                raise
+
+class StockReservations:
+    """
+    Stock holds for checkout
+    A hold is a conditional $inc on the product (quantity >= n) that also pushes
+    {id, quantity} onto product.stock_holds in the same update. Releasing or
+    committing matches on that hold id, so both are exact and idempotent even
+    when a process dies half-way through a multi-item reservation.
+    """
+
+    def __init__(self, db, hold_minutes: int = CHECKOUT_HOLD_MINUTES, sweep_interval: float = STOCK_SWEEP_SECONDS,
+                 on_recovered: Optional[Callable[[Dict], Awaitable]] = None):
+        self.db = db
+        self.collection = db.stock_reservations
+        self.hold_minutes = hold_minutes
+        self.sweep_interval = sweep_interval
+        # Called with the order when the sweeper finishes a commit a crash interrupted
+        self.on_recovered = on_recovered
+        self.transactions = False
+        self._running = False
+
+    async def ensure_indexes(self):
+        await self.collection.create_index("id", unique=True)
+        await self.collection.create_index([("status", ASCENDING), ("expires_at", ASCENDING)])
+        self.transactions = await supports_transactions(self.db)
+        logger.info(f"📦 Checkout transactions {'enabled' if self.transactions else 'unavailable, using ordered writes'}")
+
+    async def _take(self, reservation_id: str, item: Dict, expires_at: datetime) -> bool:
+        hold = {
+            "$inc": {"quantity": -item["quantity"]},
+            "$push": {"stock_holds": {"id": reservation_id, "quantity": item["quantity"], "expires_at": expires_at}}
+        }
+        query = {"id": item["product_id"], "is_published": True, "is_approved": True}
+        result = await self.db.products.update_one({**query, "quantity": {"$gt": item["quantity"]}}, hold)
+        if result.modified_count:
+            return True
+        # Taking the last units sells the product out, which feeds and caches key on updated_at
+        result = await self.db.products.update_one(
+            {**query, "quantity": item["quantity"]}, {**hold, "$set": {"updated_at": datetime.utcnow()}}
+        )
+        return result.modified_count == 1
+
+    async def _give_back(self, reservation_id: str, items: List[Dict]):
+        for item in items:
+            query = {"id": item["product_id"], "stock_holds.id": reservation_id}
+            give_back = {"$inc": {"quantity": item["quantity"]}, "$pull": {"stock_holds": {"id": reservation_id}}}
+            result = await self.db.products.update_one({**query, "quantity": {"$gt": 0}}, give_back)
+            if not result.modified_count:
+                # Back in stock
+                await self.db.products.update_one(query, {**give_back, "$set": {"updated_at": datetime.utcnow()}})
+
+    async def reserve(self, user_id: str, items: List[Dict]) -> Dict:
+        """Hold stock for every line or for none; raises OutOfStockError"""
+        # A non-positive hold would pass the quantity >= n guard and add stock
+        if any(item["quantity"] <= 0 for item in items):
+            raise ValueError("Quantities must be positive")
+        now = datetime.utcnow()
+        reservation = {
+            "id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "items": merge_quantities(items),
+            "status": "held",  # held, committing, committed, releasing, released
+            "order_id": None,
+            "created_at": now,
+            "updated_at": now,
+            "expires_at": now + timedelta(minutes=self.hold_minutes)
+        }
+        # Recorded first so the sweeper can always find holds left by a crash
+        await self.collection.insert_one(dict(reservation))
+
+        taken = []
+        for item in reservation["items"]:
+            if not await self._take(reservation["id"], item, reservation["expires_at"]):
+                await self._give_back(reservation["id"], taken)
+                await self._set_status(reservation["id"], "released")
+                raise OutOfStockError(item["product_id"])
+            taken.append(item)
+        return reservation
+
+    async def _set_status(self, reservation_id: str, status: str, session=None, **fields):
+        await self.collection.update_one(
+            {"id": reservation_id},
+            {"$set": {"status": status, "updated_at": datetime.utcnow(), **fields}},
+            session=session
+        )
+
+    async def _claim(self, query: Dict, status: str, session=None) -> Optional[Dict]:
+        return await self.collection.find_one_and_update(
+            query,
+            {"$set": {"status": status, "updated_at": datetime.utcnow()}},
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER,
+            session=session
+        )
+
+    async def _consume(self, reservation: Dict, session=None):
+        """Turn holds into sales; the stock already left `quantity` when it was held"""
+        for item in reservation["items"]:
+            await self.db.products.update_one(
+                {"id": item["product_id"], "stock_holds.id": reservation["id"]},
+                {"$pull": {"stock_holds": {"id": reservation["id"]}}, "$inc": {"sales": item["quantity"]}},
+                session=session
+            )
+
+    async def _order_for(self, reservation_id: str) -> Optional[Dict]:
+        return await self.db.orders.find_one({"reservation_id": reservation_id}, {"_id": 0})
+
+    async def get(self, reservation_id: str) -> Optional[Dict]:
+        return await self.collection.find_one({"id": reservation_id}, {"_id": 0})
+
+    async def commit(self, reservation_id: str, user_id: str,
+                     write_order: Callable[[Dict, object], Awaitable[Dict]]) -> Dict:
+        """
+        Create the order for a held reservation and consume its holds
+        write_order(reservation, session) inserts the order. With transactions
+        everything happens in one, rerun on write conflicts; otherwise the order is written before the
+        holds are consumed and the sweeper finishes an interrupted commit.
+        """
+        query = {"id": reservation_id, "user_id": user_id, "status": "held",
+                 "expires_at": {"$gt": datetime.utcnow()}}
+        if self.transactions:
+            async def body(session) -> Dict:
+                reservation = await self._claim(query, "committing", session)
+                if reservation is None:
+                    raise ReservationError("Reservation expired or already used")
+                order = await write_order(reservation, session)
+                await self._consume(reservation, session)
+                await self._set_status(reservation_id, "committed", session, order_id=order["id"])
+                return order
+
+            async with await self.db.client.start_session() as session:
+                return await run_in_transaction(session, body)
+
+        reservation = await self._claim(query, "committing")
+        if reservation is None:
+            raise ReservationError("Reservation expired or already used")
+        try:
+            order = await write_order(reservation, None)
+        except Exception:
+            # Once the order row is in, the commit is left for the sweeper to finish
+            if not await self._order_for(reservation_id):
+                await self._set_status(reservation_id, "held")
+            raise
+        await self._consume(reservation)
+        await self._set_status(reservation_id, "committed", order_id=order["id"])
+        return order
+
+    async def release(self, reservation_id: str, user_id: Optional[str] = None) -> bool:
+        query = {"id": reservation_id, "status": "held"}
+        if user_id:
+            query["user_id"] = user_id
+        reservation = await self._claim(query, "releasing")
+        if reservation is None:
+            return False
+        await self._give_back(reservation_id, reservation["items"])
+        await self._set_status(reservation_id, "released")
+        return True
+
+    async def sweep_once(self) -> int:
+        """Release expired holds and finish commits/releases interrupted by a crash"""
+        now = datetime.utcnow()
+        stale = now - timedelta(minutes=STOCK_STALE_MINUTES)
+        swept = 0
+        while True:
+            reservation = await self._claim(
+                {"$or": [
+                    {"status": "held", "expires_at": {"$lt": now}},
+                    {"status": {"$in": ["committing", "releasing"]}, "updated_at": {"$lt": stale}}
+                ]},
+                "releasing"
+            )
+            if reservation is None:
+                return swept
+            order = await self._order_for(reservation["id"])
+            if order:
+                # The order was written before the crash: finish the commit instead
+                await self._consume(reservation)
+                await self._set_status(reservation["id"], "committed", order_id=order["id"])
+                if self.on_recovered:
+                    await self.on_recovered(order)
+            else:
+                await self._give_back(reservation["id"], reservation["items"])
+                await self._set_status(reservation["id"], "released")
+            swept += 1
+
+    async def run_forever(self):
+        self._running = True
+        logger.info("📦 Stock reservation sweeper started")
+        while self._running:
+            try:
+                swept = await self.sweep_once()
+                if swept:
+                    logger.info(f"📦 Released or finished {swept} stale stock reservations")
+                await asyncio.sleep(self.sweep_interval)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"❌ Stock reservation sweeper error: {e}")
+                await asyncio.sleep(self.sweep_interval)
+
+    def stop(self):
+        self._running = False
@@ -0,0 +1,268 @@
+import asyncio
+import logging
+import os
+import random
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional
+from urllib.parse import urlencode
+
+import httpx
+
+from utils.metrics import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+STRIPE_API_BASE = os.getenv("STRIPE_API_BASE", "https://api.stripe.com")
+STRIPE_API_VERSION = os.getenv("STRIPE_API_VERSION", "2024-06-20")
+STRIPE_TIMEOUT_SECONDS = float(os.getenv("STRIPE_TIMEOUT_SECONDS", "10"))
+STRIPE_MAX_RETRIES = int(os.getenv("STRIPE_MAX_RETRIES", "3"))
+STRIPE_MAX_CONNECTIONS = int(os.getenv("STRIPE_MAX_CONNECTIONS", "50"))
+
+RETRYABLE_STATUS = {409, 429, 500, 502, 503, 504}
+
+class StripeAPIError(Exception):
+    """Non-retryable or exhausted Stripe API error"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, body: Optional[Dict] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.body = body or {}
+
+def encode_form(params: Dict, prefix: str = "") -> List[tuple]:
+    """Encode nested params the way Stripe expects (a[b][c]=v)"""
+    items = []
+    for key, value in params.items():
+        name = f"{prefix}[{key}]" if prefix else key
+        if value is None:
+            continue
+        if isinstance(value, dict):
+            items.extend(encode_form(value, name))
+        elif isinstance(value, (list, tuple)):
+            for i, v in enumerate(value):
+                items.extend(encode_form({str(i): v}, name))
+        elif isinstance(value, bool):
+            items.append((name, "true" if value else "false"))
+        else:
+            items.append((name, str(value)))
+    return items
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 8.0) -> float:
+    """Exponential backoff with full jitter"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+class AsyncStripeClient:
+    """
+    Async Stripe Connect client over a pooled httpx connection pool
+    Drop-in replacement for StripeService: same methods, same return shapes.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: str = STRIPE_API_BASE,
+        timeout: float = STRIPE_TIMEOUT_SECONDS,
+        max_retries: int = STRIPE_MAX_RETRIES,
+        max_connections: int = STRIPE_MAX_CONNECTIONS,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        self.api_key = api_key or os.getenv("STRIPE_SECRET_KEY", "")
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.is_test_mode = self.api_key.startswith("sk_test")
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=60
+        )
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Created lazily so it binds to the running event loop
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                auth=(self.api_key, ""),
+                headers={"Stripe-Version": STRIPE_API_VERSION},
+                limits=self._limits,
+                timeout=httpx.Timeout(self.timeout),
+                transport=self._transport
+            )
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+
+    def metrics(self) -> Dict[str, Dict]:
+        return {endpoint: h.snapshot() for endpoint, h in self.histograms.items()}
+
+    async def _request(
+        self,
+        method: str,
+        path: str,
+        endpoint: str,
+        params: Optional[Dict] = None,
+        stripe_account: Optional[str] = None,
+        idempotency_key: Optional[str] = None,
+        timeout: Optional[float] = None
+    ) -> Dict:
+        headers = {}
+        if stripe_account:
+            headers["Stripe-Account"] = stripe_account
+        encoded = encode_form(params or {})
+        body = None
+        if method == "POST":
+            # A fixed key across retries makes every POST safe to retry
+            headers["Idempotency-Key"] = idempotency_key or str(uuid.uuid4())
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+            body = urlencode(encoded)
+        histogram = self.histograms.setdefault(f"{method} {endpoint}", LatencyHistogram())
+
+        for attempt in range(self.max_retries + 1):
+            started = time.perf_counter()
+            try:
+                response = await self.client.request(
+                    method,
+                    path,
+                    content=body,
+                    params=encoded if method != "POST" else None,
+                    headers=headers,
+                    timeout=timeout or self.timeout
+                )
+            except httpx.TransportError as e:
+                histogram.observe((time.perf_counter() - started) * 1000, error=True)
+                if attempt >= self.max_retries:
+                    raise StripeAPIError(f"Stripe request failed: {e}")
+                await asyncio.sleep(backoff_delay(attempt))
+                continue
+
+            histogram.observe((time.perf_counter() - started) * 1000, error=response.status_code >= 400)
+
+            if response.status_code < 400:
+                return response.json()
+
+            should_retry = response.headers.get("Stripe-Should-Retry")
+            retryable = should_retry == "true" or (should_retry is None and response.status_code in RETRYABLE_STATUS)
+            if retryable and attempt < self.max_retries:
+                retry_after = response.headers.get("Retry-After")
+                delay = float(retry_after) if retry_after and retry_after.isdigit() else backoff_delay(attempt)
+                logger.warning(f"⚠️ Stripe {response.status_code} on {method} {endpoint}, retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                continue
+
+            try:
+                body = response.json()
+            except ValueError:
+                body = {}
+            message = body.get("error", {}).get("message", response.text)
+            raise StripeAPIError(message, status_code=response.status_code, body=body)
+
+    async def create_connect_account(self, email: str, country: str = "US", business_type: str = "individual") -> Dict:
+        account = await self._request("POST", "/v1/accounts", "/v1/accounts", params={
+            "type": "express",
+            "country": country,
+            "email": email,
+            "business_type": business_type,
+            "capabilities": {
+                "card_payments": {"requested": True},
+                "transfers": {"requested": True}
+            }
+        })
+        return {
+            "id": account["id"],
+            "email": account.get("email", email),
+            "country": account.get("country", country),
+            "business_type": account.get("business_type", business_type),
+            "charges_enabled": account.get("charges_enabled", False),
+            "payouts_enabled": account.get("payouts_enabled", False),
+            "details_submitted": account.get("details_submitted", False)
+        }
+
+    async def create_account_link(self, account_id: str, refresh_url: str, return_url: str) -> Dict:
+        link = await self._request("POST", "/v1/account_links", "/v1/account_links", params={
+            "account": account_id,
+            "refresh_url": refresh_url,
+            "return_url": return_url,
+            "type": "account_onboarding"
+        })
+        return {"url": link["url"], "expires_at": link["expires_at"]}
+
+    async def get_account_balance(self, account_id: str) -> Dict:
+        """Available and pending funds as per-currency lists, in major units"""
+        balance = await self._request("GET", "/v1/balance", "/v1/balance", stripe_account=account_id)
+
+        def per_currency(entries: List[Dict]) -> List[Dict]:
+            totals: Dict[str, int] = {}
+            for entry in entries:
+                totals[entry["currency"]] = totals.get(entry["currency"], 0) + entry["amount"]
+            return [{"amount": cents / 100, "currency": currency} for currency, cents in totals.items()]
+
+        return {
+            "available": per_currency(balance.get("available", [])),
+            "pending": per_currency(balance.get("pending", []))
+        }
+
+    async def create_payout(
+        self,
+        account_id: str,
+        amount: float,
+        currency: str = "usd",
+        description: Optional[str] = None,
+        idempotency_key: Optional[str] = None
+    ) -> Dict:
+        payout = await self._request(
+            "POST", "/v1/payouts", "/v1/payouts",
+            params={
+                "amount": int(round(amount * 100)),  # Convert to cents
+                "currency": currency,
+                "description": description
+            },
+            stripe_account=account_id,
+            idempotency_key=idempotency_key
+        )
+        return self._payout_dict(payout)
+
+    async def get_payout_history(self, account_id: str, limit: int = 10) -> Dict:
+        payouts = await self._request(
+            "GET", "/v1/payouts", "/v1/payouts", params={"limit": limit}, stripe_account=account_id
+        )
+        return {
+            "data": [self._payout_dict(p) for p in payouts.get("data", [])],
+            "has_more": payouts.get("has_more", False)
+        }
+
+    async def get_account_status(self, account_id: str) -> Dict:
+        account = await self._request("GET", f"/v1/accounts/{account_id}", "/v1/accounts/{id}")
+        requirements = account.get("requirements") or {}
+        return {
+            "id": account["id"],
+            "charges_enabled": account.get("charges_enabled", False),
+            "payouts_enabled": account.get("payouts_enabled", False),
+            "details_submitted": account.get("details_submitted", False),
+            "requirements": {
+                "currently_due": requirements.get("currently_due", []),
+                "eventually_due": requirements.get("eventually_due", []),
+                "past_due": requirements.get("past_due", [])
+            }
+        }
+
+    @staticmethod
+    def _payout_dict(payout: Dict) -> Dict:
+        def iso(ts):
+            return datetime.utcfromtimestamp(ts).isoformat() if ts else None
+
+        return {
+            "id": payout["id"],
+            "amount": payout["amount"] / 100,
+            "currency": payout.get("currency", "usd"),
+            "description": payout.get("description"),
+            "status": payout.get("status", "pending"),
+            "arrival_date": iso(payout.get("arrival_date")),
+            "created": iso(payout.get("created"))
+        }
@@ -0,0 +1,122 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class LocalStripeError(Exception):
+    """Raised by LocalStripe when a failure has been injected"""
+
+class LocalStripe:
+    """
+    Deterministic local stand-in for StripeService
+    Keeps balances and payouts in memory, honours idempotency keys
+    and records every call so tests can assert on Stripe traffic.
+    """
+
+    def __init__(self, default_balance: float = 0.0):
+        self.default_balance = default_balance
+        self.balances: Dict[str, float] = {}
+        self.accounts: Dict[str, Dict] = {}
+        self.payouts: List[Dict] = []
+        self.calls: List[tuple] = []
+        self._idempotent_payouts: Dict[str, Dict] = {}
+        self._failures_remaining = 0
+        self._counter = 0
+
+    def set_balance(self, account_id: str, amount: float):
+        """Set available balance for an account"""
+        self.balances[account_id] = amount
+
+    def fail_next(self, count: int = 1):
+        """Make the next `count` payout calls raise LocalStripeError"""
+        self._failures_remaining = count
+
+    def _next_id(self, prefix: str) -> str:
+        self._counter += 1
+        return f"{prefix}_local_{self._counter:010d}"
+
+    async def create_connect_account(self, email: str, country: str = "US", business_type: str = "individual") -> Dict:
+        self.calls.append(("create_connect_account", email))
+        account = {
+            "id": self._next_id("acct"),
+            "email": email,
+            "country": country,
+            "business_type": business_type,
+            "charges_enabled": False,
+            "payouts_enabled": False,
+            "details_submitted": False
+        }
+        self.accounts[account["id"]] = account
+        return account
+
+    async def create_account_link(self, account_id: str, refresh_url: str, return_url: str) -> Dict:
+        self.calls.append(("create_account_link", account_id))
+        return {
+            "url": f"https://connect.stripe.local/setup/{account_id}",
+            "expires_at": int((datetime.utcnow() + timedelta(hours=1)).timestamp())
+        }
+
+    async def get_account_balance(self, account_id: str) -> Dict:
+        self.calls.append(("get_account_balance", account_id))
+        return {
+            "available": self.balances.get(account_id, self.default_balance),
+            "pending": 0.0,
+            "currency": "usd"
+        }
+
+    async def create_payout(
+        self,
+        account_id: str,
+        amount: float,
+        currency: str = "usd",
+        description: Optional[str] = None,
+        idempotency_key: Optional[str] = None
+    ) -> Dict:
+        self.calls.append(("create_payout", account_id, amount, idempotency_key))
+
+        if self._failures_remaining > 0:
+            self._failures_remaining -= 1
+            raise LocalStripeError("Injected Stripe failure")
+
+        if idempotency_key and idempotency_key in self._idempotent_payouts:
+            return self._idempotent_payouts[idempotency_key]
+
+        available = self.balances.get(account_id, self.default_balance)
+        if amount > available:
+            raise LocalStripeError(f"Insufficient funds in {account_id}")
+        self.balances[account_id] = round(available - amount, 2)
+
+        payout = {
+            "id": self._next_id("po"),
+            "account_id": account_id,
+            "amount": amount,
+            "currency": currency,
+            "description": description,
+            "status": "pending",
+            "arrival_date": (datetime.utcnow() + timedelta(days=2)).isoformat(),
+            "created": datetime.utcnow().isoformat()
+        }
+        self.payouts.append(payout)
+        if idempotency_key:
+            self._idempotent_payouts[idempotency_key] = payout
+        return payout
+
+    async def get_payout_history(self, account_id: str, limit: int = 10) -> Dict:
+        self.calls.append(("get_payout_history", account_id))
+        data = [p for p in reversed(self.payouts) if p["account_id"] == account_id][:limit]
+        return {"data": data, "has_more": False}
+
+    async def get_account_status(self, account_id: str) -> Dict:
+        self.calls.append(("get_account_status", account_id))
+        return {
+            "id": account_id,
+            "charges_enabled": True,
+            "payouts_enabled": True,
+            "details_submitted": True,
+            "requirements": {
+                "currently_due": [],
+                "eventually_due": [],
+                "past_due": []
+            }
+        }
@@ -18,6 +18,7 @@ class StripeService:
     
     def __init__(self):
         self.is_test_mode = stripe.api_key.startswith("sk_test")
+        self._idempotent_payouts: Dict[str, Dict] = {}
         logger.info(f"💳 Stripe initialized in {'TEST' if self.is_test_mode else 'LIVE'} mode")
     
     async def create_connect_account(self, email: str, country: str = "US", business_type: str = "individual") -> Dict:
@@ -89,24 +90,37 @@ class StripeService:
             "currency": "usd"
         }
     
-    async def create_payout(self, account_id: str, amount: float, currency: str = "usd", description: Optional[str] = None) -> Dict:
+    async def create_payout(
+        self,
+        account_id: str,
+        amount: float,
+        currency: str = "usd",
+        description: Optional[str] = None,
+        idempotency_key: Optional[str] = None
+    ) -> Dict:
         """
         Create payout to Connect account
         
         Real implementation:
         payout = stripe.Payout.create(
-            amount=int(amount * 100),  # Convert to cents
+            amount=int(round(amount * 100)),  # Convert to cents
             currency=currency,
             description=description,
-            stripe_account=account_id
+            stripe_account=account_id,
+            idempotency_key=idempotency_key  # Sent as the Idempotency-Key header
         )
         """
+        # Stripe replays the original response for a repeated Idempotency-Key
+        if idempotency_key and idempotency_key in self._idempotent_payouts:
+            logger.info(f"💳 MOCK STRIPE: Replaying payout for idempotency key {idempotency_key}")
+            return self._idempotent_payouts[idempotency_key]
+        
         logger.info(f"💳 MOCK STRIPE: Creating payout of ${amount} to {account_id}")
         
         mock_payout_id = f"po_mock_{random.randint(1000000000, 9999999999)}"
         arrival_date = datetime.utcnow() + timedelta(days=2)
         
-        return {
+        payout = {
             "id": mock_payout_id,
             "amount": amount,
             "currency": currency,
@@ -115,6 +129,11 @@ class StripeService:
             "arrival_date": arrival_date.isoformat(),
             "created": datetime.utcnow().isoformat()
         }
+        
+        if idempotency_key:
+            self._idempotent_payouts[idempotency_key] = payout
+        
+        return payout
     
     async def get_payout_history(self, account_id: str, limit: int = 10) -> Dict:
         """
@@ -166,10 +185,27 @@ class StripeService:
             }
         }
 
+    async def close(self):
+        """No pooled connections to release in mock mode"""
+    
+    def metrics(self) -> Dict:
+        return {}
+
 # Global instance
-stripe_service = StripeService()
+# STRIPE_MODE=http switches to the pooled async HTTP client (utils/stripe_client.py);
+# the mock stays the default until production keys are configured
+STRIPE_MODE = os.getenv("STRIPE_MODE", "mock").lower()
+if STRIPE_MODE == "http":
+    if not os.getenv("STRIPE_WEBHOOK_SECRET"):
+        # Account and payout state only changes through verified webhooks in this mode
+        raise RuntimeError("STRIPE_WEBHOOK_SECRET must be set when STRIPE_MODE=http")
+    from utils.stripe_client import AsyncStripeClient
+    stripe_service = AsyncStripeClient()
+else:
+    stripe_service = StripeService()
 
 # For real Stripe integration, add these to .env:
 # STRIPE_SECRET_KEY=sk_live_...
 # STRIPE_PUBLISHABLE_KEY=pk_live_...
 # STRIPE_WEBHOOK_SECRET=whsec_...
+# STRIPE_MODE=http
@@ -0,0 +1,260 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import ASCENDING, UpdateMany, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+# No default: without a secret every webhook is rejected
+STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET", "")
+WEBHOOK_TOLERANCE_SECONDS = 300
+WEBHOOK_BATCH_SIZE = int(os.getenv("STRIPE_WEBHOOK_BATCH_SIZE", "500"))
+WEBHOOK_POLL_SECONDS = float(os.getenv("STRIPE_WEBHOOK_POLL_SECONDS", "1"))
+# A payout event can arrive before the settlement worker stores its stripe_payout_id;
+# it is retried this often until it matches, and given up after the max age
+WEBHOOK_RETRY_SECONDS = float(os.getenv("STRIPE_WEBHOOK_RETRY_SECONDS", "30"))
+WEBHOOK_UNMATCHED_MAX_MINUTES = int(os.getenv("STRIPE_WEBHOOK_UNMATCHED_MAX_MINUTES", "60"))
+
+PAYOUT_EVENT_STATUS = {
+    "payout.created": "pending",
+    "payout.updated": None,  # Use the status carried on the payout object
+    "payout.paid": "paid",
+    "payout.failed": "failed",
+    "payout.canceled": "canceled",
+}
+
+class WebhookSignatureError(Exception):
+    """Raised when a Stripe-Signature header does not match the payload"""
+
+def sign_webhook_payload(payload: bytes, secret: str, timestamp: Optional[int] = None) -> str:
+    """Build a Stripe-Signature header value (used by local stand-ins and tests)"""
+    timestamp = timestamp or int(time.time())
+    signed = f"{timestamp}.".encode() + payload
+    signature = hmac.new(secret.encode(), signed, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+def verify_webhook_signature(
+    payload: bytes,
+    sig_header: Optional[str],
+    secret: str = STRIPE_WEBHOOK_SECRET,
+    tolerance: int = WEBHOOK_TOLERANCE_SECONDS
+) -> Dict:
+    """
+    Verify Stripe-Signature and return the decoded event
+    Same scheme as stripe.Webhook.construct_event: HMAC-SHA256 over "{t}.{payload}".
+    """
+    if not secret:
+        raise WebhookSignatureError("STRIPE_WEBHOOK_SECRET is not configured")
+    if not sig_header:
+        raise WebhookSignatureError("Missing Stripe-Signature header")
+
+    timestamp = None
+    signatures = []
+    for part in sig_header.split(","):
+        key, _, value = part.strip().partition("=")
+        if key == "t":
+            timestamp = value
+        elif key == "v1":
+            signatures.append(value)
+
+    if not timestamp or not timestamp.isdigit() or not signatures:
+        raise WebhookSignatureError("Malformed Stripe-Signature header")
+
+    if tolerance and abs(time.time() - int(timestamp)) > tolerance:
+        raise WebhookSignatureError("Timestamp outside the tolerance zone")
+
+    expected = hmac.new(secret.encode(), f"{timestamp}.".encode() + payload, hashlib.sha256).hexdigest()
+    if not any(hmac.compare_digest(expected, s) for s in signatures):
+        raise WebhookSignatureError("No signatures found matching the expected signature")
+
+    try:
+        return json.loads(payload)
+    except ValueError:
+        raise WebhookSignatureError("Invalid JSON payload")
+
+def payout_object_id(event: Dict) -> Optional[str]:
+    """Stripe payout id a payout event applies to, None for other events"""
+    if event.get("type") not in PAYOUT_EVENT_STATUS:
+        return None
+    return event.get("payload", {}).get("data", {}).get("object", {}).get("id")
+
+def build_bulk_operations(events: List[Dict]) -> Tuple[List[UpdateOne], List[UpdateMany]]:
+    """
+    Collapse a batch of events into bulk writes
+    Only the newest event per Stripe object is applied, and only if the stored
+    document has not already seen a newer one from an earlier batch.
+    """
+    latest_accounts: Dict[str, Tuple[int, Dict]] = {}
+    latest_payouts: Dict[str, Tuple[str, int, Dict]] = {}
+
+    for event in sorted(events, key=lambda e: e.get("created", 0)):
+        obj = event.get("payload", {}).get("data", {}).get("object", {})
+        created = event.get("created", 0)
+        if event["type"] == "account.updated" and obj.get("id"):
+            latest_accounts[obj["id"]] = (created, obj)
+        elif event["type"] in PAYOUT_EVENT_STATUS and obj.get("id"):
+            latest_payouts[obj["id"]] = (event["type"], created, obj)
+
+    now = datetime.utcnow()
+    account_ops = [
+        UpdateOne(
+            {"stripe_account_id": account_id, "stripe_event_created": {"$not": {"$gte": created}}},
+            {"$set": {
+                "charges_enabled": obj.get("charges_enabled", False),
+                "payouts_enabled": obj.get("payouts_enabled", False),
+                "details_submitted": obj.get("details_submitted", False),
+                "status": "active" if obj.get("details_submitted") else "pending",
+                "requirements": obj.get("requirements", {}),
+                "stripe_event_created": created,
+                "updated_at": now
+            }}
+        )
+        for account_id, (created, obj) in latest_accounts.items()
+    ]
+
+    payout_ops = []
+    for payout_id, (event_type, created, obj) in latest_payouts.items():
+        new_status = PAYOUT_EVENT_STATUS[event_type] or obj.get("status")
+        if not new_status:
+            continue
+        update = {"status": new_status, "stripe_event_created": created, "updated_at": now}
+        if new_status == "paid":
+            update["paid_at"] = now
+        if obj.get("failure_message"):
+            update["error_message"] = obj["failure_message"]
+        payout_ops.append(UpdateMany(
+            {"stripe_payout_id": payout_id, "stripe_event_created": {"$not": {"$gte": created}}},
+            {"$set": update}
+        ))
+
+    return account_ops, payout_ops
+
+class StripeEventQueue:
+    """
+    Durable inbox for Stripe webhook events
+    Events are deduplicated on the Stripe event id.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.collection = db.stripe_events
+
+    async def ensure_indexes(self):
+        await self.collection.create_index("event_id", unique=True)
+        await self.collection.create_index([("status", ASCENDING), ("received_at", ASCENDING)])
+
+    async def ingest(self, event: Dict) -> bool:
+        """Store an event for processing, returns False for a duplicate delivery"""
+        try:
+            await self.collection.insert_one({
+                "event_id": event["id"],
+                "type": event.get("type"),
+                "created": event.get("created", 0),
+                "payload": event,
+                "status": "pending",
+                "received_at": datetime.utcnow()
+            })
+            return True
+        except DuplicateKeyError:
+            return False
+
+    async def claim_batch(self, limit: int = WEBHOOK_BATCH_SIZE) -> List[Dict]:
+        return await self.collection.find(
+            {"status": "pending", "retry_at": {"$not": {"$gt": datetime.utcnow()}}}
+        ).sort("received_at", ASCENDING).limit(limit).to_list(limit)
+
+    async def mark_processed(self, event_ids: List[str]):
+        await self.collection.update_many(
+            {"event_id": {"$in": event_ids}},
+            {"$set": {"status": "processed", "processed_at": datetime.utcnow()}}
+        )
+
+    async def defer(self, event_ids: List[str], retry_seconds: float = WEBHOOK_RETRY_SECONDS):
+        """Leave events pending, out of the next batches until retry_at"""
+        await self.collection.update_many(
+            {"event_id": {"$in": event_ids}},
+            {"$set": {"retry_at": datetime.utcnow() + timedelta(seconds=retry_seconds)}, "$inc": {"attempts": 1}}
+        )
+
+    async def mark_unmatched(self, event_ids: List[str]):
+        await self.collection.update_many(
+            {"event_id": {"$in": event_ids}},
+            {"$set": {"status": "unmatched", "processed_at": datetime.utcnow()}}
+        )
+
+class StripeEventProcessor:
+    """
+    Background worker applying webhook events to stripe_accounts and payouts in bulk
+    """
+
+    def __init__(self, queue: StripeEventQueue, batch_size: int = WEBHOOK_BATCH_SIZE,
+                 poll_interval: float = WEBHOOK_POLL_SECONDS):
+        self.queue = queue
+        self.db = queue.db
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._running = False
+
+    async def run_once(self) -> int:
+        events = await self.queue.claim_batch(self.batch_size)
+        if not events:
+            return 0
+
+        account_ops, payout_ops = build_bulk_operations(events)
+        if account_ops:
+            await self.db.stripe_accounts.bulk_write(account_ops, ordered=False)
+        if payout_ops:
+            await self.db.payouts.bulk_write(payout_ops, ordered=False)
+
+        # Events for payouts not stored yet would otherwise be lost: keep them pending
+        payout_ids = {payout_object_id(e) for e in events} - {None}
+        known = set(await self.db.payouts.distinct(
+            "stripe_payout_id", {"stripe_payout_id": {"$in": list(payout_ids)}}
+        )) if payout_ids else set()
+        cutoff = datetime.utcnow() - timedelta(minutes=WEBHOOK_UNMATCHED_MAX_MINUTES)
+        processed, deferred, unmatched = [], [], []
+        for event in events:
+            payout_id = payout_object_id(event)
+            if payout_id is None or payout_id in known:
+                processed.append(event["event_id"])
+            elif event["received_at"] < cutoff:
+                unmatched.append(event["event_id"])
+            else:
+                deferred.append(event["event_id"])
+
+        if processed:
+            await self.queue.mark_processed(processed)
+        if deferred:
+            await self.queue.defer(deferred)
+        if unmatched:
+            await self.queue.mark_unmatched(unmatched)
+            logger.warning(f"⚠️ Gave up on {len(unmatched)} Stripe payout events matching no payout")
+        logger.info(
+            f"🪝 Processed {len(processed)} Stripe events ({len(account_ops)} accounts, {len(payout_ops)} payouts), "
+            f"{len(deferred)} waiting for their payout"
+        )
+        return len(events)
+
+    async def run_forever(self):
+        self._running = True
+        logger.info("🪝 Stripe event processor started")
+        while self._running:
+            try:
+                if await self.run_once() < self.batch_size:
+                    await asyncio.sleep(self.poll_interval)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"❌ Stripe event processor error: {e}")
+                await asyncio.sleep(self.poll_interval)
+
+    def stop(self):
+        self._running = False
@@ -0,0 +1,611 @@
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from hashlib import blake2b
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from utils.search_index import (
+    INDEX_PROJECTION,
+    VISIBLE_QUERY,
+    catch_up,
+    is_searchable,
+    reconcile_deletions,
+    tokenize
+)
+
+logger = logging.getLogger(__name__)
+
+VECTOR_DIR = Path(os.getenv("VECTOR_INDEX_DIR", Path(__file__).parent.parent / "data" / "vectors"))
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "256"))
+IVF_MIN_PRODUCTS = int(os.getenv("IVF_MIN_PRODUCTS", "200000"))
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "8"))
+SCAN_CHUNK_ROWS = 131072
+METADATA_VERSION = 2
+
+CHAR_RE = re.compile(r"[^a-z0-9]+")
+
+class HashedTfidfEmbedder:
+    """
+    Offline text embedder: signed feature hashing of words, bigrams and
+    character trigrams, sublinear tf, L2-normalised. Inverse document
+    frequencies per hash bucket are learned incrementally and applied to
+    queries, so stored vectors never need re-embedding.
+    """
+
+    def __init__(self, dim: int = EMBEDDING_DIM):
+        self.dim = dim
+        self.df = np.zeros(dim, dtype=np.float64)
+        self.docs = 0
+        self._cache: Dict[str, tuple] = {}
+
+    def _bucket(self, feature: str) -> tuple:
+        cached = self._cache.get(feature)
+        if cached is None:
+            h = int.from_bytes(blake2b(feature.encode(), digest_size=8).digest(), "little")
+            cached = (h % self.dim, 1.0 if (h >> 63) & 1 else -1.0)
+            if len(self._cache) < 500000:
+                self._cache[feature] = cached
+        return cached
+
+    def features(self, text: str) -> List[str]:
+        words = tokenize(text)
+        feats = list(words)
+        feats.extend(f"{a}_{b}" for a, b in zip(words, words[1:]))
+        for word in words:
+            padded = f"#{word}#"
+            feats.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+        return feats
+
+    def embed(self, text: str) -> np.ndarray:
+        buckets = [self._bucket(feature) for feature in self.features(text)]
+        if not buckets:
+            return np.zeros(self.dim, dtype=np.float32)
+        indexes, signs = zip(*buckets)
+        counts = np.bincount(indexes, weights=signs, minlength=self.dim)
+        magnitude = np.abs(counts)
+        vector = np.sign(counts) * (1 + np.log(np.maximum(magnitude, 1)))
+        vector[magnitude == 0] = 0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).astype(np.float32)
+
+    def observe(self, vector: np.ndarray, delta: int = 1):
+        """Update bucket document frequencies for a stored vector"""
+        self.df[np.flatnonzero(vector)] += delta
+        self.docs += delta
+
+    def embed_query(self, text: str) -> np.ndarray:
+        vector = self.embed(text)
+        idf = np.log((1 + self.docs) / (1 + self.df)) + 1
+        vector = vector * idf.astype(np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+def product_text(product: Dict) -> str:
+    tags = " ".join(product.get("tags") or [])
+    # Title weighted by repetition
+    return f"{product.get('title', '')} {product.get('title', '')} {tags} {product.get('description', '')}"
+
+class IVFIndex:
+    """
+    Inverted-file coarse quantiser for catalogs too big for brute force
+    Spherical k-means centroids; queries scan only the nprobe nearest lists.
+    """
+
+    def __init__(self, centroids: np.ndarray):
+        self.centroids = centroids
+        self.lists: List[List[int]] = [[] for _ in range(len(centroids))]
+        self.assigned: Dict[int, int] = {}
+        self._arrays: Dict[int, np.ndarray] = {}
+
+    @classmethod
+    def train(cls, vectors: np.ndarray, nlist: int, iterations: int = 8, seed: int = 0) -> "IVFIndex":
+        rng = np.random.default_rng(seed)
+        sample = vectors[rng.choice(len(vectors), size=min(len(vectors), nlist * 64), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = sample[assign == c]
+                if len(members):
+                    centroid = members.sum(axis=0)
+                    centroids[c] = centroid / (np.linalg.norm(centroid) or 1)
+        return cls(centroids.astype(np.float32))
+
+    def assign(self, vectors: np.ndarray) -> np.ndarray:
+        return np.argmax(vectors @ self.centroids.T, axis=1)
+
+    def add(self, docnos: np.ndarray, vectors: np.ndarray):
+        """Add rows, moving re-embedded rows out of their previous list"""
+        for n, c in zip(docnos.tolist(), self.assign(vectors).tolist()):
+            previous = self.assigned.get(n)
+            if previous == c:
+                continue
+            if previous is not None:
+                self.discard(n)
+            self.lists[c].append(n)
+            self.assigned[n] = c
+            self._arrays.pop(c, None)
+
+    def discard(self, n: int):
+        c = self.assigned.pop(n, None)
+        if c is not None:
+            self.lists[c].remove(n)
+            self._arrays.pop(c, None)
+
+    def candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        nearest = np.argsort(-(self.centroids @ query))[:nprobe]
+        parts = []
+        for c in nearest.tolist():
+            arr = self._arrays.get(c)
+            if arr is None:
+                arr = self._arrays[c] = np.asarray(self.lists[c], dtype=np.int64)
+            parts.append(arr)
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+
+class OverflowMatrix:
+    """
+    A read-only process's matrix grown past the mapped file
+    Rows inside the file stay in the copy-on-write mapping; rows past it live
+    in a private array, so growing copies only the overflow, never the file.
+    """
+
+    def __init__(self, mapped: np.ndarray, capacity: int, previous: Optional["OverflowMatrix"] = None):
+        self.mapped = mapped
+        self.split = len(mapped)
+        self.extra = np.zeros((capacity - self.split, mapped.shape[1]), dtype=np.float32)
+        if previous is not None:
+            self.extra[:len(previous.extra)] = previous.extra
+        self.shape = (capacity, mapped.shape[1])
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)):
+            return self.mapped[key] if key < self.split else self.extra[key - self.split]
+        if isinstance(key, slice):
+            start, stop, _ = key.indices(len(self))
+            if stop <= self.split:
+                return self.mapped[start:stop]
+            if start >= self.split:
+                return self.extra[start - self.split:stop - self.split]
+            return np.concatenate([self.mapped[start:self.split], self.extra[:stop - self.split]])
+        rows = np.asarray(key)
+        out = np.empty((len(rows), self.shape[1]), dtype=np.float32)
+        low = rows < self.split
+        out[low] = self.mapped[rows[low]]
+        out[~low] = self.extra[rows[~low] - self.split]
+        return out
+
+    def __setitem__(self, n: int, vector: np.ndarray):
+        if n < self.split:
+            self.mapped[n] = vector
+        else:
+            self.extra[n - self.split] = vector
+
+class ProductVectorIndex:
+    """
+    Product embeddings in a memory-mapped float32 matrix
+    Brute-force batched top-k with argpartition, optional IVF for large catalogs.
+    Only published, approved products are indexed, as in list_products.
+    Exactly one process per directory should be writable (see warm_start);
+    the others map the matrix copy-on-write, keep their own changes in private
+    pages and never write the files. A removed product that comes back reuses
+    its row; rows of products that stay removed are dropped when the writer
+    saves and they pass COMPACT_RATIO of the matrix.
+    """
+
+    COMPACT_RATIO = 0.25
+
+    def __init__(self, directory: Path = VECTOR_DIR, dim: int = EMBEDDING_DIM, in_memory: bool = False,
+                 writable: bool = True):
+        self._lock = threading.RLock()
+        self.directory = Path(directory)
+        self.dim = dim
+        self.in_memory = in_memory
+        self.writable = writable
+        self.embedder = HashedTfidfEmbedder(dim)
+        self.doc_ids: List[Optional[str]] = []
+        self.titles: List[str] = []
+        self.docno: Dict[str, int] = {}
+        # Rows of removed products, kept until compaction so a re-upsert goes back to its row
+        self.retired: Dict[str, int] = {}
+        self.category_names: List[str] = []
+        self.category_codes: Dict[str, int] = {}
+        self.capacity = 0
+        self.vectors = np.zeros((0, dim), dtype=np.float32)
+        self.alive = np.zeros(0, dtype=bool)
+        self.prices = np.zeros(0, dtype=np.float64)
+        self.categories = np.zeros(0, dtype=np.int32)
+        self.ivf: Optional[IVFIndex] = None
+        self.watermark: Optional[datetime] = None
+        self.dirty = False
+        # Compaction writes a new matrix file; metadata names the one it describes
+        self.generation = 0
+
+    def __len__(self):
+        return len(self.docno)
+
+    @property
+    def size(self) -> int:
+        return len(self.doc_ids)
+
+    @property
+    def matrix_path(self) -> Path:
+        return self.directory / f"vectors.{self.generation}.f32"
+
+    @property
+    def metadata_path(self) -> Path:
+        return self.directory / "metadata.npz"
+
+    def _open_matrix(self, capacity: int, copy_rows: int = 0) -> np.ndarray:
+        if copy_rows and not self.writable and isinstance(self.vectors, (np.memmap, OverflowMatrix)):
+            if isinstance(self.vectors, OverflowMatrix):
+                return OverflowMatrix(self.vectors.mapped, capacity, previous=self.vectors)
+            return OverflowMatrix(self.vectors, capacity)
+        if self.in_memory or not self.writable:
+            matrix = np.zeros((capacity, self.dim), dtype=np.float32)
+            matrix[:copy_rows] = self.vectors[:copy_rows]
+            return matrix
+        self.directory.mkdir(parents=True, exist_ok=True)
+        if copy_rows and isinstance(self.vectors, np.memmap):
+            self.vectors.flush()
+        elif not copy_rows:
+            # Start a new file; readers keep their mapping of the old one
+            self.matrix_path.unlink(missing_ok=True)
+        with open(self.matrix_path, "ab") as f:
+            f.truncate(capacity * self.dim * 4)
+        return np.memmap(self.matrix_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+
+    def _grow(self, needed: int):
+        if needed <= self.capacity:
+            return
+        capacity = max(1024, self.capacity)
+        while capacity < needed:
+            capacity *= 2
+        # The file is extended in place, so existing rows stay where they are
+        self.vectors = self._open_matrix(capacity, copy_rows=self.size)
+        for name in ("alive", "prices", "categories"):
+            old = getattr(self, name)
+            grown = np.zeros(capacity, dtype=old.dtype)
+            grown[:len(old)] = old
+            setattr(self, name, grown)
+        self.capacity = capacity
+
+    def _category_code(self, category: str) -> int:
+        code = self.category_codes.get(category)
+        if code is None:
+            code = len(self.category_names)
+            self.category_names.append(category)
+            self.category_codes[category] = code
+        return code
+
+    def upsert(self, product: Dict):
+        """Embed and store a product; hidden products are removed"""
+        # Hidden products advance the watermark too, or catch_up re-reads them every pass
+        updated_at = product.get("updated_at")
+        with self._lock:
+            if isinstance(updated_at, datetime) and (self.watermark is None or updated_at > self.watermark):
+                self.watermark = updated_at
+        if not is_searchable(product):
+            self.remove(product["id"])
+            return
+
+        vector = self.embedder.embed(product_text(product))
+        with self._lock:
+            n = self.docno.get(product["id"])
+            if n is None:
+                n = self.retired.pop(product["id"], None)
+                if n is None:
+                    n = self.size
+                    self._grow(n + 1)
+                    self.doc_ids.append(product["id"])
+                    self.titles.append("")
+                else:
+                    self.doc_ids[n] = product["id"]
+                self.docno[product["id"]] = n
+            else:
+                self.embedder.observe(self.vectors[n], -1)
+            self.vectors[n] = vector
+            self.embedder.observe(vector)
+            self.titles[n] = product.get("title", "")
+            self.alive[n] = True
+            self.prices[n] = float(product.get("price", 0))
+            self.categories[n] = self._category_code(product.get("category", ""))
+            if self.ivf is not None:
+                self.ivf.add(np.array([n]), vector[None, :])
+            self.dirty = True
+
+    def remove(self, product_id: str):
+        with self._lock:
+            n = self.docno.pop(product_id, None)
+            if n is None:
+                return
+            self.embedder.observe(self.vectors[n], -1)
+            self.alive[n] = False
+            self.doc_ids[n] = None
+            self.retired[product_id] = n
+            if self.ivf is not None:
+                self.ivf.discard(n)
+            self.dirty = True
+
+    def bulk_load(self, products: Iterable[Dict]) -> int:
+        count = 0
+        for product in products:
+            self.upsert(product)
+            count += 1
+        return count
+
+    def compact(self):
+        """Drop the rows of removed products and renumber densely"""
+        with self._lock:
+            self._compact_locked()
+
+    def _compact_locked(self):
+        keep = np.flatnonzero(self.alive[:self.size])
+        count = len(keep)
+        capacity = 1024
+        while capacity < count:
+            capacity *= 2
+        old = self.vectors
+        # A new file: readers and the current metadata keep the old one until save replaces it
+        self.generation += 1
+        self.vectors = self._open_matrix(capacity)
+        for start in range(0, count, SCAN_CHUNK_ROWS):
+            chunk = keep[start:start + SCAN_CHUNK_ROWS]
+            self.vectors[start:start + len(chunk)] = old[chunk]
+        del old
+        for name in ("alive", "prices", "categories"):
+            arr = getattr(self, name)
+            fresh = np.zeros(capacity, dtype=arr.dtype)
+            fresh[:count] = arr[keep]
+            setattr(self, name, fresh)
+        self.doc_ids = [self.doc_ids[n] for n in keep]
+        self.titles = [self.titles[n] for n in keep]
+        self.docno = {product_id: i for i, product_id in enumerate(self.doc_ids)}
+        self.retired = {}
+        self.capacity = capacity
+        if self.ivf is not None:
+            ivf = IVFIndex(self.ivf.centroids)
+            for start in range(0, count, SCAN_CHUNK_ROWS):
+                rows = np.arange(start, min(count, start + SCAN_CHUNK_ROWS))
+                ivf.add(rows, np.asarray(self.vectors[start:start + len(rows)]))
+            self.ivf = ivf
+        self.dirty = True
+
+    def build_ivf(self, nlist: Optional[int] = None):
+        """Train IVF lists over the current vectors"""
+        with self._lock:
+            live = np.flatnonzero(self.alive[:self.size])
+            if len(live) == 0:
+                return
+            nlist = nlist or max(16, int(np.sqrt(len(live))))
+            ivf = IVFIndex.train(np.asarray(self.vectors[live]), nlist)
+            for start in range(0, len(live), SCAN_CHUNK_ROWS):
+                chunk = live[start:start + SCAN_CHUNK_ROWS]
+                ivf.add(chunk, np.asarray(self.vectors[chunk]))
+            self.ivf = ivf
+            logger.info(f"🧭 IVF index trained: {nlist} lists over {len(live)} products")
+
+    def _filter_mask(self, rows: np.ndarray, category: Optional[str], min_price: Optional[float],
+                     max_price: Optional[float]) -> np.ndarray:
+        mask = self.alive[rows].copy()
+        if category is not None:
+            mask &= self.categories[rows] == self.category_codes.get(category, -1)
+        if min_price is not None:
+            mask &= self.prices[rows] >= min_price
+        if max_price is not None:
+            mask &= self.prices[rows] <= max_price
+        return mask
+
+    def search_batch(
+        self,
+        queries: List[str],
+        k: int = 10,
+        category: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        nprobe: int = IVF_NPROBE
+    ) -> List[List[Dict]]:
+        """Top-k cosine neighbours for a batch of query strings"""
+        q = np.stack([self.embedder.embed_query(text) for text in queries]) if queries else np.zeros((0, self.dim), np.float32)
+        with self._lock:
+            if self.ivf is not None:
+                return [self._search_ivf(q[i], k, category, min_price, max_price, nprobe) for i in range(len(q))]
+
+            size = self.size
+            best_scores = np.full((len(q), 0), -np.inf, dtype=np.float32)
+            best_rows = np.zeros((len(q), 0), dtype=np.int64)
+            for start in range(0, size, SCAN_CHUNK_ROWS):
+                rows = np.arange(start, min(size, start + SCAN_CHUNK_ROWS))
+                scores = q @ np.asarray(self.vectors[start:start + len(rows)]).T
+                scores[:, ~self._filter_mask(rows, category, min_price, max_price)] = -np.inf
+                take = min(k, scores.shape[1])
+                part = np.argpartition(-scores, take - 1, axis=1)[:, :take]
+                best_scores = np.concatenate([best_scores, np.take_along_axis(scores, part, axis=1)], axis=1)
+                best_rows = np.concatenate([best_rows, rows[part]], axis=1)
+                if best_scores.shape[1] > k:
+                    keep = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                    best_scores = np.take_along_axis(best_scores, keep, axis=1)
+                    best_rows = np.take_along_axis(best_rows, keep, axis=1)
+
+            return [self._format(best_rows[i], best_scores[i], k) for i in range(len(q))]
+
+    def _search_ivf(self, query, k, category, min_price, max_price, nprobe) -> List[Dict]:
+        rows = self.ivf.candidates(query, nprobe)
+        rows = rows[rows < self.size]
+        rows = rows[self._filter_mask(rows, category, min_price, max_price)]
+        if not len(rows):
+            return []
+        scores = np.asarray(self.vectors[rows]) @ query
+        take = min(k, len(rows))
+        part = np.argpartition(-scores, take - 1)[:take]
+        return self._format(rows[part], scores[part], k)
+
+    def _format(self, rows: np.ndarray, scores: np.ndarray, k: int) -> List[Dict]:
+        order = np.argsort(-scores, kind="stable")[:k]
+        results = []
+        seen = set()
+        for i in order.tolist():
+            n, score = int(rows[i]), float(scores[i])
+            if not np.isfinite(score) or n in seen or self.doc_ids[n] is None:
+                continue
+            seen.add(n)
+            results.append({
+                "product_id": self.doc_ids[n],
+                "title": self.titles[n],
+                "category": self.category_names[self.categories[n]],
+                "price": float(self.prices[n]),
+                "score": round(score, 4)
+            })
+        return results
+
+    def search(self, query: str, k: int = 10, **filters) -> List[Dict]:
+        return self.search_batch([query], k, **filters)[0]
+
+    def save(self):
+        """Flush the matrix and write metadata atomically (writable index only)"""
+        if self.in_memory or not self.writable:
+            return
+        with self._lock:
+            previous = self.matrix_path
+            if self.size - len(self.docno) > self.COMPACT_RATIO * max(self.size, 1024):
+                self._compact_locked()
+            if isinstance(self.vectors, np.memmap):
+                self.vectors.flush()
+            meta = {
+                "version": METADATA_VERSION,
+                "dim": self.dim,
+                "generation": self.generation,
+                "capacity": self.capacity,
+                "watermark": self.watermark.isoformat() if self.watermark else None,
+                "doc_ids": self.doc_ids,
+                "titles": self.titles,
+                "category_names": self.category_names,
+                "docs": self.embedder.docs,
+            }
+            arrays = {
+                "alive": self.alive[:self.size].copy(),
+                "prices": self.prices[:self.size].copy(),
+                "categories": self.categories[:self.size].copy(),
+                "df": self.embedder.df.copy(),
+            }
+            if self.ivf is not None:
+                arrays["centroids"] = self.ivf.centroids
+            self.dirty = False
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp = self.metadata_path.with_name(f"{self.metadata_path.name}.{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            np.savez(f, meta=np.array(json.dumps(meta)), **arrays)
+        os.replace(tmp, self.metadata_path)
+        if previous != self.matrix_path:
+            # Unlinked only once the metadata no longer names it; open mappings stay valid
+            previous.unlink(missing_ok=True)
+        logger.info(f"🧭 Vector index saved: {len(self)} products -> {self.directory}")
+
+    @classmethod
+    def load(cls, directory: Path = VECTOR_DIR, writable: bool = True) -> Optional["ProductVectorIndex"]:
+        index = cls(directory, writable=writable)
+        if not index.metadata_path.exists():
+            return None
+        try:
+            with np.load(index.metadata_path, allow_pickle=False) as data:
+                meta = json.loads(str(data["meta"]))
+                arrays = {name: data[name] for name in data.files if name != "meta"}
+        except Exception as e:
+            logger.warning(f"⚠️ Could not read vector metadata: {e}")
+            return None
+        if meta.get("version") != METADATA_VERSION or meta["dim"] != index.dim:
+            return None
+        index.generation = meta["generation"]
+        if not index.matrix_path.exists():
+            return None
+
+        count = len(meta["doc_ids"])
+        index.capacity = meta["capacity"]
+        index.vectors = np.memmap(
+            index.matrix_path, dtype=np.float32, mode="r+" if writable else "c", shape=(index.capacity, index.dim)
+        )
+        for name, dtype in (("alive", bool), ("prices", np.float64), ("categories", np.int32)):
+            arr = np.zeros(index.capacity, dtype=dtype)
+            arr[:count] = arrays[name]
+            setattr(index, name, arr)
+        index.doc_ids = meta["doc_ids"]
+        index.titles = meta["titles"]
+        index.docno = {pid: n for n, pid in enumerate(index.doc_ids) if pid is not None}
+        index.category_names = meta["category_names"]
+        index.category_codes = {name: code for code, name in enumerate(index.category_names)}
+        index.embedder.df = arrays["df"]
+        index.embedder.docs = meta["docs"]
+        index.watermark = datetime.fromisoformat(meta["watermark"]) if meta["watermark"] else None
+        if "centroids" in arrays:
+            index.ivf = IVFIndex(arrays["centroids"])
+            live = np.flatnonzero(index.alive[:count])
+            for start in range(0, len(live), SCAN_CHUNK_ROWS):
+                chunk = live[start:start + SCAN_CHUNK_ROWS]
+                index.ivf.add(chunk, np.asarray(index.vectors[chunk]))
+        return index
+
+    def replace(self, other: "ProductVectorIndex"):
+        with self._lock:
+            for field in ("directory", "dim", "in_memory", "writable", "embedder", "doc_ids", "titles", "docno", "retired", "category_names",
+                          "category_codes", "generation", "capacity", "vectors", "alive", "prices", "categories", "ivf", "watermark", "dirty"):
+                setattr(self, field, getattr(other, field))
+
+# Memory only until warm_start swaps in the index for its directory
+vector_index = ProductVectorIndex(in_memory=True)
+
+# Open writer locks by directory, held for the life of the process
+_writer_locks: Dict[Path, object] = {}
+
+def acquire_writer_lock(directory: Path):
+    """Non-blocking exclusive lock on the index directory; returns the open lock file or None"""
+    directory.mkdir(parents=True, exist_ok=True)
+    handle = open(directory / "writer.lock", "a+")
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return None
+    return handle
+
+async def warm_start(db, directory: Path = VECTOR_DIR) -> ProductVectorIndex:
+    """
+    Open the memory-mapped vectors and catch up, or embed the catalog from scratch
+    The first worker to lock the directory owns the files; the rest are read-only.
+    """
+    started = time.perf_counter()
+    directory = Path(directory)
+    if directory not in _writer_locks:
+        _writer_locks[directory] = acquire_writer_lock(directory)
+    writable = _writer_locks[directory] is not None
+    index = ProductVectorIndex.load(directory, writable=writable)
+
+    if index is None:
+        index = ProductVectorIndex(directory, writable=writable)
+        async for product in db.products.find(VISIBLE_QUERY, INDEX_PROJECTION):
+            index.upsert(product)
+        source = "rebuild"
+    else:
+        await catch_up(db, index)
+        await reconcile_deletions(db, index)
+        source = "memmap"
+
+    if index.ivf is None and len(index) >= IVF_MIN_PRODUCTS:
+        await asyncio.to_thread(index.build_ivf)
+
+    vector_index.replace(index)
+    logger.info(
+        f"🧭 Vector index ready from {source}: {len(vector_index)} products "
+        f"in {(time.perf_counter() - started) * 1000:.0f}ms ({'writer' if writable else 'read-only'})"
+    )
+    return vector_index